@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+收集工作模組
+
+此模組將一次資料收集所需的狀態集中在 AcquisitionSession 物件中（取代 main.py 的模組層級變數），支援：
+- 生命週期：start()（初始化設備、建立輸出、啟動執行緒）→ stop()（停止讀取）→ drain()（寫完剩餘資料、上傳並關閉）
+- 每個工作擁有自己的 DeviceManager、各設備的 DeviceSink、記錄檔匯入器、收集執行緒與計數器
+- 不依賴 Flask（main.py 的路由、benchmark.py 與其他程式都可直接使用）
+- 多個工作同時執行（sections 指定各自的設備區段，例如每台設備一個工作，互不影響）
+- 輸出設定讀取（csv.ini 的分檔間隔與格式、sql.ini 的上傳間隔與連線設定）
+- 統計資訊（資料點數、遺失樣本數、佇列、觸發擷取、記錄檔匯入、連線狀態）
+
+收集迴圈只使用區域變數與物件屬性（設備管理器、輸出字典與其方法在迴圈開始前取出）。
+"""
+
+import os
+import time
+import threading
+import configparser
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional
+
+from device_manager import DeviceManager
+from device_sink import DeviceSink
+from csv_writer import CSVWriter
+from binary_writer import BinaryWriter
+from sql_uploader import SQLUploader
+from trigger_capture import SoftwareTrigger
+from device_logger import DEVICE_LOG_MODE, LogImporter
+from burst_capture import BURST_MODE
+from web_decimator import read_points_per_s
+from history_pyramid import HistoryPyramid, read_history_settings
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEVICE_INI = os.path.join(PROJECT_ROOT, "API", "PET-7H24M.ini")
+CSV_INI = os.path.join(PROJECT_ROOT, "API", "csv.ini")
+SQL_INI = os.path.join(PROJECT_ROOT, "API", "sql.ini")
+
+# 收集迴圈等待區塊通知的最長時間（秒；有資料時立即喚醒，逾時只用於檢查是否停止）
+COLLECTION_WAIT = 0.5
+
+# sql.ini 沒有設定時的 SQL 連線預設值
+DEFAULT_SQL_CONFIG = {
+    'host': 'localhost',
+    'port': '3306',
+    'user': 'root',
+    'password': '',
+    'database': 'pet7h24m',
+}
+
+
+def load_output_settings(csv_enabled: bool = True, sql_enabled: bool = False,
+                         sql_overrides: Optional[Dict[str, str]] = None,
+                         csv_ini: str = CSV_INI, sql_ini: str = SQL_INI) -> dict:
+    """
+    讀取輸出設定（csv.ini 的分檔間隔與格式、sql.ini 的上傳間隔與連線設定）
+
+    Args:
+        csv_enabled: 是否寫入 CSV / bin
+        sql_enabled: 是否上傳 SQL
+        sql_overrides: 優先於 sql.ini 的連線設定（host / port / user / password / database）
+    """
+    csv_config = configparser.ConfigParser()
+    csv_config.read(csv_ini, encoding='utf-8')
+    sql_config_parser = configparser.ConfigParser()
+    sql_config_parser.read(sql_ini, encoding='utf-8')
+
+    sql_config = dict(DEFAULT_SQL_CONFIG)
+    if sql_config_parser.has_section('SQLServer'):
+        for key, fallback in DEFAULT_SQL_CONFIG.items():
+            sql_config[key] = sql_config_parser.get('SQLServer', key, fallback=fallback)
+    if sql_enabled and sql_overrides:
+        sql_config.update({key: value for key, value in sql_overrides.items() if key in DEFAULT_SQL_CONFIG})
+
+    return {
+        'csv_enabled': bool(csv_enabled),
+        'format': csv_config.get('Output', 'format', fallback='csv').strip().lower(),
+        'save_unit': csv_config.getint('DumpUnit', 'second', fallback=60),
+        'sql_enabled': bool(sql_enabled),
+        'sql_config': sql_config,
+        'sql_upload_interval': sql_config_parser.getint('DumpUnit', 'second', fallback=60),
+    }
+
+
+class AcquisitionSession:
+    """
+    一次資料收集工作（設備、輸出、收集執行緒與統計）
+
+    使用方式：
+        session = AcquisitionSession("test", load_output_settings(), output_dir)
+        session.start()
+        ...
+        session.stop()
+        session.drain()
+    """
+
+    def __init__(self, label: str, outputs: dict, output_dir: str, ini_path: str = DEVICE_INI,
+                 sections: Optional[List[str]] = None, web_points_per_s: Optional[int] = None):
+        """
+        初始化收集工作（不連線設備，start() 時才初始化）
+
+        Args:
+            label: 資料標籤（輸出檔名使用）
+            outputs: 輸出設定（load_output_settings 的回傳值）
+            output_dir: 輸出資料夾（多設備時每台設備使用子資料夾）
+            ini_path: 設備設定檔
+            sections: 使用的設備區段（None = 所有啟用的區段）
+            web_points_per_s: 網頁顯示每個通道每秒的點數（None = 設定檔 [Web] 區段的 points_per_s）
+        """
+        self.label = label
+        self.outputs = outputs
+        self.output_dir = output_dir
+        self.ini_path = ini_path
+        self.sections = list(sections) if sections is not None else None
+        self.web_points_per_s = web_points_per_s
+        self.history_levels: List[int] = []
+        self.history_buckets = 0
+
+        self.manager = DeviceManager()
+        self.sinks: Dict[str, DeviceSink] = {}
+        self.importers: Dict[str, LogImporter] = {}
+        self.collection_thread: Optional[threading.Thread] = None
+        self.running = False
+        self.drained = False
+        self.start_time: Optional[datetime] = None
+
+    # ==========================================
+    # 生命週期
+    # ==========================================
+
+    def start(self) -> None:
+        """初始化設備、建立各設備的輸出並開始收集（失敗時釋放設備連線並拋出例外）"""
+        if self.running:
+            raise RuntimeError("收集工作已在執行中")
+
+        self.start_time = datetime.now()
+        try:
+            self.manager.init_devices(self.ini_path, self.sections)
+        except Exception as e:
+            error(f"設備初始化失敗: {e}")
+            raise RuntimeError(f"設備初始化失敗: {e}") from e
+        self.sections = [self.manager.get_device(device_id).section for device_id in self.manager.get_device_ids()]
+
+        try:
+            if self.web_points_per_s is None:
+                self.web_points_per_s = read_points_per_s(self.ini_path)
+            self.history_levels, self.history_buckets = read_history_settings(self.ini_path)
+            self._create_outputs()
+        except Exception:
+            self.manager.release()
+            raise
+
+        self.running = True
+        self.drained = False
+        for sink in self.sinks.values():
+            sink.start()
+
+        self.collection_thread = threading.Thread(target=self._collection_loop, daemon=True)
+        self.collection_thread.start()
+
+        self.manager.start_reading()
+
+        # 記錄期間匯入已分檔完成的記錄檔，停止後再匯入最後一個
+        for importer in self.importers.values():
+            importer.start()
+
+    def stop(self) -> None:
+        """停止讀取與收集（輸出中剩餘的資料由 drain() 寫完）"""
+        if not self.running:
+            return
+        self.running = False
+        self.manager.stop_reading()
+
+        # 記錄器已停止：匯入器在背景匯入剩餘的記錄檔
+        for importer in self.importers.values():
+            importer.finish()
+
+    def drain(self) -> None:
+        """等待收集執行緒結束，寫完各設備輸出中剩餘的資料、上傳剩餘的 SQL 暫存檔案並關閉（各設備並行處理）"""
+        self.stop()
+        if self.collection_thread and self.collection_thread.is_alive():
+            self.collection_thread.join(timeout=2.0)
+
+        sinks = list(self.sinks.values())
+        for sink in sinks:
+            sink.stop()
+
+        finalize_threads = [threading.Thread(target=sink.finalize, daemon=True) for sink in sinks]
+        for thread in finalize_threads:
+            thread.start()
+        for thread in finalize_threads:
+            thread.join()
+        self.drained = True
+
+    def close(self) -> None:
+        """立即停止並關閉輸出檔案（不等待剩餘資料、不上傳；程式結束時使用）"""
+        self.stop()
+        for sink in self.sinks.values():
+            sink.stop()
+            if sink.csv_writer:
+                sink.csv_writer.close()
+            if sink.sql_uploader:
+                sink.sql_uploader.close()
+
+    def importing(self) -> List[str]:
+        """仍在匯入記錄檔的設備"""
+        return [device_id for device_id, importer in self.importers.items() if importer.get_stats()['running']]
+
+    # ==========================================
+    # 輸出建立
+    # ==========================================
+
+    def _create_outputs(self) -> None:
+        """每台設備建立一組輸出（多設備時各自使用子資料夾，標籤加上 device_id）"""
+        manager = self.manager
+        multi_device = len(manager) > 1
+        sinks: Dict[str, DeviceSink] = {}
+        importers: Dict[str, LogImporter] = {}
+
+        for device_id in manager.get_device_ids():
+            device = manager.get_device(device_id)
+            sample_rate = device.get_sample_rate()
+            channels = device.get_active_channel_count()
+            info(f"系統啟動參數 [{device_id}]: 通道數={channels}, 取樣率={sample_rate} Hz")
+
+            output_path = os.path.join(self.output_dir, device_id) if multi_device else self.output_dir
+            device_label = f"{self.label}_{device_id}" if multi_device else self.label
+            os.makedirs(output_path, exist_ok=True)
+
+            if device.get_capture_mode() == DEVICE_LOG_MODE:
+                # 設備記錄模式：網頁只顯示預覽，CSV / SQL 由匯入器從記錄檔產生
+                sinks[device_id] = DeviceSink(
+                    device_id, channels, device.get_preview_rate(), self.web_points_per_s,
+                    queue_settings=manager.queue_settings,
+                    memory_budget=manager.memory_budget
+                )
+                importers[device_id] = LogImporter(
+                    device.dll, device.logger_settings, device_id,
+                    partial(self.create_sink, device_id, calibration=None, output_path=output_path,
+                            device_label=device_label)
+                )
+                self._open_history(sinks[device_id], channels, device.get_preview_rate())
+                continue
+
+            sink = self.create_sink(device_id, channels, sample_rate, device.get_calibration(),
+                                    output_path, device_label, aux_columns=device.get_aux_columns())
+
+            # 軟體觸發擷取（硬體觸發由設備只傳送事件視窗，不需要軟體觸發器）
+            if device.get_capture_mode() == 'sw_trigger':
+                sink.open_trigger(SoftwareTrigger(
+                    device.trigger_settings, channels, device.active_channels, sample_rate,
+                    device.get_calibration(), device_id
+                ))
+            self._open_history(sink, channels, sample_rate)
+            sinks[device_id] = sink
+
+        self.sinks = sinks
+        self.importers = importers
+
+    def _open_history(self, sink: DeviceSink, channels: int, sample_rate: int) -> None:
+        """依 [Web] 區段為設備輸出建立歷史資料金字塔（history_buckets = 0 時不建立）"""
+        if self.history_buckets:
+            sink.open_history(HistoryPyramid(channels, sample_rate, self.history_levels, self.history_buckets))
+
+    def create_sink(self, device_id: str, channels: int, sample_rate: int, calibration, output_path: str,
+                    device_label: str, start_time: Optional[datetime] = None,
+                    aux_columns: Optional[List[str]] = None) -> DeviceSink:
+        """
+        建立單一設備的輸出，並依輸出設定建立 CSV / bin 寫入器與 SQL 上傳器（失敗時拋出例外）
+
+        串流擷取與記錄檔匯入共用，因此兩者的分檔、時間戳記與 SQL 批次完全相同；
+        start_time 為第一個 frame 的時間（None = 現在），aux_columns 為同步輸入欄位名稱。
+        """
+        outputs = self.outputs
+        queue_settings = self.manager.queue_settings
+        # 下游佇列與讀取端佇列共用同一份記憶體預算（spill 暫存檔預設放在輸出資料夾）
+        sink = DeviceSink(
+            device_id, channels, sample_rate, self.web_points_per_s,
+            queue_settings=queue_settings,
+            memory_budget=self.manager.memory_budget,
+            spill_dir=queue_settings.spill_dir or os.path.join(output_path, ".spill"),
+            aux_columns=aux_columns
+        )
+
+        # CSV / bin 寫入器（format = bin 時改用 BinaryWriter 保留原始型別）
+        if outputs['csv_enabled']:
+            try:
+                if outputs['format'] == 'bin':
+                    writer = BinaryWriter(
+                        channels=channels,
+                        output_dir=output_path,
+                        label=device_label,
+                        sample_rate=sample_rate,
+                        calibration=calibration,
+                        start_time=start_time,
+                        aux_columns=aux_columns
+                    )
+                else:
+                    writer = CSVWriter(
+                        channels=channels,
+                        output_dir=output_path,
+                        label=device_label,
+                        sample_rate=sample_rate,
+                        start_time=start_time,
+                        aux_columns=aux_columns
+                    )
+                sink.open_csv(writer, outputs['save_unit'])
+            except Exception as e:
+                error(f"CSV Writer 初始化失敗: {e}")
+                raise RuntimeError(f"CSV Writer 初始化失敗 [{device_id}]: {e}") from e
+
+        # SQL 上傳器與暫存檔案（如果啟用）
+        if outputs['sql_enabled']:
+            try:
+                sink.open_sql(SQLUploader(channels, device_label, outputs['sql_config'], aux_columns), output_path,
+                              outputs['sql_upload_interval'], start_time)
+            except Exception as e:
+                raise RuntimeError(f"SQL 上傳器初始化失敗 [{device_id}]: {e}") from e
+
+        return sink
+
+    # ==========================================
+    # 收集迴圈
+    # ==========================================
+
+    def _collection_loop(self) -> None:
+        """資料收集主迴圈（在獨立執行緒中執行，從合併管線取出區塊並依 device_id 分發給對應的輸出）"""
+        # 每個區塊都會用到的物件與方法先取出為區域變數
+        manager = self.manager
+        wait_for_data = manager.wait_for_data
+        get_data = manager.get_data
+        dispatchers = {device_id: sink.dispatch for device_id, sink in self.sinks.items()}
+
+        while self.running:
+            try:
+                # 等待任一設備放入區塊（負載高時多個區塊合併為一次喚醒）
+                wait_for_data(COLLECTION_WAIT)
+                block = get_data()
+
+                while block is not None:
+                    dispatch = dispatchers.get(block.device_id)
+                    if dispatch is not None:
+                        dispatch(block)
+                    block.release()
+
+                    block = get_data()
+
+            except Exception as e:
+                error(f"Collection loop error: {e}")
+                time.sleep(0.1)
+
+    # ==========================================
+    # 狀態與統計
+    # ==========================================
+
+    def get_device_ids(self) -> List[str]:
+        """此工作的設備識別碼（依設定檔順序）"""
+        return list(self.sinks.keys())
+
+    def data_counter(self) -> int:
+        """所有設備累計的資料點數"""
+        return sum(sink.data_counter for sink in self.sinks.values())
+
+    def link_state(self, device_id: str) -> Optional[str]:
+        """設備的連線狀態（connected / reconnecting / down；未收集時為 None）"""
+        device = self.manager.get_device(device_id)
+        if device is None:
+            return None
+        return device.get_link_state()
+
+    def lost_samples(self) -> Dict[str, dict]:
+        """各設備累計遺失的樣本數（設備端、data_queue 丟棄、各輸出偵測到的缺漏）"""
+        reader_stats = self.manager.get_reader_stats()
+        lost = {}
+        for device_id in set(reader_stats) | set(self.sinks):
+            stats = reader_stats.get(device_id, {})
+            entry = {
+                'device': stats.get('device_lost_samples', 0),
+                'data_queue': stats.get('dropped_samples', 0),
+                'overflows': stats.get('overflows', 0),
+            }
+            sink = self.sinks.get(device_id)
+            if sink is not None:
+                entry['csv'] = sink.lost_samples['csv']
+                entry['sql'] = sink.lost_samples['sql']
+                entry['gaps'] = dict(sink.gaps)
+            lost[device_id] = entry
+        return lost
+
+    def trigger_stats(self) -> Dict[str, dict]:
+        """各設備的觸發擷取與定時擷取統計（連續擷取的設備不列出）"""
+        stats = {}
+        for device_id, sink in self.sinks.items():
+            device = self.manager.get_device(device_id)
+            if sink.trigger is not None:
+                stats[device_id] = sink.trigger.get_stats()
+            elif device is not None and device.get_capture_mode() == 'hw_trigger':
+                stats[device_id] = {'mode': 'hw_trigger', 'events': device.get_reader_stats().get('events', 0)}
+            elif device is not None and device.get_capture_mode() == BURST_MODE:
+                stats[device_id] = {'mode': BURST_MODE, **device.get_reader_stats().get('burst', {})}
+        return stats
+
+    def importer_stats(self) -> Dict[str, dict]:
+        """各設備記錄檔匯入器的統計（只列出設備記錄模式的設備）"""
+        return {device_id: importer.get_stats() for device_id, importer in self.importers.items()}
+
+    def queue_stats(self) -> Dict[str, dict]:
+        """各設備所有佇列的位元組統計（讀取端 data_queue 與 CSV / SQL / 網頁游標）"""
+        queue_stats = self.manager.get_queue_stats()
+        stats = {}
+        for device_id in set(queue_stats) | set(self.sinks):
+            entry = {}
+            if device_id in queue_stats:
+                entry['data_queue'] = queue_stats[device_id]
+            sink = self.sinks.get(device_id)
+            if sink is not None:
+                entry.update(sink.get_stats()['queues'])
+            stats[device_id] = entry
+        return stats
+
+    def live_stats(self) -> Dict[str, dict]:
+        """各設備網頁用戶端的推送統計（暫存、已送出與丟棄的資料段數、中斷的慢速用戶端）"""
+        return {device_id: sink.live.get_stats() for device_id, sink in self.sinks.items()}
+
+    def describe(self) -> str:
+        """啟動狀態摘要（取樣率、通道數、擷取模式與輸出設定）"""
+        manager = self.manager
+        first = manager.get_device(manager.get_device_ids()[0])
+        outputs = self.outputs
+        parts = [f'取樣率: {first.get_sample_rate()} Hz', f'通道數: {first.get_active_channel_count()}']
+        if len(manager) > 1:
+            parts.insert(0, f'設備數: {len(manager)}')
+        if first.get_calibration() is not None:
+            parts.append(f'原始整數模式: {first.raw_dtype}')
+        if first.get_capture_mode() == DEVICE_LOG_MODE:
+            parts.append(f'設備記錄: {first.logger_settings.log_dir}（預覽 {first.get_preview_rate()} Hz）')
+        elif first.get_capture_mode() == BURST_MODE:
+            parts.append(f'定時擷取: {first.burst_settings.describe()}')
+        elif first.get_capture_mode() != 'continuous':
+            parts.append(f'觸發擷取: {first.get_capture_mode()}')
+        if outputs['csv_enabled']:
+            parts.append(f"{outputs['format'].upper()} 分檔間隔: {outputs['save_unit']} 秒")
+        if outputs['sql_enabled']:
+            parts.append(f"SQL 上傳間隔: {outputs['sql_upload_interval']} 秒")
+        return ", ".join(parts)
@@ -0,0 +1,866 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端處理量基準測試
+
+此模組以合成資料源（simulated 後端）驅動實際的採集管線，量測系統可持續的取樣率，支援：
+- 實際管線：PET7H24M._read_loop → AcquisitionSession 收集迴圈 → DeviceSink（csv_writer_loop / sql_writer_loop / web_loop / read_web_chunks）
+- 參數掃描：取樣率（預設 10k–128k Hz）× 通道數（1–4）
+- 每個階段的 CPU 時間（以執行緒 CPU 時鐘量測）
+- 佇列最高水位（data_queue、CSV、SQL、網頁佇列）與緩衝區池統計
+- 丟棄統計（data_queue 丟棄最舊區塊、CSV / SQL / 網頁佇列滿、設備緩衝區溢位）
+- 區塊延遲（讀取完成到 CSV / SQL 寫入完成、到網頁可取出）p50 / p99 / max，並與延遲目標比較（--latency-budget-ms）
+- 收集迴圈的喚醒統計（區塊到達通知次數與實際喚醒次數，負載高時多個區塊合併為一次喚醒）
+- JSON 輸出（含 git commit、Python / NumPy 版本），可用 --compare 與先前的結果比較
+- 冷啟動時間（--cold-start：重複啟動 main.py，量測到 /status 可回應的時間，並確認啟動時未載入 libhsdaq.so）
+- 讀取端抖動（讀取間隔與讀取延遲 p50 / p99 / max；--reader-mode both 比較讀取執行緒與讀取行程 + 共用記憶體）
+- 網頁負載（--viewers N：N 個用戶端連線 /stream 接收即時資料，與 --viewers 0 的結果比較擷取與寫入是否受影響；
+  --viewer-format 選擇 JSON（Server-Sent Events）或二進位資料框）
+- 即時資料格式（--wire-formats：每次更新的資料量與編碼 CPU 時間，JSON 與 float32 / int16 資料框比較）
+
+SQL 階段只量測暫存檔案寫入（上傳間隔設為大於量測時間，不連接資料庫）。
+
+使用方式：
+    python src/benchmark.py
+    python src/benchmark.py --rates 20000,128000 --channels 4 --duration 10 --format bin
+    python src/benchmark.py --sql --output baseline.json
+    python src/benchmark.py --compare baseline.json
+    python src/benchmark.py --cold-start 5
+    python src/benchmark.py --rates 128000 --channels 4 --reader-mode both
+    python src/benchmark.py --rates 20000 --channels 4 --latency-budget-ms 5
+    python src/benchmark.py --rates 20000 --channels 4 --viewers 10 --compare baseline.json
+    python src/benchmark.py --rates 20000 --channels 4 --viewers 10 --viewer-format f32
+    python src/benchmark.py --wire-formats
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import configparser
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# main 匯入時會切換工作目錄到專案根目錄，命令列中的相對路徑以啟動時的目錄為準
+LAUNCH_DIR = os.getcwd()
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+import main as app_main
+from acquisition_session import AcquisitionSession
+from device_manager import DEVICE_SECTION_PREFIX
+from device_sink import DeviceSink
+from hsdaq_backend import BACKENDS, BACKEND_ENV
+from live_stream import LiveChunk
+from web_decimator import DEFAULT_POINTS_PER_S, EnvelopeDecimator, decimation_ratio
+from wire_format import FRAME_HEADER, KIND_FLOAT32, KIND_INT16, WIRE_FORMATS, encode_chunks
+from werkzeug.serving import make_server
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning, Logger
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    Logger = None
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+DEFAULT_RATES = "10000,20000,50000,128000"
+DEFAULT_CHANNELS = "1,2,3,4"
+
+# 已寫入樣本數至少達到讀取樣本數的比例才視為可持續
+SUSTAINED_RATIO = 0.95
+
+# 佇列水位取樣間隔（秒）
+MONITOR_INTERVAL = 0.005
+
+# 模擬瀏覽器輪詢 /data 的間隔（秒）
+WEB_POLL_INTERVAL = 0.1
+
+# 區塊延遲目標（毫秒，p99；讀取完成到 CSV 寫入完成與到網頁可取出）
+DEFAULT_LATENCY_BUDGET_MS = 5.0
+
+# --wire-formats 模擬的每秒更新次數（每次更新一個區塊）
+WIRE_UPDATES_PER_S = 100
+
+# 讀取方式：thread = 主行程的讀取執行緒；process = 讀取行程 + 共用記憶體環形緩衝區（reader_process = 1）
+READER_MODES = ("thread", "process")
+
+
+def _parse_int_list(text: str) -> List[int]:
+    """解析逗號分隔的整數清單"""
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def _thread_cpu(thread: Optional[threading.Thread]) -> Optional[float]:
+    """取得執行緒目前累計的 CPU 時間（秒；執行緒不存在或平台不支援時回傳 None）"""
+    if thread is None or not thread.is_alive() or not hasattr(time, "pthread_getcpuclockid"):
+        return None
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+    except (OSError, ValueError):
+        return None
+
+
+def _latency_ms(values) -> Optional[Dict[str, float]]:
+    """計算延遲百分位數（毫秒）"""
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64) * 1000.0
+    return {
+        'p50': round(float(np.percentile(arr, 50)), 3),
+        'p99': round(float(np.percentile(arr, 99)), 3),
+        'max': round(float(arr.max()), 3),
+        'count': int(arr.size),
+    }
+
+
+def _environment() -> Dict[str, str]:
+    """量測環境資訊（用於比較不同版本的結果）"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SCRIPT_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def write_run_ini(base_ini: str, path: str, sample_rate: int, channels: int, reader_mode: str = "thread") -> None:
+    """以基準設定檔為範本，產生單次量測用的設定檔（單一設備、模擬後端、指定取樣率、通道數與讀取方式）"""
+    cfg = configparser.ConfigParser()
+    cfg.read(base_ini, encoding='utf-8')
+    if not cfg.has_section(DEVICE_SECTION_PREFIX):
+        cfg.add_section(DEVICE_SECTION_PREFIX)
+    for section in cfg.sections():
+        if section != DEVICE_SECTION_PREFIX:
+            cfg.remove_section(section)
+
+    cfg.set(DEVICE_SECTION_PREFIX, "sample_rate", str(sample_rate))
+    for ch in range(4):
+        cfg.set(DEVICE_SECTION_PREFIX, f"enable_ai{ch}", "1" if ch < channels else "0")
+    cfg.set(DEVICE_SECTION_PREFIX, "target_count", "0")
+    cfg.set(DEVICE_SECTION_PREFIX, "sim_pace", "realtime")
+    cfg.set(DEVICE_SECTION_PREFIX, "reader_process", "1" if reader_mode == "process" else "0")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        cfg.write(f)
+
+
+class QueueMonitor:
+    """定期取樣各佇列長度，記錄最高水位"""
+
+    def __init__(self, device, sink: DeviceSink):
+        self.queues = {
+            'data_queue': device.data_queue,
+            'csv': sink.csv_cursor,
+            'sql': sink.sql_cursor,
+            'web': sink.web_cursor,
+        }
+        self.queues = {name: q for name, q in self.queues.items() if q is not None}
+        self.high_water = {name: 0 for name in self.queues}
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def _loop(self) -> None:
+        while self.running:
+            for name, q in self.queues.items():
+                size = q.qsize()
+                if size > self.high_water[name]:
+                    self.high_water[name] = size
+            time.sleep(MONITOR_INTERVAL)
+
+
+def _web_poll_loop(sink: DeviceSink, stop_event: threading.Event) -> None:
+    """模擬瀏覽器以自己的游標定期讀取網頁顯示資料（對應 /data?since= 端點）"""
+    cursor = -1
+    while not stop_event.wait(WEB_POLL_INTERVAL):
+        _, cursor, _ = sink.read_web_chunks(cursor)
+
+
+class StreamViewer:
+    """模擬一個瀏覽器連線 /stream，解析並計算收到的事件（每個用戶端一個執行緒）"""
+
+    def __init__(self, port: int, device_id: str, wire_format: str = 'json'):
+        self.port = port
+        self.device_id = device_id
+        self.wire_format = wire_format
+        self.events = 0
+        self.bytes = 0
+        self.values = 0
+        self.skipped_frames = 0
+        self.error: Optional[str] = None
+        self._closing = False
+        self._connection: Optional[http.client.HTTPConnection] = None
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def counts(self) -> tuple:
+        """目前累計的（事件數, 位元組數, 值的個數, 略過的 frame 數）"""
+        return self.events, self.bytes, self.values, self.skipped_frames
+
+    def close(self) -> None:
+        """關閉連線（伺服器端在下一次送出時發現連線中斷並移除用戶端）"""
+        self._closing = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except (OSError, AttributeError):
+                pass
+        self.thread.join(timeout=5)
+
+    def _loop(self) -> None:
+        try:
+            self._connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            query = f'/stream?device={self.device_id}'
+            if self.wire_format != 'json':
+                query += f'&format={self.wire_format}'
+            self._connection.request('GET', query)
+            response = self._connection.getresponse()
+            if response.status != 200:
+                self.error = f"HTTP {response.status}"
+                return
+            if self.wire_format != 'json':
+                self._read_frames(response)
+                return
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                self.bytes += len(line)
+                if line.startswith(b'data: '):
+                    payload = json.loads(line[6:])
+                    if 'seq' in payload:
+                        self.events += 1
+                        self.values += len(payload['data'])
+                        self.skipped_frames += payload['skipped']
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            if not self._closing:
+                self.error = str(e)
+
+    def _read_frames(self, response) -> None:
+        """讀取二進位資料框（只解析標頭，資料以 NumPy 檢視，與前端的 Float32Array 相同不逐值解析）"""
+        while True:
+            header = response.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+            _, _, kind, columns, _, _, _, skipped, count = FRAME_HEADER.unpack(header)
+            if kind == KIND_FLOAT32:
+                size = count * 4
+            elif kind == KIND_INT16:
+                size = columns * 4 + count * 2
+            else:
+                size = count
+            body = response.read(size)
+            if len(body) < size:
+                break
+            self.bytes += len(header) + size
+            if kind == KIND_FLOAT32:
+                self.events += 1
+                self.values += len(np.frombuffer(body, dtype='<f4'))
+                self.skipped_frames += skipped
+            elif kind == KIND_INT16:
+                self.events += 1
+                self.values += len(np.frombuffer(body, dtype='<i2', offset=columns * 4))
+                self.skipped_frames += skipped
+
+
+def run_case(args, sample_rate: int, channels: int, work_dir: str, reader_mode: str = "thread") -> dict:
+    """
+    執行單一取樣率 / 通道數 / 讀取方式組合的量測
+
+    Returns:
+        量測結果字典
+    """
+    case_dir = os.path.join(work_dir, f"{sample_rate}Hz_{channels}ch_{reader_mode}")
+    os.makedirs(case_dir, exist_ok=True)
+    ini_path = os.path.join(case_dir, "PET-7H24M.ini")
+    write_run_ini(args.ini, ini_path, sample_rate, channels, reader_mode)
+
+    # 與 main.py 相同的收集工作；上傳間隔大於量測時間：只量測 SQL 暫存檔案寫入，不會觸發資料庫上傳
+    outputs = {
+        'csv_enabled': True,
+        'format': args.format,
+        'save_unit': args.save_unit,
+        'sql_enabled': args.sql,
+        'sql_config': {},
+        'sql_upload_interval': int(args.duration + args.warmup) + 60,
+    }
+    session = AcquisitionSession(f"bench_{sample_rate}_{channels}", outputs, case_dir, ini_path)
+    session.start()
+    manager = session.manager
+    device_id = manager.get_device_ids()[0]
+    device = manager.get_device(device_id)
+    sink = session.sinks[device_id]
+    writer = sink.csv_writer
+
+    monitor = QueueMonitor(device, sink)
+    web_stop = threading.Event()
+    web_thread = threading.Thread(target=_web_poll_loop, args=(sink, web_stop), daemon=True)
+    collection_thread = session.collection_thread
+
+    web_thread.start()
+    monitor.start()
+
+    # 網頁負載：以 main.py 的 Flask 應用程式提供 /stream，N 個用戶端在同一行程內連線接收
+    server = None
+    viewers: List[StreamViewer] = []
+    if args.viewers > 0:
+        app_main.sessions[session.label] = session
+        server = make_server('127.0.0.1', 0, app_main.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        viewers = [StreamViewer(server.server_port, device_id, args.viewer_format) for _ in range(args.viewers)]
+        for viewer in viewers:
+            viewer.start()
+
+    # 讀取行程模式下主行程沒有讀取執行緒，讀取端 CPU 改用讀取迴圈自行回報的統計
+    threads = {
+        'reader': device.reading_thread,
+        'collection': collection_thread,
+        'csv_writer': sink.csv_writer_thread,
+        'sql_writer': sink.sql_writer_thread,
+        'history': sink.history_thread,
+        'web': sink.web_thread,
+        'web_poll': web_thread,
+    }
+
+    # 暖機後開始計算（排除啟動時建立檔案等一次性成本）
+    time.sleep(args.warmup)
+    stats0 = device.get_reader_stats()
+    written0 = dict(sink.written)
+    cpu0 = {name: _thread_cpu(t) for name, t in threads.items()}
+    viewer0 = [v.counts() for v in viewers]
+    process_cpu0 = time.process_time()
+    t0 = time.monotonic()
+
+    time.sleep(args.duration)
+
+    # 在停止前取樣（執行緒結束後無法再讀取其 CPU 時鐘）
+    elapsed = time.monotonic() - t0
+    process_cpu = time.process_time() - process_cpu0
+    cpu1 = {name: _thread_cpu(t) for name, t in threads.items()}
+    stats1 = device.get_reader_stats()
+    written1 = dict(sink.written)
+    reader_alive = device.is_reading()
+    pool_stats = device.get_pool_stats()
+    live_stats = sink.live.get_stats()
+    viewer_counts = [tuple(b - a for a, b in zip(before, v.counts())) for before, v in zip(viewer0, viewers)]
+
+    session.stop()
+    collection_thread.join(timeout=5)
+    sink.stop()
+    for t in (sink.csv_writer_thread, sink.sql_writer_thread):
+        if t:
+            t.join(timeout=10)
+    web_stop.set()
+    web_thread.join(timeout=5)
+    monitor.stop()
+    for viewer in viewers:
+        viewer.close()
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        app_main.sessions.pop(session.label, None)
+
+    # 不呼叫 finalize()（會上傳 SQL 暫存檔案），只關閉檔案寫入器
+    writer.close()
+    sink.clear()
+    queue_bytes = {
+        name: {key: stats[key] for key in ('policy', 'max_bytes', 'high_water_bytes', 'dropped_bytes',
+                                           'spilled_bytes', 'blocked_seconds')}
+        for name, stats in [('data_queue', device.get_queue_stats())] + list(sink.get_stats()['queues'].items())
+    }
+    budget_stats = manager.memory_budget.get_stats()
+    signal_stats = manager.get_signal_stats()
+    manager.release()
+
+    expected = sample_rate * channels
+    read_samples = stats1['samples'] - stats0['samples']
+    read_rate = read_samples / elapsed if elapsed > 0 else 0.0
+
+    if cpu0['reader'] is None or cpu1['reader'] is None:
+        cpu0['reader'] = stats0.get('cpu_seconds')
+        cpu1['reader'] = stats1.get('cpu_seconds')
+    cpu = {}
+    for name in threads:
+        if cpu0[name] is not None and cpu1[name] is not None:
+            cpu[name] = {
+                'cpu_s': round(cpu1[name] - cpu0[name], 4),
+                'cpu_percent': round((cpu1[name] - cpu0[name]) / elapsed * 100.0, 2),
+            }
+
+    stages = ['csv'] + (['sql'] if args.sql else [])
+    written = {}
+    for stage in stages:
+        count = written1[stage] - written0[stage]
+        written[stage] = {
+            'samples': count,
+            'samples_per_s': round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    drops = {
+        'data_queue_blocks': stats1.get('dropped_blocks', 0),
+        'data_queue_samples': stats1.get('dropped_samples', 0),
+        'device_lost_samples': stats1.get('device_lost_samples', 0),
+        'csv_blocks': sink.dropped['csv'],
+        'sql_blocks': sink.dropped['sql'],
+        'web_chunks': sink.dropped['web'],
+        'reader_aborted': not reader_alive,
+    }
+
+    latency = {stage: _latency_ms(list(sink.latency[stage])) for stage in stages + ['web']}
+    latency_ok = all(latency[stage] is not None and latency[stage]['p99'] <= args.latency_budget_ms
+                     for stage in ('csv', 'web'))
+
+    sustained = (
+        reader_alive
+        and read_rate >= expected * SUSTAINED_RATIO
+        and drops['data_queue_blocks'] == 0
+        and drops['device_lost_samples'] == 0
+        and drops['csv_blocks'] == 0
+        and drops['sql_blocks'] == 0
+        and all(written[s]['samples'] >= read_samples * SUSTAINED_RATIO for s in stages)
+    )
+
+    return {
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'reader_mode': reader_mode,
+        'expected_samples_per_s': expected,
+        'elapsed_s': round(elapsed, 3),
+        'read': {
+            'samples': read_samples,
+            'samples_per_s': round(read_rate, 1),
+            'wakeup_mode': stats1.get('mode'),
+            'reads': stats1['reads'] - stats0['reads'],
+            'jitter': stats1.get('jitter'),
+        },
+        'written': written,
+        'sustained': sustained,
+        'cpu': cpu,
+        'queue_high_water': monitor.high_water,
+        'queue_bytes': queue_bytes,
+        'memory_budget': budget_stats,
+        'buffer_pool': pool_stats,
+        'drops': drops,
+        'latency_ms': latency,
+        'latency_ok': latency_ok,
+        'collection_signal': signal_stats,
+        'process_cpu_percent': round(process_cpu / elapsed * 100.0, 2) if elapsed > 0 else 0.0,
+        'viewers': {
+            'count': len(viewers),
+            'format': args.viewer_format,
+            'events': sum(c[0] for c in viewer_counts),
+            'bytes': sum(c[1] for c in viewer_counts),
+            'bytes_per_s': round(sum(c[1] for c in viewer_counts) / elapsed, 1) if elapsed > 0 else 0.0,
+            'values': sum(c[2] for c in viewer_counts),
+            # 每個用戶端各自以游標讀取完整的資料，各用戶端的值的個數應接近
+            'values_per_viewer': [min(c[2] for c in viewer_counts), max(c[2] for c in viewer_counts)]
+            if viewer_counts else None,
+            'skipped_frames': sum(c[3] for c in viewer_counts),
+            'disconnected': live_stats['disconnected'],
+            'errors': [v.error for v in viewers if v.error],
+        },
+    }
+
+
+def _free_port() -> int:
+    """取得可用的本機埠號"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_cold_start(runs: int, backend: str, timeout: float = 30.0) -> dict:
+    """
+    量測 main.py 冷啟動時間
+
+    每次以新的行程啟動 main.py，從建立行程起輪詢 /status 直到回應，記錄：
+    - wall_ms：建立行程到 /status 第一次回應（含 Python 直譯器啟動）
+    - import_ms / http_ready_ms：main.py 自行回報的模組匯入與 HTTP 就緒時間
+    - hsdaq_loaded：回應時 libhsdaq.so 是否已載入（應為 False，設備 I/O 延後到 /start）
+    """
+    samples = []
+    env = dict(os.environ)
+    env[BACKEND_ENV] = backend
+    for i in range(runs):
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}/status"
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(SCRIPT_DIR, 'main.py'), '--port', str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        status = None
+        try:
+            while time.perf_counter() - start < timeout and proc.poll() is None:
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as response:
+                        status = json.load(response)
+                    break
+                except OSError:
+                    time.sleep(0.005)
+            wall_ms = (time.perf_counter() - start) * 1000
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if status is None:
+            raise RuntimeError(f"main.py 在 {timeout:.0f} 秒內沒有回應 /status")
+        startup = status.get('startup', {})
+        samples.append({
+            'wall_ms': round(wall_ms, 3),
+            'import_ms': startup.get('import_ms'),
+            'http_ready_ms': startup.get('http_ready_ms'),
+            'hsdaq_loaded': bool(startup.get('hsdaq', {}).get('loaded')),
+        })
+        info(f"  第 {i + 1} 次: /status 回應 {wall_ms:.1f} ms（模組匯入 {startup.get('import_ms')} ms，"
+             f"HTTP 就緒 {startup.get('http_ready_ms')} ms）")
+
+    def _summary(key):
+        values = [s[key] for s in samples if s[key] is not None]
+        if not values:
+            return None
+        return {
+            'median': round(float(np.median(values)), 3),
+            'min': round(float(min(values)), 3),
+            'max': round(float(max(values)), 3),
+        }
+
+    return {
+        'runs': samples,
+        'wall_ms': _summary('wall_ms'),
+        'import_ms': _summary('import_ms'),
+        'http_ready_ms': _summary('http_ready_ms'),
+        'hsdaq_loaded_at_ready': any(s['hsdaq_loaded'] for s in samples),
+    }
+
+
+def measure_wire_formats(rates: List[int], channel_counts: List[int], points_per_s: int = DEFAULT_POINTS_PER_S,
+                         updates_per_s: int = WIRE_UPDATES_PER_S, seconds: float = 2.0) -> List[dict]:
+    """
+    量測即時資料每次更新的資料量與編碼 CPU 時間（JSON 與二進位資料框）
+
+    以網頁執行緒相同的降頻器產生 seconds 秒的資料段（每次更新一個區塊），分別以 /stream 的 JSON 事件
+    與 f32 / i16 資料框編碼，CPU 時間以行程 CPU 時鐘量測。
+    """
+    rng = np.random.default_rng(0)
+    rows = []
+    for sample_rate in rates:
+        for channels in channel_counts:
+            ratio = decimation_ratio(sample_rate, points_per_s)
+            decimator = EnvelopeDecimator(ratio)
+            block_frames = max(1, sample_rate // updates_per_s)
+            chunks = []
+            for i in range(int(seconds * updates_per_s)):
+                frames = rng.uniform(-10.0, 10.0, (block_frames, channels)).astype(np.float32)
+                values = decimator.process(frames, i * block_frames)
+                if values is not None:
+                    chunks.append(LiveChunk(i + 1, values.ravel(), block_frames, decimator.output_index))
+
+            def _json(chunk):
+                return f"data: {json.dumps({'seq': chunk.seq, 'data': chunk.values.tolist(), 'counter': 0, 'skipped': 0, 'link_state': 'connected'})}\n\n".encode()
+
+            encoders = {'json': _json}
+            for name, kind in WIRE_FORMATS.items():
+                encoders[name] = lambda chunk, kind=kind: b''.join(encode_chunks(kind, [chunk], channels, ratio))
+
+            row = {'sample_rate': sample_rate, 'channels': channels, 'decimation': ratio,
+                   'values_per_update': round(float(np.mean([len(c.values) for c in chunks])), 1)}
+            for name, encode in encoders.items():
+                start = time.process_time()
+                size = sum(len(encode(chunk)) for chunk in chunks)
+                cpu = time.process_time() - start
+                row[name] = {
+                    'bytes_per_update': round(size / len(chunks), 1),
+                    'bytes_per_s': round(size / seconds, 1),
+                    'cpu_us_per_update': round(cpu / len(chunks) * 1e6, 2),
+                }
+            rows.append(row)
+            info(f"  {sample_rate} Hz × {channels} 通道（降頻 {ratio}，每次更新 {row['values_per_update']:.0f} 個值）: "
+                 + "，".join(f"{name} {row[name]['bytes_per_update']:.0f} B / {row[name]['cpu_us_per_update']:.1f} µs"
+                            for name in encoders))
+    return rows
+
+
+def _case_key(case: dict):
+    """比較用的組合鍵（舊版結果沒有 reader_mode，視為 thread）"""
+    return case['sample_rate'], case['channels'], case.get('reader_mode', 'thread')
+
+
+def compare_results(current: dict, baseline: dict) -> List[dict]:
+    """與先前的量測結果比較（依取樣率、通道數與讀取方式配對）"""
+    base_cases = {_case_key(c): c for c in baseline.get('cases', [])}
+    rows = []
+    for case in current['cases']:
+        base = base_cases.get(_case_key(case))
+        if base is None or 'error' in case or 'error' in base:
+            continue
+        row = {
+            'sample_rate': case['sample_rate'],
+            'channels': case['channels'],
+            'reader_mode': case.get('reader_mode', 'thread'),
+            'sustained': [base['sustained'], case['sustained']],
+            'csv_samples_per_s': [base['written']['csv']['samples_per_s'], case['written']['csv']['samples_per_s']],
+        }
+        for stage in ('csv', 'web'):
+            base_lat = (base.get('latency_ms') or {}).get(stage)
+            cur_lat = (case.get('latency_ms') or {}).get(stage)
+            if base_lat and cur_lat:
+                row[f'{stage}_latency_p99_ms'] = [base_lat['p99'], cur_lat['p99']]
+        for stage in ('reader', 'collection', 'csv_writer'):
+            if stage in base.get('cpu', {}) and stage in case['cpu']:
+                row[f'{stage}_cpu_percent'] = [base['cpu'][stage]['cpu_percent'], case['cpu'][stage]['cpu_percent']]
+        rows.append(row)
+    return rows
+
+
+def compare_reader_modes(cases: List[dict]) -> List[dict]:
+    """比較同一組取樣率 / 通道數下讀取執行緒與讀取行程的讀取端抖動（[thread, process]）"""
+    by_key = {_case_key(c): c for c in cases if 'error' not in c}
+    rows = []
+    for (sample_rate, channels, mode), thread_case in by_key.items():
+        process_case = by_key.get((sample_rate, channels, 'process'))
+        if mode != 'thread' or process_case is None:
+            continue
+        row = {'sample_rate': sample_rate, 'channels': channels,
+               'sustained': [thread_case['sustained'], process_case['sustained']]}
+        for metric in ('read_interval_ms', 'read_lag_ms'):
+            before = (thread_case['read'].get('jitter') or {}).get(metric)
+            after = (process_case['read'].get('jitter') or {}).get(metric)
+            if before and after:
+                for key in ('p50', 'p99', 'max'):
+                    row[f'{metric}_{key}'] = [before[key], after[key]]
+        base_lat = (thread_case.get('latency_ms') or {}).get('csv')
+        cur_lat = (process_case.get('latency_ms') or {}).get('csv')
+        if base_lat and cur_lat:
+            row['csv_latency_p99_ms'] = [base_lat['p99'], cur_lat['p99']]
+        rows.append(row)
+    return rows
+
+
+def main():
+    """主函數（程式入口點）"""
+    parser = argparse.ArgumentParser(
+        description='PET-7H24M end-to-end throughput benchmark',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+範例：
+  python src/benchmark.py                                   # 10k–128k Hz × 1–4 通道，每組 5 秒
+  python src/benchmark.py --rates 128000 --channels 4 --format bin
+  python src/benchmark.py --sql --output baseline.json      # 包含 SQL 暫存檔案寫入
+  python src/benchmark.py --compare baseline.json           # 與先前的結果比較
+  python src/benchmark.py --cold-start 5                    # 只量測 main.py 冷啟動時間（5 次）
+  python src/benchmark.py --rates 128000 --channels 4 --reader-mode both   # 比較讀取執行緒與讀取行程的抖動
+  python src/benchmark.py --rates 20000 --channels 4 --viewers 10 --compare base.json   # 10 個 /stream 用戶端
+  python src/benchmark.py --rates 20000 --channels 4 --viewers 10 --viewer-format f32    # 二進位資料框
+  python src/benchmark.py --wire-formats                    # 只量測 JSON 與二進位資料框的資料量與編碼時間
+        """
+    )
+    parser.add_argument('--rates', default=DEFAULT_RATES, help=f'取樣率清單 Hz（預設: {DEFAULT_RATES}）')
+    parser.add_argument('--channels', default=DEFAULT_CHANNELS, help=f'通道數清單（預設: {DEFAULT_CHANNELS}）')
+    parser.add_argument('--duration', type=float, default=5.0, help='每組量測時間，秒（預設: 5）')
+    parser.add_argument('--warmup', type=float, default=1.0, help='每組暖機時間，秒（預設: 1）')
+    parser.add_argument('--format', choices=('csv', 'bin'), default='csv', help='輸出格式（預設: csv）')
+    parser.add_argument('--save-unit', type=int, default=60, help='分檔間隔，秒（預設: 60）')
+    parser.add_argument('--sql', action='store_true', help='同時量測 SQL 暫存檔案寫入（不上傳資料庫）')
+    parser.add_argument('--backend', choices=BACKENDS, default='simulated', help='HSDAQ 後端（預設: simulated）')
+    parser.add_argument('--ini', default=os.path.join('API', 'PET-7H24M.ini'), help='基準設定檔（預設: API/PET-7H24M.ini）')
+    parser.add_argument('--output', default=None, help='JSON 結果檔案（預設: output/benchmark/benchmark_<時間>.json）')
+    parser.add_argument('--compare', default=None, help='與先前的 JSON 結果比較')
+    parser.add_argument('--keep', action='store_true', help='保留量測產生的輸出檔案')
+    parser.add_argument('--reader-mode', choices=READER_MODES + ('both',), default='thread',
+                        help='讀取方式：thread = 讀取執行緒；process = 讀取行程 + 共用記憶體；both = 兩者都量測並比較抖動（預設: thread）')
+    parser.add_argument('--latency-budget-ms', type=float, default=DEFAULT_LATENCY_BUDGET_MS,
+                        help=f'區塊延遲目標，毫秒（CSV 寫入與網頁可取出的 p99；預設: {DEFAULT_LATENCY_BUDGET_MS}）')
+    parser.add_argument('--cold-start', type=int, default=0, metavar='N',
+                        help='只量測 main.py 冷啟動時間，重複 N 次（不執行處理量量測）')
+    parser.add_argument('--viewers', type=int, default=0, metavar='N',
+                        help='量測期間 N 個用戶端連線 /stream 接收即時資料（預設: 0）')
+    parser.add_argument('--viewer-format', choices=('json',) + tuple(WIRE_FORMATS), default='json',
+                        help='--viewers 用戶端的資料格式：json = Server-Sent Events；f32 / i16 = 二進位資料框（預設: json）')
+    parser.add_argument('--wire-formats', action='store_true',
+                        help='只量測即時資料每次更新的資料量與編碼 CPU 時間（JSON 與二進位資料框，不執行處理量量測）')
+    args = parser.parse_args()
+
+    for name in ('output', 'compare'):
+        value = getattr(args, name)
+        if value:
+            setattr(args, name, os.path.join(LAUNCH_DIR, value))
+    args.ini = os.path.abspath(args.ini) if os.path.exists(args.ini) else os.path.join(LAUNCH_DIR, args.ini)
+
+    # 所有設備在 init_devices 時依此選擇後端
+    os.environ[BACKEND_ENV] = args.backend
+    if Logger is not None:
+        Logger.set_debug_enabled(False)
+
+    rates = _parse_int_list(args.rates)
+    channel_counts = _parse_int_list(args.channels)
+    for ch in channel_counts:
+        if not 1 <= ch <= 4:
+            parser.error(f"通道數必須為 1-4: {ch}")
+
+    if args.cold_start > 0:
+        info(f"量測 main.py 冷啟動時間（{args.cold_start} 次）...")
+        results = {
+            'environment': _environment(),
+            'config': {'backend': args.backend},
+            'cold_start': measure_cold_start(args.cold_start, args.backend),
+        }
+        output = args.output
+        if not output:
+            output_dir = os.path.join(app_main.PROJECT_ROOT, 'output', 'benchmark')
+            os.makedirs(output_dir, exist_ok=True)
+            output = os.path.join(output_dir, f"cold_start_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        info(f"量測結果已儲存: {output}")
+        cold = results['cold_start']
+        info(f"冷啟動中位數: /status 回應 {cold['wall_ms']['median']:.1f} ms，"
+             f"HTTP 就緒 {cold['http_ready_ms']['median']:.1f} ms"
+             f"{'（啟動時已載入 libhsdaq.so）' if cold['hsdaq_loaded_at_ready'] else ''}")
+        return
+
+    if args.wire_formats:
+        info("量測即時資料格式（每次更新的資料量 / 編碼 CPU 時間）...")
+        results = {
+            'environment': _environment(),
+            'config': {'updates_per_s': WIRE_UPDATES_PER_S},
+            'wire_formats': measure_wire_formats(rates, channel_counts),
+        }
+        output = args.output
+        if not output:
+            output_dir = os.path.join(app_main.PROJECT_ROOT, 'output', 'benchmark')
+            os.makedirs(output_dir, exist_ok=True)
+            output = os.path.join(output_dir, f"wire_formats_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        info(f"量測結果已儲存: {output}")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="pet7h24m_bench_")
+    info(f"量測輸出目錄: {work_dir}")
+
+    results = {
+        'environment': _environment(),
+        'config': {
+            'backend': args.backend,
+            'format': args.format,
+            'sql': args.sql,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'reader_mode': args.reader_mode,
+            'latency_budget_ms': args.latency_budget_ms,
+            'viewers': args.viewers,
+            'viewer_format': args.viewer_format,
+        },
+        'cases': [],
+    }
+
+    reader_modes = READER_MODES if args.reader_mode == 'both' else (args.reader_mode,)
+    try:
+        for sample_rate in rates:
+            for channels in channel_counts:
+                for reader_mode in reader_modes:
+                    info(f"量測 {sample_rate} Hz × {channels} 通道（{reader_mode}）...")
+                    try:
+                        case = run_case(args, sample_rate, channels, work_dir, reader_mode)
+                    except Exception as e:
+                        error(f"量測失敗 ({sample_rate} Hz × {channels} 通道，{reader_mode}): {e}")
+                        case = {'sample_rate': sample_rate, 'channels': channels, 'reader_mode': reader_mode,
+                                'error': str(e), 'sustained': False}
+                    results['cases'].append(case)
+                    if 'error' not in case:
+                        lat = case['latency_ms']['csv'] or {}
+                        web_lat = case['latency_ms']['web'] or {}
+                        lag = (case['read']['jitter'] or {}).get('read_lag_ms') or {}
+                        info(
+                            f"  讀取 {case['read']['samples_per_s']:.0f}/s，"
+                            f"寫入 {case['written']['csv']['samples_per_s']:.0f}/s，"
+                            f"p99 延遲 CSV / 網頁 {lat.get('p99', 0):.2f} / {web_lat.get('p99', 0):.2f} ms"
+                            f"（{'符合' if case['latency_ok'] else '超過'}目標 {args.latency_budget_ms:g} ms），"
+                            f"讀取延遲 p99 / max {lag.get('p99', 0):.1f} / {lag.get('max', 0):.1f} ms，"
+                            f"{'可持續' if case['sustained'] else '無法持續'}"
+                        )
+                        viewer_stats = case['viewers']
+                        if viewer_stats['count']:
+                            info(f"  /stream 用戶端 {viewer_stats['count']} 個（{viewer_stats['format']}）: "
+                                 f"{viewer_stats['events']} 個事件，{viewer_stats['bytes_per_s'] / 1024:.0f} KiB/s，"
+                                 f"略過 {viewer_stats['skipped_frames']} frames，"
+                                 f"中斷 {viewer_stats['disconnected']} 個")
+    finally:
+        if args.keep:
+            info(f"已保留量測輸出: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            results['comparison'] = compare_results(results, json.load(f))
+    if args.reader_mode == 'both':
+        results['reader_mode_comparison'] = compare_reader_modes(results['cases'])
+        for row in results['reader_mode_comparison']:
+            if 'read_lag_ms_p99' in row:
+                info(f"讀取端抖動 {row['sample_rate']} Hz × {row['channels']} 通道（執行緒 → 讀取行程）: "
+                     f"讀取延遲 p99 {row['read_lag_ms_p99'][0]:.1f} → {row['read_lag_ms_p99'][1]:.1f} ms，"
+                     f"max {row['read_lag_ms_max'][0]:.1f} → {row['read_lag_ms_max'][1]:.1f} ms，"
+                     f"讀取間隔 p99 {row['read_interval_ms_p99'][0]:.1f} → {row['read_interval_ms_p99'][1]:.1f} ms")
+
+    output = args.output
+    if not output:
+        output_dir = os.path.join(app_main.PROJECT_ROOT, 'output', 'benchmark')
+        os.makedirs(output_dir, exist_ok=True)
+        output = os.path.join(output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    info(f"量測結果已儲存: {output}")
+
+    sustained = [c for c in results['cases'] if c.get('sustained')]
+    if sustained:
+        best = max(sustained, key=lambda c: c['expected_samples_per_s'])
+        info(f"最高可持續: {best['sample_rate']} Hz × {best['channels']} 通道（{best['expected_samples_per_s']} samples/s）")
+    else:
+        warning("沒有任何組合可持續")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+二進位寫入器模組
+
+此模組負責將資料區塊直接以原始位元組寫入 .bin 檔案，支援：
+- 與 CSVWriter 相同的介面（可直接替換，沿用相同的分檔邏輯）
+- 保留區塊原始型別（float32 或原始整數 int32/int16，小端序、通道交錯）
+- 每個 .bin 檔案附帶同名 .ini 描述檔（型別、通道數、取樣率、起始時間、校正係數、缺漏位置）
+- 資料段切換（觸發擷取模式每個事件一個檔案）
+- 指定起始時間（匯入設備記錄檔時，時間戳記與檔名從記錄檔的起始時間推算）
+- 同步輸入紀錄（DI 狀態與計數器以結構化紀錄寫入同名 _aux.bin，每個 frame 一筆，欄位記錄在 [Aux] 區段）
+"""
+
+import os
+import configparser
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from sample_block import RawCalibration
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+
+class BinaryWriter:
+    """二進位寫入器類別"""
+
+    # 寫入迴圈依此決定傳入原始資料（True）或電壓資料（False）
+    accepts_raw = True
+
+    def __init__(self, channels: int, output_dir: str, label: str, sample_rate: int = 12800,
+                 calibration: Optional[RawCalibration] = None, start_time: Optional[datetime] = None,
+                 aux_columns: Optional[List[str]] = None):
+        """初始化二進位寫入器（start_time 為第一個 frame 的時間，None = 現在；aux_columns 為同步輸入欄位名稱）"""
+        self.channels = channels
+        self.output_dir = output_dir
+        self.label = label
+        self.sample_rate = sample_rate
+        self.calibration = calibration
+        self.file_counter = 1
+        self.current_file = None
+        self.current_filename = None
+        self.dtype: Optional[np.dtype] = None
+        # 同步輸入紀錄檔（aux_columns 為空時不建立）
+        self.aux_columns = list(aux_columns or [])
+        self.aux_file = None
+        self.aux_dtype: Optional[np.dtype] = None
+
+        # 時間計算：與 CSVWriter 相同，以全域樣本計數推算每個檔案的起始時間
+        self.global_start_time = start_time or datetime.now()
+        self.global_sample_count = 0
+        self.file_start_sample = 0
+        # 目前檔案中的缺漏：(缺漏前已寫入的 frame 數, 遺失的 frame 數)
+        self.file_gaps = []
+        # 目前檔案所屬的事件 / 定時擷取段編號（連續擷取為 -1，不寫入描述檔）
+        self.file_event = -1
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+        except Exception as e:
+            error(f"Error creating output directory: {e}")
+        self._create_new_file()
+
+    def _create_new_file(self) -> None:
+        """建立新的 .bin 檔案（檔名時間為檔案第一個 frame 的資料時間）"""
+        file_time = self.global_start_time + timedelta(seconds=self.global_sample_count / self.sample_rate)
+        timestamp = file_time.strftime("%Y%m%d%H%M%S")
+        self.current_filename = f"{timestamp}_{self.label}_{self.file_counter:03d}"
+        filepath = os.path.join(self.output_dir, f"{self.current_filename}.bin")
+        self.file_start_sample = self.global_sample_count
+        self.file_gaps = []
+
+        try:
+            self.current_file = open(filepath, 'wb', buffering=131072)
+            if self.aux_columns:
+                self.aux_file = open(os.path.join(self.output_dir, f"{self.current_filename}_aux.bin"), 'wb')
+            info(f"New binary file created: {self.current_filename}.bin")
+        except Exception as e:
+            error(f"Error creating binary file: {e}")
+
+    def _write_metadata(self) -> None:
+        """寫入目前檔案的 .ini 描述檔"""
+        meta = configparser.ConfigParser()
+        start_time = self.global_start_time + timedelta(seconds=self.file_start_sample / self.sample_rate)
+        dtype = self.dtype if self.dtype is not None else np.dtype(np.float32)
+        meta['Binary'] = {
+            'dtype': dtype.name,
+            'byte_order': 'little',
+            'layout': 'interleaved',
+            'channels': str(self.channels),
+            'sample_rate': str(self.sample_rate),
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'frames': str(self._file_frames()),
+            'label': self.label,
+        }
+        if self.file_event >= 0:
+            meta['Binary']['event_id'] = str(self.file_event)
+        if self.calibration is not None:
+            # 電壓 = raw * scale + offset
+            meta['Calibration'] = {
+                'scale': ', '.join(f'{v:.9e}' for v in self.calibration.scale.tolist()),
+                'offset': ', '.join(f'{v:.9e}' for v in self.calibration.offset.tolist()),
+                'gain_table': ', '.join(str(v) for v in self.calibration.gain_table.tolist()),
+                'offset_table': ', '.join(str(v) for v in self.calibration.offset_table.tolist()),
+            }
+
+        if self.aux_columns and self.aux_dtype is not None:
+            # 每個資料 frame 一筆紀錄（小端序，欄位依序緊密排列）
+            meta['Aux'] = {
+                'file': f"{self.current_filename}_aux.bin",
+                'columns': ', '.join(self.aux_dtype.names),
+                'dtypes': ', '.join(self.aux_dtype[name].name for name in self.aux_dtype.names),
+                'record_size': str(self.aux_dtype.itemsize),
+            }
+
+        if self.file_gaps:
+            # 第 i 個資料 frame 的時間 = start_time + (i + 位置在 i 之前的遺失 frame 數) / sample_rate
+            meta['Gaps'] = {'count': str(len(self.file_gaps))}
+            for i, (offset, frames) in enumerate(self.file_gaps, 1):
+                meta['Gaps'][f'gap_{i}'] = f'{offset}, {frames}'
+
+        meta_path = os.path.join(self.output_dir, f"{self.current_filename}.ini")
+        try:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                meta.write(f)
+        except Exception as e:
+            error(f"Error writing binary metadata: {e}")
+
+    def get_current_filename(self) -> str:
+        """取得當前檔名（不含路徑和副檔名，用於 SQL 表名）"""
+        return self.current_filename if self.current_filename else ""
+
+    def add_data_block(self, data: np.ndarray, aux: Optional[np.ndarray] = None) -> None:
+        """新增數據區塊（直接寫入原始位元組，不做格式轉換；aux 為每個 frame 的同步輸入紀錄）"""
+        if not self.current_file or len(data) == 0:
+            return
+
+        try:
+            if self.dtype is None:
+                self.dtype = data.dtype
+            self.current_file.write(np.ascontiguousarray(data, dtype=self.dtype.newbyteorder('<')).data)
+            frames = len(data) // self.channels
+            if self.aux_file:
+                if aux is not None and self.aux_dtype is None:
+                    self.aux_dtype = aux.dtype
+                if self.aux_dtype is not None:
+                    # 沒有紀錄的區塊補 0，讓紀錄與資料 frame 一一對應
+                    records = aux[:frames] if aux is not None else np.zeros(frames, dtype=self.aux_dtype)
+                    self.aux_file.write(np.ascontiguousarray(records).data)
+            self.global_sample_count += frames
+        except Exception as e:
+            error(f"Error writing binary data: {e}")
+
+    def _file_frames(self) -> int:
+        """目前檔案已寫入的 frame 數（不含缺漏）"""
+        lost = sum(frames for _, frames in self.file_gaps)
+        return self.global_sample_count - self.file_start_sample - lost
+
+    def add_gap(self, frames: int) -> None:
+        """記錄缺漏位置（寫入描述檔），並將時間計數器推進遺失的 frame 數"""
+        if frames <= 0:
+            return
+        self.file_gaps.append((self._file_frames(), frames))
+        self.global_sample_count += frames
+
+    def start_segment(self, frame_index: int, event_id: int = -1) -> bool:
+        """開始新的資料段（檔案起始時間從 frame_index 起算，event_id 寫入描述檔），目前檔案已有資料時切換檔案並回傳 True"""
+        rotate = self.global_sample_count > self.file_start_sample
+        if rotate:
+            self._close_current_file()
+            self.file_counter += 1
+        self.global_sample_count = frame_index
+        self.file_event = event_id
+        if rotate:
+            self._create_new_file()
+        else:
+            self.file_start_sample = frame_index
+            self.file_gaps = []
+        return rotate
+
+    def _close_current_file(self) -> None:
+        """關閉目前檔案並寫入描述檔"""
+        if self.current_file:
+            try:
+                self.current_file.flush()
+                os.fsync(self.current_file.fileno())  # 確保寫入物理硬碟
+                self.current_file.close()
+            except Exception as e:
+                error(f"Error closing binary file: {e}")
+            self.current_file = None
+            self._close_aux_file()
+            self._write_metadata()
+
+    def _close_aux_file(self) -> None:
+        """關閉目前的同步輸入紀錄檔"""
+        if self.aux_file:
+            try:
+                self.aux_file.close()
+            except Exception as e:
+                error(f"Error closing aux file: {e}")
+            self.aux_file = None
+
+    def update_filename(self) -> None:
+        """切換檔案（分檔功能）"""
+        self._close_current_file()
+        self.file_counter += 1
+        self._create_new_file()
+
+    def close(self) -> None:
+        """關閉寫入器（最後一個檔案沒有資料時刪除，例如最後一個區塊剛好填滿前一個檔案）"""
+        empty = self.current_file is not None and self.global_sample_count == self.file_start_sample
+        if empty and self.file_counter > 1:
+            try:
+                self.current_file.close()
+                os.remove(os.path.join(self.output_dir, f"{self.current_filename}.bin"))
+                if self.aux_file:
+                    self._close_aux_file()
+                    os.remove(os.path.join(self.output_dir, f"{self.current_filename}_aux.bin"))
+            except Exception as e:
+                error(f"Error removing empty binary file: {e}")
+            self.current_file = None
+            return
+        self._close_current_file()
+
+    def __del__(self):
+        """解構函數"""
+        self.close()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+區塊環形緩衝區模組
+
+此模組提供單一設備輸出端共用的只附加區塊序列（取代每個消費者各自一個佇列），支援：
+- 每個區塊只放入一次、只保留一個參考與一份記憶體配額，CSV / SQL / 網頁 / 其他消費者各自以游標讀取
+- 每個區塊可指定接收的消費者（例如觸發擷取時事件視窗只送往寫入端，網頁仍接收連續資料）
+- 所有接收的消費者讀過（或略過）後立即歸還區塊與記憶體配額
+- 以游標落後的資料量偵測慢速消費者，依各消費者的處理方式（block / drop_oldest / drop_newest / spill）處理
+- 每個游標的統計（落後的區塊數與位元組、高水位、丟棄與暫存到磁碟的資料量、阻塞時間、落後次數）
+- 游標提供與 ByteQueue 讀取端相同的介面（get / get_nowait / drain / qsize / empty / clear / get_stats）
+"""
+
+import queue
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from byte_queue import ByteQueue, MemoryBudget, POLICIES, item_nbytes
+from sample_block import SampleBlock
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 槽位欄位：區塊、資料量、尚未讀取的消費者數
+_BLOCK, _NBYTES, _PENDING = 0, 1, 2
+
+
+class RingCursor:
+    """
+    區塊環形緩衝區的讀取游標（每個消費者一個）
+
+    get() 回傳的區塊已為呼叫者保留一個參考，處理完畢後必須 release()。
+    spill 模式的游標落後超過上限時，之後的區塊改寫入該游標專用的磁碟暫存佇列，讀完環形緩衝區中較舊的區塊後再依序讀出。
+    """
+
+    def __init__(self, ring: "BlockRing", name: str, max_bytes: int, policy: str,
+                 block_timeout: float, spill_dir: Optional[str]):
+        """初始化游標（由 BlockRing.add_cursor 建立）"""
+        self.ring = ring
+        self.name = name
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._pending = deque()     # 尚未讀取的槽位（與其他游標共用同一個槽位）
+        self._ready = threading.Condition(ring._lock)
+
+        # 統計資訊（bytes / items 為環形緩衝區中尚未讀取的區塊，不含磁碟暫存）
+        self.bytes = 0
+        self.items = 0
+        self.high_water_bytes = 0
+        self.put_items = 0
+        self.dropped_items = 0
+        self.dropped_bytes = 0
+        self.dropped_samples = 0
+        self.blocked_seconds = 0.0
+        self.block_timeouts = 0
+        self.slow = False       # 目前是否落後超過上限（回到上限一半以下時解除）
+        self.slow_events = 0
+
+        # spill 模式：落後超過上限後改由磁碟暫存佇列接收（上限 0 = 每個區塊都寫入暫存檔）
+        # 暫存檔在釋放 ring._lock 之後寫入與讀出（慢速磁碟不影響寫入端與其他游標）：
+        # _spilling 為寫入中的區塊數（讀取端等待寫入完成，維持區塊順序），_spilled 為已寫入尚未讀取的區塊數
+        self._overflow: Optional[ByteQueue] = None
+        self._overflowing = False
+        self._spilling = 0
+        self._spilled = 0
+        if policy == "spill":
+            self._overflow = ByteQueue(f"{ring.name}_{name}", 0, "spill", spill_dir=spill_dir)
+
+    # ==========================================
+    # ByteQueue 相容的讀取介面
+    # ==========================================
+
+    def qsize(self) -> int:
+        """尚未讀取的區塊數（含磁碟暫存）"""
+        with self.ring._lock:
+            return self.items + self._spilled + self._spilling
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def get(self, timeout: Optional[float] = None) -> SampleBlock:
+        """取出下一個區塊（timeout 秒內沒有資料時拋出 queue.Empty）"""
+        return self.ring._get(self, timeout)
+
+    def get_nowait(self) -> SampleBlock:
+        """取出下一個區塊（沒有資料時拋出 queue.Empty）"""
+        return self.get(timeout=0)
+
+    def drain(self) -> List[SampleBlock]:
+        """取出所有尚未讀取的區塊"""
+        items = []
+        while True:
+            try:
+                items.append(self.get_nowait())
+            except queue.Empty:
+                return items
+
+    def clear(self) -> None:
+        """略過所有尚未讀取的區塊（不計入丟棄統計）並刪除磁碟暫存"""
+        self.ring._skip_all(self)
+
+    def get_stats(self) -> Dict[str, float]:
+        """取得游標統計（鍵與 ByteQueue.get_stats 相同，另加落後次數）"""
+        with self.ring._lock:
+            stats = {
+                'policy': self.policy,
+                'max_bytes': self.max_bytes,
+                'items': self.items,
+                'bytes': self.bytes,
+                'high_water_bytes': self.high_water_bytes,
+                'put_items': self.put_items,
+                'dropped_items': self.dropped_items,
+                'dropped_bytes': self.dropped_bytes,
+                'dropped_samples': self.dropped_samples,
+                'spilled_items': 0,
+                'spilled_bytes': 0,
+                'spill_file_bytes': 0,
+                'blocked_seconds': round(self.blocked_seconds, 4),
+                'block_timeouts': self.block_timeouts,
+                'slow_events': self.slow_events,
+            }
+        if self._overflow is not None:
+            overflow = self._overflow.get_stats()
+            stats['items'] += overflow['items']
+            stats['spilled_items'] = overflow['spilled_items']
+            stats['spilled_bytes'] = overflow['spilled_bytes']
+            stats['spill_file_bytes'] = overflow['spill_file_bytes']
+            stats['dropped_items'] += overflow['dropped_items']
+            stats['dropped_bytes'] += overflow['dropped_bytes']
+            stats['dropped_samples'] += overflow['dropped_samples']
+        return stats
+
+    # ==========================================
+    # 內部工具（呼叫時需持有 ring._lock）
+    # ==========================================
+
+    def _count_drop(self, nbytes: int, samples: int) -> None:
+        self.dropped_items += 1
+        self.dropped_bytes += nbytes
+        self.dropped_samples += samples
+
+    def _mark_slow(self) -> None:
+        """落後超過上限（只在進入落後狀態時記錄）"""
+        if self.slow:
+            return
+        self.slow = True
+        self.slow_events += 1
+        warning(f"{self.ring.name} 消費者 {self.name} 落後 {self.bytes} bytes（{self.items} 個區塊），"
+                f"超過上限 {self.max_bytes} bytes，依 {self.policy} 處理")
+
+
+class BlockRing:
+    """
+    只附加的區塊序列，每個消費者以獨立的游標讀取
+
+    append() 只保留一個區塊參考並只保留一次記憶體配額；每個槽位記錄尚未讀取的消費者數，
+    最後一個消費者讀過（或因落後被略過）時歸還區塊。停滯的消費者只持有自己尚未讀取的槽位，不影響其他消費者。
+    """
+
+    def __init__(self, name: str, budget: Optional[MemoryBudget] = None):
+        """
+        初始化環形緩衝區
+
+        Args:
+            name: 名稱（日誌與統計使用）
+            budget: 與其他佇列共用的記憶體預算（None = 只受各游標上限限制）
+        """
+        self.name = name
+        self.budget = budget
+        self._lock = threading.Lock()
+        # block 模式的寫入端等待消費者讀取（讀取端各自在游標的 _ready 上等待，只有收到區塊的消費者被喚醒）
+        self._room = threading.Condition(self._lock)
+        self._cursors: List[RingCursor] = []
+
+        # 統計資訊（slots / bytes 為至少一個消費者尚未讀取的區塊）
+        self.slots = 0
+        self.bytes = 0
+        self.high_water_bytes = 0
+        self.appended = 0
+        self.budget_denied = 0
+
+    def add_cursor(self, name: str, max_bytes: int, policy: str = "drop_newest",
+                   block_timeout: float = 1.0, spill_dir: Optional[str] = None) -> RingCursor:
+        """
+        新增消費者游標（從目前的最新位置開始讀取）
+
+        Args:
+            name: 消費者名稱（append 的 names 參數依此指定接收者）
+            max_bytes: 允許落後的資料量上限（位元組）
+            policy: 落後超過上限時的處理方式（block / drop_oldest / drop_newest / spill）
+            block_timeout: block 模式等待消費者的最長時間（秒），逾時則該消費者略過新區塊
+            spill_dir: spill 模式的暫存檔目錄
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"不支援的佇列處理方式: {policy}（可用值: {', '.join(POLICIES)}）")
+        with self._lock:
+            if any(cursor.name == name for cursor in self._cursors):
+                raise ValueError(f"消費者名稱重複: {name}")
+            cursor = RingCursor(self, name, max_bytes, policy, block_timeout, spill_dir)
+            self._cursors.append(cursor)
+        return cursor
+
+    def get_cursor(self, name: str) -> Optional[RingCursor]:
+        """依名稱取得游標"""
+        for cursor in self._cursors:
+            if cursor.name == name:
+                return cursor
+        return None
+
+    def consumer_names(self) -> List[str]:
+        """所有消費者名稱（依新增順序）"""
+        return [cursor.name for cursor in self._cursors]
+
+    def append(self, block: SampleBlock, names: Optional[Iterable[str]] = None) -> int:
+        """
+        放入區塊（呼叫者仍持有自己的參考），回傳接收區塊的消費者數
+
+        Args:
+            block: 資料區塊
+            names: 接收的消費者名稱（None = 所有消費者）
+        """
+        nbytes = item_nbytes(block)
+        samples = len(block)
+        released = []
+        spills = []
+        accepted = 0
+        with self._lock:
+            targets = [cursor for cursor in self._cursors if names is None or cursor.name in names]
+            receivers = []
+            for cursor in targets:
+                cursor.put_items += 1
+                if cursor._overflow is not None and (cursor._overflowing or cursor.bytes + nbytes > cursor.max_bytes):
+                    # spill：之後的區塊改寫入暫存檔（釋放鎖之後由 _write_overflow 寫入）
+                    if not cursor._overflowing:
+                        cursor._mark_slow()
+                    cursor._overflowing = True
+                    cursor._spilling += 1
+                    block.retain()
+                    spills.append(cursor)
+                    continue
+                if cursor.bytes + nbytes > cursor.max_bytes and not self._make_room(cursor, nbytes, released):
+                    cursor._count_drop(nbytes, samples)
+                    continue
+                receivers.append(cursor)
+
+            if receivers and not self._reserve(nbytes, released):
+                # 超出共用記憶體預算：新區塊對所有接收者丟棄
+                self.budget_denied += 1
+                for cursor in receivers:
+                    cursor._count_drop(nbytes, samples)
+                receivers = []
+
+            if receivers:
+                block.retain()
+                slot = [block, nbytes, len(receivers)]
+                self.slots += 1
+                self.appended += 1
+                for cursor in receivers:
+                    accepted += 1
+                    cursor._pending.append(slot)
+                    cursor.items += 1
+                    cursor.bytes += nbytes
+                    if cursor.bytes > cursor.high_water_bytes:
+                        cursor.high_water_bytes = cursor.bytes
+                    cursor._ready.notify()
+
+        for old in released:
+            old.release()
+        if spills:
+            accepted += self._write_overflow(block, spills)
+        return accepted
+
+    def wake(self) -> None:
+        """喚醒所有在 get() 等待的消費者（停止時讓寫入執行緒立即檢查結束條件）"""
+        with self._lock:
+            for cursor in self._cursors:
+                cursor._ready.notify_all()
+
+    def close(self) -> None:
+        """略過所有游標尚未讀取的區塊並歸還"""
+        for cursor in list(self._cursors):
+            cursor.clear()
+
+    def get_stats(self) -> Dict[str, object]:
+        """取得環形緩衝區統計"""
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'bytes': self.bytes,
+                'high_water_bytes': self.high_water_bytes,
+                'appended': self.appended,
+                'budget_denied': self.budget_denied,
+                'consumers': self.consumer_names(),
+            }
+
+    def _write_overflow(self, block: SampleBlock, cursors: List[RingCursor]) -> int:
+        """
+        將區塊寫入各 spill 游標的磁碟暫存佇列（不持有 self._lock），回傳寫入成功的游標數
+
+        append() 已為每個游標保留一個參考；暫存佇列在寫入後立即歸還，寫入失敗時由此歸還。
+        """
+        written = 0
+        for cursor in cursors:
+            ok = cursor._overflow.put(block)
+            if not ok:
+                block.release()
+            with self._lock:
+                cursor._spilling -= 1
+                # 寫入期間游標已被 clear()：暫存檔中的區塊一併略過
+                stale = ok and not cursor._overflowing
+                if ok and not stale:
+                    written += 1
+                    cursor._spilled += 1
+                cursor._ready.notify()
+            if stale:
+                cursor._overflow.clear()
+        return written
+
+    # ==========================================
+    # 內部工具（呼叫時需持有 self._lock）
+    # ==========================================
+
+    def _make_room(self, cursor: RingCursor, nbytes: int, released: list) -> bool:
+        """游標落後超過上限時依處理方式騰出空間，回傳新區塊是否可放入"""
+        cursor._mark_slow()
+        if cursor.policy == "drop_oldest":
+            # 略過此消費者最舊的區塊直到有足夠空間
+            while cursor._pending and cursor.bytes + nbytes > cursor.max_bytes:
+                slot = cursor._pending.popleft()
+                cursor._count_drop(slot[_NBYTES], len(slot[_BLOCK]))
+                self._pass(cursor, slot, released)
+            return cursor.bytes + nbytes <= cursor.max_bytes
+
+        if cursor.policy == "block":
+            start = time.monotonic()
+            deadline = start + cursor.block_timeout
+            while cursor.bytes + nbytes > cursor.max_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    cursor.block_timeouts += 1
+                    break
+                self._room.wait(remaining)
+            cursor.blocked_seconds += time.monotonic() - start
+            return cursor.bytes + nbytes <= cursor.max_bytes
+
+        # drop_newest：此消費者略過新區塊
+        return False
+
+    def _reserve(self, nbytes: int, released: list) -> bool:
+        """保留共用記憶體預算（不足時先略過 drop_oldest 消費者最舊的區塊）"""
+        if self.budget is not None and not self.budget.reserve(nbytes) and not self._evict_for_budget(nbytes, released):
+            return False
+        self.bytes += nbytes
+        if self.bytes > self.high_water_bytes:
+            self.high_water_bytes = self.bytes
+        return True
+
+    def _evict_for_budget(self, nbytes: int, released: list) -> bool:
+        """略過 drop_oldest 消費者最舊的區塊直到預算足夠（其他消費者仍未讀取的區塊不會歸還配額）"""
+        for cursor in self._cursors:
+            if cursor.policy != "drop_oldest":
+                continue
+            while cursor._pending:
+                slot = cursor._pending.popleft()
+                cursor._count_drop(slot[_NBYTES], len(slot[_BLOCK]))
+                self._pass(cursor, slot, released)
+                if self.budget.reserve(nbytes):
+                    return True
+        return False
+
+    def _pass(self, cursor: RingCursor, slot: list, released: list) -> None:
+        """游標讀過（或略過）已從 _pending 取出的槽位；最後一個消費者讀過時歸還區塊與記憶體配額"""
+        slot[_PENDING] -= 1
+        cursor.items -= 1
+        cursor.bytes -= slot[_NBYTES]
+        if cursor.slow and cursor.bytes <= cursor.max_bytes // 2:
+            cursor.slow = False
+        if slot[_PENDING] == 0:
+            released.append(slot[_BLOCK])
+            slot[_BLOCK] = None
+            self.slots -= 1
+            self.bytes -= slot[_NBYTES]
+            if self.budget is not None:
+                self.budget.release(slot[_NBYTES])
+        self._room.notify_all()
+
+    def _get(self, cursor: RingCursor, timeout: Optional[float]) -> SampleBlock:
+        """RingCursor.get 的實作"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            released = []
+            try:
+                with self._lock:
+                    while True:
+                        if cursor._pending:
+                            slot = cursor._pending.popleft()
+                            block = slot[_BLOCK]
+                            block.retain()
+                            self._pass(cursor, slot, released)
+                            return block
+
+                        if cursor._overflowing:
+                            # 環形緩衝區中較舊的區塊已讀完，依序讀出暫存檔中的區塊（寫入中的區塊等待寫入完成）
+                            if cursor._spilled:
+                                cursor._spilled -= 1
+                                break
+                            if not cursor._spilling:
+                                cursor._overflowing = False
+                                cursor.slow = False
+
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise queue.Empty
+                        cursor._ready.wait(remaining)
+            finally:
+                for old in released:
+                    old.release()
+
+            # 暫存佇列只由此游標的消費者讀取，讀取暫存檔時不持有 self._lock
+            try:
+                return cursor._overflow.get_nowait()
+            except queue.Empty:
+                # 讀取前已被 clear() 清空
+                continue
+
+    def _skip_all(self, cursor: RingCursor) -> None:
+        """RingCursor.clear 的實作"""
+        released = []
+        with self._lock:
+            while cursor._pending:
+                self._pass(cursor, cursor._pending.popleft(), released)
+            cursor._overflowing = False
+            cursor._spilled = 0
+            cursor.slow = False
+        if cursor._overflow is not None:
+            cursor._overflow.clear()
+        for old in released:
+            old.release()
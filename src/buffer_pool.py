@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+緩衝區池模組
+
+此模組提供固定數量、預先配置的讀取緩衝區，支援：
+- 預先配置大型、通道對齊的 NumPy 緩衝區（HS_GetAIBuffer 直接寫入）
+- 快取 ctypes 指標，避免每次讀取重新建立
+- 每個緩衝區可附帶預先配置的結構化紀錄陣列（同步輸入的 DI / 計數器，每個 frame 一筆）
+- 池耗盡時臨時配置緩衝區（不中斷讀取，並計入統計）
+- 統計資訊（高水位、耗盡次數、重複使用率）
+- 執行緒安全（使用 threading.Lock）
+"""
+
+import threading
+from collections import deque
+from ctypes import POINTER
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class PoolBuffer:
+    """池化緩衝區（NumPy 陣列與對應的 ctypes 指標；aux 為每個 frame 一筆的紀錄陣列，未使用時為 None）"""
+
+    __slots__ = ('array', 'pointer', 'aux', 'pooled', 'used')
+
+    def __init__(self, array: np.ndarray, pooled: bool, aux: Optional[np.ndarray] = None):
+        """初始化池化緩衝區"""
+        self.array = array
+        self.pointer = array.ctypes.data_as(POINTER(np.ctypeslib.as_ctypes_type(array.dtype)))
+        self.aux = aux
+        self.pooled = pooled
+        self.used = False
+
+
+class BufferPool:
+    """固定大小的讀取緩衝區池"""
+
+    def __init__(self, block_capacity: int, pool_size: int, dtype=np.float32,
+                 aux_dtype: Optional[np.dtype] = None, aux_frames: int = 0):
+        """
+        初始化緩衝區池
+
+        Args:
+            block_capacity: 每個緩衝區可容納的樣本數（應為通道數的倍數）
+            pool_size: 緩衝區數量
+            dtype: 緩衝區資料型別
+            aux_dtype: 每個緩衝區附帶的紀錄陣列型別（None = 不配置）
+            aux_frames: 紀錄陣列的筆數（每個緩衝區的 frame 數）
+        """
+        self.block_capacity = block_capacity
+        self.pool_size = pool_size
+        self.dtype = np.dtype(dtype)
+        self.aux_dtype = np.dtype(aux_dtype) if aux_dtype is not None else None
+        self.aux_frames = aux_frames
+        self.lock = threading.Lock()
+        self._free = deque(self._allocate(pooled=True) for _ in range(pool_size))
+
+        # 統計資訊
+        self.in_use = 0
+        self.high_water = 0
+        self.acquired = 0
+        self.reused = 0
+        self.exhausted = 0
+
+    def acquire(self) -> PoolBuffer:
+        """取得一個緩衝區（池已耗盡時臨時配置，不會阻塞）"""
+        with self.lock:
+            self.acquired += 1
+            self.in_use += 1
+            if self.in_use > self.high_water:
+                self.high_water = self.in_use
+            if self._free:
+                buffer = self._free.popleft()
+                if buffer.used:
+                    self.reused += 1
+                buffer.used = True
+                return buffer
+            self.exhausted += 1
+
+        return self._allocate(pooled=False)
+
+    def _allocate(self, pooled: bool) -> PoolBuffer:
+        """配置一個緩衝區（與紀錄陣列）"""
+        aux = np.zeros(self.aux_frames, dtype=self.aux_dtype) if self.aux_dtype is not None else None
+        return PoolBuffer(np.empty(self.block_capacity, dtype=self.dtype), pooled, aux)
+
+    def release(self, buffer: PoolBuffer) -> None:
+        """歸還緩衝區（臨時配置的緩衝區直接丟棄）"""
+        with self.lock:
+            self.in_use -= 1
+            if buffer.pooled:
+                self._free.append(buffer)
+
+    def get_stats(self) -> Dict[str, float]:
+        """取得緩衝區池統計資訊"""
+        with self.lock:
+            return {
+                'pool_size': self.pool_size,
+                'block_capacity': self.block_capacity,
+                'in_use': self.in_use,
+                'high_water': self.high_water,
+                'acquired': self.acquired,
+                'exhausted': self.exhausted,
+                'reuse_rate': (self.reused / self.acquired) if self.acquired else 0.0,
+            }
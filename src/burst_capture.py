@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定時擷取模組
+
+此模組負責 capture_mode = burst（每隔固定時間擷取一段 N Sample 資料），支援：
+- 擷取設定（每段 frame 數、擷取間隔、最大段數、每日時段）
+- 排程計算（依上一段的排定時間加上間隔；錯過的間隔略過並計入統計；時段外延後到下一個時段開始）
+- 擷取統計（完成 / 未完成的段數、略過的間隔、下一段的排定時間）
+
+擷取之間設備連線保持開啟，只停止掃描；每一段以 event_id 標示，輸出端在事件編號改變時切換檔案。
+"""
+
+import configparser
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, Optional, Tuple
+
+# 定時擷取的 capture_mode 值
+BURST_MODE = "burst"
+
+
+def _parse_clock(text: str) -> dt_time:
+    """解析 HH:MM 或 HH:MM:SS"""
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(text.strip(), fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"無效的時間: {text}（格式 HH:MM）")
+
+
+def parse_window(text: str) -> Optional[Tuple[dt_time, dt_time]]:
+    """解析每日時段（"08:00-18:00"；結束早於開始時跨越午夜；空白 = 全天）"""
+    text = text.strip()
+    if not text:
+        return None
+    start, sep, end = text.partition("-")
+    if not sep:
+        raise ValueError(f"無效的 burst_window: {text}（格式 HH:MM-HH:MM）")
+    start_time, end_time = _parse_clock(start), _parse_clock(end)
+    if start_time == end_time:
+        raise ValueError(f"無效的 burst_window: {text}（開始與結束時間相同）")
+    return start_time, end_time
+
+
+class BurstSettings:
+    """定時擷取設定（PET-7H24M.ini 設備區段的 burst_* 參數）"""
+
+    def __init__(self, frames: int, interval_s: float, max_count: int = 0,
+                 window: Optional[Tuple[dt_time, dt_time]] = None):
+        """
+        初始化定時擷取設定
+
+        Args:
+            frames: 每段擷取的 frame 數（每通道樣本數）
+            interval_s: 相鄰兩段開始時間的間隔（秒）
+            max_count: 最多擷取的段數（0 = 持續擷取直到停止收集）
+            window: 每日允許擷取的時段 (開始, 結束)，None = 全天
+        """
+        if frames <= 0:
+            raise ValueError("burst_samples 必須大於 0")
+        if interval_s <= 0:
+            raise ValueError("burst_interval_s 必須大於 0")
+        if max_count < 0:
+            raise ValueError(f"無效的 burst_count: {max_count}")
+        self.frames = frames
+        self.interval_s = interval_s
+        self.max_count = max_count
+        self.window = window
+
+    @classmethod
+    def from_config(cls, cfg: configparser.ConfigParser, section: str) -> "BurstSettings":
+        """從設備區段讀取定時擷取設定"""
+        return cls(
+            cfg.getint(section, "burst_samples", fallback=20000),
+            cfg.getfloat(section, "burst_interval_s", fallback=60.0),
+            cfg.getint(section, "burst_count", fallback=0),
+            parse_window(cfg.get(section, "burst_window", fallback="")),
+        )
+
+    def in_window(self, moment: datetime) -> bool:
+        """moment 是否位於每日時段內"""
+        if self.window is None:
+            return True
+        start, end = self.window
+        clock = moment.time()
+        if start < end:
+            return start <= clock < end
+        return clock >= start or clock < end
+
+    def next_window_start(self, moment: datetime) -> datetime:
+        """moment 之後（含）最近一次時段開始的時間（moment 已在時段內時回傳 moment）"""
+        if self.in_window(moment):
+            return moment
+        opening = datetime.combine(moment.date(), self.window[0])
+        if opening < moment:
+            opening += timedelta(days=1)
+        return opening
+
+    def describe(self) -> str:
+        """設定摘要（日誌與網頁狀態使用）"""
+        text = f"每 {self.interval_s:g} 秒擷取 {self.frames} frames"
+        if self.max_count:
+            text += f"，共 {self.max_count} 段"
+        if self.window is not None:
+            text += f"，時段 {self.window[0].strftime('%H:%M')}-{self.window[1].strftime('%H:%M')}"
+        return text
+
+
+class BurstSchedule:
+    """定時擷取排程與統計（由讀取執行緒更新，API 執行緒只讀取）"""
+
+    def __init__(self, settings: BurstSettings):
+        """初始化排程"""
+        self.settings = settings
+        self.completed = 0
+        self.incomplete = 0    # 未擷取到完整 frame 數的段數（停止收集或設備錯誤）
+        self.skipped = 0       # 上一段超過間隔而略過的排程次數
+        self.next_start: Optional[datetime] = None
+        self.last_start: Optional[datetime] = None
+        self.last_duration_s: Optional[float] = None
+
+    @property
+    def started(self) -> int:
+        """已開始的段數（event_id 依此編號）"""
+        return self.completed + self.incomplete
+
+    def finished(self) -> bool:
+        """是否已達到最大段數"""
+        return self.settings.max_count > 0 and self.started >= self.settings.max_count
+
+    def schedule(self, now: datetime) -> datetime:
+        """計算下一段的開始時間（第一段為現在；時段外延後到下一個時段開始，並從該時間重新計算間隔）"""
+        interval = timedelta(seconds=self.settings.interval_s)
+        if self.last_start is None:
+            candidate = now
+        else:
+            candidate = self.last_start + interval
+            if candidate < now:
+                missed = int((now - candidate) / interval) + 1
+                self.skipped += missed
+                candidate += missed * interval
+        self.next_start = self.settings.next_window_start(candidate)
+        return self.next_start
+
+    def begin(self, start: datetime) -> None:
+        """一段擷取開始"""
+        self.last_start = start
+        self.next_start = None
+
+    def end(self, complete: bool, duration_s: float) -> None:
+        """一段擷取結束"""
+        if complete:
+            self.completed += 1
+        else:
+            self.incomplete += 1
+        self.last_duration_s = duration_s
+
+    def to_dict(self) -> Dict[str, object]:
+        """轉換為字典（供 API 與日誌使用）"""
+        return {
+            'frames': self.settings.frames,
+            'interval_s': self.settings.interval_s,
+            'max_count': self.settings.max_count,
+            'completed': self.completed,
+            'incomplete': self.incomplete,
+            'skipped': self.skipped,
+            'last_start': self.last_start.isoformat(timespec='seconds') if self.last_start else None,
+            'last_duration_s': round(self.last_duration_s, 3) if self.last_duration_s is not None else None,
+            'next_start': self.next_start.isoformat(timespec='seconds') if self.next_start else None,
+        }
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+位元組上限佇列模組
+
+此模組提供以資料量（位元組）而非項目數限制的管線佇列，支援：
+- 每個佇列的位元組上限，以及所有佇列共用的記憶體預算（MemoryBudget）
+- 佇列滿時的處理方式：block（等待消費者，逾時則丟棄新資料）、drop_oldest、drop_newest、spill（寫入磁碟暫存）
+- SampleBlock 與 NumPy 陣列項目（丟棄的區塊自動 release() 歸還緩衝區）
+- 每個佇列的統計（目前位元組、高水位、丟棄的項目 / 位元組 / 樣本數、暫存到磁碟的資料量、阻塞時間）
+- 設定檔 [Queues] 區段解析（QueueSettings）
+- 資料到達通知（DataSignal：放入項目後喚醒消費者，取代消費端的定時輪詢）
+- 執行緒安全（使用 threading.Condition）
+"""
+
+import os
+import sys
+import time
+import queue
+import tempfile
+import threading
+import configparser
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from sample_block import SampleBlock
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 可用的滿載處理方式
+POLICIES = ("block", "drop_oldest", "drop_newest", "spill")
+
+# 設定檔區段名稱
+QUEUE_SECTION = "Queues"
+
+MB = 1024 * 1024
+
+# 各佇列的預設上限（MB）與處理方式（與原本以項目數限制時的行為相同）
+DEFAULT_QUEUE_SETTINGS = {
+    'data_queue': (32, "drop_oldest"),
+    'csv': (64, "drop_newest"),
+    'sql': (64, "drop_newest"),
+    'web': (2, "drop_oldest"),
+    'history': (8, "drop_oldest"),
+}
+
+
+def item_nbytes(item) -> int:
+    """項目佔用的資料量（位元組）"""
+    if isinstance(item, SampleBlock):
+        return item.data.nbytes + (item.aux.nbytes if item.aux is not None else 0)
+    if isinstance(item, np.ndarray):
+        return item.nbytes
+    return sys.getsizeof(item)
+
+
+def _release_item(item) -> None:
+    """丟棄項目時歸還緩衝區（SampleBlock 以外的項目不需處理）"""
+    if isinstance(item, SampleBlock):
+        item.release()
+
+
+class DataSignal:
+    """
+    資料到達通知（多個生產者、單一消費者）
+
+    生產者放入資料後呼叫 notify()；消費者 wait() 返回後取出所有已放入的資料。
+    消費者處理期間的多次通知合併為一次喚醒，負載高時自動以批次處理。
+    """
+
+    def __init__(self):
+        """初始化通知"""
+        self._event = threading.Event()
+        # 統計資訊（notifies 為實際設定通知的次數，已設定時的重複通知不計入）
+        self.notifies = 0
+        self.wakeups = 0
+        self.timeouts = 0
+
+    def notify(self) -> None:
+        """通知消費者有新資料（已通知但消費者尚未醒來時不重複設定）"""
+        if not self._event.is_set():
+            self.notifies += 1
+            self._event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待通知，收到時回傳 True
+
+        返回前先清除通知，之後取出的資料一定包含通知前放入的所有項目；
+        取出期間放入的項目會再次設定通知，不會遺漏。
+        """
+        if self._event.wait(timeout):
+            self._event.clear()
+            self.wakeups += 1
+            return True
+        self.timeouts += 1
+        return False
+
+    def get_stats(self) -> Dict[str, int]:
+        """取得通知統計"""
+        return {
+            'notifies': self.notifies,
+            'wakeups': self.wakeups,
+            'timeouts': self.timeouts,
+        }
+
+
+class MemoryBudget:
+    """所有佇列共用的記憶體預算（0 = 不限制）"""
+
+    def __init__(self, limit_bytes: int = 0):
+        """初始化記憶體預算"""
+        self.limit_bytes = limit_bytes
+        self.lock = threading.Lock()
+        self.used = 0
+        self.high_water = 0
+        self.denied = 0
+
+    def reserve(self, nbytes: int) -> bool:
+        """保留指定資料量，超出預算時回傳 False"""
+        with self.lock:
+            if self.limit_bytes and self.used + nbytes > self.limit_bytes:
+                self.denied += 1
+                return False
+            self.used += nbytes
+            if self.used > self.high_water:
+                self.high_water = self.used
+            return True
+
+    def release(self, nbytes: int) -> None:
+        """歸還資料量"""
+        with self.lock:
+            self.used -= nbytes
+
+    def get_stats(self) -> Dict[str, int]:
+        """取得記憶體預算統計"""
+        with self.lock:
+            return {
+                'limit_bytes': self.limit_bytes,
+                'used_bytes': self.used,
+                'high_water_bytes': self.high_water,
+                'denied': self.denied,
+            }
+
+
+class QueueSettings:
+    """佇列設定（PET-7H24M.ini 的 [Queues] 區段）"""
+
+    def __init__(self, memory_budget_mb: float = 256, block_timeout_ms: int = 1000, spill_dir: str = ""):
+        """初始化佇列設定（各佇列使用 DEFAULT_QUEUE_SETTINGS）"""
+        self.memory_budget_bytes = int(memory_budget_mb * MB)
+        self.block_timeout = block_timeout_ms / 1000.0
+        self.spill_dir = spill_dir
+        self.queues: Dict[str, tuple] = {
+            name: (int(size_mb * MB), policy) for name, (size_mb, policy) in DEFAULT_QUEUE_SETTINGS.items()
+        }
+
+    @classmethod
+    def from_ini(cls, ini_path: str) -> "QueueSettings":
+        """從設定檔讀取 [Queues] 區段（缺少的鍵使用預設值）"""
+        cfg = configparser.ConfigParser()
+        cfg.read(ini_path, encoding="utf-8")
+        settings = cls()
+        if not cfg.has_section(QUEUE_SECTION):
+            return settings
+
+        settings.memory_budget_bytes = int(cfg.getfloat(QUEUE_SECTION, "memory_budget_mb", fallback=256) * MB)
+        settings.block_timeout = cfg.getint(QUEUE_SECTION, "block_timeout_ms", fallback=1000) / 1000.0
+        settings.spill_dir = cfg.get(QUEUE_SECTION, "spill_dir", fallback="").strip()
+        for name, (size_mb, policy) in DEFAULT_QUEUE_SETTINGS.items():
+            size_mb = cfg.getfloat(QUEUE_SECTION, f"{name}_mb", fallback=size_mb)
+            policy = cfg.get(QUEUE_SECTION, f"{name}_policy", fallback=policy).strip().lower()
+            if policy not in POLICIES:
+                raise ValueError(f"不支援的 {name}_policy: {policy}（可用值: {', '.join(POLICIES)}）")
+            settings.queues[name] = (int(size_mb * MB), policy)
+        # 其他 <名稱>_mb 鍵為 DeviceSink.add_consumer() 新增的消費者（未設定 policy 時為 drop_oldest）
+        for key in cfg.options(QUEUE_SECTION):
+            name = key[:-len("_mb")]
+            if not key.endswith("_mb") or key == "memory_budget_mb" or name in settings.queues:
+                continue
+            policy = cfg.get(QUEUE_SECTION, f"{name}_policy", fallback="drop_oldest").strip().lower()
+            if policy not in POLICIES:
+                raise ValueError(f"不支援的 {name}_policy: {policy}（可用值: {', '.join(POLICIES)}）")
+            settings.queues[name] = (int(cfg.getfloat(QUEUE_SECTION, key) * MB), policy)
+        return settings
+
+    def create_queue(self, name: str, budget: Optional[MemoryBudget], spill_dir: Optional[str] = None,
+                     label: str = "") -> "ByteQueue":
+        """依設定建立指定名稱的佇列（label 用於日誌與暫存檔名稱）"""
+        max_bytes, policy = self.queues[name]
+        return ByteQueue(
+            f"{label}_{name}" if label else name, max_bytes, policy, budget,
+            block_timeout=self.block_timeout,
+            spill_dir=spill_dir or self.spill_dir or os.path.join(tempfile.gettempdir(), "pet7h24m_spill"),
+        )
+
+
+class _Spilled:
+    """已寫入磁碟暫存檔的項目（讀出時重建為 SampleBlock 或 NumPy 陣列；同步輸入紀錄很小，複製後留在記憶體）"""
+
+    __slots__ = ('offset', 'nbytes', 'dtype', 'is_block', 'calibration', 'device_id', 'start_index', 'read_time',
+                 'event_id', 'aux')
+
+    def __init__(self, offset: int, nbytes: int, item):
+        self.offset = offset
+        self.nbytes = nbytes
+        self.is_block = isinstance(item, SampleBlock)
+        data = item.data if self.is_block else item
+        self.dtype = data.dtype
+        if self.is_block:
+            self.calibration = item.calibration
+            self.device_id = item.device_id
+            self.start_index = item.start_index
+            self.read_time = item.read_time
+            self.event_id = item.event_id
+            self.aux = item.aux.copy() if item.aux is not None else None
+
+
+class ByteQueue:
+    """
+    以位元組限制的 FIFO 佇列
+
+    put() 回傳 False 表示新項目被丟棄（呼叫者仍持有該項目，需自行 release()）；
+    drop_oldest 丟棄的舊項目由佇列 release()。spill 模式下超出上限的項目寫入磁碟暫存檔，
+    讀出時以新配置的陣列重建（原緩衝區在寫入後立即歸還），順序與記憶體中的項目一致。
+    """
+
+    def __init__(self, name: str, max_bytes: int, policy: str = "drop_newest",
+                 budget: Optional[MemoryBudget] = None, block_timeout: float = 1.0,
+                 spill_dir: Optional[str] = None):
+        """
+        初始化佇列
+
+        Args:
+            name: 佇列名稱（日誌與統計使用）
+            max_bytes: 佇列可持有的資料量上限（位元組）
+            policy: 滿載處理方式（block / drop_oldest / drop_newest / spill）
+            budget: 共用的記憶體預算（None = 只受 max_bytes 限制）
+            block_timeout: block 模式等待的最長時間（秒），逾時則丟棄新項目
+            spill_dir: spill 模式的暫存檔目錄
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"不支援的佇列處理方式: {policy}（可用值: {', '.join(POLICIES)}）")
+        self.name = name
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.budget = budget
+        self.block_timeout = block_timeout
+        self.spill_dir = spill_dir
+        # 放入項目後通知消費者（None = 消費者自行輪詢）
+        self.signal: Optional[DataSignal] = None
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._spill_file = None
+        self._spill_path: Optional[str] = None
+        self._spill_size = 0
+        self._spilled_pending = 0
+
+        # 統計資訊
+        self.bytes = 0              # 記憶體中項目的資料量（不含已暫存到磁碟的項目）
+        self.high_water_bytes = 0
+        self.put_items = 0
+        self.dropped_items = 0
+        self.dropped_bytes = 0
+        self.dropped_samples = 0
+        self.spilled_items = 0
+        self.spilled_bytes = 0
+        self.blocked_seconds = 0.0
+        self.block_timeouts = 0
+
+    # ==========================================
+    # queue.Queue 相容介面
+    # ==========================================
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def empty(self) -> bool:
+        with self._cond:
+            return not self._items
+
+    def put(self, item) -> bool:
+        """放入項目（依處理方式決定等待、丟棄或暫存到磁碟），項目被丟棄時回傳 False"""
+        nbytes = item_nbytes(item)
+        evicted = []
+        with self._cond:
+            self.put_items += 1
+            accepted = self._reserve(nbytes)
+
+            if not accepted and self.policy == "drop_oldest":
+                # 丟棄最舊的記憶體項目直到有足夠空間（丟棄後仍不足時丟棄新項目）
+                while not accepted and self._items:
+                    evicted.append(self._pop_left())
+                    accepted = self._reserve(nbytes)
+
+            elif not accepted and self.policy == "block":
+                deadline = time.monotonic() + self.block_timeout
+                start = time.monotonic()
+                while not accepted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.block_timeouts += 1
+                        break
+                    # 共用預算可能由其他佇列釋放（不會通知本佇列），因此分段等待
+                    self._cond.wait(min(remaining, 0.01))
+                    accepted = self._reserve(nbytes)
+                self.blocked_seconds += time.monotonic() - start
+
+            elif not accepted and self.policy == "spill":
+                spilled = self._spill(item, nbytes)
+                if spilled is not None:
+                    self._items.append(spilled)
+                    self._cond.notify_all()
+                    # 資料已寫入暫存檔，原緩衝區立即歸還
+                    _release_item(item)
+                    if self.signal is not None:
+                        self.signal.notify()
+                    return True
+
+            if accepted:
+                self._items.append(item)
+                self._cond.notify_all()
+            else:
+                self._count_drop(nbytes, len(item))
+
+        for old in evicted:
+            self._count_drop_locked(old)
+            _release_item(old)
+        if accepted and self.signal is not None:
+            self.signal.notify()
+        return accepted
+
+    def put_nowait(self, item) -> bool:
+        """與 put() 相同（put 本身只有 block 模式會等待）"""
+        return self.put(item)
+
+    def get(self, timeout: Optional[float] = None):
+        """取出最舊的項目（timeout 秒內沒有資料時拋出 queue.Empty）"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait_for(lambda: self._items, timeout)
+                if not self._items:
+                    raise queue.Empty
+            entry = self._pop_left()
+            if isinstance(entry, _Spilled):
+                return self._load(entry)
+            return entry
+
+    def get_nowait(self):
+        """取出最舊的項目（沒有資料時拋出 queue.Empty）"""
+        return self.get(timeout=0)
+
+    def drain(self) -> List:
+        """取出所有項目"""
+        items = []
+        while True:
+            try:
+                items.append(self.get_nowait())
+            except queue.Empty:
+                return items
+
+    def clear(self) -> None:
+        """清空佇列（區塊歸還緩衝區，刪除暫存檔）"""
+        with self._cond:
+            entries = list(self._items)
+            self._items.clear()
+            for entry in entries:
+                if not isinstance(entry, _Spilled):
+                    self._unreserve(item_nbytes(entry))
+            self._spilled_pending = 0
+            self._close_spill()
+            self._cond.notify_all()
+        for entry in entries:
+            if not isinstance(entry, _Spilled):
+                _release_item(entry)
+
+    def close(self) -> None:
+        """關閉佇列（等同 clear()）"""
+        self.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """取得佇列統計"""
+        with self._cond:
+            return {
+                'policy': self.policy,
+                'max_bytes': self.max_bytes,
+                'items': len(self._items),
+                'bytes': self.bytes,
+                'high_water_bytes': self.high_water_bytes,
+                'put_items': self.put_items,
+                'dropped_items': self.dropped_items,
+                'dropped_bytes': self.dropped_bytes,
+                'dropped_samples': self.dropped_samples,
+                'spilled_items': self.spilled_items,
+                'spilled_bytes': self.spilled_bytes,
+                'spill_file_bytes': self._spill_size,
+                'blocked_seconds': round(self.blocked_seconds, 4),
+                'block_timeouts': self.block_timeouts,
+            }
+
+    # ==========================================
+    # 內部工具（呼叫時需持有 self._cond）
+    # ==========================================
+
+    def _reserve(self, nbytes: int) -> bool:
+        """保留記憶體（同時檢查佇列上限與共用預算）"""
+        if self.bytes + nbytes > self.max_bytes:
+            return False
+        if self.budget is not None and not self.budget.reserve(nbytes):
+            return False
+        self.bytes += nbytes
+        if self.bytes > self.high_water_bytes:
+            self.high_water_bytes = self.bytes
+        return True
+
+    def _unreserve(self, nbytes: int) -> None:
+        self.bytes -= nbytes
+        if self.budget is not None:
+            self.budget.release(nbytes)
+
+    def _pop_left(self):
+        """移除最舊的項目並歸還其記憶體配額"""
+        entry = self._items.popleft()
+        if isinstance(entry, _Spilled):
+            self._spilled_pending -= 1
+        else:
+            self._unreserve(item_nbytes(entry))
+        self._cond.notify_all()
+        return entry
+
+    def _count_drop(self, nbytes: int, samples: int) -> None:
+        self.dropped_items += 1
+        self.dropped_bytes += nbytes
+        self.dropped_samples += samples
+
+    def _count_drop_locked(self, entry) -> None:
+        """統計被 drop_oldest 丟棄的項目"""
+        with self._cond:
+            if isinstance(entry, _Spilled):
+                self._count_drop(entry.nbytes, entry.nbytes // entry.dtype.itemsize)
+            else:
+                self._count_drop(item_nbytes(entry), len(entry))
+
+    def _spill(self, item, nbytes: int) -> Optional[_Spilled]:
+        """將項目寫入暫存檔（失敗時回傳 None）"""
+        data = item.data if isinstance(item, SampleBlock) else item
+        try:
+            if self._spill_file is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill_path = os.path.join(self.spill_dir, f"{self.name}_{os.getpid()}.spill")
+                self._spill_file = open(self._spill_path, "w+b")
+                self._spill_size = 0
+                info(f"佇列 {self.name} 已滿，開始暫存到磁碟: {self._spill_path}")
+            offset = self._spill_size
+            os.pwrite(self._spill_file.fileno(), np.ascontiguousarray(data).data, offset)
+        except Exception as e:
+            error(f"佇列 {self.name} 暫存到磁碟失敗: {e}")
+            return None
+
+        # 暫存檔只寫入 data（nbytes 包含留在記憶體的同步輸入紀錄）
+        self._spill_size += data.nbytes
+        self._spilled_pending += 1
+        self.spilled_items += 1
+        self.spilled_bytes += nbytes
+        return _Spilled(offset, data.nbytes, item)
+
+    def _load(self, entry: _Spilled):
+        """從暫存檔讀回項目（暫存檔中已沒有待讀取的項目時截斷檔案重複使用）"""
+        raw = os.pread(self._spill_file.fileno(), entry.nbytes, entry.offset)
+        data = np.frombuffer(raw, dtype=entry.dtype)
+        if self._spilled_pending == 0:
+            self._spill_file.truncate(0)
+            self._spill_size = 0
+        if not entry.is_block:
+            return data
+        block = SampleBlock(data, calibration=entry.calibration,
+                            device_id=entry.device_id, start_index=entry.start_index, aux=entry.aux)
+        block.read_time = entry.read_time
+        block.event_id = entry.event_id
+        return block
+
+    def _close_spill(self) -> None:
+        """關閉並刪除暫存檔"""
+        if self._spill_file is None:
+            return
+        try:
+            self._spill_file.close()
+            os.remove(self._spill_path)
+        except Exception as e:
+            warning(f"刪除佇列暫存檔失敗: {e}")
+        self._spill_file = None
+        self._spill_path = None
+        self._spill_size = 0
@@ -8,13 +8,22 @@ CSV 寫入器模組
 - 精確的時間戳記計算（根據取樣率）
 - 確保分檔時時間戳記連續
 - 多通道資料寫入（可配置通道數）
+- NumPy 區塊輸入（向量化計算時間戳記，不逐點轉換）
+- 缺漏標記（遺失的 frame 以 "# GAP" 標記列記錄，之後的時間戳記跳過遺失的時間）
+- 資料段切換（觸發擷取模式每個事件一個檔案，時間戳記從事件起點的序號推算）
+- 指定起始時間（匯入設備記錄檔時，時間戳記與檔名從記錄檔的起始時間推算）
+- 同步輸入欄位（DI 狀態與計數器接在通道欄位之後，整欄轉換後與通道一起寫入）
 """
 
 import os
 import csv
 import time
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
+
+import numpy as np
+
+from sample_block import as_frames, aux_columns, format_timestamps, gap_row
 
 # 導入統一日誌系統
 try:
@@ -30,9 +39,14 @@ except ImportError:
 class CSVWriter:
     """CSV 寫入器類別"""
 
-    def __init__(self, channels: int, output_dir: str, label: str, sample_rate: int = 12800):
-        """初始化 CSV 寫入器"""
+    # 寫入迴圈依此決定傳入原始資料（True）或電壓資料（False）
+    accepts_raw = False
+
+    def __init__(self, channels: int, output_dir: str, label: str, sample_rate: int = 12800,
+                 start_time: Optional[datetime] = None, aux_columns: Optional[List[str]] = None):
+        """初始化 CSV 寫入器（start_time 為第一個 frame 的時間，None = 現在；aux_columns 為同步輸入欄位名稱）"""
         self.channels = channels
+        self.aux_columns = list(aux_columns or [])
         self.output_dir = output_dir
         self.label = label
         self.sample_rate = sample_rate
@@ -42,8 +56,9 @@ class CSVWriter:
         self.current_filename = None
         
         # 時間計算相關：使用全域計數器推算時間，避免 jitter
-        self.global_start_time = datetime.now()
+        self.global_start_time = start_time or datetime.now()
         self.global_sample_count = 0
+        self.file_start_sample = 0
         
         # --- 效能優化關鍵設定 ---
         self.last_flush_time = time.time()
@@ -66,12 +81,14 @@ class CSVWriter:
             error(f"Error creating output directory: {e}")
 
     def _create_new_file(self) -> None:
-        """建立新的 CSV 檔案"""
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        """建立新的 CSV 檔案（檔名時間為檔案第一個 frame 的資料時間）"""
+        file_time = self.global_start_time + timedelta(seconds=self.global_sample_count / self.sample_rate)
+        timestamp = file_time.strftime("%Y%m%d%H%M%S")
         filename = f"{timestamp}_{self.label}_{self.file_counter:03d}.csv"
         filepath = os.path.join(self.output_dir, filename)
         
         self.current_filename = f"{timestamp}_{self.label}_{self.file_counter:03d}"
+        self.file_start_sample = self.global_sample_count
 
         try:
             # 優化 1: 設定 buffering=131072 (128KB)，減少系統呼叫
@@ -81,7 +98,7 @@ class CSVWriter:
             self.writer = csv.writer(self.current_file)
 
             # 寫入標題
-            headers = ['Timestamp'] + [f'Channel_{i+1}' for i in range(self.channels)]
+            headers = ['Timestamp'] + [f'Channel_{i+1}' for i in range(self.channels)] + self.aux_columns
             self.writer.writerow(headers)
             
             # 建立檔案時立即刷新一次，確保檔案確實建立
@@ -96,36 +113,26 @@ class CSVWriter:
         """取得當前檔名（不含路徑和 .csv 後綴，用於 SQL 表名）"""
         return self.current_filename if self.current_filename else ""
 
-    def add_data_block(self, data: List[float]) -> None:
-        """新增數據區塊到 CSV 檔案（按通道分組，計算精確時間戳記）"""
-        if not self.writer or not data:
+    def add_data_block(self, data: np.ndarray, aux: Optional[np.ndarray] = None) -> None:
+        """新增數據區塊到 CSV 檔案（按通道分組，計算精確時間戳記；aux 為每個 frame 的同步輸入紀錄）"""
+        if not self.writer or len(data) == 0:
             return
 
         try:
-            sample_interval = 1.0 / self.sample_rate
-
-            # 批次準備寫入資料
-            rows = []
-            for i in range(0, len(data), self.channels):
-                # 使用計數器推算精確時間，避免累積誤差
-                elapsed_time = self.global_sample_count * sample_interval
-                timestamp = self.global_start_time + timedelta(seconds=elapsed_time)
-                
-                # 優化 2: 格式化時間字串 (包含微秒 %f)
-                ts_str = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')
-                
-                row = [ts_str]
-                # 填入通道資料 (若不足則補 0)
-                for j in range(self.channels):
-                    if i + j < len(data):
-                        row.append(data[i + j])
-                    else:
-                        row.append(0.0)
-                rows.append(row)
-                self.global_sample_count += 1
+            # 轉為 (frames, channels)，不足一組的通道補 0
+            frames = as_frames(data, self.channels)
+
+            # 優化 2: 使用計數器向量化推算精確時間（包含微秒），避免累積誤差
+            timestamps = format_timestamps(
+                self.global_start_time, self.global_sample_count, len(frames), self.sample_rate
+            )
+            self.global_sample_count += len(frames)
+
+            # 同步輸入欄位接在通道欄位之後
+            columns = frames.T.tolist() + aux_columns(aux, self.aux_columns, len(frames))
 
             # 一次寫入多行 (比 writerow 迴圈快)
-            self.writer.writerows(rows)
+            self.writer.writerows(zip(timestamps.tolist(), *columns))
 
             # 優化 3: 定期刷新 (Time-based Flush)
             # 不要每次都 flush，這會殺死效能
@@ -137,6 +144,27 @@ class CSVWriter:
         except Exception as e:
             error(f"Error writing CSV data: {e}")
 
+    def add_gap(self, frames: int) -> None:
+        """寫入缺漏標記列，並將時間計數器推進遺失的 frame 數"""
+        if not self.writer or frames <= 0:
+            return
+
+        try:
+            self.writer.writerow(gap_row(self.global_start_time, self.global_sample_count, frames, self.sample_rate))
+        except Exception as e:
+            error(f"Error writing CSV gap marker: {e}")
+        self.global_sample_count += frames
+
+    def start_segment(self, frame_index: int, event_id: int = -1) -> bool:
+        """開始新的資料段（之後的時間戳記從 frame_index 起算；event_id 未使用），目前檔案已有資料時切換檔案並回傳 True"""
+        rotate = self.global_sample_count > self.file_start_sample
+        self.global_sample_count = frame_index
+        if rotate:
+            self.update_filename()
+        else:
+            self.file_start_sample = frame_index
+        return rotate
+
     def update_filename(self) -> None:
         """切換檔案（分檔功能）"""
         # 關閉舊檔前確保資料寫入
@@ -152,7 +180,17 @@ class CSVWriter:
         self._create_new_file()
 
     def close(self) -> None:
-        """關閉寫入器"""
+        """關閉寫入器（最後一個檔案沒有資料時刪除，例如最後一個區塊剛好填滿前一個檔案）"""
+        if self.current_file and self.global_sample_count == self.file_start_sample and self.file_counter > 1:
+            try:
+                self.current_file.close()
+                os.remove(os.path.join(self.output_dir, f"{self.current_filename}.csv"))
+            except Exception as e:
+                error(f"Error removing empty CSV file: {e}")
+            self.current_file = None
+            self.writer = None
+            return
+
         if self.current_file:
             try:
                 self.current_file.flush()
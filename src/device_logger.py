@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+設備記錄器模組
+
+此模組負責 capture_mode = device_log（掃描資料由 HSDAQ 函式庫直接寫入記錄檔，不經過 Python 讀取管線），支援：
+- LoggerSettings：記錄器設定（記錄檔目錄、檔案格式、分檔間隔、即時預覽取樣率、匯入區塊大小）
+- LogImporter：背景執行緒以 HS_GetAllLogFiles / HS_LogFile_Open_byIndex 列出已完成的記錄檔，
+  以 HS_GetLogFile_AIData 整段讀入池化的 NumPy 區塊，經 DeviceSink 寫入與串流模式相同的 CSV / bin / SQL 輸出
+- 輸出時間戳記以記錄檔的起始時間（HS_GetLogFile_AIScanSampleInfo）推算
+- 已匯入清單（記錄檔目錄下的 .imported，重新啟動後不重複匯入）
+"""
+
+import os
+import time
+import threading
+import configparser
+from ctypes import *
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from buffer_pool import BufferPool
+from sample_block import SampleBlock
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 設備記錄模式的 capture_mode 值
+DEVICE_LOG_MODE = "device_log"
+
+# HS_StartLogger / HS_GetAllLogFiles 的 filetype（hsdaql.h: filetype BIN TXT）
+LOG_FILE_TYPES = {"bin": 0, "txt": 1}
+
+# 已匯入的記錄檔清單（每行一個檔名）
+IMPORTED_MANIFEST = ".imported"
+
+# HS_LogFile_Open_byIndex / HS_GetLogFileInfo 回傳檔名的緩衝區大小
+LOG_NAME_SIZE = 512
+
+# HS_GetLogFile_AIScanSampleInfo 回傳的日期、時間字串可能的格式
+LOG_TIME_FORMATS = (
+    "%Y/%m/%d %H:%M:%S.%f", "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S",
+    "%Y%m%d %H%M%S",
+)
+
+# 匯入時每個輸出佇列最多等待寫入的區塊數（匯入不是即時資料，佇列滿時等待而不丟棄）
+IMPORT_QUEUE_DEPTH = 4
+
+
+def parse_log_start(date: str, clock: str) -> Optional[datetime]:
+    """解析記錄檔的起始日期與時間（無法解析時回傳 None）"""
+    text = f"{date.strip()} {clock.strip()}"
+    for fmt in LOG_TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class LoggerSettings:
+    """設備記錄器設定（PET-7H24M.ini 設備區段中 logger_ 與 preview_ 開頭的鍵）"""
+
+    def __init__(self, log_dir: str, file_type: str = "bin", interval: int = 0,
+                 preview_rate: int = 50, preview_block_ms: int = 100,
+                 import_chunk_ms: int = 1000, import_poll_ms: int = 2000):
+        """初始化記錄器設定"""
+        if file_type not in LOG_FILE_TYPES:
+            raise ValueError(f"不支援的 logger_file_type: {file_type}（可用值: {', '.join(LOG_FILE_TYPES)}）")
+        if preview_rate <= 0:
+            raise ValueError("preview_rate 必須大於 0")
+        self.log_dir = log_dir
+        self.file_type = file_type
+        self.interval = interval
+        self.preview_rate = preview_rate
+        self.preview_block_ms = preview_block_ms
+        self.import_chunk_ms = import_chunk_ms
+        self.import_poll_ms = import_poll_ms
+
+    @classmethod
+    def from_config(cls, cfg: configparser.ConfigParser, section: str, device_id: str) -> "LoggerSettings":
+        """從設定檔讀取記錄器設定（logger_dir 空白時使用 output/device_log/<device_id>）"""
+        log_dir = cfg.get(section, "logger_dir", fallback="").strip() or os.path.join("output", "device_log", device_id)
+        return cls(
+            log_dir=os.path.abspath(log_dir),
+            file_type=cfg.get(section, "logger_file_type", fallback="bin").strip().lower(),
+            interval=cfg.getint(section, "logger_interval", fallback=0),
+            preview_rate=cfg.getint(section, "preview_rate", fallback=50),
+            preview_block_ms=cfg.getint(section, "preview_block_ms", fallback=100),
+            import_chunk_ms=cfg.getint(section, "import_chunk_ms", fallback=1000),
+            import_poll_ms=cfg.getint(section, "import_poll_ms", fallback=2000),
+        )
+
+    @property
+    def file_type_code(self) -> int:
+        """HSDAQ 函數使用的 filetype 數值"""
+        return LOG_FILE_TYPES[self.file_type]
+
+    def preview_block_frames(self) -> int:
+        """每個預覽區塊的 frame 數"""
+        return max(1, self.preview_rate * self.preview_block_ms // 1000)
+
+
+class LogImporter:
+    """
+    記錄檔匯入器
+
+    記錄期間定期列出記錄檔目錄，匯入除最新一個（仍在寫入）以外的記錄檔；
+    finish() 表示記錄器已停止，匯入剩餘的所有記錄檔後結束。
+    每個記錄檔由 sink_factory 依記錄檔的通道數、取樣率與起始時間建立一組已設定寫入器的 DeviceSink，
+    區塊序號從 0 開始，因此分檔、時間戳記與缺漏處理都與串流模式相同。
+    """
+
+    def __init__(self, dll, settings: LoggerSettings, device_id: str,
+                 sink_factory: Callable[..., object]):
+        """
+        初始化匯入器
+
+        Args:
+            dll: HSDAQ 後端（提供 HS_GetAllLogFiles、HS_LogFile_* 函數）
+            settings: 記錄器設定
+            device_id: 設備識別碼（寫入區塊的 device_id）
+            sink_factory: 建立輸出的函數（關鍵字參數 channels、sample_rate、start_time 為記錄檔的通道數、取樣率與起始時間）
+        """
+        self.dll = dll
+        self.settings = settings
+        self.device_id = device_id
+        self.sink_factory = sink_factory
+        self.logging = True
+        self._abort = False
+        self._wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.imported = self._load_manifest()
+
+        # 統計資訊
+        self.files_imported = 0
+        self.files_failed = 0
+        self.samples = 0
+        self.seconds = 0.0
+        self.current_file: Optional[str] = None
+
+    # ==========================================
+    # 生命週期
+    # ==========================================
+
+    def start(self) -> None:
+        """啟動匯入執行緒"""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def finish(self) -> None:
+        """記錄器已停止：匯入剩餘的記錄檔（包含最後一個）後結束"""
+        self.logging = False
+        self._wake.set()
+
+    def stop(self) -> None:
+        """中止匯入（目前的記錄檔寫到哪裡就停在哪裡，下次重新匯入）"""
+        self._abort = True
+        self.logging = False
+        self._wake.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """等待匯入執行緒結束"""
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, object]:
+        """取得匯入統計"""
+        return {
+            'log_dir': self.settings.log_dir,
+            'logging': self.logging,
+            'running': bool(self.thread and self.thread.is_alive()),
+            'files_imported': self.files_imported,
+            'files_failed': self.files_failed,
+            'samples': self.samples,
+            'seconds': round(self.seconds, 3),
+            'current_file': self.current_file,
+        }
+
+    # ==========================================
+    # 匯入流程
+    # ==========================================
+
+    def _run(self) -> None:
+        """匯入迴圈（在獨立執行緒中執行）"""
+        poll = self.settings.import_poll_ms / 1000.0
+        while not self._abort:
+            finished = not self.logging
+            try:
+                self._import_pending(include_last=finished)
+            except Exception as e:
+                error(f"[{self.device_id}] 匯入記錄檔時發生錯誤: {e}")
+            if finished:
+                break
+            self._wake.wait(poll)
+            self._wake.clear()
+        info(f"[{self.device_id}] 記錄檔匯入結束: {self.files_imported} 個檔案, {self.samples} 個樣本")
+
+    def _list_files(self) -> List[str]:
+        """列出記錄檔目錄中的記錄檔（完整路徑，依檔名排序）"""
+        if not os.path.isdir(self.settings.log_dir):
+            return []
+        count = self.dll.HS_GetAllLogFiles(self.settings.log_dir.encode("utf-8"), self.settings.file_type_code)
+        files = []
+        for index in range(max(0, count)):
+            name = create_string_buffer(LOG_NAME_SIZE)
+            handle = self.dll.HS_LogFile_Open_byIndex(index, name)
+            if handle:
+                self.dll.HS_LogFile_Close(handle)
+            if name.value:
+                files.append(name.value.decode("utf-8"))
+        return sorted(files)
+
+    def _import_pending(self, include_last: bool) -> None:
+        """匯入尚未匯入的記錄檔（記錄期間最新的記錄檔仍在寫入，不匯入）"""
+        files = self._list_files()
+        if not include_last:
+            files = files[:-1]
+        for path in files:
+            if self._abort:
+                return
+            name = os.path.basename(path)
+            if name in self.imported:
+                continue
+            self.current_file = name
+            try:
+                self._import_file(path)
+                self._mark_imported(name)
+                self.files_imported += 1
+            except Exception as e:
+                self.files_failed += 1
+                error(f"[{self.device_id}] 記錄檔匯入失敗 {name}: {e}")
+            finally:
+                self.current_file = None
+
+    def _import_file(self, path: str) -> None:
+        """將一個記錄檔整段讀入區塊並寫入輸出"""
+        handle = self.dll.HS_LogFile_Open(path.encode("utf-8"))
+        if not handle:
+            error_code = self.dll.HS_GetLastError()
+            raise RuntimeError(f"HS_LogFile_Open 失敗，錯誤碼: 0x{error_code:x}")
+
+        started = time.monotonic()
+        try:
+            channels, sample_rate = self._scan_config(handle)
+            sample_count, start_time = self._sample_info(handle, path, channels, sample_rate)
+            info(f"[{self.device_id}] 匯入記錄檔 {os.path.basename(path)}: 通道數={channels}, "
+                 f"取樣率={sample_rate} Hz, 樣本數={sample_count}, 起始時間={start_time}")
+
+            sink = self.sink_factory(channels=channels, sample_rate=sample_rate, start_time=start_time)
+            sink.start()
+            try:
+                self.samples += self._copy_blocks(handle, sink, channels, sample_rate, sample_count)
+            finally:
+                sink.stop()
+                sink.finalize()
+        finally:
+            self.dll.HS_LogFile_Close(handle)
+            self.seconds += time.monotonic() - started
+
+    def _scan_config(self, handle) -> tuple:
+        """讀取記錄檔的掃描設定，回傳 (通道數, 取樣率)"""
+        chcnt = c_short()
+        gain = c_short()
+        trigger_mode = c_short()
+        sample_rate = c_long()
+        data_trans_method = c_short()
+        sync_mode = c_short()
+        if not self.dll.HS_GetLogFile_AIScanConfigInfo(handle, byref(chcnt), byref(gain), byref(trigger_mode),
+                                                       byref(sample_rate), byref(data_trans_method), byref(sync_mode)):
+            error_code = self.dll.HS_GetLastError()
+            raise RuntimeError(f"HS_GetLogFile_AIScanConfigInfo 失敗，錯誤碼: 0x{error_code:x}")
+        if chcnt.value <= 0 or sample_rate.value <= 0:
+            raise RuntimeError(f"記錄檔掃描設定無效: 通道數={chcnt.value}, 取樣率={sample_rate.value}")
+        return chcnt.value, sample_rate.value
+
+    def _sample_info(self, handle, path: str, channels: int, sample_rate: int) -> tuple:
+        """讀取記錄檔的樣本數與起始時間（無法解析時以檔案修改時間減去資料長度推算）"""
+        sample_count = c_uint32()
+        start_date = create_string_buffer(64)
+        start_clock = create_string_buffer(64)
+        if not self.dll.HS_GetLogFile_AIScanSampleInfo(handle, byref(sample_count), start_date, start_clock):
+            error_code = self.dll.HS_GetLastError()
+            raise RuntimeError(f"HS_GetLogFile_AIScanSampleInfo 失敗，錯誤碼: 0x{error_code:x}")
+
+        count = sample_count.value - sample_count.value % channels
+        start_time = parse_log_start(start_date.value.decode("utf-8", "replace"),
+                                     start_clock.value.decode("utf-8", "replace"))
+        if start_time is None:
+            duration = timedelta(seconds=count // channels / sample_rate)
+            start_time = datetime.fromtimestamp(os.path.getmtime(path)) - duration
+            warning(f"[{self.device_id}] 無法解析記錄檔起始時間，改用檔案修改時間推算: {start_time}")
+        return count, start_time
+
+    def _copy_blocks(self, handle, sink, channels: int, sample_rate: int, sample_count: int) -> int:
+        """以 HS_GetLogFile_AIData 分段讀入池化緩衝區，並送入輸出佇列，回傳匯入的樣本數"""
+        chunk = max(1, sample_rate * self.settings.import_chunk_ms // 1000) * channels
+        pool = BufferPool(chunk, IMPORT_QUEUE_DEPTH * 2 + 2, np.float32)
+        position = 0
+
+        while position < sample_count and not self._abort:
+            read_count = min(chunk, sample_count - position)
+            buffer = pool.acquire()
+            read_size = self.dll.HS_GetLogFile_AIData(handle, position, read_count, buffer.pointer)
+            read_size -= read_size % channels
+            if read_size <= 0:
+                pool.release(buffer)
+                warning(f"[{self.device_id}] 記錄檔在樣本 {position} 處無法再讀取資料（預期 {sample_count}）")
+                break
+
+            block = SampleBlock(buffer.array[:read_size], buffer, pool,
+                                device_id=self.device_id, start_index=position // channels)
+            self._wait_for_room(sink)
+            sink.enqueue(block)
+            block.release()
+            position += read_size
+
+        return position
+
+    def _wait_for_room(self, sink) -> None:
+        """等待輸出佇列有空間（匯入速度受寫入速度限制，不依佇列滿載處理方式丟棄）"""
+        while not self._abort and sink.file_backlog() >= IMPORT_QUEUE_DEPTH:
+            time.sleep(0.01)
+
+    # ==========================================
+    # 已匯入清單
+    # ==========================================
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.settings.log_dir, IMPORTED_MANIFEST)
+
+    def _load_manifest(self) -> set:
+        """讀取已匯入的記錄檔清單"""
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+        except Exception as e:
+            warning(f"讀取已匯入清單失敗: {e}")
+            return set()
+
+    def _mark_imported(self, name: str) -> None:
+        """將記錄檔加入已匯入清單"""
+        self.imported.add(name)
+        try:
+            with open(self._manifest_path(), "a", encoding="utf-8") as f:
+                f.write(name + "\n")
+        except Exception as e:
+            warning(f"寫入已匯入清單失敗: {e}")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多設備管理模組
+
+此模組負責管理同一台主機上的多台 PET-7H24M 設備，支援：
+- 從 PET-7H24M.ini 讀取多個設備區段（[PET7H24M]、[PET7H24M_2]、[PET7H24M_3]...）
+- 每台設備獨立的連線、緩衝區池與讀取執行緒（reader_process = 1 時改為獨立的讀取行程與共用記憶體環形緩衝區）
+- 合併資料管線（輪流從各設備佇列取出區塊，區塊標記 device_id 與 start_index）
+- 所有設備與輸出佇列共用同一份記憶體預算（[Queues] 區段）
+- 區塊到達通知（各設備放入區塊時喚醒合併管線的消費者，取代定時輪詢）
+- 各設備統計資訊（緩衝區池、讀取執行緒、佇列）
+"""
+
+import configparser
+from typing import Dict, List, Optional
+
+from byte_queue import DataSignal, MemoryBudget, QueueSettings
+from pet7h24m import PET7H24M, DEVICE_LOG_MODE
+from reader_process import ReaderProcess
+from sample_block import SampleBlock
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 設備區段名稱前綴（[PET7H24M] 為主要設備，[PET7H24M_<n>] 為其他設備）
+DEVICE_SECTION_PREFIX = "PET7H24M"
+
+
+def find_device_sections(ini_path: str) -> List[str]:
+    """列出設定檔中啟用的設備區段（enabled = 0 的區段略過）"""
+    cfg = configparser.ConfigParser()
+    cfg.read(ini_path, encoding="utf-8")
+
+    sections = []
+    for section in cfg.sections():
+        if section != DEVICE_SECTION_PREFIX and not section.startswith(DEVICE_SECTION_PREFIX + "_"):
+            continue
+        if not cfg.getint(section, "enabled", fallback=1):
+            debug(f"設備區段 [{section}] 已停用，略過")
+            continue
+        sections.append(section)
+
+    # 沒有任何設備區段時沿用單一設備的預設值
+    return sections or [DEVICE_SECTION_PREFIX]
+
+
+def reader_process_slots(ini_path: str, section: str) -> int:
+    """
+    設備是否使用獨立的讀取行程（回傳環形緩衝區槽位數，0 = 在主行程的讀取執行緒中讀取）
+
+    未設定的參數沿用 [PET7H24M]；設備記錄模式由函式庫寫入記錄檔，不使用讀取行程。
+    """
+    cfg = configparser.ConfigParser()
+    cfg.read(ini_path, encoding="utf-8")
+
+    def _get(key: str, fallback: str) -> str:
+        for name in (section, DEVICE_SECTION_PREFIX):
+            if cfg.has_option(name, key):
+                return cfg.get(name, key)
+        return fallback
+
+    if not int(_get("reader_process", "0")):
+        return 0
+    if _get("capture_mode", "continuous").strip().lower() == DEVICE_LOG_MODE:
+        warning(f"[{section}] capture_mode = device_log 不支援 reader_process = 1，改在主行程中讀取")
+        return 0
+    slots = int(_get("reader_ring_slots", "128"))
+    if slots < 2:
+        raise ValueError(f"無效的 reader_ring_slots: {slots}（至少 2）")
+    return slots
+
+
+class DeviceManager:
+    """多設備管理類別"""
+
+    def __init__(self):
+        """初始化多設備管理器"""
+        self.devices: Dict[str, PET7H24M] = {}
+        self._order: List[str] = []
+        self._next = 0
+        # 佇列設定與共用記憶體預算（init_devices 時依設定檔重新建立）
+        self.queue_settings = QueueSettings()
+        self.memory_budget = MemoryBudget(self.queue_settings.memory_budget_bytes)
+        # 任一設備放入區塊時通知 wait_for_data()
+        self.data_signal = DataSignal()
+
+    def init_devices(self, ini_path: str, sections: Optional[List[str]] = None) -> None:
+        """
+        讀取設定檔中的設備區段並逐一初始化（任一設備失敗時釋放已建立的連線）
+
+        Args:
+            ini_path: 設定檔路徑
+            sections: 只初始化這些設備區段（None = 所有啟用的區段；同時執行多個收集工作時各自指定不同的設備）
+        """
+        self.release()
+        self.queue_settings = QueueSettings.from_ini(ini_path)
+        self.memory_budget = MemoryBudget(self.queue_settings.memory_budget_bytes)
+
+        if sections is None:
+            sections = find_device_sections(ini_path)
+        else:
+            available = find_device_sections(ini_path)
+            unknown = [section for section in sections if section not in available]
+            if unknown:
+                raise ValueError(f"設定檔中沒有啟用的設備區段: {', '.join(unknown)}（可用: {', '.join(available)}）")
+        for section in sections:
+            try:
+                ring_slots = reader_process_slots(ini_path, section)
+                if ring_slots:
+                    device = ReaderProcess()
+                    device.init_devices(ini_path, section, ring_slots=ring_slots)
+                else:
+                    device = PET7H24M()
+                    device.init_devices(ini_path, section, self.queue_settings, self.memory_budget)
+            except Exception:
+                self.release()
+                raise
+
+            if device.device_id in self.devices:
+                self.release()
+                raise ValueError(f"設備識別碼重複: {device.device_id}（請在各區段設定不同的 device_id）")
+            device.set_data_signal(self.data_signal)
+            self.devices[device.device_id] = device
+            self._order.append(device.device_id)
+
+        info(f"已初始化 {len(self.devices)} 台設備: {', '.join(self._order)}")
+
+    def release(self) -> None:
+        """停止讀取並釋放所有設備連線"""
+        for device in self.devices.values():
+            device.stop_reading()
+        self.devices = {}
+        self._order = []
+        self._next = 0
+
+    def get_device_ids(self) -> List[str]:
+        """取得設備識別碼列表（依設定檔順序）"""
+        return list(self._order)
+
+    def get_device(self, device_id: str) -> Optional[PET7H24M]:
+        """依識別碼取得設備"""
+        return self.devices.get(device_id)
+
+    def start_reading(self) -> None:
+        """啟動所有設備的讀取執行緒"""
+        for device_id in self._order:
+            self.devices[device_id].start_reading()
+
+    def stop_reading(self) -> None:
+        """停止所有設備的讀取執行緒（並喚醒等待資料的消費者）"""
+        for device_id in self._order:
+            self.devices[device_id].stop_reading()
+        self.data_signal.notify()
+
+    def wait_for_data(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待任一設備放入區塊（收到通知時回傳 True，逾時回傳 False）
+
+        返回後應以 get_data() 取出所有區塊直到回傳 None；取出期間放入的區塊會再次通知。
+        """
+        return self.data_signal.wait(timeout)
+
+    def get_signal_stats(self) -> dict:
+        """取得區塊到達通知的統計（通知 / 喚醒 / 逾時次數）"""
+        return self.data_signal.get_stats()
+
+    def get_data(self) -> Optional[SampleBlock]:
+        """
+        從合併管線取出一個區塊（各設備輪流取出，避免單一設備佔滿下游；無資料時回傳 None）
+
+        注意：取得的區塊使用完畢後必須呼叫 release() 歸還緩衝區
+        """
+        # release() / init_devices() 可能在其他執行緒中替換設備列表（只替換、不修改原物件），先取得快照
+        order = self._order
+        devices = self.devices
+        count = len(order)
+        for _ in range(count):
+            index = self._next % count
+            self._next = (index + 1) % count
+            device = devices.get(order[index])
+            if device is None:
+                continue
+            block = device.get_data()
+            if block is not None:
+                return block
+        return None
+
+    def get_pool_stats(self) -> Dict[str, dict]:
+        """取得各設備的緩衝區池統計資訊"""
+        devices = self.devices
+        return {device_id: devices[device_id].get_pool_stats() for device_id in list(self._order) if device_id in devices}
+
+    def get_reader_stats(self) -> Dict[str, dict]:
+        """取得各設備的讀取執行緒統計"""
+        devices = self.devices
+        return {device_id: devices[device_id].get_reader_stats() for device_id in list(self._order) if device_id in devices}
+
+    def get_queue_stats(self) -> Dict[str, dict]:
+        """取得各設備讀取端輸出佇列的統計"""
+        devices = self.devices
+        return {device_id: devices[device_id].get_queue_stats() for device_id in list(self._order) if device_id in devices}
+
+    def __len__(self) -> int:
+        return len(self._order)
@@ -0,0 +1,744 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+設備輸出模組
+
+此模組負責單一設備的所有下游輸出（多設備時每台設備一組），支援：
+- 網頁顯示（網頁執行緒降頻為最小 / 最大值包絡並轉換為電壓後放入共用的即時資料環形緩衝區，/stream 與 /data 的用戶端各自以游標讀取，降頻比例依每秒顯示點數計算）
+- 歷史資料金字塔（/history 縮放檢視；歷史資料執行緒以 history 游標讀取連續資料並逐層更新）
+- CSV / bin 寫入執行緒（依資料量自動分檔）
+- SQL 暫存檔案與上傳執行緒（依資料量分批上傳）
+- 共用的區塊環形緩衝區（block_ring）：每個區塊只放入一次，CSV / SQL / 網頁與 add_consumer() 新增的消費者各自以游標讀取
+- 游標落後的資料量上限與處理方式、共用記憶體預算由 [Queues] 區段設定（csv / sql / web）
+- 統計資訊（各消費者丟棄的區塊數、已寫入樣本數、區塊從讀取到寫入完成的延遲）
+- 缺漏偵測（依區塊序號 start_index 偵測遺失的 frame，於 CSV / bin / SQL 輸出中寫入缺漏標記）
+- 觸發擷取（軟體觸發只將事件視窗送往 CSV / SQL，網頁顯示仍為連續資料；每個事件一個檔案）
+- 設備記錄模式（只顯示即時預覽；記錄檔匯入時直接以 enqueue() 送入 CSV / SQL 佇列）
+- 同步輸入欄位（區塊的 aux 紀錄與資料以 frame 為單位同步切割，寫入 CSV / bin / SQL 並接在網頁顯示資料之後）
+"""
+
+import os
+import csv
+import time
+import queue
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib import recfunctions
+
+from block_ring import BlockRing, RingCursor
+from byte_queue import MemoryBudget, QueueSettings
+from history_pyramid import HistoryPyramid
+from live_stream import LiveChunk, LiveStream
+from sample_block import SampleBlock, as_frames, aux_columns, format_timestamps, gap_row
+from sql_uploader import SQLUploader
+from trigger_capture import SoftwareTrigger
+from web_decimator import DEFAULT_POINTS_PER_S, EnvelopeDecimator, decimation_ratio
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+
+# 保留最近多少個區塊的延遲（用於計算百分位數）
+LATENCY_WINDOW = 10000
+
+# /data 超過此時間（秒）沒有輪詢且沒有 /stream 用戶端時不再接收區塊（沒有瀏覽器連線時不持有讀取緩衝區）
+WEB_IDLE_TIMEOUT = 2.0
+
+# 顯示用的消費者（接收連續資料；觸發擷取與記錄檔匯入的區塊只送往其他消費者）
+DISPLAY_CONSUMERS = ('web', 'history')
+
+
+class DeviceSink:
+    """單一設備的輸出（網頁顯示、CSV、SQL）"""
+
+    def __init__(self, device_id: str, channels: int, sample_rate: int, web_points_per_s: int = DEFAULT_POINTS_PER_S,
+                 queue_settings: Optional[QueueSettings] = None, memory_budget: Optional[MemoryBudget] = None,
+                 spill_dir: Optional[str] = None, aux_columns: Optional[List[str]] = None):
+        """
+        初始化設備輸出
+
+        Args:
+            device_id: 設備識別碼
+            channels: 啟用的通道數
+            sample_rate: 取樣率（Hz）
+            web_points_per_s: 網頁顯示每個通道每秒的點數（決定降頻比例）
+            queue_settings: 佇列設定（None = 使用預設值）
+            memory_budget: 與其他佇列共用的記憶體預算（None = 只受各佇列上限限制）
+            spill_dir: spill 模式的暫存檔目錄（None = 使用佇列設定）
+            aux_columns: 同步輸入欄位名稱（None = 未啟用同步輸入）
+        """
+        self.device_id = device_id
+        self.channels = channels
+        self.aux_columns = list(aux_columns or [])
+        self.sample_rate = sample_rate
+        self.running = False
+
+        # 區塊環形緩衝區與各消費者的游標（落後超過上限時依各自的處理方式等待、丟棄或暫存到磁碟）
+        # CSV / SQL 游標在 open_csv / open_sql 時建立，未啟用的輸出不持有區塊
+        self.queue_settings = queue_settings or QueueSettings()
+        self.spill_dir = spill_dir
+        self.ring = BlockRing(device_id, memory_budget)
+        self.web_cursor: RingCursor = self.add_consumer('web')
+        self.csv_cursor: Optional[RingCursor] = None
+        self.sql_cursor: Optional[RingCursor] = None
+        self.data_counter = 0
+
+        # 網頁顯示降頻（每 web_ratio 個 frame 輸出最小與最大值；跨區塊的區間由降頻器保留，只在網頁執行緒中使用）
+        self.web_ratio = decimation_ratio(sample_rate, web_points_per_s)
+        self._web_decimator = EnvelopeDecimator(self.web_ratio)
+        self._aux_decimator = EnvelopeDecimator(self.web_ratio)
+        # 降頻後的資料分送給各網頁用戶端（/stream 推送、/data 輪詢）
+        self.live = LiveStream(device_id, WEB_IDLE_TIMEOUT)
+        self.web_thread: Optional[threading.Thread] = None
+
+        # 統計資訊（已寫入樣本數、最近區塊的延遲，秒；丟棄數由佇列統計）
+        self.written: Dict[str, int] = {'csv': 0, 'sql': 0}
+        # 區塊從讀取完成到寫入完成（csv / sql）或降頻後推送給網頁用戶端（web）的時間
+        self.latency: Dict[str, deque] = {name: deque(maxlen=LATENCY_WINDOW) for name in ('csv', 'sql', 'web')}
+
+        # 缺漏統計（各輸出預期的下一個區塊序號、缺漏次數、遺失的樣本數）
+        self.next_index: Dict[str, int] = {'csv': 0, 'sql': 0}
+        self.gaps: Dict[str, int] = {'csv': 0, 'sql': 0}
+        self.lost_samples: Dict[str, int] = {'csv': 0, 'sql': 0}
+
+        # 觸發擷取（軟體觸發器與各輸出目前的事件編號，-1 = 連續擷取）
+        self.trigger: Optional[SoftwareTrigger] = None
+        self.current_event: Dict[str, int] = {'csv': -1, 'sql': -1}
+
+        # CSV / bin 寫入
+        self.csv_writer = None  # CSVWriter 或 BinaryWriter
+        self.target_size = 0
+        self.current_data_size = 0
+        self.csv_writer_thread: Optional[threading.Thread] = None
+
+        # SQL 上傳
+        self.sql_uploader: Optional[SQLUploader] = None
+        self.sql_target_size = 0
+        self.sql_current_data_size = 0
+        self.sql_temp_dir: Optional[str] = None
+        self.sql_current_temp_file: Optional[str] = None
+        self.sql_temp_file_lock = threading.Lock()
+        self.sql_sample_count = 0
+        self.sql_start_time: Optional[datetime] = None
+        self.sql_writer_thread: Optional[threading.Thread] = None
+
+        # 歷史資料金字塔
+        self.history: Optional[HistoryPyramid] = None
+        self.history_cursor: Optional[RingCursor] = None
+        self.history_thread: Optional[threading.Thread] = None
+
+    # ==========================================
+    # 設定與生命週期
+    # ==========================================
+
+    def add_consumer(self, name: str, max_bytes: Optional[int] = None, policy: Optional[str] = None) -> RingCursor:
+        """
+        新增區塊消費者（例如訊號處理），回傳讀取游標
+
+        消費者從游標 get() 取得與其他輸出共用的唯讀區塊（不複製），處理完畢後 release()。
+        未指定的上限與處理方式使用 [Queues] 區段的 <name>_mb / <name>_policy（沒有時為 64 MB、drop_oldest）。
+        """
+        default_bytes, default_policy = self.queue_settings.queues.get(name, (64 * 1024 * 1024, "drop_oldest"))
+        return self.ring.add_cursor(
+            name, default_bytes if max_bytes is None else max_bytes, policy or default_policy,
+            block_timeout=self.queue_settings.block_timeout,
+            spill_dir=self.spill_dir or self.queue_settings.spill_dir or os.path.join(tempfile.gettempdir(), "pet7h24m_spill"),
+        )
+
+    @property
+    def file_consumers(self) -> List[str]:
+        """接收寫入資料的消費者（顯示用的消費者以外；觸發擷取時只接收事件視窗）"""
+        return [name for name in self.ring.consumer_names() if name not in DISPLAY_CONSUMERS]
+
+    def open_csv(self, writer, save_unit: int) -> None:
+        """設定 CSV / bin 寫入器（save_unit 為每個檔案的資料時間長度，秒）"""
+        self.csv_writer = writer
+        if self.csv_cursor is None:
+            self.csv_cursor = self.add_consumer('csv')
+        self.target_size = save_unit * self.sample_rate * self.channels
+        self.current_data_size = 0
+
+    def open_sql(self, uploader: SQLUploader, output_path: str, upload_interval: int,
+                 start_time: Optional[datetime] = None) -> None:
+        """
+        設定 SQL 上傳器並建立第一個暫存檔案
+
+        upload_interval 為每批上傳的資料時間長度（秒），start_time 為第一個 frame 的時間
+        （None = 現在；匯入記錄檔時為記錄檔的起始時間）。
+        """
+        self.sql_uploader = uploader
+        if self.sql_cursor is None:
+            self.sql_cursor = self.add_consumer('sql')
+        self.sql_target_size = upload_interval * self.sample_rate * self.channels
+        self.sql_current_data_size = 0
+        self.sql_start_time = start_time or datetime.now()
+        self.sql_sample_count = 0
+
+        # 建立暫存檔案目錄
+        self.sql_temp_dir = os.path.join(output_path, ".sql_temp")
+        os.makedirs(self.sql_temp_dir, exist_ok=True)
+
+        # 建立第一個暫存檔案
+        if self._create_new_temp_file() is None:
+            raise RuntimeError("無法建立 SQL 暫存檔案")
+
+    def open_history(self, history: HistoryPyramid) -> None:
+        """設定歷史資料金字塔（start() 時啟動歷史資料執行緒）"""
+        self.history = history
+        if self.history_cursor is None:
+            self.history_cursor = self.add_consumer('history')
+
+    def open_trigger(self, trigger: SoftwareTrigger) -> None:
+        """設定軟體觸發器（之後只有事件視窗會寫入 CSV / SQL）"""
+        self.trigger = trigger
+
+    def start(self) -> None:
+        """啟動網頁執行緒、CSV / SQL 寫入執行緒與歷史資料執行緒"""
+        self.running = True
+
+        self.web_thread = threading.Thread(target=self.web_loop, daemon=True)
+        self.web_thread.start()
+
+        if self.csv_writer:
+            self.csv_writer_thread = threading.Thread(target=self.csv_writer_loop, daemon=True)
+            self.csv_writer_thread.start()
+
+        if self.sql_uploader:
+            self.sql_writer_thread = threading.Thread(target=self.sql_writer_loop, daemon=True)
+            self.sql_writer_thread.start()
+
+        if self.history:
+            self.history_thread = threading.Thread(target=self.history_loop, daemon=True)
+            self.history_thread.start()
+
+    def stop(self) -> None:
+        """通知寫入執行緒停止（佇列中剩餘的區塊仍會寫完）"""
+        self.running = False
+        self.ring.wake()
+
+    def clear(self) -> None:
+        """略過所有消費者尚未讀取的區塊並歸還"""
+        self.ring.close()
+
+    def _cursors(self) -> Dict[str, Optional[RingCursor]]:
+        """CSV / SQL / 網頁 / 歷史資料游標（未啟用的輸出為 None）"""
+        return {'csv': self.csv_cursor, 'sql': self.sql_cursor, 'web': self.web_cursor, 'history': self.history_cursor}
+
+    @property
+    def dropped(self) -> Dict[str, int]:
+        """各消費者丟棄的區塊數"""
+        return {name: cursor.dropped_items if cursor is not None else 0 for name, cursor in self._cursors().items()}
+
+    def file_backlog(self) -> int:
+        """寫入端消費者尚未讀取的最大區塊數（記錄檔匯入依此控制速度）"""
+        return max((cursor.qsize() for cursor in (self.csv_cursor, self.sql_cursor) if cursor is not None), default=0)
+
+    # ==========================================
+    # 區塊分發
+    # ==========================================
+
+    def dispatch(self, block: SampleBlock) -> None:
+        """將區塊放入環形緩衝區供所有消費者讀取（呼叫者仍持有自己的參考）"""
+        web_active = self.live.active()
+        if not web_active and self.web_cursor.items:
+            self.web_cursor.clear()
+        display = ('web', 'history') if web_active else ('history',) if self.history_cursor is not None else ()
+
+        if self.trigger is not None:
+            # 軟體觸發：寫入端只接收事件視窗（事件區塊為獨立配置的陣列），網頁與歷史資料仍接收連續資料
+            if self.csv_writer or self.sql_uploader:
+                for event_block in self.trigger.process(block):
+                    self.enqueue(event_block)
+            if display:
+                self.ring.append(block, display)
+        else:
+            # 區塊為唯讀，所有消費者共用同一份資料，不需複製
+            self.ring.append(block, None if web_active else self.file_consumers + list(display))
+
+        self.data_counter += len(block)
+
+    def enqueue(self, block: SampleBlock) -> None:
+        """將區塊只送往寫入端消費者（不更新網頁顯示；記錄檔匯入也直接使用）"""
+        if not self.ring.append(block, self.file_consumers) and (self.csv_writer or self.sql_uploader):
+            warning(f"[{self.device_id}] 寫入端落後，區塊已丟棄")
+
+    def _downsample(self, block: SampleBlock) -> Optional[np.ndarray]:
+        """
+        網頁顯示的降頻資料（每 web_ratio 個 frame 的最小 / 最大值包絡，原始整數區塊在降頻後才轉換為電壓）
+
+        第一個區間起點的 frame 序號為 self._web_decimator.output_index。
+        """
+        data = block.data
+        channels = self.channels
+        frame_count = len(data) // channels
+        if frame_count == 0:
+            return None
+
+        frames = data[:frame_count * channels].reshape(frame_count, channels)
+        downsampled_chunk = self._web_decimator.process(frames, block.start_index)
+        aux = None
+        if self.aux_columns and block.aux is not None:
+            aux = self._aux_decimator.process(
+                recfunctions.structured_to_unstructured(block.aux[:frame_count], dtype=np.float64), block.start_index
+            )
+        if downsampled_chunk is None:
+            return None
+
+        # 校正為線性轉換，包絡的點在轉換後仍是區間的極值
+        if block.calibration is not None:
+            downsampled_chunk = block.calibration.to_volts(downsampled_chunk)
+        if aux is not None:
+            # 同步輸入欄位接在通道之後（網頁依 channel_names 分組顯示）
+            downsampled_chunk = np.hstack((downsampled_chunk, aux))
+        return downsampled_chunk.ravel()
+
+    @property
+    def column_names(self) -> List[str]:
+        """網頁顯示資料每個 frame 的欄位名稱（通道之後為同步輸入欄位）"""
+        return [f'Channel_{i + 1}' for i in range(self.channels)] + self.aux_columns
+
+    def get_stats(self) -> dict:
+        """取得輸出統計（丟棄區塊數、已寫入樣本數、佇列長度與位元組統計）"""
+        return {
+            'dropped': self.dropped,
+            'written': dict(self.written),
+            'gaps': dict(self.gaps),
+            'lost_samples': dict(self.lost_samples),
+            'queued': {name: cursor.qsize() if cursor is not None else 0 for name, cursor in self._cursors().items()},
+            'trigger': self.trigger.get_stats() if self.trigger is not None else None,
+            'queues': {name: cursor.get_stats() for name, cursor in self._cursors().items() if cursor is not None},
+            'ring': self.ring.get_stats(),
+            'history': self.history.get_stats() if self.history is not None else None,
+            'live': self.live.get_stats(),
+        }
+
+    def _take_event(self, stage: str, block: SampleBlock) -> bool:
+        """區塊屬於新的觸發事件時回傳 True（該輸出的序號從事件起點重新開始，不視為缺漏）"""
+        if block.event_id == self.current_event[stage]:
+            return False
+        self.current_event[stage] = block.event_id
+        self.next_index[stage] = block.start_index
+        return True
+
+    def _take_gap(self, stage: str, block: SampleBlock) -> int:
+        """比對區塊序號與該輸出預期的下一個序號，回傳中間遺失的 frame 數（並更新缺漏統計）"""
+        frames = block.start_index - self.next_index[stage]
+        self.next_index[stage] = block.start_index + block.frame_count(self.channels)
+        if frames <= 0:
+            return 0
+
+        self.gaps[stage] += 1
+        self.lost_samples[stage] += frames * self.channels
+        warning(f"[{self.device_id}] {stage.upper()} 輸出偵測到缺漏: 序號 {block.start_index - frames} 起遺失 {frames} frames")
+        return frames
+
+    def read_web_chunks(self, since: Optional[int] = None) -> Tuple[List[LiveChunk], int, int]:
+        """
+        讀取游標 since 之後的降頻資料段（不移除資料，每個用戶端各自保存游標；None = 共用的伺服器端游標）
+
+        回傳 (資料段, 下一次讀取的游標, 略過的原始 frame 數)。
+        """
+        return self.live.read(since)
+
+    def web_loop(self) -> None:
+        """網頁迴圈（在獨立執行緒中執行，以網頁游標讀取區塊、降頻並推送給網頁用戶端）"""
+        channels = self.channels
+        cursor = self.web_cursor
+        live = self.live
+        latency = self.latency['web']
+
+        while self.running or not cursor.empty():
+            try:
+                try:
+                    block = cursor.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                try:
+                    chunk = self._downsample(block)
+                    frames = block.frame_count(channels)
+                finally:
+                    block.release()
+                if chunk is not None:
+                    live.publish(chunk, frames, self._web_decimator.output_index)
+                latency.append(time.monotonic() - block.read_time)
+            except Exception as e:
+                error(f"[{self.device_id}] Web loop error: {e}")
+                time.sleep(0.1)
+
+        # 收集結束：中斷推送用戶端的連線（/data 仍可取出剩餘的資料）
+        live.close()
+
+    def history_loop(self) -> None:
+        """歷史資料迴圈（在獨立執行緒中執行，以 history 游標讀取連續資料並更新金字塔）"""
+        history = self.history
+        cursor = self.history_cursor
+
+        while self.running or not cursor.empty():
+            try:
+                try:
+                    block = cursor.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                try:
+                    history.add(block)
+                finally:
+                    block.release()
+            except Exception as e:
+                error(f"[{self.device_id}] History loop error: {e}")
+                time.sleep(0.1)
+
+    # ==========================================
+    # CSV / bin 寫入
+    # ==========================================
+
+    def csv_writer_loop(self) -> None:
+        """CSV 寫入迴圈（在獨立執行緒中執行）"""
+        channels = self.channels
+        writer = self.csv_writer
+        cursor = self.csv_cursor
+
+        while self.running or not cursor.empty():
+            try:
+                try:
+                    block = cursor.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+
+                try:
+                    # 新的觸發事件或定時擷取段：切換到新檔案，時間戳記從事件起點推算
+                    if self._take_event('csv', block):
+                        if writer.start_segment(block.start_index, block.event_id):
+                            self._create_sql_table()
+                        self.current_data_size = 0
+
+                    # 序號不連續：先寫入缺漏標記，之後的時間戳記跳過遺失的時間
+                    gap = self._take_gap('csv', block)
+                    if gap:
+                        writer.add_gap(gap)
+
+                    # BinaryWriter 直接寫入原始資料；CSVWriter 需要電壓（原始整數模式下向量化轉換）
+                    data = block.data if writer.accepts_raw else block.volts()
+                    aux = block.aux  # 同步輸入紀錄（每個 frame 一筆，與 data 同步切割）
+                    data_size = len(data)
+                    self.current_data_size += data_size
+
+                    if self.current_data_size < self.target_size:
+                        writer.add_data_block(data, aux)
+                    else:
+                        data_actual_size = data_size
+                        empty_space = self.target_size - (self.current_data_size - data_actual_size)
+                        empty_space = (empty_space // channels) * channels
+
+                        while self.current_data_size >= self.target_size:
+                            batch = data[:empty_space]
+                            writer.add_data_block(batch, aux[:empty_space // channels] if aux is not None else None)
+                            writer.update_filename()
+                            self._create_sql_table()
+
+                            self.current_data_size -= self.target_size
+
+                            if empty_space < data_actual_size:
+                                data = data[empty_space:]
+                                if aux is not None:
+                                    aux = aux[empty_space // channels:]
+                                data_actual_size = len(data)
+                                empty_space = self.target_size
+                                empty_space = (empty_space // channels) * channels
+                            else:
+                                # 區塊剛好填滿檔案，已全部寫入
+                                data_actual_size = 0
+                                break
+
+                        pending = data_actual_size
+                        if pending:
+                            writer.add_data_block(data, aux)
+                            self.current_data_size = pending
+                        else:
+                            self.current_data_size = 0
+
+                    self.written['csv'] += data_size
+                    self.latency['csv'].append(time.monotonic() - block.read_time)
+                finally:
+                    block.release()
+
+            except Exception as e:
+                error(f"[{self.device_id}] CSV writer loop error: {e}")
+                time.sleep(0.1)
+
+    def _create_sql_table(self) -> None:
+        """切換 CSV 檔案後建立對應的 SQL 表（如果啟用 SQL）"""
+        if not self.sql_uploader:
+            return
+        csv_filename = self.csv_writer.get_current_filename()
+        if csv_filename:
+            if self.sql_uploader.create_table(csv_filename):
+                info(f"SQL 表已建立，對應 CSV: {csv_filename}")
+            else:
+                warning(f"SQL 表建立失敗，對應 CSV: {csv_filename}")
+
+    # ==========================================
+    # SQL 暫存檔案與上傳
+    # ==========================================
+
+    def _table_name(self) -> Optional[str]:
+        """從對應的 CSV 檔名推斷 SQL 表名"""
+        if self.csv_writer:
+            csv_filename = self.csv_writer.get_current_filename()
+            if csv_filename:
+                return csv_filename
+        return None
+
+    def _create_new_temp_file(self) -> Optional[str]:
+        """建立新的 SQL 暫存檔案"""
+        if not self.sql_temp_dir:
+            return None
+
+        try:
+            temp_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            temp_filename = f"{temp_timestamp}_sql_temp.csv"
+            new_temp_file = os.path.join(self.sql_temp_dir, temp_filename)
+
+            with open(new_temp_file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                headers = ['Timestamp'] + [f'Channel_{i+1}' for i in range(self.channels)] + self.aux_columns
+                writer.writerow(headers)
+
+            with self.sql_temp_file_lock:
+                self.sql_current_temp_file = new_temp_file
+
+            info(f"新的 SQL 暫存檔案已建立: {temp_filename}")
+            return new_temp_file
+        except Exception as e:
+            error(f"建立新暫存檔案失敗: {e}")
+            return None
+
+    def _write_to_temp_file(self, data: np.ndarray, aux: Optional[np.ndarray] = None) -> None:
+        """將資料寫入 SQL 暫存檔案（aux 為每個 frame 的同步輸入紀錄）"""
+        if not self.sql_current_temp_file or not os.path.exists(self.sql_current_temp_file):
+            return
+
+        try:
+            with self.sql_temp_file_lock:
+                current_file = self.sql_current_temp_file
+                if not current_file or not os.path.exists(current_file):
+                    return
+
+                frames = as_frames(data, self.channels)
+                timestamps = format_timestamps(
+                    self.sql_start_time, self.sql_sample_count, len(frames), self.sample_rate, sep='T'
+                )
+
+                columns = frames.T.tolist() + aux_columns(aux, self.aux_columns, len(frames))
+
+                with open(current_file, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerows(zip(timestamps.tolist(), *columns))
+
+            self.sql_sample_count += len(frames)
+        except Exception as e:
+            error(f"寫入暫存檔案失敗: {e}")
+
+    def _write_gap_to_temp_file(self, frames: int) -> None:
+        """將缺漏標記寫入 SQL 暫存檔案（上傳時記錄到缺漏資料表）"""
+        try:
+            with self.sql_temp_file_lock:
+                current_file = self.sql_current_temp_file
+                if current_file and os.path.exists(current_file):
+                    with open(current_file, 'a', newline='', encoding='utf-8') as f:
+                        csv.writer(f).writerow(
+                            gap_row(self.sql_start_time, self.sql_sample_count, frames, self.sample_rate, sep='T')
+                        )
+        except Exception as e:
+            error(f"寫入缺漏標記失敗: {e}")
+        self.sql_sample_count += frames
+
+    def _upload_temp_file_if_needed(self) -> bool:
+        """檢查並上傳 SQL 暫存檔案（如果資料量達到門檻）"""
+        if not self.sql_uploader or not self.sql_current_temp_file:
+            return False
+
+        # 檢查資料量是否達到門檻
+        if self.sql_current_data_size < self.sql_target_size:
+            return False
+
+        # 資料量達到門檻，準備上傳
+        with self.sql_temp_file_lock:
+            temp_file_to_upload = self.sql_current_temp_file
+
+        if not temp_file_to_upload or not os.path.exists(temp_file_to_upload):
+            return False
+
+        try:
+            # 記錄當前資料量（用於日誌）
+            current_data_size_before_upload = self.sql_current_data_size
+
+            # 上傳檔案
+            if self.sql_uploader.upload_from_csv_file(temp_file_to_upload, self._table_name()):
+                # 計算筆數（資料點數 / 通道數）
+                rows_count = current_data_size_before_upload // self.channels
+                target_rows = self.sql_target_size // self.channels
+
+                # 上傳成功，刪除暫存檔
+                try:
+                    os.remove(temp_file_to_upload)
+                    info(f"暫存檔案已上傳並刪除: {os.path.basename(temp_file_to_upload)} (筆數: {rows_count} 筆, 目標: {target_rows} 筆)")
+                except Exception as e:
+                    warning(f"刪除暫存檔案失敗: {e}")
+
+                # 建立新的暫存檔案
+                self._create_new_temp_file()
+
+                # 計算超出部分的資料量（用於下一個暫存檔案）
+                excess_data_size = current_data_size_before_upload - self.sql_target_size
+
+                # 重置資料量計數器，保留超出部分的資料量
+                self.sql_current_data_size = excess_data_size
+
+                if excess_data_size > 0:
+                    excess_rows = excess_data_size // self.channels
+                    debug(f"保留超出部分的資料量: {excess_rows} 筆 ({excess_data_size} 個資料點) 到新暫存檔案")
+
+                return True
+            else:
+                error(f"上傳暫存檔案失敗: {os.path.basename(temp_file_to_upload)}")
+                # 上傳失敗，保留檔案等待下次重試
+                return False
+
+        except Exception as e:
+            error(f"上傳暫存檔案時發生錯誤: {e}")
+            return False
+
+    def sql_writer_loop(self) -> None:
+        """SQL 寫入迴圈（在獨立執行緒中執行）"""
+        channels = self.channels
+        cursor = self.sql_cursor
+
+        while self.running or not cursor.empty():
+            try:
+                try:
+                    block = cursor.get(timeout=1.0)
+                except queue.Empty:
+                    if self.sql_current_data_size > 0:
+                        self._upload_temp_file_if_needed()
+                    continue
+
+                try:
+                    # 新的觸發事件：時間戳記從事件起點推算
+                    if self._take_event('sql', block):
+                        self.sql_sample_count = block.start_index
+
+                    gap = self._take_gap('sql', block)
+                    if gap:
+                        self._write_gap_to_temp_file(gap)
+
+                    if not self.sql_current_temp_file:
+                        continue
+
+                    remaining_data = block.volts()
+                    remaining_aux = block.aux  # 同步輸入紀錄（與資料同步切割）
+
+                    while len(remaining_data) > 0:
+                        remaining_space = self.sql_target_size - self.sql_current_data_size
+
+                        if remaining_space <= 0:
+                            if not self._upload_temp_file_if_needed():
+                                self._write_to_temp_file(remaining_data, remaining_aux)
+                                self.sql_current_data_size += len(remaining_data)
+                                break
+                            remaining_space = self.sql_target_size - self.sql_current_data_size
+
+                        write_size = min(len(remaining_data), remaining_space)
+                        write_size = (write_size // channels) * channels
+
+                        if write_size > 0:
+                            write_frames = write_size // channels
+                            self._write_to_temp_file(remaining_data[:write_size],
+                                                     remaining_aux[:write_frames] if remaining_aux is not None else None)
+                            self.sql_current_data_size += write_size
+
+                            remaining_data = remaining_data[write_size:]
+                            if remaining_aux is not None:
+                                remaining_aux = remaining_aux[write_frames:]
+
+                            if self.sql_current_data_size >= self.sql_target_size:
+                                if not self._upload_temp_file_if_needed():
+                                    break
+                        else:
+                            if not self._upload_temp_file_if_needed():
+                                self._write_to_temp_file(remaining_data, remaining_aux)
+                                self.sql_current_data_size += len(remaining_data)
+                                break
+
+                    self.written['sql'] += len(block)
+                    self.latency['sql'].append(time.monotonic() - block.read_time)
+                finally:
+                    block.release()
+
+            except Exception as e:
+                error(f"[{self.device_id}] SQL writer loop error: {e}")
+                time.sleep(0.1)
+
+    # ==========================================
+    # 停止後的清理
+    # ==========================================
+
+    def finalize(self) -> None:
+        """等待佇列寫完、上傳剩餘的 SQL 暫存檔案並關閉寫入器"""
+        # 寫入執行緒在游標讀完後結束（stop() 已喚醒等待中的執行緒）
+        for thread in (self.web_thread, self.csv_writer_thread, self.sql_writer_thread, self.history_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=5)
+
+        if self.sql_uploader and self.sql_temp_dir:
+            try:
+                if os.path.exists(self.sql_temp_dir):
+                    temp_files = sorted(
+                        f for f in os.listdir(self.sql_temp_dir)
+                        if f.endswith("_sql_temp.csv")
+                    )
+                    for temp_file in temp_files:
+                        temp_file_path = os.path.join(self.sql_temp_dir, temp_file)
+                        if self.sql_uploader.upload_from_csv_file(temp_file_path, self._table_name()):
+                            try:
+                                os.remove(temp_file_path)
+                                info(f"停止時已上傳並刪除暫存檔案: {temp_file}")
+                            except Exception as e:
+                                warning(f"刪除暫存檔案失敗: {e}")
+                        else:
+                            error(f"停止時上傳暫存檔案失敗: {temp_file}")
+
+                    try:
+                        if not os.listdir(self.sql_temp_dir):
+                            os.rmdir(self.sql_temp_dir)
+                    except:
+                        pass
+
+            except Exception as e:
+                warning(f"清理 SQL 暫存檔案時發生錯誤: {e}")
+
+        if self.csv_writer:
+            self.csv_writer.close()
+
+        if self.sql_uploader:
+            self.sql_uploader.close()
+
+        # 歸還剩餘區塊並刪除游標暫存檔
+        self.clear()
+        if self.spill_dir:
+            try:
+                if os.path.isdir(self.spill_dir) and not os.listdir(self.spill_dir):
+                    os.rmdir(self.spill_dir)
+            except OSError:
+                pass
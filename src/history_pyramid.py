@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+歷史資料金字塔模組
+
+此模組負責網頁縮放檢視的近期資料（/history?t0=&t1=&points=），支援：
+- 多層最小 / 最大值金字塔（預設 1×、16×、256×、4096×，每層固定數量的區間，記憶體有上限）
+- 區塊到達時逐層更新（每層只處理上一層新完成的區間，不重新計算）
+- 缺漏（區塊序號不連續）：未填滿的區間直接完成，跳過的區間為 NaN，網頁顯示為斷線
+- 查詢時選擇仍涵蓋 t0、點數不超過上限的最細層；查詢的計算量只與點數有關，與時間範圍長度無關
+- 原始整數資料以原始值儲存，查詢時才轉換為電壓
+"""
+
+import time
+import threading
+import configparser
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from sample_block import RawCalibration, SampleBlock
+
+# [Web] 區段 history_levels / history_buckets 的預設值
+DEFAULT_HISTORY_LEVELS = (1, 16, 256, 4096)
+DEFAULT_HISTORY_BUCKETS = 65536
+
+
+def read_history_settings(ini_path: str) -> Tuple[List[int], int]:
+    """讀取設定檔 [Web] 區段的金字塔各層降頻比例與每層區間數（區間數 0 = 停用）"""
+    cfg = configparser.ConfigParser()
+    cfg.read(ini_path, encoding="utf-8")
+    text = cfg.get("Web", "history_levels", fallback=", ".join(str(ratio) for ratio in DEFAULT_HISTORY_LEVELS))
+    try:
+        ratios = [int(item) for item in text.split(",") if item.strip()]
+    except ValueError:
+        raise ValueError(f"無效的 history_levels: {text}")
+    buckets = cfg.getint("Web", "history_buckets", fallback=DEFAULT_HISTORY_BUCKETS)
+    if buckets < 0:
+        raise ValueError(f"無效的 history_buckets: {buckets}")
+    return ratios, buckets
+
+
+class _Level:
+    """金字塔的一層（ratio = 每個區間的 frame 數，step = 每個區間包含上一層的區間數）"""
+
+    def __init__(self, ratio: int, step: int, capacity: int, columns: int):
+        self.ratio = ratio
+        self.step = step
+        self.lo = np.full((capacity, columns), np.nan, dtype=np.float32)
+        # 第一層每個區間只有一個 frame，最小值與最大值共用同一個陣列
+        self.hi = self.lo if ratio == 1 else np.full((capacity, columns), np.nan, dtype=np.float32)
+        self.end = 0                          # 已寫入的下一個區間序號
+        self._acc_lo: Optional[np.ndarray] = None  # 尚未填滿的區間
+        self._acc_hi: Optional[np.ndarray] = None
+        self._acc_index = 0
+
+    @property
+    def oldest(self) -> int:
+        """仍保留的最舊區間序號"""
+        return max(0, self.end - len(self.lo))
+
+    def add(self, lo: np.ndarray, hi: np.ndarray, start: int) -> List[tuple]:
+        """
+        加入上一層的區間（start 為第一個區間在上一層的序號），回傳本層新完成的區間 [(lo, hi, 序號), ...]
+        """
+        step = self.step
+        if step == 1:
+            self._write(lo, hi, start)
+            return [(lo, hi, start)]
+
+        done = []
+        count = len(lo)
+        if self._acc_lo is not None and start // step != self._acc_index:
+            # 區間未填滿就不連續：以目前的內容完成該區間
+            done.append(self._flush())
+
+        pos = 0
+        if start % step or self._acc_lo is not None:
+            pos = min(count, step - start % step)
+            head_lo = lo[:pos].min(axis=0)
+            head_hi = hi[:pos].max(axis=0)
+            if self._acc_lo is None:
+                self._acc_lo, self._acc_hi, self._acc_index = head_lo, head_hi, start // step
+            else:
+                self._acc_lo = np.minimum(self._acc_lo, head_lo)
+                self._acc_hi = np.maximum(self._acc_hi, head_hi)
+            if (start + pos) % step == 0:
+                done.append(self._flush())
+
+        whole = (count - pos) // step * step
+        if whole:
+            columns = lo.shape[1]
+            done.append((lo[pos:pos + whole].reshape(-1, step, columns).min(axis=1),
+                         hi[pos:pos + whole].reshape(-1, step, columns).max(axis=1),
+                         (start + pos) // step))
+            pos += whole
+        if pos < count:
+            self._acc_lo = lo[pos:].min(axis=0)
+            self._acc_hi = hi[pos:].max(axis=0)
+            self._acc_index = (start + pos) // step
+
+        for segment in done:
+            self._write(*segment)
+        return done
+
+    def _flush(self) -> tuple:
+        """完成尚未填滿的區間"""
+        segment = (self._acc_lo[np.newaxis], self._acc_hi[np.newaxis], self._acc_index)
+        self._acc_lo = self._acc_hi = None
+        return segment
+
+    def _write(self, lo: np.ndarray, hi: np.ndarray, start: int) -> None:
+        """寫入環形陣列（跳過的區間填入 NaN；超過容量時只保留最後的區間）"""
+        capacity = len(self.lo)
+        if start < self.end:
+            # 與已寫入的區間重疊（不應發生）：略過重疊部分
+            lo, hi = lo[self.end - start:], hi[self.end - start:]
+            start = self.end
+        if len(lo) == 0:
+            return
+        if start > self.end:
+            self._fill(self.end, min(start - self.end, capacity), np.nan, np.nan)
+        if len(lo) > capacity:
+            start += len(lo) - capacity
+            lo, hi = lo[-capacity:], hi[-capacity:]
+        self._fill(start, len(lo), lo, hi)
+        self.end = start + len(lo)
+
+    def _fill(self, start: int, count: int, lo, hi) -> None:
+        """從區間序號 start 寫入 count 個區間（環形陣列尾端不足時分兩段）"""
+        capacity = len(self.lo)
+        first = start % capacity
+        head = min(count, capacity - first)
+        targets = [(self.lo, lo)] if self.hi is self.lo else [(self.lo, lo), (self.hi, hi)]
+        for target, values in targets:
+            if np.ndim(values) == 0:
+                target[first:first + head] = values
+                target[:count - head] = values
+            else:
+                target[first:first + head] = values[:head]
+                target[:count - head] = values[head:count]
+
+    def read(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """讀取區間序號 [start, stop) 的最小與最大值（複本）"""
+        capacity = len(self.lo)
+        positions = np.arange(start, stop) % capacity
+        return self.lo[positions], self.hi[positions]
+
+
+class HistoryPyramid:
+    """
+    近期資料的多層最小 / 最大值金字塔（寫入端為歷史資料執行緒，查詢端為 Flask 請求執行緒）
+
+    區間序號以收集開始後的 frame 序號（區塊的 start_index）計算，origin 為 frame 0 的時間。
+    """
+
+    def __init__(self, channels: int, sample_rate: int, ratios=DEFAULT_HISTORY_LEVELS,
+                 capacity: int = DEFAULT_HISTORY_BUCKETS):
+        """
+        初始化金字塔
+
+        Args:
+            channels: 通道數（同步輸入欄位不保留）
+            sample_rate: 取樣率（Hz）
+            ratios: 各層每個區間的 frame 數（由小到大，每層必須是上一層的整數倍）
+            capacity: 每層保留的區間數
+        """
+        ratios = list(ratios)
+        if not ratios or ratios[0] < 1 or any(b <= a or b % a for a, b in zip(ratios, ratios[1:])):
+            raise ValueError(f"無效的 history_levels: {ratios}（由小到大，每層必須是上一層的整數倍）")
+        if capacity <= 0:
+            raise ValueError(f"無效的 history_buckets: {capacity}")
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        previous = [1] + ratios[:-1]
+        self.levels = [_Level(ratio, ratio // prev, capacity, channels) for ratio, prev in zip(ratios, previous)]
+        self.origin: Optional[float] = None
+        self.calibration: Optional[RawCalibration] = None
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """各層陣列佔用的記憶體（位元組）"""
+        return sum(level.lo.nbytes + (level.hi.nbytes if level.hi is not level.lo else 0) for level in self.levels)
+
+    def add(self, block: SampleBlock) -> None:
+        """加入一個區塊並逐層更新"""
+        data = block.data
+        channels = self.channels
+        frame_count = len(data) // channels
+        if frame_count == 0:
+            return
+        frames = data[:frame_count * channels].reshape(frame_count, channels)
+
+        with self._lock:
+            if self.origin is None:
+                # frame 0 的時間：區塊讀取完成時的系統時間往前推算區塊結束的 frame 數
+                read_at = time.time() - (time.monotonic() - block.read_time)
+                self.origin = read_at - (block.start_index + frame_count) / self.sample_rate
+            self.calibration = block.calibration
+
+            segments = [(frames, frames, block.start_index)]
+            for level in self.levels:
+                done = []
+                for segment in segments:
+                    done.extend(level.add(*segment))
+                if not done:
+                    break
+                segments = done
+
+    def query(self, t0: float, t1: float, points: int) -> Optional[dict]:
+        """
+        查詢時間範圍 [t0, t1)（系統時間，秒）的最小 / 最大值（最多 points 個區間，每個區間一組最小與最大值）
+
+        選擇仍涵蓋 t0、區間數不超過 points 的最細層；沒有符合的層時使用最粗的一層，
+        再將相鄰區間合併到 points 以內。尚未收到資料時回傳 None。
+        """
+        with self._lock:
+            if self.origin is None:
+                return None
+            rate = self.sample_rate
+            first = max(0, int((t0 - self.origin) * rate))
+            last = max(first, int(np.ceil((t1 - self.origin) * rate)))
+
+            # 涵蓋範圍隨層數增加，因此第一個涵蓋 t0 且區間數不超過 points 的層即為最細的可用層
+            for level in self.levels:
+                start = max(first // level.ratio, level.oldest)
+                stop = max(start, min(-(-last // level.ratio), level.end))
+                if first // level.ratio >= level.oldest and stop - start <= points:
+                    break
+            lo, hi = level.read(start, stop)
+            calibration = self.calibration
+            origin = self.origin
+
+        # 相鄰區間合併（不足一組的部分以 NaN 補齊，fmin / fmax 略過 NaN）
+        group = max(1, -(-(stop - start) // points))
+        if group > 1:
+            padded = -(-len(lo) // group) * group
+            if padded > len(lo):
+                pad = np.full((padded - len(lo), lo.shape[1]), np.nan, dtype=lo.dtype)
+                lo, hi = np.concatenate((lo, pad)), np.concatenate((hi, pad))
+            lo = np.fmin.reduce(lo.reshape(-1, group, lo.shape[1]), axis=1)
+            hi = np.fmax.reduce(hi.reshape(-1, group, hi.shape[1]), axis=1)
+
+        if calibration is not None:
+            # 校正為線性轉換（係數為負時最小與最大值互換）
+            lo, hi = calibration.to_volts(lo), calibration.to_volts(hi)
+            lo, hi = np.fmin(lo, hi), np.fmax(lo, hi)
+
+        step = level.ratio * group
+        return {
+            'start': origin + start * level.ratio / rate,
+            'step': step / rate,
+            'level': level.ratio,
+            'group': group,
+            'buckets': len(lo),
+            'min': lo,
+            'max': hi,
+        }
+
+    def get_stats(self) -> dict:
+        """各層的降頻比例、涵蓋的時間長度與已寫入的區間數"""
+        with self._lock:
+            return {
+                'bytes': self.nbytes,
+                'levels': [
+                    {
+                        'ratio': level.ratio,
+                        'span_s': round(min(level.end, self.capacity) * level.ratio / self.sample_rate, 3),
+                        'buckets': level.end,
+                    }
+                    for level in self.levels
+                ],
+            }
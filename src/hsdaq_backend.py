@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HSDAQ 後端選擇模組
+
+此模組負責在執行期（而非 import 時）選擇 PET7H24M 使用的 HSDAQ 後端，支援：
+- hsdaq：官方 libhsdaq.so（第一次初始化設備時才以 ctypes 載入，函數簽名只設定一次）
+- 依 platform.machine() 搜尋對應架構的函式庫路徑（LinuxArm64 / LinuxJetArm64 / Linuxx64 / LinuxArm32）
+- 環境變數 PET7H24M_HSDAQ_LIB 指定函式庫路徑（優先於自動搜尋）
+- simulated：純 NumPy 模擬設備（不需要硬體，可在 x86 CI 環境執行）
+- 環境變數 PET7H24M_BACKEND 覆寫設定檔中的 backend
+"""
+
+import os
+import time
+import platform
+import threading
+from ctypes import *
+from typing import Dict, List, Optional, Tuple
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# HSDAQ 函式庫（Linux 版本）
+# 參考官方範例：docs/linux_python3_SDK_Demo/python_demo/PET-7H24M/<架構>/
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+HSDAQ_LIB_NAME = 'libhsdaq.so'
+SDK_DEMO_DIR = os.path.join(PROJECT_ROOT, 'docs', 'linux_python3_SDK_Demo', 'python_demo', 'PET-7H24M')
+SDK_DEMO_NAMES = ('ET7H24_AI_Buffer_Continue', 'ET7H24_N_Sample_float')
+
+# platform.machine() 對應的函式庫目錄（依序搜尋）
+ARCH_DIRS = {
+    'aarch64': ('LinuxArm64', 'LinuxJetArm64'),
+    'arm64': ('LinuxArm64', 'LinuxJetArm64'),
+    'x86_64': ('Linuxx64',),
+    'amd64': ('Linuxx64',),
+    'armv7l': ('LinuxArm32',),
+    'armv6l': ('LinuxArm32',),
+}
+
+# Jetson 上優先使用 LinuxJetArm64
+JETSON_RELEASE_FILE = '/etc/nv_tegra_release'
+
+# 環境變數指定函式庫路徑（優先於自動搜尋）
+HSDAQ_LIB_ENV = "PET7H24M_HSDAQ_LIB"
+
+# 可用的後端名稱
+BACKENDS = ("hsdaq", "simulated")
+
+# 環境變數覆寫（例如 CI 環境設定 PET7H24M_BACKEND=simulated）
+BACKEND_ENV = "PET7H24M_BACKEND"
+
+_hsdaq_dll = None
+_hsdaq_path: Optional[str] = None
+_hsdaq_load_ms: Optional[float] = None
+_load_lock = threading.Lock()
+
+
+def _setup_function_signatures(dll) -> None:
+    """設定 ctypes 函數簽名"""
+    # HS_Device_Create
+    dll.HS_Device_Create.restype = c_void_p
+    dll.HS_Device_Create.argtypes = [c_char_p]
+
+    # HS_Device_Release
+    dll.HS_Device_Release.restype = c_bool
+    dll.HS_Device_Release.argtypes = [c_void_p]
+
+    # HS_SetAIScanParam
+    dll.HS_SetAIScanParam.restype = c_bool
+    dll.HS_SetAIScanParam.argtypes = [c_void_p, c_short, c_short, c_short, c_long, c_ulong, c_short, c_short]
+
+    # HS_GetAIScanParam（用於驗證參數設定）
+    dll.HS_GetAIScanParam.restype = c_bool
+    dll.HS_GetAIScanParam.argtypes = [c_void_p, POINTER(c_short), POINTER(c_short), POINTER(c_short),
+                                      POINTER(c_long), POINTER(c_ulong), POINTER(c_short), POINTER(c_short)]
+
+    # HS_StartAIScan
+    dll.HS_StartAIScan.restype = c_bool
+    dll.HS_StartAIScan.argtypes = [c_void_p]
+
+    # HS_StopAIScan
+    dll.HS_StopAIScan.restype = c_bool
+    dll.HS_StopAIScan.argtypes = [c_void_p]
+
+    # HS_GetAIBufferStatus
+    dll.HS_GetAIBufferStatus.restype = c_bool
+    dll.HS_GetAIBufferStatus.argtypes = [c_void_p, POINTER(c_ushort), POINTER(c_ulong)]
+
+    # HS_GetAIBuffer
+    dll.HS_GetAIBuffer.restype = c_ulong
+    dll.HS_GetAIBuffer.argtypes = [c_void_p, POINTER(c_float), c_ulong]
+
+    # HS_GetAIBufferHex（原始整數模式）
+    dll.HS_GetAIBufferHex.restype = c_uint
+    dll.HS_GetAIBufferHex.argtypes = [c_void_p, POINTER(c_uint32), c_uint]
+
+    # HS_ReadGainOffset（讀取通道校正表）
+    dll.HS_ReadGainOffset.restype = c_bool
+    dll.HS_ReadGainOffset.argtypes = [c_void_p, c_int, c_int, POINTER(c_ushort), POINTER(c_short)]
+
+    # HS_Calibrate_Data_Float（原始值轉換為電壓）
+    dll.HS_Calibrate_Data_Float.restype = c_bool
+    dll.HS_Calibrate_Data_Float.argtypes = [c_void_p, c_int, c_int, c_int, POINTER(c_float)]
+
+    # HS_SetEventCallback / HS_RemoveEventCallback（事件喚醒，舊版函式庫可能沒有）
+    try:
+        dll.HS_SetEventCallback.restype = c_ushort
+        dll.HS_SetEventCallback.argtypes = [c_void_p, c_ushort, c_ushort, c_void_p, c_void_p]
+        dll.HS_RemoveEventCallback.restype = c_ushort
+        dll.HS_RemoveEventCallback.argtypes = [c_void_p, c_ushort]
+    except AttributeError:
+        debug("HSDAQ 函式庫不支援事件回呼，將使用輪詢模式")
+
+    # HS_GetTotalSamplingStatus / HS_ClearAIBuffer（樣本總數比對與溢位後清除緩衝區，舊版函式庫可能沒有）
+    try:
+        dll.HS_GetTotalSamplingStatus.restype = c_bool
+        dll.HS_GetTotalSamplingStatus.argtypes = [c_void_p, POINTER(c_uint32), POINTER(c_uint32)]
+        dll.HS_ClearAIBuffer.restype = c_bool
+        dll.HS_ClearAIBuffer.argtypes = [c_void_p]
+    except AttributeError:
+        debug("HSDAQ 函式庫不支援 HS_GetTotalSamplingStatus，無法比對設備端遺失的樣本")
+
+    # HS_SetAIAnalogTriggerParam（硬體類比觸發，無法設定時改用軟體觸發）
+    try:
+        dll.HS_SetAIAnalogTriggerParam.restype = c_bool
+        dll.HS_SetAIAnalogTriggerParam.argtypes = [c_void_p, c_int, POINTER(c_char), POINTER(c_float),
+                                                   POINTER(c_float), c_int, c_uint32, c_uint32, c_uint32]
+    except AttributeError:
+        debug("HSDAQ 函式庫不支援 HS_SetAIAnalogTriggerParam，觸發擷取將使用軟體觸發")
+
+    # HS_ReadAIALL（單點讀取所有通道，設備記錄模式的即時預覽使用）
+    try:
+        dll.HS_ReadAIALL.restype = c_bool
+        dll.HS_ReadAIALL.argtypes = [c_void_p, c_int, POINTER(c_float), c_int]
+    except AttributeError:
+        debug("HSDAQ 函式庫不支援 HS_ReadAIALL，設備記錄模式將沒有即時預覽")
+
+    # 資料記錄器與記錄檔讀取（設備記錄模式，舊版函式庫可能沒有）
+    try:
+        dll.HS_StartLogger.restype = c_bool
+        dll.HS_StartLogger.argtypes = [c_void_p, c_char_p, c_int, c_int]
+        dll.HS_StopLogger.restype = c_bool
+        dll.HS_StopLogger.argtypes = [c_void_p]
+        dll.HS_GetAllLogFiles.restype = c_int
+        dll.HS_GetAllLogFiles.argtypes = [c_char_p, c_int]
+        dll.HS_LogFile_Open_byIndex.restype = c_void_p
+        dll.HS_LogFile_Open_byIndex.argtypes = [c_int, c_char_p]
+        dll.HS_LogFile_Open.restype = c_void_p
+        dll.HS_LogFile_Open.argtypes = [c_char_p]
+        dll.HS_LogFile_Close.restype = c_bool
+        dll.HS_LogFile_Close.argtypes = [c_void_p]
+        dll.HS_GetLogFile_AIScanConfigInfo.restype = c_bool
+        dll.HS_GetLogFile_AIScanConfigInfo.argtypes = [c_void_p, POINTER(c_short), POINTER(c_short), POINTER(c_short),
+                                                       POINTER(c_long), POINTER(c_short), POINTER(c_short)]
+        dll.HS_GetLogFile_AIScanSampleInfo.restype = c_bool
+        dll.HS_GetLogFile_AIScanSampleInfo.argtypes = [c_void_p, POINTER(c_uint32), c_char_p, c_char_p]
+        dll.HS_GetLogFile_AIData.restype = c_ulong
+        dll.HS_GetLogFile_AIData.argtypes = [c_void_p, c_int, c_ulong, POINTER(c_float)]
+    except AttributeError:
+        debug("HSDAQ 函式庫不支援資料記錄器，無法使用 capture_mode = device_log")
+
+    # 同步輸入（AI 與 DI / 計數器時間對齊，舊版函式庫可能沒有）
+    try:
+        dll.HS_SetSyncInScanParam.restype = c_bool
+        dll.HS_SetSyncInScanParam.argtypes = [c_void_p, c_uint32, POINTER(c_ushort), POINTER(c_ushort), c_ushort,
+                                              c_uint32, c_uint32]
+        dll.HS_GetSyncInBufferLV.restype = c_uint32
+        dll.HS_GetSyncInBufferLV.argtypes = [c_void_p, POINTER(c_uint32), POINTER(c_uint32), POINTER(c_ubyte),
+                                             POINTER(c_ubyte), POINTER(c_uint32), POINTER(c_uint32),
+                                             POINTER(c_uint32), POINTER(c_uint32), c_uint32]
+        dll.HS_GetSyncInBufferStatus.restype = c_bool
+        dll.HS_GetSyncInBufferStatus.argtypes = [c_void_p, POINTER(c_ushort), POINTER(c_uint32)]
+        dll.HS_ClearSyncInBuffer.restype = c_bool
+        dll.HS_ClearSyncInBuffer.argtypes = [c_void_p]
+        dll.HS_GetSyncInTotalSamplingStatus.restype = c_bool
+        dll.HS_GetSyncInTotalSamplingStatus.argtypes = [c_void_p, POINTER(c_uint32), POINTER(c_uint32)]
+    except AttributeError:
+        debug("HSDAQ 函式庫不支援同步輸入，無法使用 sync_in = 1")
+
+    # HS_GetLastError
+    dll.HS_GetLastError.restype = c_ulong
+    dll.HS_GetLastError.argtypes = []
+
+
+def arch_dirs(machine: Optional[str] = None) -> Tuple[str, ...]:
+    """依 platform.machine() 決定函式庫目錄（未知架構時使用 LinuxArm64）"""
+    machine = (machine or platform.machine()).lower()
+    dirs = ARCH_DIRS.get(machine, ('LinuxArm64',))
+    if 'LinuxJetArm64' in dirs and os.path.exists(JETSON_RELEASE_FILE):
+        dirs = ('LinuxJetArm64',) + tuple(d for d in dirs if d != 'LinuxJetArm64')
+    return dirs
+
+
+def candidate_paths(machine: Optional[str] = None) -> List[str]:
+    """函式庫候選路徑（依搜尋順序：環境變數、src/include、官方範例、系統目錄、工作目錄）"""
+    paths = []
+    override = os.environ.get(HSDAQ_LIB_ENV)
+    if override:
+        paths.append(os.path.abspath(override))
+    for arch in arch_dirs(machine):
+        paths.append(os.path.join(SCRIPT_DIR, 'include', 'hsdaq', arch, HSDAQ_LIB_NAME))
+    for arch in arch_dirs(machine):
+        for demo in SDK_DEMO_NAMES:
+            paths.append(os.path.join(SDK_DEMO_DIR, arch, demo, HSDAQ_LIB_NAME))
+    paths.append(os.path.join('/usr/local/lib', HSDAQ_LIB_NAME))
+    paths.append(os.path.join('/usr/lib', HSDAQ_LIB_NAME))
+    paths.append(os.path.abspath(HSDAQ_LIB_NAME))
+    return paths
+
+
+def load_hsdaq():
+    """
+    載入 libhsdaq.so（同一行程只載入一次；失敗時拋出 RuntimeError，不結束程式）
+
+    依 candidate_paths() 的順序嘗試存在的檔案，第一個可載入的函式庫與其函數簽名會被快取，
+    之後所有設備共用同一個 handle。
+    """
+    global _hsdaq_dll, _hsdaq_path, _hsdaq_load_ms
+    if _hsdaq_dll is not None:
+        return _hsdaq_dll
+
+    with _load_lock:
+        if _hsdaq_dll is not None:
+            return _hsdaq_dll
+
+        start = time.perf_counter()
+        failures = []
+        for path in candidate_paths():
+            if not os.path.isfile(path):
+                continue
+            try:
+                dll = CDLL(path)
+            except OSError as e:
+                warning(f"無法載入 HSDAQ 函式庫 {path}: {e}")
+                failures.append(str(e))
+                continue
+            _setup_function_signatures(dll)
+            _hsdaq_load_ms = (time.perf_counter() - start) * 1000
+            _hsdaq_path = path
+            _hsdaq_dll = dll
+            info(f"成功載入 HSDAQ 函式庫: {path}（{_hsdaq_load_ms:.1f} ms）")
+            return dll
+
+        if not failures:
+            error(f"無法找到 {HSDAQ_LIB_NAME} 函式庫（系統架構：{platform.machine()}）")
+            info("已搜尋的路徑：")
+            for path in candidate_paths():
+                info(f"  {path}")
+            info(f"可設定環境變數 {HSDAQ_LIB_ENV} 指定函式庫路徑")
+            raise RuntimeError(f"無法找到 {HSDAQ_LIB_NAME} 函式庫")
+
+        error_msg = failures[-1]
+        error(f"無法載入 HSDAQ 函式庫: {error_msg}")
+
+        # 檢查是否是架構不匹配的問題
+        if any("invalid ELF header" in msg or "wrong ELF class" in msg for msg in failures):
+            error("\n函式庫架構不匹配！")
+            error(f"系統架構：{platform.machine()}（搜尋目錄：{', '.join(arch_dirs())}）")
+            error("找到的函式庫與系統架構不同")
+            info("\n可能的解決方案：")
+            info("  1. 從 ICP-DAS 官方取得對應架構的 libhsdaq.so")
+            info("  2. 或使用靜態庫 libhsdaq.a 重新編譯")
+            info("  3. 或聯繫 ICP-DAS 技術支援取得正確版本的函式庫")
+            info(f"  4. 沒有硬體時可設定 backend = simulated（或環境變數 {BACKEND_ENV}=simulated）")
+
+        raise RuntimeError(f"無法載入 HSDAQ 函式庫: {error_msg}")
+
+
+def get_load_stats() -> dict:
+    """HSDAQ 函式庫載入狀態（未初始化 hsdaq 設備前不會載入）"""
+    return {
+        'loaded': _hsdaq_dll is not None,
+        'path': _hsdaq_path,
+        'load_ms': round(_hsdaq_load_ms, 3) if _hsdaq_load_ms is not None else None,
+    }
+
+
+def resolve_backend_name(configured: str) -> str:
+    """決定實際使用的後端名稱（環境變數優先）"""
+    name = os.environ.get(BACKEND_ENV) or configured or "hsdaq"
+    name = name.strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"不支援的 backend: {name}（可用值: {', '.join(BACKENDS)}）")
+    return name
+
+
+def create_backend(name: str, options: Optional[Dict[str, str]] = None):
+    """
+    建立 HSDAQ 後端
+
+    Args:
+        name: 後端名稱（hsdaq / simulated）
+        options: 模擬設備參數（設定檔中 sim_ 開頭的鍵，僅 simulated 使用）
+
+    Returns:
+        提供 HS_* 函數的物件（ctypes CDLL 或 SimulatedHSDAQ）
+    """
+    if name == "simulated":
+        # 延後匯入：只有使用模擬設備時才需要
+        from simulated_daq import SimulatedHSDAQ
+        return SimulatedHSDAQ(options or {})
+    return load_hsdaq()
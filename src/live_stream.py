@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+即時資料推送模組
+
+此模組負責將降頻後的即時資料分送給網頁用戶端（每台設備一個 LiveStream），支援：
+- 共用環形緩衝區：網頁執行緒降頻後呼叫 publish()，資料段只放入一次（最多 RING_CHUNKS 段），所有用戶端共用
+- 每個用戶端一個游標（已讀取到的原始 frame 累計數），讀取不會移除資料，多個瀏覽器分頁與牆面顯示器各自看到完整的訊號
+- 落後的用戶端：游標早於環形緩衝區最舊的資料段時從最舊的資料段繼續，回傳略過的原始 frame 數（不影響其他用戶端）
+- 推送用戶端（/stream）：publish() 時立即被喚醒；持續落後超過 CLIENT_STALL_TIMEOUT 秒時中斷連線
+- 輪詢（/data?since=<游標>）：游標由用戶端保存，伺服器不需為輪詢用戶端保留狀態；
+  未指定 since 的輪詢共用一個伺服器端游標（舊版用戶端）
+- 沒有推送用戶端且超過閒置時間沒有輪詢時 active() 為 False，網頁游標不接收區塊（不降頻、不持有讀取緩衝區）
+"""
+
+import time
+import threading
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# 共用環形緩衝區保留的資料段數（每個區塊一段，約數秒的資料；超過時丟棄最舊的資料段）
+RING_CHUNKS = 256
+
+# 推送用戶端持續落後（游標早於最舊的資料段）超過此時間（秒）時中斷連線
+CLIENT_STALL_TIMEOUT = 10.0
+
+
+class LiveChunk:
+    """一段降頻後的資料（values 為依 frame 交錯排列的一維陣列，同一段資料由所有用戶端共用，不可修改）"""
+
+    __slots__ = ('seq', 'values', 'frames', 'start_index', 'offset')
+
+    def __init__(self, seq: int, values: np.ndarray, frames: int, start_index: int = 0, offset: int = 0):
+        self.seq = seq
+        self.values = values
+        self.frames = frames  # 這段資料涵蓋的原始 frame 數
+        self.start_index = start_index  # 第一個區間起點的原始 frame 序號
+        self.offset = offset  # 這段資料之前已放入的原始 frame 累計數（用戶端游標的單位）
+
+    @property
+    def end(self) -> int:
+        """讀取這段資料後的游標"""
+        return self.offset + self.frames
+
+
+class LiveClient:
+    """一個網頁用戶端的游標（推送用戶端在連線期間持續接收；共用的輪詢游標只在最近輪詢過時接收）"""
+
+    def __init__(self, name: str, cursor: int, polling: bool):
+        self.name = name
+        self.polling = polling
+        self.cursor = cursor
+        self.closed = False
+        self.connected_at = time.time()
+        self.last_read = float('-inf')
+        self.sent_chunks = 0
+        self.skipped_frames = 0
+        self._lagging_since: Optional[float] = None
+
+
+class LiveStream:
+    """單一設備的即時資料分送（寫入端為網頁執行緒，讀取端為 Flask 請求執行緒）"""
+
+    def __init__(self, device_id: str, idle_timeout: float, capacity: int = RING_CHUNKS,
+                 stall_timeout: float = CLIENT_STALL_TIMEOUT):
+        """
+        初始化即時資料分送
+
+        Args:
+            device_id: 設備識別碼
+            idle_timeout: 超過此時間（秒）沒有輪詢且沒有推送用戶端時不再接收資料
+            capacity: 共用環形緩衝區保留的資料段數
+            stall_timeout: 推送用戶端持續落後超過此時間（秒）時中斷連線
+        """
+        self.device_id = device_id
+        self.idle_timeout = idle_timeout
+        self.stall_timeout = stall_timeout
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._ring: deque = deque(maxlen=capacity)
+        self._clients: List[LiveClient] = []
+        self._seq = 0
+        self._total_frames = 0
+        self._last_poll = float('-inf')
+        self.published = 0
+        self.polls = 0
+        self.poll_skipped_frames = 0
+        self.disconnected = 0
+        self.closed = False
+        # 未指定 since 的 /data 輪詢共用的游標（不計入推送用戶端）
+        self.poll_client = LiveClient("poll", 0, polling=True)
+
+    def subscribe(self, name: str) -> LiveClient:
+        """新增推送用戶端（從最新的資料開始；離線時必須呼叫 unsubscribe()；收集結束後新增的用戶端直接為中斷狀態）"""
+        with self._lock:
+            client = LiveClient(name, self._total_frames, polling=False)
+            if self.closed:
+                client.closed = True
+            else:
+                self._clients.append(client)
+            return client
+
+    def unsubscribe(self, client: LiveClient) -> None:
+        """移除推送用戶端"""
+        with self._lock:
+            client.closed = True
+            if client in self._clients:
+                self._clients.remove(client)
+            self._ready.notify_all()
+
+    def active(self) -> bool:
+        """是否有用戶端需要資料（推送用戶端已連線，或最近輪詢過）"""
+        return bool(self._clients) or time.monotonic() - self._last_poll < self.idle_timeout
+
+    def publish(self, values: np.ndarray, frames: int, start_index: int = 0) -> None:
+        """分送一段降頻後的資料（呼叫後不可再修改 values；start_index 為第一個區間起點的原始 frame 序號）"""
+        now = time.monotonic()
+        with self._lock:
+            self._seq += 1
+            self.published += 1
+            self._ring.append(LiveChunk(self._seq, values, frames, start_index, self._total_frames))
+            self._total_frames += frames
+
+            # 落後的推送用戶端（游標早於最舊的資料段）：持續落後超過 stall_timeout 時中斷連線（推送執行緒醒來後結束回應）
+            oldest = self._ring[0].offset
+            for client in list(self._clients):
+                if client.cursor >= oldest:
+                    client._lagging_since = None
+                elif client._lagging_since is None:
+                    client._lagging_since = now
+                elif now - client._lagging_since > self.stall_timeout:
+                    client.closed = True
+                    self._clients.remove(client)
+                    self.disconnected += 1
+            self._ready.notify_all()
+
+    def _read(self, cursor: int) -> Tuple[List[LiveChunk], int, int]:
+        """游標之後的資料段（呼叫者持有鎖），回傳 (資料段, 新游標, 略過的原始 frame 數)"""
+        chunks = []
+        # 用戶端通常只落後幾段，從最新的資料段往回找
+        for chunk in reversed(self._ring):
+            if chunk.offset < cursor:
+                break
+            chunks.append(chunk)
+        if not chunks:
+            # 游標超過最新的資料（收集重新開始後的舊游標）時從最新的資料繼續
+            return [], min(cursor, self._total_frames), 0
+        chunks.reverse()
+        return chunks, chunks[-1].end, max(0, chunks[0].offset - cursor)
+
+    def read(self, since: Optional[int]) -> Tuple[List[LiveChunk], int, int]:
+        """
+        輪詢讀取游標 since 之後的資料段（不移除資料；游標由用戶端保存）
+
+        since < 0 時從最新的資料開始；since 為 None 時使用共用的伺服器端游標（閒置超過 idle_timeout 後
+        從最新的資料開始）。回傳 (資料段, 下一次輪詢的游標, 略過的原始 frame 數)。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._last_poll = now
+            self.polls += 1
+            client = self.poll_client if since is None else None
+            if client is not None:
+                since = client.cursor if now - client.last_read < self.idle_timeout else -1
+                client.last_read = now
+            if since < 0:
+                since = self._total_frames
+            chunks, cursor, skipped = self._read(since)
+            self.poll_skipped_frames += skipped
+            if client is not None:
+                client.cursor = cursor
+                client.sent_chunks += len(chunks)
+                client.skipped_frames += skipped
+            return chunks, cursor, skipped
+
+    def take(self, client: LiveClient, timeout: Optional[float] = None) -> Tuple[List[LiveChunk], int]:
+        """
+        推送用戶端讀取游標之後的所有資料段，回傳 (資料段, 略過的原始 frame 數)
+
+        timeout 為 None 時不等待；否則等待到有資料、用戶端被中斷或逾時（逾時回傳空串列）。
+        """
+        with self._lock:
+            if timeout is not None and client.cursor >= self._total_frames and not client.closed:
+                self._ready.wait(timeout)
+            chunks, client.cursor, skipped = self._read(client.cursor)
+            client.last_read = time.monotonic()
+            client._lagging_since = None
+            client.sent_chunks += len(chunks)
+            client.skipped_frames += skipped
+            return chunks, skipped
+
+    def close(self) -> None:
+        """中斷所有推送用戶端（停止收集時呼叫；輪詢仍可讀取環形緩衝區內剩餘的資料）"""
+        with self._lock:
+            self.closed = True
+            for client in self._clients:
+                client.closed = True
+            self._clients.clear()
+            self._ready.notify_all()
+
+    def get_stats(self) -> dict:
+        """共用環形緩衝區與各推送用戶端的游標、已送出與略過的資料量"""
+        with self._lock:
+            now = time.time()
+            oldest = self._ring[0].offset if self._ring else self._total_frames
+            return {
+                'published': self.published,
+                'cursor': self._total_frames,
+                'ring_chunks': len(self._ring),
+                'ring_capacity': self._ring.maxlen,
+                'ring_bytes': sum(chunk.values.nbytes for chunk in self._ring),
+                'ring_frames': self._total_frames - oldest,
+                'polls': self.polls,
+                'poll_skipped_frames': self.poll_skipped_frames,
+                'disconnected': self.disconnected,
+                'clients': [
+                    {
+                        'name': client.name,
+                        'connected_s': round(now - client.connected_at, 1),
+                        'behind_frames': self._total_frames - client.cursor,
+                        'sent': client.sent_chunks,
+                        'skipped_frames': client.skipped_frames,
+                    }
+                    for client in self._clients
+                ],
+            }
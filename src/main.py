@@ -10,26 +10,43 @@ PET-7H24M 即時資料可視化系統 - 主控制程式
 - CSV 自動儲存（根據設定檔自動分檔儲存資料）
 - SQL 資料庫上傳（可選的 MySQL/MariaDB 上傳功能）
 - 設定檔管理（透過 Web 介面編輯 PET-7H24M.ini、csv.ini、sql.ini）
-- 多執行緒架構（5 個獨立執行緒：Flask、DAQ Reading、Collection、CSV Writer、SQL Writer）
-- 執行緒安全通訊（使用 queue.Queue 進行執行緒間通訊）
-- 降頻佇列架構（web_data_queue 存儲降頻後的資料供前端使用）
+- 多執行緒架構（Flask、Collection，以及每台設備各自的 DAQ Reading、CSV Writer、SQL Writer）
+- 多設備採集（DeviceManager 管理 PET-7H24M.ini 中的多個設備區段，區塊標記 device_id 後依設備分流）
+- 收集工作（AcquisitionSession 擁有設備、輸出與收集執行緒；使用不同設備區段的工作可同時執行）
+- 執行緒安全通訊（使用以位元組限制的 ByteQueue 進行執行緒間通訊）
+- 區塊環形緩衝區（每台設備的網頁執行緒降頻後推送給網頁用戶端，前端以 device 參數切換）
+- 即時資料推送（降頻後的資料段放入共用環形緩衝區，/stream 以 Server-Sent Events 在區塊到達時推送；每個用戶端一個游標，落後時回報略過的樣本數，慢速用戶端被中斷；/data?since= 輪詢保留為備用）
+- 二進位資料框（/stream 與 /data 的 ?format=f32 / i16：固定標頭 + float32 / int16 值，前端直接以 Float32Array 解碼；未指定時為 JSON）
+- 近期資料縮放檢視（/history 從歷史資料金字塔選擇適當的層，不需重新讀取 CSV 檔案）
+- NumPy 區塊管線（各佇列傳遞唯讀 float32 區塊，消費者共用同一份資料不複製）
+- 緩衝區池歸還（CSV/SQL 消費者處理完區塊後 release()，緩衝區回到讀取端重複使用）
+- 原始整數模式（區塊保持 int32/int16，僅網頁顯示、CSV 文字與 SQL 需要時才向量化轉換為電壓）
+- 觸發擷取（capture_mode = hw_trigger / sw_trigger 時只寫入事件視窗，網頁仍顯示連續資料）
+- 設備記錄模式（capture_mode = device_log 由函式庫寫入記錄檔，網頁顯示低速預覽，記錄檔於背景匯入為相同格式的輸出）
+- 快速啟動（HTTP 伺服器先開始監聽，libhsdaq.so 延後到第一次初始化設備時才載入；冷啟動時間記錄於 /status）
 """
 
 import os
 import sys
+import json
 import time
+
+# 冷啟動計時起點（量測模組匯入與 HTTP 就緒時間）
+PROCESS_START = time.perf_counter()
+
 import threading
-import queue
 import configparser
 import argparse
-import csv
+import numpy as np
 import logging
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from pet7h24m import PET7H24M
-from csv_writer import CSVWriter
-from sql_uploader import SQLUploader
+from datetime import datetime
+from typing import Optional, Dict, List, Set, Tuple
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from werkzeug.serving import make_server
+from acquisition_session import AcquisitionSession, DEVICE_INI, load_output_settings
+from device_manager import find_device_sections
+from hsdaq_backend import BACKENDS, BACKEND_ENV, get_load_stats
+from wire_format import MIMETYPE, encode_chunks, encode_json, parse_wire_format
 
 try:
     from logger import info, debug, error, warning
@@ -51,80 +68,63 @@ app = Flask(__name__, template_folder=template_dir)
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
+# 模組匯入完成（不含任何設備 I/O 與 libhsdaq.so 載入）
+IMPORT_DONE = time.perf_counter()
+
 # ==========================================
-# 全域變數與資料結構 (優化核心)
+# 收集工作
 # ==========================================
 
-# 1. 網頁顯示專用佇列 (Web Visualization Queue)
-web_data_queue: "queue.Queue[List[float]]" = queue.Queue(maxsize=50000)
+# 冷啟動時間（毫秒，以 PROCESS_START 為起點）：import_ms = 模組匯入，http_ready_ms = HTTP 伺服器開始監聽
+startup_stats: Dict[str, Optional[float]] = {
+    'import_ms': round((IMPORT_DONE - PROCESS_START) * 1000, 3),
+    'http_ready_ms': None,
+}
 
-# 2. 降頻比例 (Downsampling Ratio)
-WEB_DOWNSAMPLE_RATIO = 25
+# 收集工作（以工作識別碼為鍵，依啟動順序）：每個工作擁有自己的設備、輸出與收集執行緒，
+# 使用不同設備區段的工作可同時執行；已停止的工作保留到下一次 /start，網頁仍可取出剩餘資料與統計
+# sessions 的新增與移除都必須持有 sessions_lock，網頁路由以 _session_items() 取得快照後再讀取
+sessions: Dict[str, AcquisitionSession] = {}
+sessions_lock = threading.Lock()
+# /start 建立與啟動工作期間（不持有 sessions_lock）保留的設備區段，避免兩個請求同時啟動同一台設備
+starting_sections: Set[str] = set()
 
-# 3. 資料流佇列 (Raw Data Queues)
-csv_data_queue: "queue.Queue[List[float]]" = queue.Queue(maxsize=50000)
-sql_data_queue: "queue.Queue[List[float]]" = queue.Queue(maxsize=50000)
+# /history 未指定時間範圍時的秒數與點數上限
+HISTORY_DEFAULT_SECONDS = 60
+HISTORY_MAX_POINTS = 20000
 
-# 4. 控制旗標與物件
-is_collecting = False
-data_lock = threading.Lock()
+# /stream 沒有新資料時送出註解行的間隔（秒，讓代理伺服器與瀏覽器保持連線）
+STREAM_KEEPALIVE = 15.0
 
-collection_thread: Optional[threading.Thread] = None
-csv_writer_thread: Optional[threading.Thread] = None
-sql_writer_thread: Optional[threading.Thread] = None
 
-daq_instance: Optional[PET7H24M] = None
-csv_writer_instance: Optional[CSVWriter] = None
-sql_uploader_instance: Optional[SQLUploader] = None
+def _session_items() -> List[Tuple[str, AcquisitionSession]]:
+    """收集工作的快照（依啟動順序；/start 可能同時新增或移除工作）"""
+    with sessions_lock:
+        return list(sessions.items())
 
-data_counter = 0
-collection_start_time: Optional[datetime] = None
-current_sample_rate: int = 12800
 
-target_size = 0
-current_data_size = 0
-sql_target_size = 0
-sql_current_data_size = 0
-sql_enabled = False
-sql_config: Dict[str, str] = {}
-sql_upload_interval = 0
-sql_temp_dir = None
-sql_current_temp_file = None
-sql_temp_file_lock = threading.Lock()
-sql_sample_count = 0
-sql_start_time: Optional[datetime] = None
-channels = 2  # 預設通道數，會在啟動時從 DAQ 取得
+def _is_collecting(items: Optional[List[Tuple[str, AcquisitionSession]]] = None) -> bool:
+    """是否有收集工作正在執行（items 為 _session_items() 的快照，None = 重新取得）"""
+    items = _session_items() if items is None else items
+    return any(session.running for _, session in items)
 
 
-# ==========================================
-# 核心邏輯：資料更新與處理
-# ==========================================
+def _device_sessions(items: Optional[List[Tuple[str, AcquisitionSession]]] = None) -> Dict[str, AcquisitionSession]:
+    """各設備所屬的收集工作（同一設備出現在多個工作時以最後啟動的為準）"""
+    items = _session_items() if items is None else items
+    owners = {}
+    for _, session in items:
+        for device_id in session.get_device_ids():
+            owners[device_id] = session
+    return owners
 
-def update_realtime_data(data: List[float]) -> None:
-    """更新即時資料（針對 Web 顯示進行降頻處理）"""
-    global web_data_queue, WEB_DOWNSAMPLE_RATIO, data_counter
 
-    if web_data_queue.full():
-        try:
-            for _ in range(10):
-                web_data_queue.get_nowait()
-        except queue.Empty:
-            pass
-
-    # 根據通道數進行降頻處理
-    step = channels * WEB_DOWNSAMPLE_RATIO
-    
-    downsampled_chunk = []
-    
-    for i in range(0, len(data), step):
-        if i + channels <= len(data):
-            downsampled_chunk.extend(data[i : i + channels])
-
-    if downsampled_chunk:
-        with data_lock:
-            web_data_queue.put(downsampled_chunk)
-            
-    data_counter += len(data)
+def _merge_device_stats(getter, items: List[Tuple[str, AcquisitionSession]]) -> Dict[str, dict]:
+    """合併各收集工作以 device_id 為鍵的統計"""
+    merged = {}
+    for _, session in items:
+        merged.update(getter(session))
+    return merged
 
 
 # Flask 路由
@@ -138,40 +138,232 @@ def files_page():
 
 @app.route('/data')
 def get_data():
-    """前端輪詢 API"""
-    global web_data_queue, current_sample_rate, is_collecting, data_counter, collection_start_time
-
-    new_data = []
-    with data_lock:
-        while not web_data_queue.empty():
-            try:
-                chunk = web_data_queue.get_nowait()
-                new_data.extend(chunk)
-            except queue.Empty:
-                break
-    
+    """
+    前端輪詢 API（?device=<id> 指定設備，未指定時回傳第一台設備的資料）
+
+    ?since=<游標> 回傳該游標之後的資料（不移除資料，多個瀏覽器各自保存回應中的 cursor，互不影響；
+    -1 = 從最新的資料開始），skipped 為游標落後超過共用環形緩衝區而略過的原始 frame 數。
+    未指定 since 時使用共用的伺服器端游標。
+
+    ?format=f32 / i16 時回傳二進位資料框：第一個為 JSON 資料框（與 JSON 回應相同但不含 data），
+    之後為資料框（frame 序號連續的資料段合併為一個）。
+    """
+    try:
+        kind = parse_wire_format(request.args.get('format'))
+        since = request.args.get('since')
+        since = int(since) if since not in (None, '') else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    owners = _device_sessions()
+    device_ids = list(owners.keys())
+    device_id = request.args.get('device') or (device_ids[0] if device_ids else None)
+    session = owners.get(device_id)
+    if device_id and session is None:
+        return jsonify({'success': False, 'message': f'未知的設備: {device_id}', 'devices': device_ids})
+    sink = session.sinks[device_id] if session else None
+
     response_data = {
         "success": True,
-        "data": new_data,
-        "counter": data_counter,
-        "sample_rate": current_sample_rate,
-        "is_collecting": is_collecting
+        "counter": sink.data_counter if sink else 0,
+        "sample_rate": sink.sample_rate if sink else 0,
+        "decimation": sink.web_ratio if sink else 0,
+        "channels": len(sink.column_names) if sink else 0,
+        "ai_channels": sink.channels if sink else 0,
+        "channel_names": sink.column_names if sink else [],
+        "device": device_id,
+        "devices": device_ids,
+        "is_collecting": session.running if session else _is_collecting(),
+        "link_state": session.link_state(device_id) if session else None
     }
 
-    if collection_start_time:
-        response_data["start_time"] = collection_start_time.isoformat()
+    if session and session.start_time:
+        response_data["start_time"] = session.start_time.isoformat()
+
+    chunks, cursor, skipped = sink.read_web_chunks(since) if sink else ([], 0, 0)
+    response_data["cursor"] = cursor
+    response_data["skipped"] = skipped
+
+    if kind is None:
+        response_data["data"] = np.concatenate([chunk.values for chunk in chunks]).tolist() if chunks else []
+        return jsonify(response_data)
+
+    frames = [encode_json(response_data)]
+    if sink:
+        frames += encode_chunks(kind, chunks, len(sink.column_names), sink.web_ratio, skipped)
+    return Response(b''.join(frames), mimetype=MIMETYPE, headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/stream')
+def stream_data():
+    """
+    即時資料推送（Server-Sent Events，?device=<id>）
 
+    連線後先送出 meta 事件（通道、取樣率、降頻比例），之後每當網頁執行緒降頻完成就送出一個資料事件：
+    data 為這段期間所有資料段依 frame 交錯排列的值，skipped 為此用戶端的游標落後超過共用環形緩衝區而略過的原始 frame 數。
+
+    ?format=f32 / i16 時改為連續的二進位資料框（application/octet-stream）：第一個為 meta JSON 資料框，
+    之後為資料框（每次喚醒時取出的連續資料段合併為一個），計數與連線狀態改變時送出 status JSON 資料框
+    （閒置時也作為保持連線）。
+    """
+    try:
+        kind = parse_wire_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    owners = _device_sessions()
+    device_ids = list(owners.keys())
+    device_id = request.args.get('device') or (device_ids[0] if device_ids else None)
+    session = owners.get(device_id)
+    if session is None or not session.running:
+        return jsonify({'success': False, 'message': f'設備沒有在收集資料: {device_id}', 'devices': device_ids}), 404
+    sink = session.sinks[device_id]
+    live = sink.live
+    client = live.subscribe(request.remote_addr or 'stream')
+    meta = {
+        'device': device_id,
+        'devices': device_ids,
+        'sample_rate': sink.sample_rate,
+        'decimation': sink.web_ratio,
+        'channels': len(sink.column_names),
+        'ai_channels': sink.channels,
+        'channel_names': sink.column_names,
+        'start_time': session.start_time.isoformat() if session.start_time else None,
+    }
+
+    def generate():
+        try:
+            yield f"event: meta\ndata: {json.dumps(meta)}\n\n"
+            while not client.closed:
+                chunks, skipped = live.take(client, timeout=STREAM_KEEPALIVE)
+                if not chunks:
+                    if not client.closed:
+                        yield ": keepalive\n\n"
+                    continue
+                values = chunks[0].values if len(chunks) == 1 else np.concatenate([chunk.values for chunk in chunks])
+                payload = {
+                    'seq': chunks[-1].seq,
+                    'data': values.tolist(),
+                    'counter': sink.data_counter,
+                    'skipped': skipped,
+                    'link_state': session.link_state(device_id),
+                }
+                yield f"data: {json.dumps(payload)}\n\n"
+        finally:
+            live.unsubscribe(client)
+
+    def generate_frames():
+        try:
+            meta['event'] = 'meta'
+            yield encode_json(meta)
+            columns = meta['channels']
+            status = None
+            status_time = 0.0
+            while not client.closed:
+                chunks, skipped = live.take(client, timeout=STREAM_KEEPALIVE)
+                frames = encode_chunks(kind, chunks, columns, sink.web_ratio, skipped)
+                # 計數每秒更新一次；連線狀態改變或閒置時立即送出
+                link_state = session.link_state(device_id)
+                now = time.monotonic()
+                if not chunks or link_state != status or now - status_time >= 1.0:
+                    status, status_time = link_state, now
+                    frames.append(encode_json({'event': 'status', 'counter': sink.data_counter,
+                                               'link_state': link_state}))
+                if not client.closed:
+                    yield b''.join(frames)
+        finally:
+            live.unsubscribe(client)
+
+    if kind is not None:
+        return Response(generate_frames(), mimetype=MIMETYPE,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _json_values(values: np.ndarray) -> list:
+    """NumPy 陣列轉為 JSON 串列（NaN = 缺漏，轉為 null）"""
+    flat = values.ravel()
+    result = flat.astype(object)
+    result[np.isnan(flat)] = None
+    return result.tolist()
+
+
+@app.route('/history')
+def get_history():
+    """
+    近期資料縮放檢視（?device=<id>&t0=&t1=&points=）
+
+    t0 / t1 為系統時間（秒，t1 預設為現在）；t0 <= 0 表示相對於 t1 的秒數（預設 -60）。
+    回傳最多 points 個區間，每個區間為各通道的最小值（min）與最大值（max），依 frame 交錯排列。
+    """
+    owners = _device_sessions()
+    device_ids = list(owners.keys())
+    device_id = request.args.get('device') or (device_ids[0] if device_ids else None)
+    session = owners.get(device_id)
+    if session is None:
+        return jsonify({'success': False, 'message': f'未知的設備: {device_id}', 'devices': device_ids})
+    history = session.sinks[device_id].history
+    if history is None:
+        return jsonify({'success': False, 'message': '歷史資料未啟用（history_buckets = 0）'})
+
+    try:
+        t1 = float(request.args.get('t1') or time.time())
+        t0 = float(request.args.get('t0') or -HISTORY_DEFAULT_SECONDS)
+        points = int(request.args.get('points') or 1000)
+    except ValueError:
+        return jsonify({'success': False, 'message': 't0 / t1 / points 必須為數字'})
+    if t0 <= 0:
+        t0 = t1 + t0
+    points = max(1, min(points, HISTORY_MAX_POINTS))
+
+    response_data = {
+        'success': True,
+        'device': device_id,
+        't0': t0,
+        't1': t1,
+        'channels': history.channels,
+        'channel_names': [f'Channel_{i + 1}' for i in range(history.channels)],
+    }
+    result = history.query(t0, t1, points)
+    if result is None:
+        response_data.update({'start': t0, 'step': 0, 'level': 0, 'group': 0, 'buckets': 0, 'min': [], 'max': []})
+    else:
+        response_data.update(result)
+        response_data['min'] = _json_values(result['min'])
+        response_data['max'] = _json_values(result['max'])
     return jsonify(response_data)
 
 
 @app.route('/status')
 def get_status():
-    """檢查資料收集狀態（用於前端狀態恢復）"""
-    global is_collecting, data_counter
+    """檢查資料收集狀態（用於前端狀態恢復；各項統計以 device_id 為鍵，記憶體預算與工作資訊以工作識別碼為鍵）"""
+    items = _session_items()
+    owners = _device_sessions(items)
     return jsonify({
         'success': True,
-        'is_collecting': is_collecting,
-        'counter': data_counter
+        'is_collecting': _is_collecting(items),
+        'counter': sum(session.data_counter() for _, session in items),
+        'devices': {device_id: session.sinks[device_id].data_counter for device_id, session in owners.items()},
+        'sessions': {
+            session_id: {
+                'label': session.label,
+                'running': session.running,
+                'devices': session.get_device_ids(),
+                'sections': session.sections,
+                'start_time': session.start_time.isoformat() if session.start_time else None,
+                'output_dir': session.output_dir,
+            }
+            for session_id, session in items
+        },
+        'buffer_pool': _merge_device_stats(lambda session: session.manager.get_pool_stats(), items),
+        'reader': _merge_device_stats(lambda session: session.manager.get_reader_stats(), items),
+        'lost_samples': _merge_device_stats(AcquisitionSession.lost_samples, items),
+        'queues': _merge_device_stats(AcquisitionSession.queue_stats, items),
+        'trigger': _merge_device_stats(AcquisitionSession.trigger_stats, items),
+        'importer': _merge_device_stats(AcquisitionSession.importer_stats, items),
+        'live': _merge_device_stats(AcquisitionSession.live_stats, items),
+        'memory_budget': {session_id: session.manager.memory_budget.get_stats()
+                          for session_id, session in items},
+        'startup': dict(startup_stats, hsdaq=get_load_stats())
     })
 
 
@@ -248,6 +440,8 @@ def config():
             pet7h24m_config.set('PET7H24M', 'target_count', request.form.get('pet7h24m_target_count', '0'))
             pet7h24m_config.set('PET7H24M', 'data_trans_method', request.form.get('pet7h24m_data_trans_method', '0'))
             pet7h24m_config.set('PET7H24M', 'auto_run', request.form.get('pet7h24m_auto_run', '0'))
+            pet7h24m_config.set('PET7H24M', 'acquisition_mode', request.form.get('pet7h24m_acquisition_mode', 'float'))
+            pet7h24m_config.set('PET7H24M', 'raw_dtype', request.form.get('pet7h24m_raw_dtype', 'int32'))
 
             # 讀取 csv.ini 設定
             csv_config = configparser.ConfigParser()
@@ -256,6 +450,9 @@ def config():
                 csv_config.add_section('DumpUnit')
             
             csv_config.set('DumpUnit', 'second', request.form.get('csv_second', '60'))
+            if not csv_config.has_section('Output'):
+                csv_config.add_section('Output')
+            csv_config.set('Output', 'format', request.form.get('csv_format', 'csv'))
 
             # 讀取 sql.ini 設定
             sql_config = configparser.ConfigParser()
@@ -307,7 +504,9 @@ def config():
         'trigger_mode': pet7h24m_config.get('PET7H24M', 'trigger_mode', fallback='0'),
         'target_count': pet7h24m_config.get('PET7H24M', 'target_count', fallback='0'),
         'data_trans_method': pet7h24m_config.get('PET7H24M', 'data_trans_method', fallback='0'),
-        'auto_run': pet7h24m_config.get('PET7H24M', 'auto_run', fallback='0')
+        'auto_run': pet7h24m_config.get('PET7H24M', 'auto_run', fallback='0'),
+        'acquisition_mode': pet7h24m_config.get('PET7H24M', 'acquisition_mode', fallback='float'),
+        'raw_dtype': pet7h24m_config.get('PET7H24M', 'raw_dtype', fallback='int32')
     }
 
     # 讀取 csv.ini
@@ -318,7 +517,8 @@ def config():
         pass
     
     csv_data = {
-        'second': csv_config_parser.get('DumpUnit', 'second', fallback='60')
+        'second': csv_config_parser.get('DumpUnit', 'second', fallback='60'),
+        'format': csv_config_parser.get('Output', 'format', fallback='csv')
     }
 
     # 讀取 sql.ini
@@ -346,320 +546,117 @@ def config():
 
 @app.route('/start', methods=['POST'])
 def start_collection():
-    """啟動資料收集（DAQ、CSVWriter、SQLUploader 與即時顯示）"""
-    global is_collecting, collection_thread, daq_instance, csv_writer_instance
-    global target_size, current_data_size, realtime_data, data_counter
-    global sql_uploader_instance, sql_target_size, sql_current_data_size, sql_enabled, sql_config
-    global sql_upload_interval, sql_temp_dir, sql_current_temp_file
-    global sql_start_time, sql_sample_count, last_data_request_time
+    """
+    啟動資料收集工作（指定設備的 DAQ、CSVWriter、SQLUploader 與即時顯示）
 
-    if is_collecting:
-        return jsonify({'success': False, 'message': '資料收集已在執行中'})
+    JSON 參數 devices 為設備區段清單（未指定 = 所有啟用的區段）；
+    與執行中的工作使用不同設備時可同時啟動多個工作。
+    """
+    data = request.get_json(silent=True) or {}
+    label = data.get('label', '')
+    csv_enabled = data.get('csv_enabled', True)
+    sql_enabled = bool(data.get('sql_enabled', False))
 
-    try:
-        data = request.get_json()
-        label = data.get('label', '') if data else ''
-        csv_enabled = data.get('csv_enabled', True) if data else True
-        sql_enabled_request = data.get('sql_enabled', False) if data else False
-
-        if not label:
-            return jsonify({'success': False, 'message': '請提供資料標籤'})
-
-        # 至少需要啟用一個選項
-        if not csv_enabled and not sql_enabled_request:
-            return jsonify({'success': False, 'message': '請至少選擇一個儲存選項（CSV 或 SQL）'})
-
-        with data_lock:
-            with web_data_queue.mutex:
-                web_data_queue.queue.clear()
-            with csv_data_queue.mutex:
-                csv_data_queue.queue.clear()
-            with sql_data_queue.mutex:
-                sql_data_queue.queue.clear()
-                
-            data_counter = 0
-            current_data_size = 0
-            sql_current_data_size = 0
-            collection_start_time = datetime.now()
-            sql_sample_count = 0
-            sql_start_time = None
-
-        # 讀取 CSV 分檔間隔（從 csv.ini）
-        csv_ini_file_path = "API/csv.ini"
-        csv_config_parser = configparser.ConfigParser()
-        csv_config_parser.read(csv_ini_file_path, encoding='utf-8')
-        save_unit = csv_config_parser.getint('DumpUnit', 'second', fallback=60)
-
-        # 讀取 SQL 上傳間隔（從 sql.ini）
-        sql_ini_file_path = "API/sql.ini"
-        sql_config_parser = configparser.ConfigParser()
-        sql_config_parser.read(sql_ini_file_path, encoding='utf-8')
-        
-        # 讀取 SQL 上傳間隔
-        sql_upload_interval = sql_config_parser.getint('DumpUnit', 'second', fallback=60)
-        
-        sql_enabled_ini = False
-        sql_config_ini = {
-            'host': 'localhost',
-            'port': '3306',
-            'user': 'root',
-            'password': '',
-            'database': 'pet7h24m'
-        }
-        
-        if sql_config_parser.has_section('SQLServer'):
-            sql_enabled_ini = sql_config_parser.getboolean('SQLServer', 'enabled', fallback=False)
-            sql_config_ini['host'] = sql_config_parser.get('SQLServer', 'host', fallback='localhost')
-            sql_config_ini['port'] = sql_config_parser.get('SQLServer', 'port', fallback='3306')
-            sql_config_ini['user'] = sql_config_parser.get('SQLServer', 'user', fallback='root')
-            sql_config_ini['password'] = sql_config_parser.get('SQLServer', 'password', fallback='')
-            sql_config_ini['database'] = sql_config_parser.get('SQLServer', 'database', fallback='pet7h24m')
-
-        # 處理 SQL 設定（優先使用前端請求的設定）
-        if sql_enabled_request:
-            sql_enabled = True
-            sql_config = {
-                'host': data.get('sql_host', sql_config_ini['host']) if data else sql_config_ini['host'],
-                'port': data.get('sql_port', sql_config_ini['port']) if data else sql_config_ini['port'],
-                'user': data.get('sql_user', sql_config_ini['user']) if data else sql_config_ini['user'],
-                'password': data.get('sql_password', sql_config_ini['password']) if data else sql_config_ini['password'],
-                'database': data.get('sql_database', sql_config_ini['database']) if data else sql_config_ini['database']
-            }
-        else:
-            sql_enabled = False
-            sql_config = sql_config_ini.copy()
+    if not label:
+        return jsonify({'success': False, 'message': '請提供資料標籤'})
 
-        # 1. 初始化 DAQ 設備 (讀取 ini)
-        try:
-            # 確保這裡是使用 PET7H24M 類別
-            if daq_instance is None:
-                daq_instance = PET7H24M()
-            
-            # 這一步會讀取 ini 並計算 channel_mask
-            daq_instance.init_devices("API/PET-7H24M.ini")
-            
-            # 2. 動態獲取配置 (關鍵！)
-            sample_rate = daq_instance.get_sample_rate()
-            current_sample_rate = sample_rate
-            global channels
-            channels = daq_instance.get_active_channel_count()
-            
-            info(f"系統啟動參數: 通道數={channels}, 取樣率={sample_rate} Hz")
+    # 至少需要啟用一個選項
+    if not csv_enabled and not sql_enabled:
+        return jsonify({'success': False, 'message': '請至少選擇一個儲存選項（CSV 或 SQL）'})
 
-        except Exception as e:
-            error(f"設備初始化失敗: {e}")
-            is_collecting = False
-            return jsonify({'success': False, 'message': f'設備初始化失敗: {str(e)}'})
+    try:
+        sections = data.get('devices') or find_device_sections(DEVICE_INI)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'啟動失敗: {str(e)}'})
 
-        expected_samples_per_second = sample_rate * channels
-        target_size = save_unit * expected_samples_per_second
-        sql_target_size = sql_upload_interval * expected_samples_per_second
+    with sessions_lock:
+        overlap = sorted(set(sections) & starting_sections)
+        if overlap:
+            return jsonify({'success': False, 'message': f'資料收集正在啟動中: {", ".join(overlap)}'})
+        for session_id, session in sessions.items():
+            overlap = sorted(set(sections) & set(session.sections or []))
+            if not overlap:
+                continue
+            if session.running:
+                return jsonify({'success': False, 'message': f'資料收集已在執行中（{session_id}: {", ".join(overlap)}）'})
+            # 上一次的記錄檔仍在匯入時不啟動（避免兩個匯入器處理同一個記錄檔目錄）
+            busy = session.importing()
+            if busy:
+                return jsonify({'success': False, 'message': f'上一次的記錄檔仍在匯入中: {", ".join(busy)}'})
+
+        # 已停止且寫完剩餘資料的工作不再保留（歸還網頁游標尚未取出的區塊）；
+        # 仍在 finalize_upload 中寫入 CSV / SQL 的工作保留到下一次 /start，由 drain() 寫完並歸還區塊
+        pruned = [sessions.pop(sid) for sid, session in list(sessions.items())
+                  if not session.running and session.drained]
+        starting_sections.update(sections)
+
+    # 連線設備與啟動讀取行程可能需要數十秒，不持有 sessions_lock（/stop 與網頁輪詢不受影響）
+    try:
+        for session in pruned:
+            for sink in session.sinks.values():
+                sink.clear()
+
+        # SQL 連線設定優先使用前端請求的設定
+        outputs = load_output_settings(csv_enabled, sql_enabled, {
+            key: data[f'sql_{key}'] for key in ('host', 'port', 'user', 'password', 'database')
+            if f'sql_{key}' in data
+        })
 
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        folder = f"{timestamp}_{label}"
-        output_path = os.path.join(PROJECT_ROOT, "output", "PET-7H24M", folder)
-        
-        # 只有在啟用 CSV 或 SQL 時才建立資料夾
-        if csv_enabled or sql_enabled_request:
-            os.makedirs(output_path, exist_ok=True)
-
-        # 3. 根據通道數初始化 CSV Writer（如果啟用）
-        csv_writer_instance = None
-        if csv_enabled:
-            try:
-                # 這裡傳入動態計算的 channels
-                csv_writer_instance = CSVWriter(
-                    channels=channels,  # <--- 動態改變
-                    output_dir=output_path,
-                    label=label,
-                    sample_rate=sample_rate   # <--- 動態改變
-                )
-            except Exception as e:
-                error(f"CSV Writer 初始化失敗: {e}")
-                is_collecting = False
-                return jsonify({'success': False, 'message': f'CSV Writer 初始化失敗: {str(e)}'})
-
-        # 4. 根據通道數初始化 SQL Uploader (如果啟用)
-        sql_uploader_instance = None
-        sql_temp_dir = None
-        sql_current_temp_file = None
-        sql_start_time = datetime.now()
-        sql_sample_count = 0
-        sql_current_data_size = 0
-        
-        if sql_enabled:
-            try:
-                # 使用動態獲取的通道數初始化 SQL Uploader
-                sql_uploader_instance = SQLUploader(channels, label, sql_config)
-                
-                # 建立暫存檔案目錄
-                sql_temp_dir = os.path.join(output_path, ".sql_temp")
-                os.makedirs(sql_temp_dir, exist_ok=True)
-                
-                # 建立第一個暫存檔案
-                temp_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                temp_filename = f"{temp_timestamp}_sql_temp.csv"
-                sql_current_temp_file = os.path.join(sql_temp_dir, temp_filename)
-                
-                # 建立 CSV 檔案並寫入標題
-                with open(sql_current_temp_file, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    headers = ['Timestamp'] + [f'Channel_{i+1}' for i in range(channels)]
-                    writer.writerow(headers)
-                
-                info(f"SQL 暫存檔案已建立: {temp_filename}")
-                
-            except Exception as e:
-                return jsonify({'success': False, 'message': f'SQL 上傳器初始化失敗: {str(e)}'})
-
-        is_collecting = True
-
-        collection_thread = threading.Thread(target=collection_loop, daemon=True)
-        collection_thread.start()
+        session_id = f"{timestamp}_{label}"
+        output_dir = os.path.join(PROJECT_ROOT, "output", "PET-7H24M", session_id)
+        session = AcquisitionSession(label, outputs, output_dir, DEVICE_INI, sections)
+        session.start()
+        with sessions_lock:
+            sessions[session_id] = session
 
-        if csv_writer_instance:
-            csv_writer_thread = threading.Thread(target=csv_writer_loop, daemon=True)
-            csv_writer_thread.start()
-
-        if sql_uploader_instance and sql_enabled:
-            sql_writer_thread = threading.Thread(target=sql_writer_loop, daemon=True)
-            sql_writer_thread.start()
-
-        daq_instance.start_reading()
-
-        # 構建狀態訊息
-        status_parts = [f'取樣率: {sample_rate} Hz', f'通道數: {channels}']
-        if csv_enabled:
-            status_parts.append(f'CSV 分檔間隔: {save_unit} 秒')
-        if sql_enabled:
-            status_parts.append(f'SQL 上傳間隔: {sql_upload_interval} 秒')
-        
         return jsonify({
             'success': True,
-            'message': f'資料收集已啟動 ({", ".join(status_parts)})'
+            'session': session_id,
+            'message': f'資料收集已啟動 ({session.describe()})'
         })
 
     except Exception as e:
-        is_collecting = False
         return jsonify({'success': False, 'message': f'啟動失敗: {str(e)}'})
 
+    finally:
+        with sessions_lock:
+            starting_sections.difference_update(sections)
+
 
 @app.route('/stop', methods=['POST'])
 def stop_collection():
-    """停止資料收集（停止所有執行緒、安全關閉，並上傳剩餘資料）"""
-    global is_collecting, daq_instance, csv_writer_instance, sql_uploader_instance
-    global current_data_size, sql_current_data_size, sql_enabled
-    global sql_temp_dir, sql_current_temp_file
+    """停止資料收集（JSON 參數 session 指定工作，未指定時停止所有工作；剩餘資料在背景寫完並上傳）"""
+    data = request.get_json(silent=True) or {}
+    with sessions_lock:
+        targets = [session for session_id, session in sessions.items()
+                   if session.running and data.get('session') in (None, session_id)]
 
-    if not is_collecting:
+    if not targets:
         return jsonify({'success': False, 'message': '資料收集未在執行中'})
 
     try:
-        is_collecting = False
-
-        if daq_instance:
-            daq_instance.stop_reading()
+        for session in targets:
+            session.stop()
 
         # 立即返回成功回應，讓前端知道已停止
-        # 剩餘的上傳工作在背景執行
-        response_message = '資料收集已停止'
-        
-        # 在背景執行緒中處理剩餘的上傳工作（避免阻塞前端）
-        cleanup_thread = threading.Thread(target=finalize_upload, daemon=True)
+        # 剩餘的寫入與上傳工作在背景執行（避免阻塞前端）
+        cleanup_thread = threading.Thread(target=finalize_upload, args=(targets,), daemon=True)
         cleanup_thread.start()
-        
-        return jsonify({'success': True, 'message': response_message})
+
+        return jsonify({'success': True, 'message': '資料收集已停止'})
 
     except Exception as e:
         return jsonify({'success': False, 'message': f'停止失敗: {str(e)}'})
 
 
-def finalize_upload():
-    """停止後的清理與剩餘資料上傳"""
-    global collection_thread, csv_writer_thread, sql_writer_thread
-    global csv_data_queue, sql_data_queue
-    global sql_uploader_instance, sql_enabled, sql_temp_dir, sql_current_temp_file
-    global csv_writer_instance
-
-    if collection_thread and collection_thread.is_alive():
-        collection_thread.join(timeout=2.0)
-    
-    if csv_writer_thread and csv_writer_thread.is_alive():
-        start_t = time.time()
-        while not csv_data_queue.empty() and (time.time() - start_t < 5):
-            time.sleep(0.1)
-    
-    if sql_writer_thread and sql_writer_thread.is_alive():
-        start_t = time.time()
-        while not sql_data_queue.empty() and (time.time() - start_t < 5):
-            time.sleep(0.1)
-
-    time.sleep(0.5)
-
-    if sql_uploader_instance and sql_enabled and sql_temp_dir:
-        try:
-            with sql_temp_file_lock:
-                current_temp = sql_current_temp_file
-
-            if current_temp and os.path.exists(current_temp):
-                if csv_writer_instance:
-                    csv_filename = csv_writer_instance.get_current_filename()
-                    if csv_filename:
-                        table_name = csv_filename
-                    else:
-                        table_name = None
-                else:
-                    table_name = None
-
-                if sql_uploader_instance.upload_from_csv_file(current_temp, table_name):
-                    try:
-                        os.remove(current_temp)
-                        info(f"停止時已上傳並刪除暫存檔案: {os.path.basename(current_temp)}")
-                    except Exception as e:
-                        warning(f"刪除暫存檔案失敗: {e}")
-                else:
-                    error(f"停止時上傳暫存檔案失敗: {os.path.basename(current_temp)}")
-
-            if os.path.exists(sql_temp_dir):
-                temp_files = [
-                    f for f in os.listdir(sql_temp_dir)
-                    if f.endswith("_sql_temp.csv")
-                ]
-                for temp_file in temp_files:
-                    temp_file_path = os.path.join(sql_temp_dir, temp_file)
-                    if os.path.exists(temp_file_path):
-                        if csv_writer_instance:
-                            csv_filename = csv_writer_instance.get_current_filename()
-                            if csv_filename:
-                                table_name = csv_filename
-                            else:
-                                table_name = None
-                        else:
-                            table_name = None
-
-                        if sql_uploader_instance.upload_from_csv_file(temp_file_path, table_name):
-                            try:
-                                os.remove(temp_file_path)
-                                info(f"停止時已上傳並刪除暫存檔案: {temp_file}")
-                            except Exception as e:
-                                warning(f"刪除暫存檔案失敗: {e}")
-                        else:
-                            error(f"停止時上傳暫存檔案失敗: {temp_file}")
-
-                try:
-                    if not os.listdir(sql_temp_dir):
-                        os.rmdir(sql_temp_dir)
-                except:
-                    pass
-
-        except Exception as e:
-            warning(f"清理 SQL 暫存檔案時發生錯誤: {e}")
-
-    if csv_writer_instance:
-        csv_writer_instance.close()
-
-    if sql_uploader_instance:
-        sql_uploader_instance.close()
+def finalize_upload(targets: List[AcquisitionSession]):
+    """停止後的清理與剩餘資料上傳（各工作的各設備輸出並行處理）"""
+    drain_threads = [threading.Thread(target=session.drain, daemon=True) for session in targets]
+    for thread in drain_threads:
+        thread.start()
+    for thread in drain_threads:
+        thread.join()
 
     info("所有資源已安全關閉")
 
@@ -750,325 +747,15 @@ def download_file():
         return jsonify({'success': False, 'message': str(e)})
 
 
-def _create_new_temp_file() -> Optional[str]:
-    """建立新的 SQL 暫存檔案"""
-    global sql_temp_dir, sql_current_temp_file, channels
-
-    if not sql_temp_dir:
-        return None
-
-    try:
-        temp_timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        temp_filename = f"{temp_timestamp}_sql_temp.csv"
-        new_temp_file = os.path.join(sql_temp_dir, temp_filename)
-
-        with open(new_temp_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            headers = ['Timestamp'] + [f'Channel_{i+1}' for i in range(channels)]
-            writer.writerow(headers)
-
-        with sql_temp_file_lock:
-            sql_current_temp_file = new_temp_file
-
-        info(f"新的 SQL 暫存檔案已建立: {temp_filename}")
-        return new_temp_file
-    except Exception as e:
-        error(f"建立新暫存檔案失敗: {e}")
-        return None
-
-
-def _write_to_temp_file(
-    data: List[float], sample_rate: int, start_time: datetime, sample_count: int
-) -> int:
-    """將資料寫入 SQL 暫存檔案"""
-    global sql_current_temp_file
-    
-    if not sql_current_temp_file or not os.path.exists(sql_current_temp_file):
-        return sample_count
-    
-    try:
-        with sql_temp_file_lock:
-            current_file = sql_current_temp_file
-            if not current_file or not os.path.exists(current_file):
-                return sample_count
-            
-            with open(current_file, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                sample_interval = 1.0 / sample_rate
-                current_count = sample_count
-                
-                for i in range(0, len(data), channels):
-                    elapsed_time = current_count * sample_interval
-                    timestamp = start_time + timedelta(seconds=elapsed_time)
-                    
-                    row = [timestamp.isoformat()]
-                    for j in range(channels):
-                        if i + j < len(data):
-                            row.append(data[i + j])
-                        else:
-                            row.append(0.0)
-                    
-                    writer.writerow(row)
-                    current_count += 1
-        
-        return current_count
-    except Exception as e:
-        error(f"寫入暫存檔案失敗: {e}")
-        return sample_count
-
-
-def _upload_temp_file_if_needed():
-    """檢查並上傳 SQL 暫存檔案（如果資料量達到門檻）"""
-    global sql_uploader_instance, sql_current_temp_file, sql_temp_dir, csv_writer_instance
-    global sql_current_data_size, sql_target_size, channels
-    
-    if not sql_uploader_instance or not sql_current_temp_file:
-        return False
-    
-    # 檢查資料量是否達到門檻
-    if sql_current_data_size < sql_target_size:
-        return False
-    
-    # 資料量達到門檻，準備上傳
-    with sql_temp_file_lock:
-        temp_file_to_upload = sql_current_temp_file
-    
-    if not temp_file_to_upload or not os.path.exists(temp_file_to_upload):
-        return False
-    
-    try:
-        # 記錄當前資料量（用於日誌）
-        current_data_size_before_upload = sql_current_data_size
-        
-        # 從檔名推斷表名（使用對應的 CSV 檔名）
-        if csv_writer_instance:
-            csv_filename = csv_writer_instance.get_current_filename()
-            if csv_filename:
-                table_name = csv_filename
-            else:
-                table_name = None
-        else:
-            table_name = None
-        
-        # 上傳檔案
-        if sql_uploader_instance.upload_from_csv_file(temp_file_to_upload, table_name):
-            # 計算筆數（資料點數 / 通道數）
-            rows_count = current_data_size_before_upload // channels
-            target_rows = sql_target_size // channels
-            
-            # 上傳成功，刪除暫存檔
-            try:
-                os.remove(temp_file_to_upload)
-                info(f"暫存檔案已上傳並刪除: {os.path.basename(temp_file_to_upload)} (筆數: {rows_count} 筆, 目標: {target_rows} 筆)")
-            except Exception as e:
-                warning(f"刪除暫存檔案失敗: {e}")
-            
-            # 建立新的暫存檔案
-            _create_new_temp_file()
-            
-            # 計算超出部分的資料量（用於下一個暫存檔案）
-            excess_data_size = current_data_size_before_upload - sql_target_size
-            
-            # 重置資料量計數器，保留超出部分的資料量
-            sql_current_data_size = excess_data_size
-            
-            if excess_data_size > 0:
-                excess_rows = excess_data_size // channels
-                debug(f"保留超出部分的資料量: {excess_rows} 筆 ({excess_data_size} 個資料點) 到新暫存檔案")
-            
-            return True
-        else:
-            error(f"上傳暫存檔案失敗: {os.path.basename(temp_file_to_upload)}")
-            # 上傳失敗，保留檔案等待下次重試
-            return False
-            
-    except Exception as e:
-        error(f"上傳暫存檔案時發生錯誤: {e}")
-        return False
-
-
-def collection_loop():
-    """資料收集主迴圈（在獨立執行緒中執行）"""
-    global is_collecting, daq_instance, csv_data_queue, sql_data_queue
-    global csv_writer_instance, sql_uploader_instance, sql_enabled
-
-    while is_collecting:
-        try:
-            data = daq_instance.get_data()
-
-            while data and len(data) > 0:
-                update_realtime_data(data)
-
-                if csv_writer_instance:
-                    try:
-                        csv_data_queue.put(data.copy(), block=False)
-                    except queue.Full:
-                        warning("CSV Queue Full")
-
-                if sql_uploader_instance and sql_enabled:
-                    try:
-                        sql_data_queue.put(data.copy(), block=False)
-                    except queue.Full:
-                        warning("SQL Queue Full")
-
-                data = daq_instance.get_data()
-
-            time.sleep(0.01)
-
-        except Exception as e:
-            error(f"Collection loop error: {e}")
-            time.sleep(0.1)
-
-def csv_writer_loop():
-    """CSV 寫入迴圈（在獨立執行緒中執行）"""
-    global is_collecting, csv_writer_instance, sql_uploader_instance, sql_enabled
-    global target_size, current_data_size, csv_data_queue
-
-    while is_collecting or not csv_data_queue.empty():
-        try:
-            try:
-                data = csv_data_queue.get(timeout=1.0)
-            except queue.Empty:
-                continue
-
-            data_size = len(data)
-            current_data_size += data_size
-
-            if current_data_size < target_size:
-                csv_writer_instance.add_data_block(data)
-            else:
-                data_actual_size = data_size
-                empty_space = target_size - (current_data_size - data_actual_size)
-                empty_space = (empty_space // channels) * channels
-
-                while current_data_size >= target_size:
-                    batch = data[:empty_space]
-                    csv_writer_instance.add_data_block(batch)
-                    csv_writer_instance.update_filename()
-
-                    if sql_uploader_instance and sql_enabled:
-                        csv_filename = (
-                            csv_writer_instance.get_current_filename()
-                            if csv_writer_instance
-                            else None
-                        )
-                        if csv_filename:
-                            if sql_uploader_instance.create_table(csv_filename):
-                                info(f"SQL 表已建立，對應 CSV: {csv_filename}")
-                            else:
-                                warning(f"SQL 表建立失敗，對應 CSV: {csv_filename}")
-
-                    current_data_size -= target_size
-
-                    if empty_space < data_actual_size:
-                        data = data[empty_space:]
-                        data_actual_size = len(data)
-                        empty_space = target_size
-                        empty_space = (empty_space // channels) * channels
-                    else:
-                        break
-
-                pending = data_actual_size
-                if pending:
-                    csv_writer_instance.add_data_block(data)
-                    current_data_size = pending
-                else:
-                    current_data_size = 0
-
-            csv_data_queue.task_done()
-
-        except Exception as e:
-            error(f"CSV writer loop error: {e}")
-            time.sleep(0.1)
-
-def sql_writer_loop():
-    """SQL 寫入迴圈（在獨立執行緒中執行）"""
-    global is_collecting, sql_uploader_instance, sql_enabled, sql_current_temp_file
-    global sql_target_size, sql_current_data_size, sql_sample_count, sql_start_time
-    global sql_data_queue, csv_writer_instance, daq_instance
-
-    sample_rate = 12800
-    if csv_writer_instance:
-        sample_rate = csv_writer_instance.sample_rate
-    elif daq_instance:
-        try:
-            sample_rate = daq_instance.get_sample_rate()
-        except:
-            pass
-
-    if sql_start_time is None:
-        sql_start_time = datetime.now()
-        sql_sample_count = 0
-        sql_current_data_size = 0
-
-    while is_collecting or not sql_data_queue.empty():
-        try:
-            try:
-                sql_data = sql_data_queue.get(timeout=1.0)
-            except queue.Empty:
-                if sql_current_data_size > 0:
-                    _upload_temp_file_if_needed()
-                continue
-
-            if not sql_current_temp_file:
-                continue
-
-            remaining_data = sql_data
-
-            while len(remaining_data) > 0:
-                remaining_space = sql_target_size - sql_current_data_size
-
-                if remaining_space <= 0:
-                    if not _upload_temp_file_if_needed():
-                        sql_sample_count = _write_to_temp_file(
-                            remaining_data,
-                            sample_rate,
-                            sql_start_time,
-                            sql_sample_count,
-                        )
-                        sql_current_data_size += len(remaining_data)
-                        break
-                    remaining_space = sql_target_size - sql_current_data_size
-
-                write_size = min(len(remaining_data), remaining_space)
-                write_size = (write_size // channels) * channels
-
-                if write_size > 0:
-                    data_to_write = remaining_data[:write_size]
-                    sql_sample_count = _write_to_temp_file(
-                        data_to_write, sample_rate, sql_start_time, sql_sample_count
-                    )
-                    sql_current_data_size += write_size
-
-                    remaining_data = remaining_data[write_size:]
-
-                    if sql_current_data_size >= sql_target_size:
-                        if not _upload_temp_file_if_needed():
-                            break
-                else:
-                    if not _upload_temp_file_if_needed():
-                        sql_sample_count = _write_to_temp_file(
-                            remaining_data,
-                            sample_rate,
-                            sql_start_time,
-                            sql_sample_count,
-                        )
-                        sql_current_data_size += len(remaining_data)
-                        break
-
-            sql_data_queue.task_done()
-
-        except Exception as e:
-            error(f"SQL writer loop error: {e}")
-            time.sleep(0.1)
-
-
-def run_flask_server(port: int = 8080):
-    """在獨立執行緒中執行 Flask 伺服器"""
+def run_flask_server(port: int = 8080, server=None):
+    """在獨立執行緒中執行 Flask 伺服器（server 為已開始監聽的 werkzeug 伺服器）"""
     log = logging.getLogger('werkzeug')
     log.setLevel(logging.ERROR)
     
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    if server is None:
+        app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+        return
+    server.serve_forever()
 
 
 def main():
@@ -1081,6 +768,7 @@ def main():
   python src/main.py              # 使用預設 port 8080
   python src/main.py --port 3000  # 使用自訂 port 3000
   python src/main.py -p 9000      # 使用自訂 port 9000
+  python src/main.py --backend simulated  # 不連接硬體，使用模擬設備
         """
     )
     parser.add_argument(
@@ -1090,8 +778,19 @@ def main():
         help='Flask 伺服器監聽的埠號（預設: 8080）'
     )
     
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default=None,
+        help='HSDAQ 後端（預設依 PET-7H24M.ini 的 backend 設定；simulated = 模擬設備）'
+    )
+    
     args = parser.parse_args()
     port = args.port
+
+    if args.backend:
+        # 所有設備在 init_devices 時依此選擇後端
+        os.environ[BACKEND_ENV] = args.backend
     
     if not (1 <= port <= 65535):
         error(f"無效的埠號: {port}，請使用 1-65535 之間的數字")
@@ -1104,7 +803,16 @@ def main():
     info("Press Ctrl+C to stop the server")
     info("=" * 60)
 
-    flask_thread = threading.Thread(target=run_flask_server, args=(port,), daemon=True)
+    # 先綁定埠號再啟動執行緒，監聽開始即記錄冷啟動時間（此時尚未載入 libhsdaq.so 或存取設備）
+    try:
+        server = make_server('0.0.0.0', port, app, threaded=True)
+    except OSError as e:
+        error(f"無法監聽埠號 {port}: {e}")
+        sys.exit(1)
+    startup_stats['http_ready_ms'] = round((time.perf_counter() - PROCESS_START) * 1000, 3)
+    info(f"冷啟動時間: 模組匯入 {startup_stats['import_ms']:.1f} ms，HTTP 就緒 {startup_stats['http_ready_ms']:.1f} ms")
+
+    flask_thread = threading.Thread(target=run_flask_server, args=(port, server), daemon=True)
     flask_thread.start()
 
     try:
@@ -1112,15 +820,9 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         info("\nShutting down server...")
-        global is_collecting, daq_instance, csv_writer_instance, sql_uploader_instance
-        if is_collecting:
-            is_collecting = False
-            if daq_instance:
-                daq_instance.stop_reading()
-            if csv_writer_instance:
-                csv_writer_instance.close()
-            if sql_uploader_instance:
-                sql_uploader_instance.close()
+        for _, session in _session_items():
+            if session.running:
+                session.close()
         info("Server has been shut down")
 
 
@@ -9,17 +9,42 @@ PET-7H24M 設備通訊模組
 - 動態通道遮罩（位元遮罩配置）
 - 兩種讀取模式（AI Buffer Continue、N Sample）
 - 高效能讀取（使用資料佇列緩衝）
-- 執行緒安全（使用 queue.Queue 進行資料傳遞）
+- NumPy 區塊模式（HS_GetAIBuffer 直接寫入 float32 陣列，不轉換為 Python 列表）
+- 預先配置的緩衝區池（讀取緩衝區重複使用，消費者處理完畢後歸還）
+- 原始整數模式（HS_GetAIBufferHex 讀取 int32/int16 原始值，校正係數於初始化時讀取一次）
+- 事件喚醒（HS_SetEventCallback），不支援時改用依填入速率計算的自適應輪詢間隔
+- 執行期選擇 HSDAQ 後端（libhsdaq.so 或模擬設備），載入失敗不會在 import 時結束程式
+- 樣本序號（區塊 start_index 包含遺失的 frame），以 HS_GetTotalSamplingStatus 比對設備端遺失的樣本
+- 緩衝區溢位處理（overflow_action = stop 停止讀取；continue 清除緩衝區後繼續，遺失部分以缺漏記錄）
+- 觸發擷取（capture_mode = hw_trigger 設定 HS_SetAIAnalogTriggerParam，無法設定時改用 sw_trigger 軟體觸發）
+- 設備記錄模式（capture_mode = device_log 以 HS_StartLogger 由函式庫寫入記錄檔，讀取執行緒只以 HS_ReadAIALL 取得低速預覽）
+- 定時擷取（capture_mode = burst 每隔 burst_interval_s 秒以 N Sample 模式擷取一段，段與段之間只停止掃描、不重新連線）
+- 同步輸入（sync_in = 1 以 HS_GetSyncInBufferLV 讀取與 AI 時間對齊的 DI 狀態與計數器，區塊附帶每個 frame 的結構化紀錄）
+- 斷線重新連線（讀取執行緒偵測到連線中斷後以指數退避重新建立連線並啟動掃描，序號跳過中斷期間，輸出不重新開始）
+- 執行緒安全（使用以位元組限制的 ByteQueue 進行資料傳遞，滿載處理方式可設定）
 """
 
 import os
 import time
 import threading
 import configparser
-from typing import List, Optional
-import sys
+from typing import Optional
 import queue
 from ctypes import *
+from datetime import datetime
+
+import numpy as np
+
+from buffer_pool import BufferPool
+from burst_capture import BURST_MODE, BurstSchedule, BurstSettings
+from byte_queue import ByteQueue, DataSignal, MemoryBudget, QueueSettings
+from device_logger import DEVICE_LOG_MODE, LoggerSettings
+from hsdaq_backend import create_backend, resolve_backend_name
+from read_pacing import AdaptivePoller, ChunkController, CHUNK_MODES, ReaderStats
+from reconnect import LinkStats, ReconnectSettings
+from sample_block import RawCalibration, SampleBlock
+from sync_in import SyncInReader, SyncInSettings
+from trigger_capture import AI_CHANNELS, AI_TRI_AI, CAPTURE_MODES, TriggerSettings
 
 try:
     from logger import info, debug, warning, error
@@ -29,30 +54,18 @@ except ImportError:
     def warning(m): print(f"[WARN] {m}")
     def error(m): print(f"[ERROR] {m}")
 
-# 嘗試載入 HSDAQ 函式庫（Linux 版本）
-# 參考官方範例：docs/linux_python3_SDK_Demo/python_demo/PET-7H24M/LinuxArm64/
-HSDAQ_LIB_PATH = os.path.join(os.path.dirname(__file__), 'include', 'hsdaq', 'LinuxArm64', 'libhsdaq.so')
+# 原始整數模式：探測 HS_Calibrate_Data_Float 線性係數時使用的原始值
+CALIBRATION_PROBE_RAW = 1 << 16
 
-try:
-    dll = CDLL(HSDAQ_LIB_PATH)
-    info(f"成功載入 HSDAQ 函式庫: {HSDAQ_LIB_PATH}")
-except Exception as e:
-    error_msg = str(e)
-    error(f"無法載入 HSDAQ 函式庫: {error_msg}")
-    
-    # 檢查是否是架構不匹配的問題
-    if "invalid ELF header" in error_msg or "wrong ELF class" in error_msg:
-        error("\n函式庫架構不匹配！")
-        import platform
-        error(f"系統架構：{platform.machine()}")
-        error("請確認函式庫是 ARM64 (aarch64) 版本")
-        error("當前找到的函式庫可能是 x86_64 或其他架構版本")
-        info("\n可能的解決方案：")
-        info("  1. 從 ICP-DAS 官方取得 ARM64 版本的 libhsdaq.so")
-        info("  2. 或使用靜態庫 libhsdaq.a 重新編譯")
-        info("  3. 或聯繫 ICP-DAS 技術支援取得正確版本的函式庫")
-    
-    sys.exit(1)
+# HS_GetTotalSamplingStatus 的樣本總數為 UL32（hsdaql.h），每 2^32 回繞一次（128k Hz × 4 通道約 2.3 小時）
+DEVICE_COUNTER_MODULUS = 1 << 32
+
+# HS_SetEventCallback 事件類型（hsdaql.h: callback event）
+EVENT_N_SAMPLE_REACH = 0x0002
+EVENT_LAN_BUFFER_OVERFLOW = 0x0008
+
+# 事件回呼的 C 函數型別（回呼只負責喚醒讀取執行緒，不讀取任何參數）
+EVENT_CALLBACK = CFUNCTYPE(None)
 
 
 class PET7H24M:
@@ -63,6 +76,8 @@ class PET7H24M:
         self.device_handle = None
         self.device_ip = "192.168.255.1"
         self.device_port = 502
+        self.section = "PET7H24M"
+        self.device_id = "PET7H24M"  # 設備識別碼（多設備時用於區分資料區塊、輸出資料夾與網頁檢視）
         self.sample_rate = 20000
         self.channel_mask = 0
         self.active_channels = []  # 紀錄哪幾個通道被開啟，例如 [0, 2, 3]
@@ -78,81 +93,113 @@ class PET7H24M:
         self.counter = 0
         self.reading = False
         self.reading_thread: Optional[threading.Thread] = None
-        self.data_queue = queue.Queue(maxsize=1000)
-        
-        # 設定函式庫函數簽名
-        self._setup_function_signatures()
-
-    def _setup_function_signatures(self):
-        """設定 ctypes 函數簽名"""
-        # HS_Device_Create
-        dll.HS_Device_Create.restype = c_void_p
-        dll.HS_Device_Create.argtypes = [c_char_p]
-        
-        # HS_Device_Release
-        dll.HS_Device_Release.restype = c_bool
-        dll.HS_Device_Release.argtypes = [c_void_p]
-        
-        # HS_SetAIScanParam
-        dll.HS_SetAIScanParam.restype = c_bool
-        dll.HS_SetAIScanParam.argtypes = [c_void_p, c_short, c_short, c_short, c_long, c_ulong, c_short, c_short]
-        
-        # HS_GetAIScanParam（用於驗證參數設定）
-        dll.HS_GetAIScanParam.restype = c_bool
-        dll.HS_GetAIScanParam.argtypes = [c_void_p, POINTER(c_short), POINTER(c_short), POINTER(c_short), 
-                                          POINTER(c_long), POINTER(c_ulong), POINTER(c_short), POINTER(c_short)]
-        
-        # HS_StartAIScan
-        dll.HS_StartAIScan.restype = c_bool
-        dll.HS_StartAIScan.argtypes = [c_void_p]
-        
-        # HS_StopAIScan
-        dll.HS_StopAIScan.restype = c_bool
-        dll.HS_StopAIScan.argtypes = [c_void_p]
-        
-        # HS_GetAIBufferStatus
-        dll.HS_GetAIBufferStatus.restype = c_bool
-        dll.HS_GetAIBufferStatus.argtypes = [c_void_p, POINTER(c_ushort), POINTER(c_ulong)]
-        
-        # HS_GetAIBuffer
-        dll.HS_GetAIBuffer.restype = c_ulong
-        dll.HS_GetAIBuffer.argtypes = [c_void_p, POINTER(c_float), c_ulong]
-        
-        # HS_GetLastError
-        dll.HS_GetLastError.restype = c_ulong
-        dll.HS_GetLastError.argtypes = []
-
-    def init_devices(self, ini_path: str) -> None:
-        """從設定檔讀取參數並初始化設備"""
+        # 讀取端輸出佇列（init_devices 時依 [Queues] 設定重新建立）
+        self.data_queue: ByteQueue = QueueSettings().create_queue("data_queue", None)
+        # 區塊放入 data_queue 時通知合併管線（DeviceManager 設定）
+        self.data_signal: Optional[DataSignal] = None
+        self.buffer_pool: Optional[BufferPool] = None
+        # 原始整數模式（acquisition_mode = raw）
+        self.acquisition_mode = "float"
+        self.raw_dtype = "int32"
+        self.raw_shift = 0
+        self.calibration: Optional[RawCalibration] = None
+        self._raw_scratch: Optional[np.ndarray] = None
+        self._raw_scratch_pointer = None
+        # 喚醒模式（wakeup_mode = auto / event / poll）
+        self.wakeup_mode = "auto"
+        self.wakeup_target_ms = 10
+        self._data_event = threading.Event()
+        self._event_callback = None  # 保留 CFUNCTYPE 參考，避免被回收
+        self._callback_registered = False
+        self._poller: Optional[AdaptivePoller] = None
+        self.reader_stats: Optional[ReaderStats] = None
+        # 讀取區塊大小控制（chunk_mode = off / block / latency，只用於連續讀取）
+        self.chunk_mode = "off"
+        self.chunk_target_ms = 20
+        self.chunk_safety_fraction = 0.5
+        self.device_buffer_samples = 0
+        self._chunker: Optional[ChunkController] = None
+        # 樣本總數比對間隔與溢位處理方式（overflow_action = stop / continue）
+        self.sample_check_ms = 100
+        self.overflow_action = "stop"
+        # 擷取模式（capture_mode = continuous / hw_trigger / sw_trigger）與觸發設定
+        self.capture_mode = "continuous"
+        self.trigger_settings: Optional[TriggerSettings] = None
+        self._scan_start = 0.0
+        # 設備記錄模式（capture_mode = device_log）的記錄器設定與記錄器是否已啟動
+        self.logger_settings: Optional[LoggerSettings] = None
+        self._logger_started = False
+        # 定時擷取（capture_mode = burst）的設定與排程（排程在 start_reading 時重新建立）
+        self.burst_settings: Optional[BurstSettings] = None
+        self.burst_schedule: Optional[BurstSchedule] = None
+        # 同步輸入（sync_in = 1）的設定與讀取器（讀取器在建立緩衝區池時建立）
+        self.sync_in_settings: Optional[SyncInSettings] = None
+        self._sync_reader: Optional[SyncInReader] = None
+        # 斷線重新連線設定與連線統計（統計在 start_reading 時重新建立）
+        self.reconnect_settings = ReconnectSettings()
+        self.link_stats: Optional[LinkStats] = None
+        self._loss_base = 0  # 目前連線開始前已累計的設備端遺失樣本數（重新連線後設備取樣總數重新計算）
+        # HSDAQ 後端（init_devices 時依設定檔選擇：hsdaq / simulated）
+        self.backend_name = "hsdaq"
+        self.dll = None
+
+    def init_devices(self, ini_path: str, section: str = "PET7H24M",
+                     queue_settings: Optional[QueueSettings] = None,
+                     memory_budget: Optional[MemoryBudget] = None) -> None:
+        """
+        從設定檔讀取參數並初始化設備
+
+        Args:
+            ini_path: 設定檔路徑
+            section: 設備區段名稱（多設備時為 PET7H24M_2、PET7H24M_3...，未設定的參數沿用 [PET7H24M]）
+            queue_settings: 佇列設定（None = 讀取設定檔的 [Queues] 區段）
+            memory_budget: 與其他佇列共用的記憶體預算（None = 依佇列設定建立獨立的預算）
+        """
         try:
             cfg = configparser.ConfigParser()
             cfg.read(ini_path, encoding="utf-8")
 
+            # 其他設備區段未設定的參數沿用主要區段（連線位址、識別碼與啟用旗標除外）
+            if section != "PET7H24M" and cfg.has_section("PET7H24M"):
+                if not cfg.has_section(section):
+                    cfg.add_section(section)
+                for key, value in cfg.items("PET7H24M"):
+                    if key not in ("device_id", "device_ip", "enabled") and not cfg.has_option(section, key):
+                        cfg.set(section, key, value)
+            self.section = section
+            self.device_id = cfg.get(section, "device_id", fallback=section)
+
+            # 0. 選擇 HSDAQ 後端（執行期決定，環境變數 PET7H24M_BACKEND 優先）
+            self.backend_name = resolve_backend_name(cfg.get(section, "backend", fallback="hsdaq"))
+            sim_options = {key: value for key, value in cfg.items(section) if key.startswith("sim_")} \
+                if cfg.has_section(section) else {}
+            self.dll = create_backend(self.backend_name, sim_options)
+
             # 1. 讀取連線資訊
-            self.device_ip = cfg.get("PET7H24M", "device_ip", fallback="192.168.255.1")
-            self.device_port = cfg.getint("PET7H24M", "device_port", fallback=502)
+            self.device_ip = cfg.get(self.section, "device_ip", fallback="192.168.255.1")
+            self.device_port = cfg.getint(self.section, "device_port", fallback=502)
             
             # 向後兼容：保留 ip_address
             self.ip_address = self.device_ip
             
             # 2. 讀取取樣率 (PET-7H24M 必須是特定數值，如 10k, 20k...)
-            self.sample_rate = cfg.getint("PET7H24M", "sample_rate", fallback=20000)
+            self.sample_rate = cfg.getint(self.section, "sample_rate", fallback=20000)
 
             # 3. 計算通道遮罩 (Channel Bitmask)
             # AI0=1, AI1=2, AI2=4, AI3=8
             self.channel_mask = 0
             self.active_channels = []  # 紀錄哪幾個通道被開啟，例如 [0, 2, 3]
             
-            if cfg.getint("PET7H24M", "enable_ai0", fallback=1):
+            if cfg.getint(self.section, "enable_ai0", fallback=1):
                 self.channel_mask |= 1
                 self.active_channels.append(0)
-            if cfg.getint("PET7H24M", "enable_ai1", fallback=1):
+            if cfg.getint(self.section, "enable_ai1", fallback=1):
                 self.channel_mask |= 2
                 self.active_channels.append(1)
-            if cfg.getint("PET7H24M", "enable_ai2", fallback=1):
+            if cfg.getint(self.section, "enable_ai2", fallback=1):
                 self.channel_mask |= 4
                 self.active_channels.append(2)
-            if cfg.getint("PET7H24M", "enable_ai3", fallback=1):
+            if cfg.getint(self.section, "enable_ai3", fallback=1):
                 self.channel_mask |= 8
                 self.active_channels.append(3)
 
@@ -164,84 +211,538 @@ class PET7H24M:
             if self.channels_count == 0:
                 raise ValueError("錯誤：至少必須啟用一個通道！")
 
-            info(f"PET-7H24M 初始化完成: IP={self.device_ip}, Port={self.device_port}, Rate={self.sample_rate}Hz, Channels={self.active_channels} (Mask=0x{self.channel_mask:x})")
+            info(f"PET-7H24M [{self.device_id}] 初始化完成: IP={self.device_ip}, Port={self.device_port}, Rate={self.sample_rate}Hz, Channels={self.active_channels} (Mask=0x{self.channel_mask:x})")
+
+            # 讀取資料格式：float（HS_GetAIBuffer）或 raw（HS_GetAIBufferHex + 延後校正）
+            self.acquisition_mode = cfg.get(self.section, "acquisition_mode", fallback="float").strip().lower()
+            self.raw_dtype = cfg.get(self.section, "raw_dtype", fallback="int32").strip().lower()
+            if self.acquisition_mode not in ("float", "raw"):
+                raise ValueError(f"不支援的 acquisition_mode: {self.acquisition_mode}（可用值: float, raw）")
+            if self.raw_dtype not in ("int32", "int16"):
+                raise ValueError(f"不支援的 raw_dtype: {self.raw_dtype}（可用值: int32, int16）")
+            self.raw_shift = cfg.getint(self.section, "raw_int16_shift", fallback=8) if self.raw_dtype == "int16" else 0
+
+            # 讀取執行緒喚醒方式：event（HS_SetEventCallback）、poll（自適應輪詢）、auto（優先使用事件）
+            self.wakeup_mode = cfg.get(self.section, "wakeup_mode", fallback="auto").strip().lower()
+            self.wakeup_target_ms = cfg.getint(self.section, "wakeup_target_ms", fallback=10)
+            if self.wakeup_mode not in ("auto", "event", "poll"):
+                raise ValueError(f"不支援的 wakeup_mode: {self.wakeup_mode}（可用值: auto, event, poll）")
+
+            # 讀取區塊大小控制：目標區塊長度 / 讀取延遲與設備緩衝區安全比例（0 = 由後端提供容量）
+            self.chunk_mode = cfg.get(self.section, "chunk_mode", fallback="off").strip().lower()
+            self.chunk_target_ms = cfg.getint(self.section, "chunk_target_ms", fallback=20)
+            self.chunk_safety_fraction = cfg.getfloat(self.section, "chunk_safety_fraction", fallback=0.5)
+            self.device_buffer_samples = cfg.getint(self.section, "device_buffer_samples", fallback=0)
+            if self.chunk_mode not in CHUNK_MODES:
+                raise ValueError(f"不支援的 chunk_mode: {self.chunk_mode}（可用值: {', '.join(CHUNK_MODES)}）")
+            if self.chunk_mode != "off":
+                # 喚醒間隔與區塊大小使用同一個目標
+                self.wakeup_target_ms = self.chunk_target_ms
+
+            # 樣本總數比對（HS_GetTotalSamplingStatus，0 = 停用）與緩衝區溢位處理方式
+            self.sample_check_ms = cfg.getint(self.section, "sample_check_ms", fallback=100)
+            self.overflow_action = cfg.get(self.section, "overflow_action", fallback="stop").strip().lower()
+            if self.overflow_action not in ("stop", "continue"):
+                raise ValueError(f"不支援的 overflow_action: {self.overflow_action}（可用值: stop, continue）")
+
+            # 擷取模式：continuous 連續擷取；hw_trigger / sw_trigger 只輸出觸發事件前後的資料；
+            # device_log 由函式庫直接寫入記錄檔，停止後再匯入
+            self.capture_mode = cfg.get(self.section, "capture_mode", fallback="continuous").strip().lower()
+            capture_modes = CAPTURE_MODES + (DEVICE_LOG_MODE, BURST_MODE)
+            if self.capture_mode not in capture_modes:
+                raise ValueError(f"不支援的 capture_mode: {self.capture_mode}（可用值: {', '.join(capture_modes)}）")
+            self.trigger_settings = None
+            self.logger_settings = None
+            self.burst_settings = None
+            if self.capture_mode == BURST_MODE:
+                self.burst_settings = BurstSettings.from_config(cfg, self.section)
+            elif self.capture_mode == DEVICE_LOG_MODE:
+                self.logger_settings = LoggerSettings.from_config(cfg, self.section, self.device_id)
+                if not hasattr(self.dll, "HS_StartLogger"):
+                    raise RuntimeError("HSDAQ 函式庫不支援資料記錄器，無法使用 capture_mode = device_log")
+                if self.acquisition_mode == "raw":
+                    # 預覽與匯入都讀取已校正的電壓值
+                    debug("capture_mode = device_log，acquisition_mode 改為 float")
+                    self.acquisition_mode = "float"
+            elif self.capture_mode != "continuous":
+                self.trigger_settings = TriggerSettings.from_config(cfg, self.section)
+                missing = [ch for ch in self.trigger_settings.channels if ch not in self.active_channels]
+                if missing:
+                    raise ValueError(f"觸發通道未啟用: {', '.join(f'AI{ch}' for ch in missing)}")
+
+            # 同步輸入：AI 與 DI / 計數器以同一個 frame 讀取（只支援連續擷取）
+            self.sync_in_settings = SyncInSettings.from_config(cfg, self.section, self.active_channels)
+            self._sync_reader = None
+            if self.sync_in_settings is not None:
+                if self.capture_mode != "continuous":
+                    raise ValueError(f"sync_in = 1 只支援 capture_mode = continuous（目前為 {self.capture_mode}）")
+                if not hasattr(self.dll, "HS_SetSyncInScanParam"):
+                    raise RuntimeError("HSDAQ 函式庫不支援同步輸入，無法使用 sync_in = 1")
+                if self.acquisition_mode == "raw":
+                    # HS_GetSyncInBufferLV 的 AI 欄位為已校正的電壓值
+                    debug("sync_in = 1，acquisition_mode 改為 float")
+                    self.acquisition_mode = "float"
+
+            # 斷線重新連線（N Sample 模式達到目標後即停止，不重新連線）
+            self.reconnect_settings = ReconnectSettings.from_config(cfg, self.section)
+
+            # 掃描參數（保留舊的參數，如果設定檔中有）
+            self.gain = cfg.getint(self.section, "gain", fallback=0)
+            self.trigger_mode = cfg.getint(self.section, "trigger_mode", fallback=0)
+            if self.capture_mode == "hw_trigger" and self.trigger_mode != AI_TRI_AI:
+                # 硬體類比觸發需使用類比輸入觸發掃描模式
+                debug(f"capture_mode = hw_trigger，trigger_mode 由 {self.trigger_mode} 改為 {AI_TRI_AI}（AI_TRI_AI）")
+                self.trigger_mode = AI_TRI_AI
+            self.target_count = cfg.getint(self.section, "target_count", fallback=0)
+            if self.burst_settings is not None:
+                # 定時擷取：設備以 N Sample 模式擷取一段後自行停止，每段重新啟動掃描
+                self.target_count = self.burst_settings.frames * self.channels_count
+            self.data_trans_method = cfg.getint(self.section, "data_trans_method", fallback=0)
+            self.auto_run = cfg.getint(self.section, "auto_run", fallback=0)
 
             # 4. 連線與設定 (呼叫 C 函式庫)
-            # 步驟1：建立TCP/IP連線（參考官方範例）
-            debug("正在建立 TCP/IP 連線...")
-            try:
-                # 連接字串格式：僅 IP 位址（參考官方範例）
-                # 官方範例使用 IP 位址字串，不需要指定埠號
-                self.device_handle = dll.HS_Device_Create(c_char_p(self.device_ip.encode('utf-8')))
-                
-                if self.device_handle is None:
-                    error_code = dll.HS_GetLastError()
-                    error(f"無法建立設備連線！錯誤碼: 0x{error_code:x}")
-                    raise RuntimeError(f"無法建立設備連線，錯誤碼: 0x{error_code:x}")
-                
-                debug("TCP/IP 連線建立成功。")
+            self._connect()
 
-            except Exception as e:
-                error(f"建立 TCP/IP 連線時發生錯誤: {e}")
-                raise
+            # 硬體類比觸發（設定失敗時改用軟體觸發）
+            if self.capture_mode == "hw_trigger" and not self._set_analog_trigger():
+                warning(f"[{self.device_id}] 無法設定硬體類比觸發，改用軟體觸發")
+                self.capture_mode = "sw_trigger"
+            if self.trigger_settings is not None:
+                settings = self.trigger_settings
+                info(f"觸發擷取 [{self.device_id}]: 模式={self.capture_mode}, 通道={settings.channels}, "
+                     f"上限={settings.high.tolist()}, 下限={settings.low.tolist()}, "
+                     f"觸發前={settings.pre_frames}, 觸發後={settings.post_frames} frames")
+            if self.burst_settings is not None:
+                info(f"定時擷取 [{self.device_id}]: {self.burst_settings.describe()}")
+            if self.logger_settings is not None:
+                settings = self.logger_settings
+                info(f"設備記錄模式 [{self.device_id}]: 記錄檔目錄={settings.log_dir}, 格式={settings.file_type}, "
+                     f"分檔間隔={settings.interval}, 預覽取樣率={settings.preview_rate} Hz")
 
-            # 步驟2：設定類比輸入掃描參數
-            # 注意：HS_SetAIScanParam 的第一個參數是通道數，我們使用啟用的通道數
-            debug("正在設定類比輸入掃描參數...")
-            try:
-                # 保留舊的參數（如果設定檔中有）
-                self.gain = cfg.getint("PET7H24M", "gain", fallback=0)
-                self.trigger_mode = cfg.getint("PET7H24M", "trigger_mode", fallback=0)
-                self.target_count = cfg.getint("PET7H24M", "target_count", fallback=0)
-                self.data_trans_method = cfg.getint("PET7H24M", "data_trans_method", fallback=0)
-                self.auto_run = cfg.getint("PET7H24M", "auto_run", fallback=0)
-                
-                ret = dll.HS_SetAIScanParam(
-                    self.device_handle,
-                    c_short(self.channels_count),  # 使用啟用的通道數
-                    c_short(self.gain),
-                    c_short(self.trigger_mode),
-                    c_long(self.sample_rate),
-                    c_ulong(self.target_count),
-                    c_short(self.data_trans_method),
-                    c_short(self.auto_run)
-                )
-                
-                if not ret:
-                    error_code = dll.HS_GetLastError()
-                    error(f"設定掃描參數失敗！錯誤碼: 0x{error_code:x}")
-                    raise RuntimeError(f"設定掃描參數失敗，錯誤碼: 0x{error_code:x}")
-                
-                # 驗證參數設定（參考官方範例）
-                chcnt = c_short()
-                gain = c_short()
-                triggermode = c_short()
-                samplerate = c_long()
-                targetcnt = c_ulong()
-                datatransmethod = c_short()
-                autorun = c_short()
-                
-                if dll.HS_GetAIScanParam(self.device_handle, byref(chcnt), byref(gain), byref(triggermode),
-                                         byref(samplerate), byref(targetcnt), byref(datatransmethod), byref(autorun)):
-                    debug(f"掃描參數設定成功並驗證:")
-                    debug(f"  通道數: {chcnt.value}")
-                    debug(f"  增益: {gain.value}")
-                    debug(f"  觸發模式: {triggermode.value}")
-                    debug(f"  取樣率: {samplerate.value} Hz")
-                    debug(f"  目標計數: {targetcnt.value}")
-                    debug(f"  資料傳輸方法: {datatransmethod.value}")
-                    debug(f"  自動執行: {autorun.value}")
-                else:
-                    warning("無法驗證參數設定，但繼續執行")
+            # 步驟3：原始整數模式讀取校正表（僅讀取一次，之後以向量化方式轉換）
+            self.calibration = None
+            if self.acquisition_mode == "raw":
+                try:
+                    self.calibration = self._load_calibration()
+                    info(f"原始整數模式已啟用: dtype={self.raw_dtype}, 校正係數 scale={self.calibration.scale.tolist()}, offset={self.calibration.offset.tolist()}")
+                except Exception as e:
+                    warning(f"無法取得校正係數，改用 float 模式讀取: {e}")
+                    self.acquisition_mode = "float"
 
-            except Exception as e:
-                error(f"設定掃描參數時發生錯誤: {e}")
-                raise
+            # 步驟4：建立讀取緩衝區池
+            self._create_buffer_pool(cfg)
+
+            # 步驟5：建立以位元組限制的輸出佇列
+            if queue_settings is None:
+                queue_settings = QueueSettings.from_ini(ini_path)
+            if memory_budget is None:
+                memory_budget = MemoryBudget(queue_settings.memory_budget_bytes)
+            self.data_queue.clear()
+            self.data_queue = queue_settings.create_queue("data_queue", memory_budget, label=self.device_id)
+            self.data_queue.signal = self.data_signal
 
         except Exception as e:
             error(f"初始化設備時發生錯誤: {e}")
             raise
 
+    def _connect(self) -> None:
+        """
+        建立 TCP/IP 連線並設定掃描參數（初始化與斷線重新連線共用，失敗時拋出例外）
+
+        連線建立後才失敗時 device_handle 保留已建立的連線，由呼叫端釋放。
+        """
+        # 步驟1：建立TCP/IP連線（參考官方範例）
+        debug("正在建立 TCP/IP 連線...")
+        try:
+            # 連接字串格式：僅 IP 位址（參考官方範例）
+            # 官方範例使用 IP 位址字串，不需要指定埠號
+            self.device_handle = self.dll.HS_Device_Create(c_char_p(self.device_ip.encode('utf-8')))
+            
+            if self.device_handle is None:
+                error_code = self.dll.HS_GetLastError()
+                error(f"無法建立設備連線！錯誤碼: 0x{error_code:x}")
+                raise RuntimeError(f"無法建立設備連線，錯誤碼: 0x{error_code:x}")
+            
+            debug("TCP/IP 連線建立成功。")
+
+        except Exception as e:
+            error(f"建立 TCP/IP 連線時發生錯誤: {e}")
+            raise
+
+        # 步驟2：設定類比輸入掃描參數
+        # 注意：HS_SetAIScanParam 的第一個參數是通道數，我們使用啟用的通道數
+        debug("正在設定類比輸入掃描參數...")
+        try:
+            ret = self.dll.HS_SetAIScanParam(
+                self.device_handle,
+                c_short(self.channels_count),  # 使用啟用的通道數
+                c_short(self.gain),
+                c_short(self.trigger_mode),
+                c_long(self.sample_rate),
+                c_ulong(self.target_count),
+                c_short(self.data_trans_method),
+                c_short(self.auto_run)
+            )
+            
+            if not ret:
+                error_code = self.dll.HS_GetLastError()
+                error(f"設定掃描參數失敗！錯誤碼: 0x{error_code:x}")
+                raise RuntimeError(f"設定掃描參數失敗，錯誤碼: 0x{error_code:x}")
+            
+            # 驗證參數設定（參考官方範例）
+            chcnt = c_short()
+            gain = c_short()
+            triggermode = c_short()
+            samplerate = c_long()
+            targetcnt = c_ulong()
+            datatransmethod = c_short()
+            autorun = c_short()
+            
+            if self.dll.HS_GetAIScanParam(self.device_handle, byref(chcnt), byref(gain), byref(triggermode),
+                                     byref(samplerate), byref(targetcnt), byref(datatransmethod), byref(autorun)):
+                debug(f"掃描參數設定成功並驗證:")
+                debug(f"  通道數: {chcnt.value}")
+                debug(f"  增益: {gain.value}")
+                debug(f"  觸發模式: {triggermode.value}")
+                debug(f"  取樣率: {samplerate.value} Hz")
+                debug(f"  目標計數: {targetcnt.value}")
+                debug(f"  資料傳輸方法: {datatransmethod.value}")
+                debug(f"  自動執行: {autorun.value}")
+            else:
+                warning("無法驗證參數設定，但繼續執行")
+
+        except Exception as e:
+            error(f"設定掃描參數時發生錯誤: {e}")
+            raise
+
+        if self.sync_in_settings is not None:
+            self._set_sync_in()
+
+    def _create_buffer_pool(self, cfg: configparser.ConfigParser) -> None:
+        """建立讀取緩衝區池（每個緩衝區容納 buffer_block_ms 毫秒的資料，且為通道數的倍數）"""
+        pool_size = cfg.getint(self.section, "buffer_pool_size", fallback=32)
+        block_ms = cfg.getint(self.section, "buffer_block_ms", fallback=100)
+        block_capacity = max(1, self.sample_rate * block_ms // 1000) * self.channels_count
+        if self.logger_settings is not None:
+            # 設備記錄模式只傳遞低速預覽區塊
+            block_capacity = self.logger_settings.preview_block_frames() * self.channels_count
+        elif self.target_count > block_capacity and self.burst_settings is None:
+            # N Sample 模式：確保一個緩衝區即可容納全部目標樣本（定時擷取分段讀取，不需要）
+            block_capacity = -(-self.target_count // self.channels_count) * self.channels_count
+
+        if self.acquisition_mode == "float":
+            dtype = np.float32
+        elif self.raw_dtype == "int32":
+            # HS_GetAIBufferHex 直接寫入 DWORD 緩衝區，區塊再以 int32 檢視（不複製）
+            dtype = np.uint32
+        else:
+            # int16：先讀入共用的 DWORD 暫存區，位移後寫入 int16 緩衝區
+            dtype = np.int16
+            self._raw_scratch = np.empty(block_capacity, dtype=np.uint32)
+            self._raw_scratch_pointer = self._raw_scratch.ctypes.data_as(POINTER(c_uint32))
+
+        aux_dtype = self.sync_in_settings.aux_dtype if self.sync_in_settings is not None else None
+        block_frames = block_capacity // self.channels_count
+        self.buffer_pool = BufferPool(block_capacity, pool_size, dtype, aux_dtype, block_frames)
+        if self.sync_in_settings is not None:
+            self._sync_reader = SyncInReader(self.dll, self.sync_in_settings, block_frames)
+        debug(f"緩衝區池已建立: {pool_size} 個緩衝區，每個 {block_capacity} 個樣本 ({np.dtype(dtype).name})")
+
+    def _set_sync_in(self) -> None:
+        """設定同步輸入掃描參數（HS_SetSyncInScanParam，失敗時拋出 RuntimeError）"""
+        settings = self.sync_in_settings
+        numbers, types, count = settings.param_arrays()
+        ret = self.dll.HS_SetSyncInScanParam(
+            self.device_handle, settings.header, numbers, types, count, settings.options, 0
+        )
+        if not ret:
+            error_code = self.dll.HS_GetLastError()
+            raise RuntimeError(f"設定同步輸入參數失敗，錯誤碼: 0x{error_code:x}")
+        info(f"同步輸入 [{self.device_id}]: AI={settings.ai_channels}, DI={settings.di_channels}, "
+             f"DI 計數器={settings.di_counters}, 計數器={settings.counters}")
+
+    def _set_analog_trigger(self) -> bool:
+        """設定硬體類比觸發（HS_SetAIAnalogTriggerParam），成功回傳 True"""
+        if not hasattr(self.dll, "HS_SetAIAnalogTriggerParam"):
+            return False
+        settings = self.trigger_settings
+        enabled, high, low = settings.analog_trigger_arrays()
+        try:
+            ret = self.dll.HS_SetAIAnalogTriggerParam(
+                self.device_handle,
+                settings.analog_mode,
+                enabled, high, low,
+                AI_CHANNELS,
+                settings.pre_frames,
+                settings.post_frames,
+                0
+            )
+        except Exception as e:
+            warning(f"設定硬體類比觸發時發生錯誤: {e}")
+            return False
+
+        if not ret:
+            error_code = self.dll.HS_GetLastError()
+            warning(f"設定硬體類比觸發失敗，錯誤碼: 0x{error_code:x}")
+            return False
+        return True
+
+    def _calibrate_point(self, channel: int, raw: int) -> float:
+        """使用 HS_Calibrate_Data_Float 轉換單一原始值"""
+        value = c_float()
+        if not self.dll.HS_Calibrate_Data_Float(self.device_handle, channel, self.gain, raw, byref(value)):
+            error_code = self.dll.HS_GetLastError()
+            raise RuntimeError(f"HS_Calibrate_Data_Float 失敗（通道 {channel}），錯誤碼: 0x{error_code:x}")
+        return value.value
+
+    def _load_calibration(self) -> RawCalibration:
+        """
+        讀取各啟用通道的校正表，並以 HS_Calibrate_Data_Float 探測線性轉換係數
+
+        SDK 的轉換為 電壓 = raw * scale + offset，因此以 0 與 ±CALIBRATION_PROBE_RAW
+        三點推算係數並驗證線性，之後整個區塊即可用 NumPy 一次轉換。
+        """
+        gain_table = []
+        offset_table = []
+        scales = []
+        offsets = []
+
+        for channel in self.active_channels:
+            gain_val = c_ushort()
+            offset_val = c_short()
+            if not self.dll.HS_ReadGainOffset(self.device_handle, channel, self.gain,
+                                         byref(gain_val), byref(offset_val)):
+                error_code = self.dll.HS_GetLastError()
+                raise RuntimeError(f"HS_ReadGainOffset 失敗（通道 {channel}），錯誤碼: 0x{error_code:x}")
+            gain_table.append(gain_val.value)
+            offset_table.append(offset_val.value)
+
+            v_zero = self._calibrate_point(channel, 0)
+            v_pos = self._calibrate_point(channel, CALIBRATION_PROBE_RAW)
+            v_neg = self._calibrate_point(channel, -CALIBRATION_PROBE_RAW)
+            scale = (v_pos - v_zero) / CALIBRATION_PROBE_RAW
+            if abs((v_zero - v_neg) - (v_pos - v_zero)) > 1e-4 * abs(v_pos - v_zero) + 1e-7:
+                raise RuntimeError(f"通道 {channel} 的校正轉換不是線性，無法向量化轉換")
+
+            # int16 模式儲存的是右移後的值，係數需放大對應倍數
+            scales.append(scale * (1 << self.raw_shift))
+            offsets.append(v_zero)
+            debug(f"  通道 AI{channel}: gain={gain_val.value}, offset={offset_val.value}, scale={scale:.6e}, zero={v_zero:.6f}")
+
+        return RawCalibration(
+            np.array(scales), np.array(offsets),
+            np.array(gain_table, dtype=np.uint16), np.array(offset_table, dtype=np.int16)
+        )
+
+    def _read_into(self, buffer, read_count: int) -> int:
+        """將設備緩衝區資料讀入池化緩衝區，回傳實際讀取的樣本數"""
+        if self._sync_reader is not None:
+            frames = self._sync_reader.read(self.device_handle, buffer, read_count // self.channels_count)
+            return frames * self.channels_count
+
+        if self.acquisition_mode == "float":
+            return self.dll.HS_GetAIBuffer(self.device_handle, buffer.pointer, read_count)
+
+        if self.raw_dtype == "int32":
+            return self.dll.HS_GetAIBufferHex(self.device_handle, buffer.pointer, read_count)
+
+        read_size = self.dll.HS_GetAIBufferHex(self.device_handle, self._raw_scratch_pointer, read_count)
+        if read_size > 0:
+            raw = self._raw_scratch[:read_size].view(np.int32)
+            np.right_shift(raw, self.raw_shift, out=raw)
+            np.copyto(buffer.array[:read_size], raw, casting='unsafe')
+        return read_size
+
+    def _block_view(self, buffer, read_size: int) -> np.ndarray:
+        """取得池化緩衝區上的區塊檢視（int32 原始模式以有號整數檢視）"""
+        view = buffer.array[:read_size]
+        if self.acquisition_mode == "raw" and self.raw_dtype == "int32":
+            return view.view(np.int32)
+        return view
+
+    def _register_event_callback(self) -> bool:
+        """註冊 HS_SetEventCallback（資料達到門檻時喚醒讀取執行緒），成功回傳 True"""
+        if not hasattr(self.dll, "HS_SetEventCallback") or self._sync_reader is not None:
+            # 同步輸入的資料不經過 AI 緩衝區，樣本數事件不適用
+            return False
+
+        # 事件參數為 WORD：每累積 wakeup_target_ms 毫秒的資料觸發一次
+        samples_per_wake = self.sample_rate * self.wakeup_target_ms // 1000 * self.channels_count
+        if self.target_count > 0 and self.burst_settings is None:
+            samples_per_wake = self.target_count
+        elif self._chunker is not None:
+            # 讀取區塊大小控制：目標大小可能因讀取上限或設備緩衝區安全上限而縮小
+            samples_per_wake = self._chunker.target_samples
+        event_param = max(self.channels_count, min(samples_per_wake, 0xFFFF))
+
+        def _on_event():
+            self._data_event.set()
+
+        self._event_callback = EVENT_CALLBACK(_on_event)
+        try:
+            ret = self.dll.HS_SetEventCallback(
+                self.device_handle,
+                EVENT_N_SAMPLE_REACH,
+                event_param,
+                cast(self._event_callback, c_void_p),
+                None
+            )
+        except Exception as e:
+            warning(f"註冊事件回呼時發生錯誤: {e}")
+            ret = 1
+
+        if ret != 0:
+            self._event_callback = None
+            return False
+
+        self._callback_registered = True
+        debug(f"事件回呼已註冊（每 {event_param} 個樣本喚醒一次）")
+        return True
+
+    def _remove_event_callback(self) -> None:
+        """移除事件回呼"""
+        if self._callback_registered and self.device_handle:
+            try:
+                self.dll.HS_RemoveEventCallback(self.device_handle, EVENT_N_SAMPLE_REACH)
+            except Exception as e:
+                warning(f"移除事件回呼時發生錯誤: {e}")
+        self._callback_registered = False
+        self._event_callback = None
+
+    def _new_poller(self) -> AdaptivePoller:
+        """建立自適應輪詢間隔計算器（讀取區塊大小控制啟用時以控制器的目標大小為喚醒目標）"""
+        poller = AdaptivePoller(self.sample_rate * self.channels_count, self.wakeup_target_ms)
+        if self._chunker is not None:
+            poller.target_samples = self._chunker.target_samples
+        return poller
+
+    def _create_chunker(self) -> Optional[ChunkController]:
+        """建立讀取區塊大小控制器（chunk_mode = off、N Sample 模式與定時擷取時回傳 None）"""
+        if self.chunk_mode == "off" or self.target_count > 0 or self.burst_settings is not None:
+            return None
+        # 設備緩衝區容量：設定檔未指定時使用後端提供的值（模擬設備為 sim_buffer_samples）
+        capacity = self.device_buffer_samples or int(getattr(self.dll, "buffer_samples", 0))
+        chunker = ChunkController(
+            self.chunk_mode, self.sample_rate * self.channels_count, self.channels_count,
+            self.chunk_target_ms, self.buffer_pool.block_capacity, capacity, self.chunk_safety_fraction
+        )
+        if chunker.target_samples < self.sample_rate * self.chunk_target_ms // 1000 * self.channels_count:
+            warning(f"chunk_target_ms = {self.chunk_target_ms} 超過讀取緩衝區容量（buffer_block_ms）或設備緩衝區安全上限，"
+                    f"區塊大小限制為 {chunker.target_samples // self.channels_count} frames")
+        if not capacity:
+            debug("設備緩衝區容量未知（device_buffer_samples = 0），不檢查安全上限")
+        debug(f"讀取區塊大小控制: 模式={chunker.mode}, 目標={chunker.target_samples // self.channels_count} frames, "
+              f"安全上限={chunker.safety_limit} 個樣本")
+        return chunker
+
+    def _wait_for_data(self, available: int) -> None:
+        """
+        等待設備緩衝區累積資料（事件模式等待回呼，輪詢模式依填入速率計算等待時間）
+
+        讀取區塊大小控制啟用且緩衝區已有部分資料時，事件模式也改為依填入速率等待剩餘的量，
+        避免資料略少於目標時多等一整個事件週期。
+        """
+        self.reader_stats.wakeups += 1
+        if self._callback_registered and (self._chunker is None or available <= 0):
+            # 設定逾時作為保險，避免事件遺失時讀取執行緒停滯
+            self._data_event.wait(timeout=self._poller.max_interval)
+            self._data_event.clear()
+            return
+
+        interval = self._poller.next_interval(available)
+        if self._chunker is not None:
+            interval = self._chunker.limit_wait(interval, available, self._poller.fill_rate)
+        if interval > 0:
+            time.sleep(interval)
+        self._data_event.clear()
+
+    def _get_buffer_status(self, status: c_ushort, count: c_ulong) -> bool:
+        """取得設備緩衝區狀態與樣本數（同步輸入模式以 frame 數乘上通道數換算為樣本數）"""
+        if self._sync_reader is None:
+            return self.dll.HS_GetAIBufferStatus(self.device_handle, byref(status), byref(count))
+        frames = c_uint32()
+        if not self.dll.HS_GetSyncInBufferStatus(self.device_handle, byref(status), byref(frames)):
+            return False
+        count.value = frames.value * self.channels_count
+        return True
+
+    def _total_status_function(self) -> Optional[str]:
+        """樣本總數查詢使用的函數名稱（函式庫不支援時回傳 None）"""
+        name = "HS_GetSyncInTotalSamplingStatus" if self._sync_reader is not None else "HS_GetTotalSamplingStatus"
+        return name if hasattr(self.dll, name) else None
+
+    def _query_total_sampled(self) -> Optional[int]:
+        """查詢設備已取樣的總樣本數（HS_GetTotalSamplingStatus；不支援或失敗時回傳 None）"""
+        name = self._total_status_function()
+        if name is None:
+            return None
+        total = c_uint32()
+        sampling_status = c_uint32()
+        try:
+            if getattr(self.dll, name)(self.device_handle, byref(total), byref(sampling_status)):
+                # 同步輸入模式回傳的是 frame 數
+                return total.value * self.channels_count if self._sync_reader is not None else total.value
+        except Exception as e:
+            debug(f"查詢樣本總數時發生錯誤: {e}")
+        return None
+
+    def _account_device_loss(self, device_total: int, total_read: int, buffered: int) -> int:
+        """
+        比對設備取樣總數與已讀取 + 緩衝區中的樣本數，回傳新增的遺失樣本數
+
+        device_total 需在 buffered 之前查詢：兩次呼叫之間新進的樣本只會使差值偏小，
+        不會誤判為遺失；遺失數為累計值，偏小的部分會在下一次比對時補上。
+        """
+        # 設備計數器為 32 位元，回繞後以模數運算比對（total_read 為不回繞的累計值）；
+        # 同步輸入模式的計數器單位為 frame，換算為樣本數後的模數乘上通道數
+        modulus = DEVICE_COUNTER_MODULUS * (self.channels_count if self._sync_reader is not None else 1)
+        lost = (device_total - total_read - buffered) % modulus
+        if lost >= modulus // 2:
+            return 0
+
+        stats = self.reader_stats
+        counted = stats.device_lost_samples - self._loss_base
+        if lost <= counted:
+            return 0
+        new_lost = lost - counted
+        stats.device_lost_samples = self._loss_base + lost
+        warning(f"[{self.device_id}] 設備端遺失 {new_lost} 個樣本（累計 {stats.device_lost_samples}）")
+        return new_lost
+
+    def _clear_ai_buffer(self) -> bool:
+        """清除設備緩衝區（溢位後繼續讀取用），成功回傳 True"""
+        name = "HS_ClearSyncInBuffer" if self._sync_reader is not None else "HS_ClearAIBuffer"
+        if not hasattr(self.dll, name):
+            return False
+        try:
+            return bool(getattr(self.dll, name)(self.device_handle))
+        except Exception as e:
+            warning(f"清除緩衝區時發生錯誤: {e}")
+            return False
+
+    def get_reader_stats(self) -> dict:
+        """取得讀取執行緒統計（喚醒模式、每個樣本耗用的 CPU 時間、連線狀態與重新連線統計）"""
+        if self.reader_stats is None:
+            return {}
+        stats = self.reader_stats.to_dict()
+        if self.link_stats is not None:
+            stats['link'] = self.link_stats.to_dict()
+        if self.burst_schedule is not None:
+            stats['burst'] = self.burst_schedule.to_dict()
+        if self._chunker is not None:
+            stats['chunk'] = self._chunker.to_dict()
+        return stats
+
+    def get_link_state(self) -> Optional[str]:
+        """取得連線狀態（connected / reconnecting / down；未開始讀取時為 None）"""
+        if self.link_stats is None:
+            return None
+        return self.link_stats.state
+
+    def is_reading(self) -> bool:
+        """讀取執行緒是否正在執行"""
+        return self.reading_thread is not None and self.reading_thread.is_alive()
+
     def start_reading(self) -> None:
         """開始讀取振動數據"""
         if self.reading:
@@ -252,60 +753,208 @@ class PET7H24M:
             error("設備未初始化！")
             return
 
+        if self.capture_mode == DEVICE_LOG_MODE:
+            self._start_logging()
+            return
+
+        # 設定喚醒方式（事件回呼需在啟動掃描前註冊）
+        self._data_event.clear()
+        self._chunker = self._create_chunker()
+        self._poller = self._new_poller()
+        use_event = False
+        if self.wakeup_mode in ("auto", "event"):
+            use_event = self._register_event_callback()
+            if not use_event and self.wakeup_mode == "event":
+                warning("無法註冊事件回呼，改用自適應輪詢")
+            elif not use_event:
+                debug("事件回呼不可用，使用自適應輪詢")
+        self.reader_stats = ReaderStats("event" if use_event else "adaptive_poll")
+        self.link_stats = LinkStats()
+        self._loss_base = 0
+
+        if self.burst_settings is not None:
+            # 定時擷取：掃描由讀取執行緒依排程啟動與停止
+            self.burst_schedule = BurstSchedule(self.burst_settings)
+            self._scan_start = time.monotonic()
+            self.reading = True
+            self.reading_thread = threading.Thread(target=self._burst_loop)
+            self.reading_thread.daemon = True
+            self.reading_thread.start()
+            debug("定時擷取執行緒已啟動。")
+            return
+
         # 啟動掃描
         debug("正在啟動類比輸入掃描...")
-        ret = dll.HS_StartAIScan(self.device_handle)
+        ret = self.dll.HS_StartAIScan(self.device_handle)
         if not ret:
-            error_code = dll.HS_GetLastError()
+            error_code = self.dll.HS_GetLastError()
             error(f"啟動掃描失敗！錯誤碼: 0x{error_code:x}")
             return
 
+        self._scan_start = time.monotonic()
         self.reading = True
         self.reading_thread = threading.Thread(target=self._read_loop)
         self.reading_thread.daemon = True
         self.reading_thread.start()
         debug("讀取執行緒已啟動。")
 
+    def _start_logging(self) -> None:
+        """設備記錄模式：啟動資料記錄器與掃描，讀取執行緒只負責即時預覽"""
+        settings = self.logger_settings
+        os.makedirs(settings.log_dir, exist_ok=True)
+        if not self.dll.HS_StartLogger(self.device_handle, settings.log_dir.encode("utf-8"),
+                                       settings.interval, settings.file_type_code):
+            error_code = self.dll.HS_GetLastError()
+            error(f"啟動資料記錄器失敗！錯誤碼: 0x{error_code:x}")
+            return
+        self._logger_started = True
+
+        debug("正在啟動類比輸入掃描（資料記錄器）...")
+        if not self.dll.HS_StartAIScan(self.device_handle):
+            error_code = self.dll.HS_GetLastError()
+            error(f"啟動掃描失敗！錯誤碼: 0x{error_code:x}")
+            self._stop_logger()
+            return
+
+        self._data_event.clear()
+        self.reader_stats = ReaderStats(DEVICE_LOG_MODE)
+        self._scan_start = time.monotonic()
+        self.reading = True
+        self.reading_thread = threading.Thread(target=self._preview_loop)
+        self.reading_thread.daemon = True
+        self.reading_thread.start()
+        info(f"[{self.device_id}] 資料記錄器已啟動: {settings.log_dir}")
+
+    def _stop_logger(self) -> None:
+        """停止資料記錄器（記錄器未啟動時不做任何事）"""
+        if not self._logger_started:
+            return
+        self._logger_started = False
+        try:
+            if not self.dll.HS_StopLogger(self.device_handle):
+                error_code = self.dll.HS_GetLastError()
+                warning(f"停止資料記錄器失敗，錯誤碼: 0x{error_code:x}")
+            else:
+                debug("資料記錄器已停止。")
+        except Exception as e:
+            error(f"停止資料記錄器時發生錯誤: {e}")
+
     def stop_reading(self) -> None:
         """停止讀取振動數據並清理資源"""
         if self.reading:
             self.reading = False
+            self._data_event.set()
             if self.reading_thread and self.reading_thread.is_alive():
                 self.reading_thread.join()
+        self._remove_event_callback()
 
         # 停止掃描
         if self.device_handle:
             try:
-                dll.HS_StopAIScan(self.device_handle)
+                self.dll.HS_StopAIScan(self.device_handle)
                 debug("掃描已停止。")
             except Exception as e:
                 error(f"停止掃描時發生錯誤: {e}")
+            self._stop_logger()
 
-        # 重置計數器和清空佇列
+        # 重置計數器和清空佇列（歸還區塊的緩衝區）
         self.counter = 0
-        while not self.data_queue.empty():
-            try:
-                self.data_queue.get_nowait()
-            except queue.Empty:
-                break
+        self.data_queue.clear()
 
         # 釋放設備連線
         if self.device_handle:
             try:
-                dll.HS_Device_Release(self.device_handle)
+                self.dll.HS_Device_Release(self.device_handle)
                 self.device_handle = None
                 debug("設備連線已釋放。")
             except Exception as e:
                 error(f"釋放設備連線時發生錯誤: {e}")
 
+    def _release_connection(self) -> None:
+        """釋放目前的連線（連線中斷後、重新連線前呼叫；連線已中斷，失敗只記錄除錯訊息）"""
+        self._remove_event_callback()
+        if not self.device_handle:
+            return
+        for name in ("HS_StopAIScan", "HS_Device_Release"):
+            try:
+                getattr(self.dll, name)(self.device_handle)
+            except Exception as e:
+                debug(f"{name} 失敗: {e}")
+        self.device_handle = None
+
+    def _can_reconnect(self) -> bool:
+        """連線中斷時是否重新連線（N Sample 模式讀取目標樣本後即結束，不重新連線）"""
+        return self.reconnect_settings.enabled and self.target_count == 0
+
+    def _reconnect(self, reason: str) -> bool:
+        """
+        斷線重新連線（在讀取執行緒內呼叫）
+
+        釋放舊連線後依 reconnect_initial_ms / reconnect_max_ms 指數退避，重新執行 HS_Device_Create、
+        HS_SetAIScanParam（與硬體觸發、同步輸入設定）與 HS_StartAIScan。
+        成功回傳 True；停止收集或超過 reconnect_max_attempts 時回傳 False。
+        """
+        link = self.link_stats
+        link.link_lost(reason)
+        warning(f"[{self.device_id}] 連線中斷（{reason}），開始重新連線")
+        self._release_connection()
+
+        attempt = 0
+        for delay in self.reconnect_settings.delays():
+            # stop_reading 會設定 _data_event，退避等待中也能立即結束
+            self._data_event.wait(delay)
+            self._data_event.clear()
+            if not self.reading:
+                break
+            attempt += 1
+            try:
+                self._connect()
+                if self.capture_mode == "hw_trigger" and not self._set_analog_trigger():
+                    raise RuntimeError("無法重新設定硬體類比觸發")
+                if self.reader_stats.mode == "event" and not self._register_event_callback():
+                    warning(f"[{self.device_id}] 重新連線後無法註冊事件回呼，改用自適應輪詢")
+                    self.reader_stats.mode = "adaptive_poll"
+                if not self.dll.HS_StartAIScan(self.device_handle):
+                    error_code = self.dll.HS_GetLastError()
+                    raise RuntimeError(f"啟動掃描失敗，錯誤碼: 0x{error_code:x}")
+            except Exception as e:
+                link.attempt_failed(str(e))
+                warning(f"[{self.device_id}] 第 {attempt} 次重新連線失敗: {e}")
+                self._release_connection()
+                continue
+            return True
+
+        link.gave_up()
+        if self.reading:
+            error(f"[{self.device_id}] 重新連線 {attempt} 次皆失敗，停止讀取")
+        return False
+
     def _read_loop(self) -> None:
         """讀取振動數據（主要讀取迴圈，在獨立執行緒中執行）"""
         consecutive_errors = 0
         max_consecutive_errors = 5
-        total_samples_read = 0  # 累計讀取的樣本數（用於 N Sample 模式）
+        total_samples_read = 0  # 目前連線累計讀取的樣本數（用於 N Sample 模式與設備取樣總數比對）
+        frame_cursor = 0        # 下一個區塊的序號（包含遺失的 frame）
+        pending_lost = 0        # 已偵測但尚未插入序號的遺失樣本數
+        conn_origin = 0         # 目前連線開始掃描時的序號
+        link_lost: Optional[str] = None  # 偵測到連線中斷的原因（下一輪重新連線）
+        # 硬體觸發時設備只傳送事件視窗，取樣總數無法與已讀取的樣本數比對
+        check_total = (self.sample_check_ms > 0 and self.capture_mode != "hw_trigger"
+                       and self._total_status_function() is not None)
+        # 硬體觸發：每個事件視窗的樣本數、目前視窗已讀取的樣本數與事件編號
+        hw_window = self.trigger_settings.window_frames * self.channels_count if self.capture_mode == "hw_trigger" else 0
+        window_read = 0
+        event_id = -1
+        next_check = 0.0
+        pool = self.buffer_pool
+        stats = self.reader_stats
+        link = self.link_stats
+        poller = self._poller
+        chunker = self._chunker
+        stats.start()
 
         try:
-            debug("讀取迴圈已啟動...")
+            debug(f"讀取迴圈已啟動...（喚醒方式: {stats.mode}）")
             if self.target_count > 0:
                 debug(f"N Sample 模式：目標樣本數 = {self.target_count}")
             else:
@@ -313,38 +962,95 @@ class PET7H24M:
             
             while self.reading:
                 try:
+                    if link_lost is not None:
+                        if not self._reconnect(link_lost):
+                            break
+                        link_lost = None
+                        # 中斷期間的樣本：以舊連線的掃描時間推算應有的 frame 數，序號跳過未讀到的部分（消費者寫入缺漏標記）
+                        expected = conn_origin + int((time.monotonic() - self._scan_start) * self.sample_rate)
+                        gap_frames = max(0, expected - frame_cursor)
+                        frame_cursor += gap_frames
+                        if gap_frames:
+                            stats.gaps += 1
+                            stats.device_lost_samples += gap_frames * self.channels_count
+                        link.reconnected(gap_frames * self.channels_count)
+                        info(f"[{self.device_id}] 重新連線成功（耗時 {link.last_reconnect_ms:.0f} ms，"
+                             f"中斷期間遺失 {gap_frames} frames），繼續讀取")
+                        # 新連線的設備取樣總數與緩衝區從零開始
+                        self._scan_start = time.monotonic()
+                        self._loss_base = stats.device_lost_samples
+                        conn_origin = frame_cursor
+                        total_samples_read = 0
+                        pending_lost = 0
+                        window_read = 0
+                        consecutive_errors = 0
+                        next_check = 0.0
+                        poller = self._poller = self._new_poller()
+                        continue
+
+                    # 定期查詢設備取樣總數（必須在查詢緩衝區狀態之前）
+                    device_total = None
+                    if check_total and time.monotonic() >= next_check:
+                        device_total = self._query_total_sampled()
+                        next_check = time.monotonic() + self.sample_check_ms / 1000.0
+
                     # 取得緩衝區狀態（參考官方範例）
                     buffer_status = c_ushort()
                     buffer_cnt = c_ulong()
                     
-                    ret = dll.HS_GetAIBufferStatus(
-                        self.device_handle,
-                        byref(buffer_status),
-                        byref(buffer_cnt)
-                    )
+                    ret = self._get_buffer_status(buffer_status, buffer_cnt)
                     
                     if not ret:
-                        error_code = dll.HS_GetLastError()
+                        error_code = self.dll.HS_GetLastError()
                         error(f"取得緩衝區狀態失敗！錯誤碼: 0x{error_code:x}")
                         consecutive_errors += 1
                         if consecutive_errors >= max_consecutive_errors:
+                            if self._can_reconnect():
+                                link_lost = f"連續 {max_consecutive_errors} 次無法取得緩衝區狀態"
+                                continue
                             error(f"連續 {max_consecutive_errors} 次錯誤，停止讀取")
                             break
                         time.sleep(0.1)
                         continue
 
+                    poller.observe(total_samples_read, buffer_cnt.value)
+
+                    if device_total is not None:
+                        pending_lost += self._account_device_loss(device_total, total_samples_read, buffer_cnt.value)
+
                     # 檢查緩衝區狀態錯誤（參考官方範例）
                     status_value = buffer_status.value
                     if (status_value & 0x02) == 0x02:
-                        error_code = dll.HS_GetLastError()
+                        error_code = self.dll.HS_GetLastError()
                         error(f"AI 緩衝區溢位！錯誤碼: 0x{error_code:x}")
-                        dll.HS_StopAIScan(self.device_handle)
+                        stats.overflows += 1
+                        if self.overflow_action == "continue" and self._clear_ai_buffer():
+                            if not check_total:
+                                # 無法比對樣本總數時，至少將被清除的樣本計入缺漏
+                                pending_lost += buffer_cnt.value
+                                stats.device_lost_samples += buffer_cnt.value
+                            warning("已清除設備緩衝區並繼續讀取（遺失的樣本以缺漏記錄）")
+                            next_check = 0.0
+                            continue
+
+                        # 停止前最後一次比對，記錄遺失的樣本數
+                        if check_total:
+                            final_total = self._query_total_sampled()
+                            if final_total is not None:
+                                self._account_device_loss(final_total, total_samples_read, buffer_cnt.value)
+                        self.dll.HS_StopAIScan(self.device_handle)
                         break
                     elif (status_value & 0x04) == 0x04:
                         error("AI 掃描已停止")
+                        if self._can_reconnect():
+                            link_lost = "AI 掃描已停止"
+                            continue
                         break
                     elif (status_value & 0x08) == 0x08:
                         error("其他錯誤")
+                        if self._can_reconnect():
+                            link_lost = "設備回報錯誤"
+                            continue
                         break
 
                     # 決定是否讀取資料
@@ -355,6 +1061,10 @@ class PET7H24M:
                         if buffer_cnt.value >= self.target_count:
                             should_read = True
                             debug(f"達到目標樣本數 {self.target_count}，開始讀取")
+                    elif chunker is not None:
+                        # 讀取區塊大小控制：累積到目標大小（或超過安全上限）才讀取
+                        chunk_count = chunker.read_size(buffer_cnt.value)
+                        should_read = chunk_count > 0
                     else:
                         # AI Buffer Continue 模式：有資料就讀取
                         if buffer_cnt.value > 0:
@@ -365,52 +1075,91 @@ class PET7H24M:
                         # 在 N Sample 模式下，讀取目標數量；在 Continue 模式下，讀取所有可用資料
                         if self.target_count > 0:
                             read_count = min(buffer_cnt.value, self.target_count)
+                        elif chunker is not None:
+                            read_count = chunk_count
                         else:
                             read_count = buffer_cnt.value
                         
-                        # 確保讀取數量是通道數的倍數
+                        # 單次讀取不超過緩衝區容量，且確保讀取數量是通道數的倍數
+                        read_count = min(read_count, pool.block_capacity)
+                        if hw_window:
+                            # 區塊不跨越事件視窗，輸出端依 event_id 切換檔案
+                            read_count = min(read_count, hw_window - window_read)
                         read_count = read_count - (read_count % self.channels_count)
                         
                         if read_count > 0:
-                            # 建立浮點數陣列緩衝區（參考官方範例）
-                            fdata_buffer = (c_float * read_count)()
+                            # 從緩衝區池取得緩衝區，由 HS_GetAIBuffer / HS_GetAIBufferHex 直接寫入（不經過 Python 物件轉換）
+                            buffer = pool.acquire()
                             
-                            # 讀取資料
-                            read_size = dll.HS_GetAIBuffer(
-                                self.device_handle,
-                                fdata_buffer,
-                                read_count
-                            )
+                            # 讀取資料（失敗時歸還緩衝區，再交由下方的錯誤處理計數與重新連線）
+                            try:
+                                read_size = self._read_into(buffer, read_count)
+                            except Exception:
+                                pool.release(buffer)
+                                raise
                             
                             if read_size > 0:
-                                # 轉換為 Python 列表
-                                processed_data = [float(fdata_buffer[i]) for i in range(read_size)]
-                                
-                                # 將處理後的數據放入佇列
+                                # 設備端遺失的樣本：序號跳過對應的 frame 數，消費者據此寫入缺漏標記
+                                gap_frames = pending_lost // self.channels_count
+                                if gap_frames:
+                                    pending_lost -= gap_frames * self.channels_count
+                                    frame_cursor += gap_frames
+                                    stats.gaps += 1
+
+                                if hw_window and window_read == 0:
+                                    # 新事件：以掃描經過時間減去緩衝區中的資料量估計事件起點的序號
+                                    event_id += 1
+                                    stats.events += 1
+                                    elapsed_frames = conn_origin + int((time.monotonic() - self._scan_start) * self.sample_rate)
+                                    frame_cursor = max(frame_cursor, elapsed_frames - buffer_cnt.value // self.channels_count)
+
+                                # 區塊交給多個消費者共用（唯讀），最後一個消費者釋放後歸還緩衝區（建立失敗時由此歸還）
                                 try:
-                                    self.data_queue.put_nowait(processed_data)
-                                except queue.Full:
-                                    # 佇列滿了，移除最舊的數據
-                                    try:
-                                        self.data_queue.get_nowait()
-                                        self.data_queue.put_nowait(processed_data)
-                                    except queue.Empty:
-                                        pass
+                                    processed_data = SampleBlock(
+                                        self._block_view(buffer, read_size), buffer, pool, self.calibration,
+                                        device_id=self.device_id,
+                                        start_index=frame_cursor,
+                                        aux=buffer.aux[:read_size // self.channels_count] if buffer.aux is not None else None
+                                    )
+                                except Exception:
+                                    pool.release(buffer)
+                                    raise
+                                processed_data.event_id = event_id
+                                frame_cursor += read_size // self.channels_count
+                                if hw_window:
+                                    window_read = (window_read + read_size) % hw_window
+                                
+                                # 將處理後的數據放入佇列（滿載時依 data_queue_policy 處理，丟棄的區塊計入統計）
+                                if not self.data_queue.put(processed_data):
+                                    processed_data.release()
+                                stats.dropped_blocks = self.data_queue.dropped_items
+                                stats.dropped_samples = self.data_queue.dropped_samples
                                 
                                 self.counter += 1
                                 total_samples_read += read_size
                                 consecutive_errors = 0
+                                stats.samples += read_size
+                                stats.reads += 1
+                                stats.record_read(buffer_cnt.value / float(self.sample_rate * self.channels_count),
+                                                  read_size // self.channels_count)
+                                stats.update()
+                                link.data_received()
                                 
                                 # N Sample 模式：達到目標後停止
                                 if self.target_count > 0 and total_samples_read >= self.target_count:
                                     debug(f"已讀取 {total_samples_read} 個樣本，達到目標 {self.target_count}，停止讀取")
                                     self.reading = False
                                     break
+
+                                # 設備緩衝區已讀空時等待下一批資料，否則立即繼續讀取
+                                if read_size >= buffer_cnt.value:
+                                    self._wait_for_data(0)
                             else:
+                                pool.release(buffer)
                                 warning("未讀取到資料")
                         else:
                             # 資料不足一個完整通道組，等待更多資料
-                            time.sleep(0.001)  # 1ms
+                            self._wait_for_data(buffer_cnt.value)
                     else:
                         # 尚未達到讀取條件，短暫休息
                         if self.target_count > 0:
@@ -420,12 +1169,15 @@ class PET7H24M:
                                 # 只在進度達到 10% 的倍數時輸出，避免產生過多日誌
                                 if int(progress) % 10 == 0:
                                     debug(f"等待資料中... 緩衝區: {buffer_cnt.value}/{self.target_count} ({progress:.1f}%)")
-                        time.sleep(0.001)  # 1ms
+                        self._wait_for_data(buffer_cnt.value)
 
                 except Exception as e:
                     consecutive_errors += 1
                     error(f"讀取資料時發生錯誤: {e}")
                     if consecutive_errors >= max_consecutive_errors:
+                        if self._can_reconnect() and link_lost is None:
+                            link_lost = f"連續 {max_consecutive_errors} 次讀取錯誤"
+                            continue
                         error(f"連續 {max_consecutive_errors} 次錯誤，停止讀取")
                         break
                     time.sleep(0.1)
@@ -433,14 +1185,277 @@ class PET7H24M:
         except Exception as e:
             error(f"讀取迴圈發生嚴重錯誤: {e}")
         finally:
+            stats.update()
+            summary = stats.to_dict()
+            info(f"讀取統計: 模式={summary['mode']}, 樣本數={summary['samples']}, 喚醒次數={summary['wakeups']}, "
+                 f"CPU/樣本={summary['cpu_per_sample_us']} µs, CPU 負載={summary['cpu_load'] * 100:.1f}%")
+            if summary['device_lost_samples'] or summary['dropped_samples'] or summary['overflows']:
+                warning(f"遺失統計: 設備端遺失={summary['device_lost_samples']}, 佇列丟棄={summary['dropped_samples']}, "
+                        f"溢位次數={summary['overflows']}, 缺漏次數={summary['gaps']}")
+            if link.link_losses:
+                link_summary = link.to_dict()
+                warning(f"連線統計: 中斷次數={link_summary['link_losses']}, 重新連線次數={link_summary['reconnects']}, "
+                        f"最長重新連線耗時={link_summary['max_reconnect_ms']} ms, "
+                        f"累計中斷時間={link_summary['total_outage_s']} s")
             debug("讀取迴圈已結束。")
 
-    def get_data(self) -> List[float]:
-        """取得最新的振動數據（非阻塞式，從佇列中取出）"""
+    def _burst_loop(self) -> None:
+        """
+        定時擷取迴圈（在獨立執行緒中執行）
+
+        依排程啟動掃描，讀取一段 N Sample 資料後停止掃描（連線保持開啟）。每段的區塊以 event_id 標示，
+        start_index 為該段開始時距離收集開始的 frame 數，輸出端據此切換檔案並計算時間戳記。
+        """
+        schedule = self.burst_schedule
+        stats = self.reader_stats
+        stats.start()
+
+        try:
+            debug(f"定時擷取迴圈已啟動...（{self.burst_settings.describe()}）")
+            while self.reading and not schedule.finished():
+                start_at = schedule.schedule(datetime.now())
+                if start_at > datetime.now():
+                    debug(f"下一段擷取: {start_at.strftime('%Y-%m-%d %H:%M:%S')}")
+                if not self._wait_until(start_at):
+                    break
+
+                event_id = schedule.started
+                schedule.begin(start_at)
+                began = time.monotonic()
+                frames = self._read_burst(event_id)
+                complete = frames >= self.burst_settings.frames
+                schedule.end(complete, time.monotonic() - began)
+                stats.events = schedule.started
+                stats.update()
+                if complete:
+                    info(f"[{self.device_id}] 第 {event_id + 1} 段擷取完成（{frames} frames，"
+                         f"{schedule.last_duration_s:.2f} 秒）")
+                else:
+                    warning(f"[{self.device_id}] 第 {event_id + 1} 段擷取未完成（{frames}/{self.burst_settings.frames} frames）")
+
+            if schedule.finished():
+                info(f"[{self.device_id}] 已完成 {schedule.started} 段定時擷取，停止讀取")
+                self.reading = False
+
+        except Exception as e:
+            error(f"定時擷取迴圈發生嚴重錯誤: {e}")
+        finally:
+            stats.update()
+            summary = schedule.to_dict()
+            info(f"定時擷取統計: 完成={summary['completed']}, 未完成={summary['incomplete']}, "
+                 f"略過的間隔={summary['skipped']}, 樣本數={stats.samples}")
+            debug("定時擷取迴圈已結束。")
+
+    def _wait_until(self, start_at: datetime) -> bool:
+        """等待到排定的時間（停止收集時回傳 False；每秒重新比對系統時間）"""
+        while self.reading:
+            delay = (start_at - datetime.now()).total_seconds()
+            if delay <= 0:
+                return True
+            self._data_event.wait(min(delay, 1.0))
+            self._data_event.clear()
+        return False
+
+    def _read_burst(self, event_id: int) -> int:
+        """啟動掃描並讀取一段資料，回傳讀取到的 frame 數（結束時停止掃描，不釋放連線）"""
+        channels = self.channels_count
+        burst_samples = self.burst_settings.frames * channels
+        pool = self.buffer_pool
+        stats = self.reader_stats
+        max_consecutive_errors = 5
+
+        if event_id > 0:
+            # 清除上一段結束後殘留在設備緩衝區的資料
+            self._clear_ai_buffer()
+        if not self.dll.HS_StartAIScan(self.device_handle):
+            error_code = self.dll.HS_GetLastError()
+            error(f"[{self.device_id}] 啟動第 {event_id + 1} 段擷取失敗！錯誤碼: 0x{error_code:x}")
+            return 0
+
+        origin = int((time.monotonic() - self._scan_start) * self.sample_rate)
+        poller = self._poller = AdaptivePoller(self.sample_rate * channels, self.wakeup_target_ms)
+        # 設備未在預期時間內產生一段資料時放棄該段（例如連線中斷）
+        deadline = time.monotonic() + self.burst_settings.frames / self.sample_rate * 2 + 5.0
+        collected = 0
+        consecutive_errors = 0
+        try:
+            while self.reading and collected < burst_samples:
+                if time.monotonic() > deadline:
+                    error(f"[{self.device_id}] 第 {event_id + 1} 段擷取逾時")
+                    break
+
+                buffer_status = c_ushort()
+                buffer_cnt = c_ulong()
+                if not self._get_buffer_status(buffer_status, buffer_cnt):
+                    error_code = self.dll.HS_GetLastError()
+                    error(f"取得緩衝區狀態失敗！錯誤碼: 0x{error_code:x}")
+                    consecutive_errors += 1
+                    if consecutive_errors >= max_consecutive_errors:
+                        break
+                    time.sleep(0.1)
+                    continue
+                consecutive_errors = 0
+                poller.observe(collected, buffer_cnt.value)
+
+                status_value = buffer_status.value
+                if status_value & 0x02:
+                    error_code = self.dll.HS_GetLastError()
+                    error(f"AI 緩衝區溢位！錯誤碼: 0x{error_code:x}")
+                    stats.overflows += 1
+                    break
+                if status_value & 0x08:
+                    error("其他錯誤")
+                    break
+
+                read_count = min(buffer_cnt.value, burst_samples - collected, pool.block_capacity)
+                read_count -= read_count % channels
+                if read_count <= 0:
+                    if status_value & 0x04:
+                        # 掃描已停止且緩衝區已讀空
+                        break
+                    self._wait_for_data(buffer_cnt.value)
+                    continue
+
+                # 讀取或建立區塊失敗時歸還緩衝區（區塊建立後由最後一個消費者歸還）
+                buffer = pool.acquire()
+                try:
+                    read_size = self._read_into(buffer, read_count)
+                    if read_size > 0:
+                        block = SampleBlock(
+                            self._block_view(buffer, read_size), buffer, pool, self.calibration,
+                            device_id=self.device_id, start_index=origin + collected // channels
+                        )
+                except Exception:
+                    pool.release(buffer)
+                    raise
+                if read_size <= 0:
+                    pool.release(buffer)
+                    self._wait_for_data(0)
+                    continue
+                block.event_id = event_id
+                if not self.data_queue.put(block):
+                    block.release()
+                stats.dropped_blocks = self.data_queue.dropped_items
+                stats.dropped_samples = self.data_queue.dropped_samples
+
+                self.counter += 1
+                collected += read_size
+                stats.samples += read_size
+                stats.reads += 1
+                stats.record_read(buffer_cnt.value / float(self.sample_rate * channels), read_size // channels)
+                stats.update()
+                self.link_stats.data_received()
+                if collected < burst_samples and read_size >= buffer_cnt.value:
+                    self._wait_for_data(0)
+        finally:
+            try:
+                self.dll.HS_StopAIScan(self.device_handle)
+            except Exception as e:
+                warning(f"停止掃描時發生錯誤: {e}")
+        return collected // channels
+
+    def _preview_loop(self) -> None:
+        """
+        設備記錄模式的預覽迴圈（在獨立執行緒中執行）
+
+        掃描資料由函式庫寫入記錄檔，這裡只以 HS_ReadAIALL 依 preview_rate 單點讀取，
+        累積 preview_block_ms 毫秒後以區塊送入 data_queue 供網頁顯示（start_index 為預覽 frame 的序號）。
+        """
+        settings = self.logger_settings
+        interval = 1.0 / settings.preview_rate
+        block_frames = settings.preview_block_frames()
+        channels = self.channels_count
+        values = (c_float * channels)()
+        pool = self.buffer_pool
+        stats = self.reader_stats
+        consecutive_errors = 0
+        max_consecutive_errors = 5
+        frame_cursor = 0
+        buffer = None
+        filled = 0
+        next_read = time.monotonic()
+        stats.start()
+
+        if not hasattr(self.dll, "HS_ReadAIALL"):
+            warning("HSDAQ 函式庫不支援 HS_ReadAIALL，設備記錄模式沒有即時預覽")
+            return
+
+        try:
+            debug(f"預覽迴圈已啟動...（{settings.preview_rate} Hz，每個區塊 {block_frames} frames）")
+            while self.reading:
+                delay = next_read - time.monotonic()
+                if delay > 0:
+                    self._data_event.wait(delay)
+                    if not self.reading:
+                        break
+                # 落後超過一個間隔時不補讀，從現在重新計時
+                next_read = max(next_read + interval, time.monotonic())
+
+                try:
+                    if not self.dll.HS_ReadAIALL(self.device_handle, self.gain, values, channels):
+                        error_code = self.dll.HS_GetLastError()
+                        raise RuntimeError(f"HS_ReadAIALL 失敗，錯誤碼: 0x{error_code:x}")
+                except Exception as e:
+                    consecutive_errors += 1
+                    warning(f"預覽讀取失敗: {e}")
+                    if consecutive_errors >= max_consecutive_errors:
+                        error(f"連續 {max_consecutive_errors} 次錯誤，停止預覽（資料記錄器仍繼續記錄）")
+                        break
+                    continue
+                consecutive_errors = 0
+
+                if buffer is None:
+                    buffer = pool.acquire()
+                    filled = 0
+                buffer.array[filled * channels:(filled + 1) * channels] = values
+                filled += 1
+                stats.reads += 1
+                if filled < block_frames:
+                    continue
+
+                block = SampleBlock(buffer.array[:filled * channels], buffer, pool,
+                                    device_id=self.device_id, start_index=frame_cursor)
+                buffer = None
+                frame_cursor += filled
+                if not self.data_queue.put(block):
+                    block.release()
+                stats.dropped_blocks = self.data_queue.dropped_items
+                stats.dropped_samples = self.data_queue.dropped_samples
+                stats.samples += filled * channels
+                self.counter += 1
+                stats.update()
+
+        except Exception as e:
+            error(f"預覽迴圈發生嚴重錯誤: {e}")
+        finally:
+            if buffer is not None:
+                pool.release(buffer)
+            stats.update()
+            debug("預覽迴圈已結束。")
+
+    def get_data(self) -> Optional[SampleBlock]:
+        """
+        取得最新的振動數據區塊（非阻塞式，從佇列中取出；無資料時回傳 None）
+
+        注意：取得的區塊使用完畢後必須呼叫 release() 歸還緩衝區
+        """
         try:
             return self.data_queue.get_nowait()
         except queue.Empty:
-            return []
+            return None
+
+    def set_data_signal(self, signal: Optional[DataSignal]) -> None:
+        """設定區塊放入 data_queue 時的通知（None = 由消費者輪詢）"""
+        self.data_signal = signal
+        self.data_queue.signal = signal
+
+    def get_queue_stats(self) -> dict:
+        """取得讀取端輸出佇列的統計"""
+        return self.data_queue.get_stats()
+
+    def get_capture_mode(self) -> str:
+        """取得實際使用的擷取模式（硬體觸發設定失敗時為 sw_trigger）"""
+        return self.capture_mode
 
     def get_counter(self) -> int:
         """取得數據讀取次數"""
@@ -450,10 +1465,32 @@ class PET7H24M:
         """重置計數器"""
         self.counter = 0
 
+    def get_pool_stats(self) -> dict:
+        """取得緩衝區池統計資訊（高水位、耗盡次數、重複使用率）"""
+        if self.buffer_pool is None:
+            return {}
+        return self.buffer_pool.get_stats()
+
+    def get_calibration(self) -> Optional[RawCalibration]:
+        """取得原始整數模式的校正係數（float 模式回傳 None）"""
+        return self.calibration
+
+    def get_aux_columns(self) -> list:
+        """取得同步輸入欄位名稱（未啟用同步輸入時為空列表）"""
+        if self.sync_in_settings is None:
+            return []
+        return self.sync_in_settings.aux_columns
+
     def get_sample_rate(self) -> int:
         """取得取樣率"""
         return self.sample_rate
 
+    def get_preview_rate(self) -> int:
+        """取得送入 data_queue 的資料取樣率（設備記錄模式為預覽取樣率，其他模式與取樣率相同）"""
+        if self.logger_settings is not None:
+            return self.logger_settings.preview_rate
+        return self.sample_rate
+
     def get_channel_count(self) -> int:
         """取得通道數（向後兼容方法）"""
         return self.channels_count
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+讀取節奏控制模組
+
+此模組負責決定讀取執行緒何時醒來檢查設備緩衝區，支援：
+- 自適應輪詢間隔（依取樣率與實際觀測到的填入速率計算）
+- 讀取執行緒 CPU 統計（每個樣本耗用的 CPU 時間、喚醒次數、佇列已滿時丟棄的區塊數）
+- 讀取端抖動統計（最近 JITTER_WINDOW 次讀取的間隔與讀取時設備緩衝區累積的資料時間，p50 / p99 / max）
+- 讀取區塊大小控制（chunk_mode：依目標區塊長度或讀取延遲決定每次讀取的樣本數，設備緩衝區超過安全比例時全速讀取）
+- 區塊大小與讀取延遲直方圖（以 2 的次方為邊界，累計整個收集期間）
+"""
+
+import math
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 抖動統計保留的讀取次數
+JITTER_WINDOW = 4096
+
+# 讀取區塊大小控制模式（off = 每次讀取設備緩衝區中的全部資料）
+CHUNK_MODES = ("off", "block", "latency")
+
+
+def _align(samples: int, channels: int) -> int:
+    """向下取整為通道數的倍數"""
+    return samples - samples % channels
+
+
+class AdaptivePoller:
+    """
+    自適應輪詢間隔計算器
+
+    以設備緩衝區「已產生樣本數」（累計讀取數 + 緩衝區內資料量）的變化估計填入速率（EWMA），
+    並計算距離緩衝區累積到 target_ms 毫秒資料所需的等待時間。
+    """
+
+    def __init__(self, nominal_rate: float, target_ms: float = 10.0,
+                 min_interval: float = 0.0005, max_interval: float = 0.05):
+        """
+        初始化輪詢間隔計算器
+
+        Args:
+            nominal_rate: 名目填入速率（樣本數/秒，取樣率 × 通道數）
+            target_ms: 每次喚醒希望累積的資料時間長度（毫秒）
+            min_interval: 最短等待時間（秒）
+            max_interval: 最長等待時間（秒），避免設備緩衝區溢位
+        """
+        self.nominal_rate = float(nominal_rate)
+        self.fill_rate = float(nominal_rate)
+        self.target_samples = max(1.0, nominal_rate * target_ms / 1000.0)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._last_produced = None
+        self._last_time = None
+
+    def observe(self, total_read: int, available: int) -> None:
+        """記錄一次緩衝區狀態，更新填入速率估計"""
+        now = time.monotonic()
+        produced = total_read + available
+        if self._last_time is not None:
+            elapsed = now - self._last_time
+            if elapsed >= 0.002:
+                rate = (produced - self._last_produced) / elapsed
+                if rate > 0:
+                    self.fill_rate = 0.8 * self.fill_rate + 0.2 * rate
+                self._last_produced = produced
+                self._last_time = now
+        else:
+            self._last_produced = produced
+            self._last_time = now
+
+    def next_interval(self, available: int) -> float:
+        """計算下一次檢查前應等待的時間（秒）"""
+        deficit = self.target_samples - available
+        if deficit <= 0:
+            return 0.0
+        interval = deficit / max(self.fill_rate, 1.0)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+
+class Log2Histogram:
+    """以 2 的次方為邊界的直方圖（第 i 個區間為 (base × 2^(i-1), base × 2^i]，第 0 個區間為 <= base）"""
+
+    def __init__(self, base: float, buckets: int):
+        """
+        初始化直方圖
+
+        Args:
+            base: 第一個區間的上限
+            buckets: 區間數（超過最後一個上限的值計入最後一個區間）
+        """
+        self.base = float(base)
+        self.counts = [0] * buckets
+
+    def add(self, value: float) -> None:
+        """記錄一個值"""
+        if value <= self.base:
+            index = 0
+        else:
+            mantissa, exponent = math.frexp(value / self.base)
+            index = exponent - 1 if mantissa == 0.5 else exponent
+        self.counts[min(index, len(self.counts) - 1)] += 1
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        """轉換為字典：le = 各區間上限，counts = 各區間的次數（只列出第一個到最後一個非零區間）"""
+        nonzero = [i for i, count in enumerate(self.counts) if count]
+        if not nonzero:
+            return {'le': [], 'counts': []}
+        first, last = nonzero[0], nonzero[-1]
+        return {
+            'le': [self.base * (1 << i) for i in range(first, last + 1)],
+            'counts': self.counts[first:last + 1],
+        }
+
+
+class ChunkController:
+    """
+    讀取區塊大小控制器
+
+    block   = 每次讀取 target_ms 毫秒的資料（緩衝區中累積較多時連續讀取多個固定大小的區塊）
+    latency = 緩衝區累積到 target_ms 毫秒的資料時讀取全部可用資料（最舊樣本的等待時間約為 target_ms）
+    兩種模式下，設備緩衝區超過 safety_fraction × 容量時不再等待，每次讀取緩衝區池允許的最大區塊直到回到安全範圍。
+    等待時間由 AdaptivePoller 依觀測到的填入速率計算，控制器再限制等待時間不使緩衝區超過安全上限。
+    """
+
+    def __init__(self, mode: str, nominal_rate: float, channels: int, target_ms: float,
+                 max_samples: int, device_capacity: int = 0, safety_fraction: float = 0.5):
+        """
+        初始化控制器
+
+        Args:
+            mode: block / latency
+            nominal_rate: 名目填入速率（樣本數/秒，取樣率 × 通道數）
+            channels: 通道數（讀取數量為通道數的倍數）
+            target_ms: 目標區塊長度 / 讀取延遲（毫秒）
+            max_samples: 單次讀取的上限（緩衝區池的區塊容量）
+            device_capacity: 設備緩衝區容量（樣本數，0 = 未知，不檢查安全上限）
+            safety_fraction: 設備緩衝區的安全比例（0 < 比例 <= 1）
+        """
+        if mode not in CHUNK_MODES[1:]:
+            raise ValueError(f"不支援的 chunk_mode: {mode}（可用值: {', '.join(CHUNK_MODES)}）")
+        if target_ms <= 0:
+            raise ValueError("chunk_target_ms 必須大於 0")
+        if not 0 < safety_fraction <= 1:
+            raise ValueError(f"無效的 chunk_safety_fraction: {safety_fraction}（0 < 比例 <= 1）")
+        self.mode = mode
+        self.channels = channels
+        self.target_ms = target_ms
+        self.max_samples = _align(max_samples, channels)
+        self.device_capacity = device_capacity
+        self.safety_limit = int(device_capacity * safety_fraction) if device_capacity > 0 else 0
+        # 目標大小不超過單次讀取上限與安全上限的一半（保留喚醒延遲的餘裕）
+        target = _align(int(nominal_rate * target_ms / 1000.0), channels)
+        if self.safety_limit:
+            target = min(target, _align(self.safety_limit // 2, channels))
+        self.target_samples = min(self.max_samples, max(channels, target))
+        self.catchup_reads = 0     # 超過安全上限而全速讀取的次數
+        self.peak_available = 0    # 觀測到的設備緩衝區最大樣本數
+
+    def read_size(self, available: int) -> int:
+        """依設備緩衝區中的樣本數決定本次讀取的樣本數（0 = 繼續等待）"""
+        if available > self.peak_available:
+            self.peak_available = available
+        if self.safety_limit and available >= self.safety_limit:
+            self.catchup_reads += 1
+            return _align(min(available, self.max_samples), self.channels)
+        if available < self.target_samples:
+            return 0
+        if self.mode == "block":
+            return self.target_samples
+        return _align(min(available, self.max_samples), self.channels)
+
+    def limit_wait(self, interval: float, available: int, fill_rate: float) -> float:
+        """限制等待時間，使等待期間設備緩衝區不超過安全上限"""
+        if not self.safety_limit:
+            return interval
+        headroom = (self.safety_limit - available) / max(fill_rate, 1.0)
+        return max(0.0, min(interval, headroom))
+
+    def to_dict(self) -> Dict[str, object]:
+        """轉換為字典（供 API 與日誌使用）"""
+        return {
+            'mode': self.mode,
+            'target_ms': self.target_ms,
+            'target_frames': self.target_samples // self.channels,
+            'safety_limit_samples': self.safety_limit,
+            'catchup_reads': self.catchup_reads,
+            'peak_fill': round(self.peak_available / self.device_capacity, 4) if self.device_capacity else None,
+        }
+
+
+class ReaderStats:
+    """讀取執行緒統計（CPU 時間以 time.thread_time() 量測，僅計入讀取執行緒本身）"""
+
+    def __init__(self, mode: str):
+        """初始化統計"""
+        self.mode = mode
+        self.samples = 0
+        self.reads = 0
+        self.wakeups = 0
+        self.dropped_blocks = 0   # data_queue 滿載時丟棄的區塊數（依 data_queue_policy）
+        self.dropped_samples = 0
+        self.device_lost_samples = 0  # 設備端遺失的樣本數（HS_GetTotalSamplingStatus 比對結果）
+        self.overflows = 0            # 設備緩衝區溢位次數
+        self.gaps = 0                 # 序號中插入的缺漏次數（設備端遺失）
+        self.events = 0               # 硬體觸發模式收到的事件視窗數
+        self._cpu_start = None
+        self._wall_start = None
+        self.cpu_seconds = 0.0
+        self.wall_seconds = 0.0
+        # 抖動統計（固定大小的環形陣列，由讀取執行緒寫入；API 執行緒讀取時不需要加鎖）
+        self._intervals = np.zeros(JITTER_WINDOW)
+        self._lags = np.zeros(JITTER_WINDOW)
+        self._jitter_count = 0
+        self._last_read: Optional[float] = None
+        # 整個收集期間的區塊大小（frame 數）與讀取延遲（毫秒）直方圖
+        self.block_histogram = Log2Histogram(1, 24)
+        self.lag_histogram = Log2Histogram(0.125, 20)
+
+    def start(self) -> None:
+        """於讀取執行緒內開始計時"""
+        self._cpu_start = time.thread_time()
+        self._wall_start = time.monotonic()
+
+    def update(self) -> None:
+        """於讀取執行緒內更新 CPU 時間"""
+        if self._cpu_start is not None:
+            self.cpu_seconds = time.thread_time() - self._cpu_start
+            self.wall_seconds = time.monotonic() - self._wall_start
+
+    def record_read(self, lag: float, frames: int = 0) -> None:
+        """
+        於讀取執行緒內記錄一次讀取
+
+        Args:
+            lag: 讀取時設備緩衝區已累積的資料時間（秒，緩衝區樣本數 / 取樣率 / 通道數）
+            frames: 本次讀取的區塊 frame 數（0 = 不計入區塊大小直方圖）
+        """
+        now = time.monotonic()
+        if frames > 0:
+            self.block_histogram.add(frames)
+        self.lag_histogram.add(lag * 1000.0)
+        slot = self._jitter_count % JITTER_WINDOW
+        self._intervals[slot] = (now - self._last_read) if self._last_read is not None else np.nan
+        self._lags[slot] = lag
+        self._last_read = now
+        self._jitter_count += 1
+
+    @staticmethod
+    def _percentiles_ms(values: np.ndarray) -> Optional[Dict[str, float]]:
+        values = values[~np.isnan(values)] * 1000.0
+        if values.size == 0:
+            return None
+        p50, p99 = np.percentile(values, (50, 99))
+        return {'p50': round(float(p50), 3), 'p99': round(float(p99), 3), 'max': round(float(values.max()), 3)}
+
+    def jitter(self) -> Dict[str, Optional[Dict[str, float]]]:
+        """讀取端抖動：讀取間隔與讀取延遲（設備緩衝區累積的資料時間）的百分位數（毫秒）"""
+        count = min(self._jitter_count, JITTER_WINDOW)
+        return {
+            'read_interval_ms': self._percentiles_ms(self._intervals[:count].copy()),
+            'read_lag_ms': self._percentiles_ms(self._lags[:count].copy()),
+        }
+
+    def to_dict(self) -> Dict[str, float]:
+        """轉換為字典（供 API 與日誌使用）"""
+        return {
+            'mode': self.mode,
+            'samples': self.samples,
+            'reads': self.reads,
+            'wakeups': self.wakeups,
+            'dropped_blocks': self.dropped_blocks,
+            'dropped_samples': self.dropped_samples,
+            'device_lost_samples': self.device_lost_samples,
+            'overflows': self.overflows,
+            'gaps': self.gaps,
+            'events': self.events,
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'cpu_load': round(self.cpu_seconds / self.wall_seconds, 4) if self.wall_seconds else 0.0,
+            'cpu_per_sample_us': round(self.cpu_seconds * 1e6 / self.samples, 4) if self.samples else 0.0,
+            'jitter': self.jitter(),
+            'histograms': {
+                'block_frames': self.block_histogram.to_dict(),
+                'read_lag_ms': self.lag_histogram.to_dict(),
+            },
+        }
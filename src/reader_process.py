@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+讀取行程模組
+
+此模組將設備讀取迴圈移到獨立的行程（reader_process = 1），支援：
+- 子行程內執行 PET7H24M 的連線、讀取迴圈與斷線重新連線（不與主行程的輸出與網頁執行緒競爭 GIL）
+- 讀取迴圈直接寫入共用記憶體環形緩衝區（shm_ring），主行程依名稱附加並以唯讀檢視取出區塊（不複製）
+- ReaderProcess 提供與 PET7H24M 相同的介面，DeviceManager 與 main.py 不需要區分兩種模式
+- 控制命令（start / stats / stop）以 multiprocessing.Pipe 傳遞，統計資訊由子行程回報
+- 區塊發布通知（multiprocessing.Event），主行程的轉送執行緒喚醒合併管線，不需輪詢環形緩衝區
+
+子行程以 spawn 方式啟動（不複製主行程的執行緒與 Flask 狀態）。環形緩衝區由子行程建立、
+主行程在停止時移除名稱；設備記錄模式（capture_mode = device_log）不使用讀取行程。
+"""
+
+import threading
+import multiprocessing
+from typing import Dict, Optional
+
+import numpy as np
+
+from shm_ring import RingQueue, RingReader, RingWriter, _dtype_descr
+from sample_block import RawCalibration, SampleBlock
+from burst_capture import BurstSettings
+from trigger_capture import TriggerSettings
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning, Logger
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    Logger = None
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 等待子行程完成初始化（含連線設備）與回應命令的時間（秒）
+READY_TIMEOUT = 60.0
+COMMAND_TIMEOUT = 10.0
+
+# 轉送執行緒等待區塊通知的最長時間（秒，只影響停止時的結束速度）
+FORWARD_WAIT = 0.5
+
+
+def _snapshot(device, writer: RingWriter) -> Dict[str, object]:
+    """子行程目前的狀態與統計"""
+    thread = device.reading_thread
+    return {
+        'reading': device.reading and thread is not None and thread.is_alive(),
+        'reader': device.get_reader_stats(),
+        'pool': writer.get_stats(),
+        'counter': device.counter,
+    }
+
+
+def reader_main(ini_path: str, section: str, ring_slots: int, debug_enabled: bool, conn, data_event=None) -> None:
+    """
+    讀取行程入口（multiprocessing spawn 的 target，必須為模組層級函數）
+
+    初始化設備後建立環形緩衝區並回報 ('ready', 描述資訊)，之後依序處理主行程的命令，
+    收到 stop（或主行程結束、管道關閉）時停止讀取並結束。
+    """
+    from pet7h24m import PET7H24M, DEVICE_LOG_MODE
+
+    if Logger is not None:
+        Logger.set_debug_enabled(debug_enabled)
+    device = PET7H24M()
+    writer: Optional[RingWriter] = None
+    try:
+        try:
+            device.init_devices(ini_path, section)
+            if device.get_capture_mode() == DEVICE_LOG_MODE:
+                raise ValueError("capture_mode = device_log 不支援 reader_process = 1")
+            pool = device.buffer_pool
+            descriptor = {
+                'version': 1,
+                'device_id': device.device_id,
+                'slots': ring_slots,
+                'capacity': pool.block_capacity,
+                'dtype': _dtype_descr(pool.dtype),
+                # int32 原始模式的區塊以有號整數檢視 DWORD 緩衝區（與 PET7H24M._block_view 相同）
+                'block_dtype': _dtype_descr(np.int32 if device.acquisition_mode == "raw" and device.raw_dtype == "int32"
+                                            else pool.dtype),
+                'aux_dtype': _dtype_descr(pool.aux_dtype),
+                'aux_frames': pool.aux_frames,
+                'channels': device.channels_count,
+                'sample_rate': device.sample_rate,
+            }
+            writer = RingWriter.create(None, descriptor)
+            # 讀取迴圈改為直接寫入環形緩衝區（取代緩衝區池與 data_queue）
+            device.buffer_pool = writer
+            device.data_queue = RingQueue(writer, data_event)
+        except Exception as e:
+            conn.send(('error', str(e)))
+            return
+
+        conn.send(('ready', {
+            'ring': writer.name,
+            'device_id': device.device_id,
+            'section': device.section,
+            'sample_rate': device.sample_rate,
+            'active_channels': list(device.active_channels),
+            'capture_mode': device.get_capture_mode(),
+            'trigger_settings': device.trigger_settings,
+            'burst_settings': device.burst_settings,
+            'calibration': device.get_calibration(),
+            'raw_dtype': device.raw_dtype,
+            'aux_columns': device.get_aux_columns(),
+        }))
+        info(f"讀取行程 [{device.device_id}] 已就緒，環形緩衝區: {writer.name}（{ring_slots} 個槽位）")
+
+        while True:
+            try:
+                command = conn.recv()
+            except (EOFError, OSError):
+                # 主行程已結束
+                command = 'stop'
+            if command == 'start':
+                device.start_reading()
+            elif command == 'reset_counter':
+                device.reset_counter()
+            elif command == 'stop':
+                device.stop_reading()
+            try:
+                conn.send(_snapshot(device, writer))
+            except (BrokenPipeError, OSError):
+                break
+            if command == 'stop':
+                break
+    finally:
+        if device.device_handle:
+            device.stop_reading()
+        if writer is not None:
+            writer.close()
+
+
+class ReaderProcess:
+    """
+    讀取行程代理（與 PET7H24M 相同的介面，DeviceManager 依 reader_process 設定選擇）
+
+    get_data() 從共用記憶體環形緩衝區取出區塊；統計資訊向子行程查詢，子行程已結束時回傳最後一次的結果。
+    """
+
+    def __init__(self):
+        """初始化讀取行程代理"""
+        self.section = "PET7H24M"
+        self.device_id = "PET7H24M"
+        self.sample_rate = 20000
+        self.active_channels = []
+        self.channels_count = 0
+        self.capture_mode = "continuous"
+        self.trigger_settings: Optional[TriggerSettings] = None
+        self.burst_settings: Optional[BurstSettings] = None
+        self.calibration: Optional[RawCalibration] = None
+        self.raw_dtype = "int32"
+        self.aux_columns = []
+        # 讀取行程不支援設備記錄模式（main.py 依此判斷是否建立記錄檔匯入器）
+        self.logger_settings = None
+        # 讀取迴圈在子行程中執行，主行程沒有讀取執行緒
+        self.reading_thread = None
+        self.ring_slots = 128
+        self.data_queue: Optional[RingReader] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, object] = {}
+        # 區塊發布通知（子行程設定，轉送執行緒轉為合併管線的 DataSignal）
+        self.data_signal = None
+        self._data_event = None
+        self._forward_thread: Optional[threading.Thread] = None
+        self._forwarding = False
+
+    def init_devices(self, ini_path: str, section: str = "PET7H24M", queue_settings=None,
+                     memory_budget=None, ring_slots: int = 128) -> None:
+        """
+        啟動讀取行程並等待設備初始化完成
+
+        Args:
+            ini_path: 設定檔路徑
+            section: 設備區段名稱
+            queue_settings: 未使用（環形緩衝區取代 data_queue，大小由 ring_slots 決定）
+            memory_budget: 未使用
+            ring_slots: 環形緩衝區槽位數（每個槽位一個讀取區塊）
+        """
+        self.stop_reading()
+        self.section = section
+        self.ring_slots = ring_slots
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        self._data_event = ctx.Event()
+        debug_enabled = Logger._debug_enabled if Logger is not None else True
+        process = ctx.Process(target=reader_main, name=f"reader-{section}",
+                              args=(ini_path, section, ring_slots, debug_enabled, child_conn, self._data_event),
+                              daemon=True)
+        process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(READY_TIMEOUT):
+            process.terminate()
+            raise RuntimeError(f"讀取行程 [{section}] 初始化逾時")
+        try:
+            kind, payload = parent_conn.recv()
+        except EOFError:
+            kind, payload = 'error', f"讀取行程異常結束（exit code {process.exitcode}）"
+        if kind != 'ready':
+            process.join(timeout=5)
+            raise RuntimeError(payload)
+
+        self._process = process
+        self._conn = parent_conn
+        self.device_id = payload['device_id']
+        self.sample_rate = payload['sample_rate']
+        self.active_channels = payload['active_channels']
+        self.channels_count = len(self.active_channels)
+        self.capture_mode = payload['capture_mode']
+        self.trigger_settings = payload['trigger_settings']
+        self.burst_settings = payload['burst_settings']
+        self.calibration = payload['calibration']
+        self.raw_dtype = payload['raw_dtype']
+        self.aux_columns = payload['aux_columns']
+        self.data_queue = RingReader.attach(payload['ring'])
+        self.data_queue.calibration = self.calibration
+        info(f"讀取行程 [{self.device_id}] 已啟動（pid {process.pid}），共用記憶體: {payload['ring']}")
+
+    def _request(self, command: str) -> Dict[str, object]:
+        """傳送命令並等待子行程回報統計（子行程已結束時回傳最後一次的結果）"""
+        with self._lock:
+            if self._conn is None:
+                return self._snapshot
+            try:
+                self._conn.send(command)
+                if self._conn.poll(COMMAND_TIMEOUT):
+                    self._snapshot = self._conn.recv()
+                else:
+                    warning(f"讀取行程 [{self.device_id}] 未回應命令: {command}")
+            except (EOFError, OSError) as e:
+                debug(f"讀取行程 [{self.device_id}] 已結束: {e}")
+                self._conn = None
+            return self._snapshot
+
+    def start_reading(self) -> None:
+        """開始讀取（子行程啟動掃描與讀取迴圈）"""
+        if self._conn is None:
+            error("設備未初始化！")
+            return
+        if self.data_signal is not None and self._forward_thread is None:
+            self._forwarding = True
+            self._forward_thread = threading.Thread(target=self._forward_loop, name=f"forward-{self.section}",
+                                                    daemon=True)
+            self._forward_thread.start()
+        self._request('start')
+
+    def _forward_loop(self) -> None:
+        """將子行程的區塊發布通知轉送給合併管線（停止讀取時結束）"""
+        event = self._data_event
+        while self._forwarding:
+            if event.wait(FORWARD_WAIT):
+                event.clear()
+                self.data_signal.notify()
+
+    def set_data_signal(self, signal) -> None:
+        """設定區塊發布時的通知（None = 由消費者輪詢）"""
+        self.data_signal = signal
+
+    def stop_reading(self) -> None:
+        """停止讀取並結束子行程，移除共用記憶體"""
+        if self._forward_thread is not None:
+            self._forwarding = False
+            self._data_event.set()
+            self._forward_thread.join()
+            self._forward_thread = None
+
+        process = self._process
+        if process is None:
+            return
+        self._request('stop')
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        process.join(timeout=COMMAND_TIMEOUT)
+        if process.is_alive():
+            warning(f"讀取行程 [{self.device_id}] 未正常結束，強制終止")
+            process.terminate()
+            process.join()
+        self._process = None
+
+        # 與執行緒模式相同，停止後不再取出剩餘的區塊；消費者仍持有的區塊檢視在釋放前保持有效
+        if self.data_queue is not None:
+            self.data_queue.unlink()
+            self.data_queue.close()
+
+    def is_reading(self) -> bool:
+        """讀取迴圈是否正在執行"""
+        if self._process is None or not self._process.is_alive():
+            return False
+        return bool(self._request('stats').get('reading'))
+
+    def get_data(self) -> Optional[SampleBlock]:
+        """
+        取得下一個數據區塊（非阻塞式；無資料時回傳 None）
+
+        注意：取得的區塊使用完畢後必須呼叫 release() 歸還環形緩衝區槽位
+        """
+        if self.data_queue is None:
+            return None
+        return self.data_queue.get()
+
+    def get_reader_stats(self) -> dict:
+        """取得讀取迴圈統計（向子行程查詢）"""
+        return dict(self._request('stats').get('reader', {}))
+
+    def get_link_state(self) -> Optional[str]:
+        """取得連線狀態（connected / reconnecting / down；未開始讀取時為 None）"""
+        return self.get_reader_stats().get('link', {}).get('state')
+
+    def get_queue_stats(self) -> dict:
+        """取得環形緩衝區讀取端統計"""
+        if self.data_queue is None:
+            return {}
+        return self.data_queue.get_stats()
+
+    def get_pool_stats(self) -> dict:
+        """取得環形緩衝區寫入端統計（與緩衝區池統計相同的鍵）"""
+        return dict(self._request('stats').get('pool', {}))
+
+    def get_capture_mode(self) -> str:
+        """取得實際使用的擷取模式"""
+        return self.capture_mode
+
+    def get_counter(self) -> int:
+        """取得數據讀取次數"""
+        return int(self._request('stats').get('counter', 0))
+
+    def reset_counter(self) -> None:
+        """重置計數器"""
+        self._request('reset_counter')
+
+    def get_calibration(self) -> Optional[RawCalibration]:
+        """取得原始整數模式的校正係數（float 模式回傳 None）"""
+        return self.calibration
+
+    def get_aux_columns(self) -> list:
+        """取得同步輸入欄位名稱"""
+        return list(self.aux_columns)
+
+    def get_sample_rate(self) -> int:
+        """取得取樣率"""
+        return self.sample_rate
+
+    def get_preview_rate(self) -> int:
+        """取得送入資料管線的取樣率（讀取行程不支援設備記錄模式，與取樣率相同）"""
+        return self.sample_rate
+
+    def get_channel_count(self) -> int:
+        """取得通道數（向後兼容方法）"""
+        return self.channels_count
+
+    def get_active_channel_count(self) -> int:
+        """取得目前啟用的通道總數"""
+        return self.channels_count
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+斷線重新連線模組
+
+此模組負責讀取執行緒偵測到 TCP 連線中斷後的重新連線策略與統計，支援：
+- 重新連線設定（PET-7H24M.ini 設備區段的 reconnect_* 參數）
+- 指數退避（第一次等待 reconnect_initial_ms，之後每次加倍，最多 reconnect_max_ms）
+- 連線統計（斷線次數、重新連線次數與嘗試次數、重新連線耗時、中斷時間、中斷期間遺失的樣本數）
+
+重新連線在同一個讀取執行緒內完成，CSV / SQL 輸出與序號不會重新開始；
+中斷期間的樣本以缺漏記錄（依中斷時間換算 frame 數）。
+"""
+
+import time
+import configparser
+from typing import Dict, Iterator, Optional
+
+# 連線狀態
+LINK_CONNECTED = "connected"
+LINK_RECONNECTING = "reconnecting"
+LINK_DOWN = "down"
+
+
+class ReconnectSettings:
+    """重新連線設定（PET-7H24M.ini 設備區段的 reconnect 開頭的鍵）"""
+
+    def __init__(self, enabled: bool = True, initial_ms: int = 500, max_ms: int = 10000,
+                 max_attempts: int = 0):
+        """
+        初始化重新連線設定
+
+        Args:
+            enabled: 是否在連線中斷時自動重新連線（False = 停止讀取，與舊版相同）
+            initial_ms: 第一次重試前的等待時間（毫秒）
+            max_ms: 重試間隔上限（毫秒）
+            max_attempts: 單次中斷的最大重試次數（0 = 持續重試直到停止收集）
+        """
+        if initial_ms <= 0 or max_ms < initial_ms:
+            raise ValueError(f"無效的重新連線間隔: reconnect_initial_ms={initial_ms}, reconnect_max_ms={max_ms}")
+        if max_attempts < 0:
+            raise ValueError(f"無效的 reconnect_max_attempts: {max_attempts}")
+        self.enabled = enabled
+        self.initial_ms = initial_ms
+        self.max_ms = max_ms
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def from_config(cls, cfg: configparser.ConfigParser, section: str) -> "ReconnectSettings":
+        """從設定檔讀取重新連線設定"""
+        return cls(
+            enabled=bool(cfg.getint(section, "reconnect", fallback=1)),
+            initial_ms=cfg.getint(section, "reconnect_initial_ms", fallback=500),
+            max_ms=cfg.getint(section, "reconnect_max_ms", fallback=10000),
+            max_attempts=cfg.getint(section, "reconnect_max_attempts", fallback=0),
+        )
+
+    def delays(self) -> Iterator[float]:
+        """每次重試前的等待時間（秒），超過 max_attempts 時結束"""
+        delay_ms = self.initial_ms
+        attempt = 0
+        while self.max_attempts == 0 or attempt < self.max_attempts:
+            attempt += 1
+            yield delay_ms / 1000.0
+            delay_ms = min(delay_ms * 2, self.max_ms)
+
+
+class LinkStats:
+    """
+    連線統計（由讀取執行緒更新，API 執行緒只讀取）
+
+    - reconnect_ms：偵測到中斷到重新啟動掃描的時間（含退避等待）
+    - outage_s：中斷前最後一次讀到資料到重新連線後第一次讀到資料的時間
+    """
+
+    def __init__(self):
+        """初始化統計"""
+        self.state = LINK_CONNECTED
+        self.link_losses = 0
+        self.reconnects = 0
+        self.attempts = 0
+        self.failed_attempts = 0
+        self.last_reason = ""
+        self.last_error = ""
+        self.last_reconnect_ms: Optional[float] = None
+        self.max_reconnect_ms: Optional[float] = None
+        self.last_outage_s: Optional[float] = None
+        self.max_outage_s: Optional[float] = None
+        self.total_outage_s = 0.0
+        self.outage_lost_samples = 0
+        self._last_data = time.monotonic()
+        self._lost_at: Optional[float] = None
+        self._outage_start: Optional[float] = None
+
+    def data_received(self) -> None:
+        """讀取到資料（重新連線後第一次讀到資料時結束中斷計時）"""
+        now = time.monotonic()
+        if self._outage_start is not None:
+            outage = now - self._outage_start
+            self._outage_start = None
+            self.last_outage_s = outage
+            self.max_outage_s = outage if self.max_outage_s is None else max(self.max_outage_s, outage)
+            self.total_outage_s += outage
+        self._last_data = now
+
+    def link_lost(self, reason: str) -> None:
+        """偵測到連線中斷"""
+        self.state = LINK_RECONNECTING
+        self.link_losses += 1
+        self.last_reason = reason
+        self._lost_at = time.monotonic()
+        if self._outage_start is None:
+            self._outage_start = self._last_data
+
+    def attempt_failed(self, message: str) -> None:
+        """一次重試失敗"""
+        self.attempts += 1
+        self.failed_attempts += 1
+        self.last_error = message
+
+    def reconnected(self, lost_samples: int) -> None:
+        """重新連線成功（掃描已重新啟動）"""
+        self.attempts += 1
+        self.reconnects += 1
+        self.state = LINK_CONNECTED
+        self.outage_lost_samples += lost_samples
+        elapsed = (time.monotonic() - self._lost_at) * 1000 if self._lost_at is not None else 0.0
+        self.last_reconnect_ms = elapsed
+        self.max_reconnect_ms = elapsed if self.max_reconnect_ms is None else max(self.max_reconnect_ms, elapsed)
+        self._lost_at = None
+
+    def gave_up(self) -> None:
+        """停止重試（超過重試次數或停止收集）"""
+        self.state = LINK_DOWN
+
+    @staticmethod
+    def _round(value: Optional[float], digits: int) -> Optional[float]:
+        return round(value, digits) if value is not None else None
+
+    def to_dict(self) -> Dict[str, object]:
+        """轉換為字典（供 API 與日誌使用）"""
+        outage = self.total_outage_s
+        if self._outage_start is not None:
+            # 中斷尚未結束：計入目前為止的時間
+            outage += time.monotonic() - self._outage_start
+        return {
+            'state': self.state,
+            'link_losses': self.link_losses,
+            'reconnects': self.reconnects,
+            'attempts': self.attempts,
+            'failed_attempts': self.failed_attempts,
+            'last_reason': self.last_reason,
+            'last_error': self.last_error,
+            'last_reconnect_ms': self._round(self.last_reconnect_ms, 1),
+            'max_reconnect_ms': self._round(self.max_reconnect_ms, 1),
+            'last_outage_s': self._round(self.last_outage_s, 3),
+            'max_outage_s': self._round(self.max_outage_s, 3),
+            'total_outage_s': round(outage, 3),
+            'outage_lost_samples': self.outage_lost_samples,
+        }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料區塊工具模組
+
+此模組提供資料區塊（NumPy 一維陣列，通道交錯排列）的共用處理函數，支援：
+- SampleBlock：池化緩衝區上的唯讀區塊，使用參考計數歸還緩衝區
+- 同步輸入紀錄（aux：每個 frame 一筆 DI / 計數器的結構化紀錄，與 data 的 frame 一一對應）
+- RawCalibration：原始整數區塊的通道校正係數（向量化轉換為電壓）
+- 將交錯資料轉換為 (frames, channels) 二維檢視（不複製資料）
+- 向量化計算每個 frame 的時間戳記字串
+- 缺漏標記列（CSV / SQL 暫存檔案中標示遺失的 frame）
+- 同步輸入紀錄轉為 CSV 欄位（整欄轉換，不逐列處理）
+"""
+
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from buffer_pool import BufferPool, PoolBuffer
+
+
+class RawCalibration:
+    """
+    原始整數資料的通道校正係數
+
+    電壓 = raw * scale + offset（scale、offset 為每個通道一個值，已包含 int16 模式的位移量），
+    gain_table、offset_table 為 HS_ReadGainOffset 讀回的設備原始校正表。
+    """
+
+    __slots__ = ('scale', 'offset', 'gain_table', 'offset_table')
+
+    def __init__(self, scale: np.ndarray, offset: np.ndarray,
+                 gain_table: np.ndarray, offset_table: np.ndarray):
+        """初始化校正係數"""
+        self.scale = scale.astype(np.float32)
+        self.offset = offset.astype(np.float32)
+        self.gain_table = gain_table
+        self.offset_table = offset_table
+
+    def to_volts(self, data: np.ndarray) -> np.ndarray:
+        """將原始整數資料轉換為 float32 電壓（一維交錯或 (frames, channels) 皆可，輸出維度與輸入相同）"""
+        frames = as_frames(data, len(self.scale)) if data.ndim == 1 else data
+        volts = frames.astype(np.float32) * self.scale + self.offset
+        return volts.ravel() if data.ndim == 1 else volts
+
+
+class SampleBlock:
+    """
+    資料區塊
+
+    data 為緩衝區上的唯讀檢視。區塊建立時參考計數為 1（屬於取出區塊的人），
+    分發給多個消費者前呼叫 retain()，每個消費者處理完畢後呼叫 release()，
+    計數歸零時緩衝區歸還給緩衝區池。
+
+    原始整數模式下 data 為 int32/int16 原始值，calibration 提供轉換係數，
+    需要電壓的消費者呼叫 volts()。
+
+    device_id 為產生區塊的設備識別碼，start_index 為區塊第一個 frame
+    自掃描開始起算的序號（包含遺失的 frame，因此相鄰區塊的序號不連續即代表缺漏；
+    多設備合併管線中也用於分流與對齊時間）。
+    read_time 為區塊建立時的 time.monotonic()，用於量測管線延遲。
+    event_id 為觸發擷取模式下區塊所屬的事件編號（連續擷取為 -1），
+    輸出端在事件編號改變時切換檔案。
+    aux 為同步輸入模式下每個 frame 一筆的結構化紀錄（DI 狀態與計數器值，未使用時為 None），
+    切割區塊時需與 data 以 frame 為單位同步切割。
+    """
+
+    __slots__ = ('data', 'aux', 'calibration', 'device_id', 'start_index', 'read_time', 'event_id',
+                 '_buffer', '_pool', '_refs')
+
+    def __init__(self, data: np.ndarray, buffer: Optional[PoolBuffer] = None,
+                 pool: Optional[BufferPool] = None,
+                 calibration: Optional[RawCalibration] = None,
+                 device_id: str = "", start_index: int = 0,
+                 aux: Optional[np.ndarray] = None):
+        """初始化資料區塊"""
+        data.flags.writeable = False
+        if aux is not None:
+            aux.flags.writeable = False
+        self.data = data
+        self.aux = aux
+        self.calibration = calibration
+        self.device_id = device_id
+        self.start_index = start_index
+        self.read_time = time.monotonic()
+        self.event_id = -1
+        self._buffer = buffer
+        self._pool = pool
+        self._refs = 1
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def frame_count(self, channels: int) -> int:
+        """區塊包含的 frame 數"""
+        return len(self.data) // channels
+
+    def volts(self) -> np.ndarray:
+        """取得電壓資料（float 模式直接回傳 data，原始整數模式向量化轉換）"""
+        if self.calibration is None:
+            return self.data
+        return self.calibration.to_volts(self.data)
+
+    def retain(self, count: int = 1) -> None:
+        """增加參考計數（分發給更多消費者前呼叫）"""
+        if self._pool is None:
+            return
+        with self._pool.lock:
+            self._refs += count
+
+    def release(self) -> None:
+        """減少參考計數，歸零時將緩衝區歸還給緩衝區池"""
+        if self._pool is None:
+            return
+        with self._pool.lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+        pool, buffer = self._pool, self._buffer
+        self._pool = None
+        self._buffer = None
+        pool.release(buffer)
+
+
+def as_frames(data: np.ndarray, channels: int) -> np.ndarray:
+    """將交錯排列的一維資料轉為 (frames, channels) 二維陣列（不足一組時補 0）"""
+    remainder = len(data) % channels
+    if remainder:
+        data = np.concatenate((data, np.zeros(channels - remainder, dtype=data.dtype)))
+    return data.reshape(-1, channels)
+
+
+def aux_columns(aux: Optional[np.ndarray], names: List[str], count: int) -> List[list]:
+    """
+    將同步輸入紀錄轉為 CSV 欄位（每個欄位整欄轉為 Python 列表，與通道欄位一起 zip 成列）
+
+    沒有紀錄時（例如未啟用同步輸入）回傳空欄位，讓每一列的欄位數與標題相同。
+    """
+    if not names:
+        return []
+    if aux is None:
+        return [[''] * count for _ in names]
+    return [aux[name][:count].tolist() for name in names]
+
+
+# 缺漏標記列的第一欄（CSV 讀取時可視為註解列略過，例如 pandas.read_csv(comment='#')）
+GAP_MARKER = "# GAP"
+
+
+def gap_row(start_time: datetime, first_index: int, frames: int, sample_rate: int, sep: str = ' ') -> list:
+    """
+    產生缺漏標記列：[GAP_MARKER, 第一個遺失 frame 的時間戳記, 遺失的 frame 數]
+
+    Args:
+        start_time: 第 0 個 frame 的時間
+        first_index: 第一個遺失 frame 的全域索引
+        frames: 遺失的 frame 數
+        sample_rate: 取樣率（Hz）
+        sep: 日期與時間之間的分隔字元
+    """
+    timestamp = format_timestamps(start_time, first_index, 1, sample_rate, sep=sep)[0]
+    return [GAP_MARKER, str(timestamp), frames]
+
+
+def format_timestamps(start_time: datetime, first_index: int, count: int,
+                      sample_rate: int, sep: str = ' ') -> np.ndarray:
+    """
+    向量化計算時間戳記字串（格式：YYYY-MM-DD HH:MM:SS.ffffff）
+
+    Args:
+        start_time: 第 0 個 frame 的時間
+        first_index: 本批第一個 frame 的全域索引
+        count: frame 數量
+        sample_rate: 取樣率（Hz）
+        sep: 日期與時間之間的分隔字元（CSV 使用空白，ISO 格式使用 'T'）
+    """
+    offsets_us = np.rint(
+        np.arange(first_index, first_index + count, dtype=np.float64) * (1e6 / sample_rate)
+    ).astype(np.int64)
+    timestamps = np.datetime64(start_time, 'us') + offsets_us.astype('timedelta64[us]')
+    strings = np.datetime_as_string(timestamps, unit='us')
+    if sep != 'T':
+        strings = np.char.replace(strings, 'T', sep)
+    return strings
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共用記憶體環形緩衝區模組
+
+此模組提供讀取行程與主行程之間的資料通道（multiprocessing.shared_memory），支援：
+- 固定數量的區塊槽位（每個槽位的大小與緩衝區池的緩衝區相同，HS_GetAIBuffer 直接寫入共用記憶體）
+- 單一寫入者 / 單一讀取者，以序號計數器同步（head = 已發布的區塊數，tail = 已歸還的區塊數），不使用鎖
+- 讀取端以槽位上的唯讀檢視建立 SampleBlock（不複製），所有消費者釋放後才歸還槽位
+- 其他行程可依名稱附加（描述資訊以 JSON 存放於標頭：型別、容量、通道數、取樣率等）
+- 環形緩衝區已滿時寫入端改用臨時緩衝區讀取並丟棄該區塊（讀取端不阻塞，序號留下缺漏）
+
+記憶體配置：
+    [0, 64)            計數器（uint64 × 8）
+    [64, 4096)         描述資訊（uint32 長度 + UTF-8 JSON）
+    槽位資訊           每個槽位一筆 SLOT_DTYPE（seq、start_index、樣本數、event_id、read_time）
+    資料區             每個槽位 capacity 個樣本
+    紀錄區             每個槽位 aux_frames 筆同步輸入紀錄（未使用同步輸入時為空）
+"""
+
+import json
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from buffer_pool import PoolBuffer
+from sample_block import RawCalibration, SampleBlock
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+RING_MAGIC = 0x50455452  # "PETR"
+RING_VERSION = 1
+
+# 計數器索引
+HEAD = 0            # 已發布的區塊數（寫入端更新）
+TAIL = 1            # 已歸還的區塊數（讀取端更新）
+DROPPED_BLOCKS = 2  # 環形緩衝區已滿而丟棄的區塊數（寫入端更新）
+DROPPED_SAMPLES = 3
+MAGIC = 7
+
+COUNTERS_BYTES = 64
+HEADER_BYTES = 4096
+ALIGN = 64
+
+# 槽位資訊（seq = 該槽位最後一次發布時的 head + 1，讀取端據此確認槽位內容屬於預期的區塊）
+SLOT_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('start_index', '<i8'),
+    ('count', '<u8'),
+    ('event_id', '<i8'),
+    ('read_time', '<f8'),
+])
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _dtype_descr(dtype: Optional[np.dtype]):
+    """將 NumPy 型別轉為可存放於 JSON 的描述"""
+    if dtype is None:
+        return None
+    return np.lib.format.dtype_to_descr(np.dtype(dtype))
+
+
+def _descr_dtype(descr) -> Optional[np.dtype]:
+    """將 JSON 中的型別描述轉回 NumPy 型別"""
+    if descr is None:
+        return None
+    if isinstance(descr, list):
+        descr = [tuple(field) for field in descr]
+    return np.lib.format.descr_to_dtype(descr)
+
+
+class ShmRing:
+    """共用記憶體環形緩衝區的記憶體配置（建立或依名稱附加）"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, descriptor: Dict[str, object]):
+        """依描述資訊建立各區域的 NumPy 檢視"""
+        self.shm = shm
+        self.name = shm.name
+        self.descriptor = descriptor
+        self.slots = int(descriptor['slots'])
+        self.capacity = int(descriptor['capacity'])
+        self.dtype = _descr_dtype(descriptor['dtype'])
+        self.block_dtype = _descr_dtype(descriptor['block_dtype'])
+        self.aux_dtype = _descr_dtype(descriptor['aux_dtype'])
+        self.aux_frames = int(descriptor['aux_frames'])
+
+        buf = shm.buf
+        self.counters = np.ndarray(8, dtype='<u8', buffer=buf, offset=0)
+        offset = HEADER_BYTES
+        self.meta = np.ndarray(self.slots, dtype=SLOT_DTYPE, buffer=buf, offset=offset)
+        offset = _align(offset + self.meta.nbytes)
+        self.data = np.ndarray((self.slots, self.capacity), dtype=self.dtype, buffer=buf, offset=offset)
+        offset = _align(offset + self.data.nbytes)
+        self.aux = None
+        if self.aux_dtype is not None:
+            self.aux = np.ndarray((self.slots, self.aux_frames), dtype=self.aux_dtype, buffer=buf, offset=offset)
+
+    @staticmethod
+    def size(descriptor: Dict[str, object]) -> int:
+        """依描述資訊計算所需的共用記憶體大小"""
+        slots = int(descriptor['slots'])
+        itemsize = _descr_dtype(descriptor['dtype']).itemsize
+        size = _align(HEADER_BYTES + slots * SLOT_DTYPE.itemsize)
+        size = _align(size + slots * int(descriptor['capacity']) * itemsize)
+        aux_dtype = _descr_dtype(descriptor['aux_dtype'])
+        if aux_dtype is not None:
+            size += slots * int(descriptor['aux_frames']) * aux_dtype.itemsize
+        return size
+
+    @classmethod
+    def create(cls, name: Optional[str], descriptor: Dict[str, object]):
+        """建立環形緩衝區（name = None 時由系統產生名稱）"""
+        payload = json.dumps(descriptor, ensure_ascii=False).encode('utf-8')
+        if len(payload) + 4 > HEADER_BYTES - COUNTERS_BYTES:
+            raise ValueError("環形緩衝區描述資訊過長")
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.size(descriptor))
+        header = np.ndarray(HEADER_BYTES - COUNTERS_BYTES, dtype=np.uint8, buffer=shm.buf, offset=COUNTERS_BYTES)
+        header[:4] = np.frombuffer(np.uint32(len(payload)).tobytes(), dtype=np.uint8)
+        header[4:4 + len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        del header
+        ring = cls(shm, descriptor)
+        ring.counters[:] = 0
+        ring.counters[MAGIC] = RING_MAGIC
+        return ring
+
+    @classmethod
+    def attach(cls, name: str):
+        """依名稱附加到已存在的環形緩衝區"""
+        shm = shared_memory.SharedMemory(name=name)
+        header = bytes(shm.buf[COUNTERS_BYTES:HEADER_BYTES])
+        magic = int(np.frombuffer(bytes(shm.buf[MAGIC * 8:MAGIC * 8 + 8]), dtype='<u8')[0])
+        if magic != RING_MAGIC:
+            shm.close()
+            raise ValueError(f"{name} 不是 PET-7H24M 環形緩衝區")
+        length = int(np.frombuffer(header[:4], dtype=np.uint32)[0])
+        descriptor = json.loads(header[4:4 + length].decode('utf-8'))
+        if descriptor.get('version') != RING_VERSION:
+            shm.close()
+            raise ValueError(f"不支援的環形緩衝區版本: {descriptor.get('version')}")
+        return cls(shm, descriptor)
+
+    def close(self) -> bool:
+        """解除對應（仍有區塊檢視時無法解除，回傳 False，待檢視釋放後由系統回收）"""
+        self.counters = None
+        self.meta = None
+        self.data = None
+        self.aux = None
+        try:
+            self.shm.close()
+            return True
+        except BufferError:
+            debug(f"環形緩衝區 {self.name} 仍有區塊使用中，延後解除對應")
+            return False
+
+    def unlink(self) -> None:
+        """移除共用記憶體名稱（已對應的行程仍可繼續使用）"""
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RingWriter(ShmRing):
+    """
+    環形緩衝區寫入端（讀取行程使用）
+
+    提供與 BufferPool 相同的 acquire() / release() / block_capacity，讀取迴圈直接將設備資料寫入槽位；
+    RingQueue 提供與 ByteQueue 相同的 put()，put() 發布區塊後槽位由讀取端歸還。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, descriptor: Dict[str, object]):
+        super().__init__(shm, descriptor)
+        self.block_capacity = self.capacity
+        self.pool_size = self.slots
+        self.lock = threading.Lock()
+        self._buffers = [
+            PoolBuffer(self.data[i], True, self.aux[i] if self.aux is not None else None)
+            for i in range(self.slots)
+        ]
+        self._head = 0
+        self._pending: Optional[PoolBuffer] = None
+        # 統計資訊
+        self.acquired = 0
+        self.exhausted = 0
+        self.high_water = 0
+
+    def acquire(self) -> PoolBuffer:
+        """取得下一個槽位（環形緩衝區已滿時回傳臨時緩衝區，put() 時丟棄）"""
+        self.acquired += 1
+        in_use = self._head - int(self.counters[TAIL])
+        if in_use >= self.slots:
+            self.exhausted += 1
+            aux = np.zeros(self.aux_frames, dtype=self.aux_dtype) if self.aux_dtype is not None else None
+            return PoolBuffer(np.empty(self.capacity, dtype=self.dtype), False, aux)
+        if in_use + 1 > self.high_water:
+            self.high_water = in_use + 1
+        self._pending = self._buffers[self._head % self.slots]
+        return self._pending
+
+    def release(self, buffer: PoolBuffer) -> None:
+        """放棄尚未發布的槽位（未讀到資料或 put() 失敗時）"""
+        if buffer is self._pending:
+            self._pending = None
+
+    def publish(self, block: SampleBlock) -> bool:
+        """發布區塊（先寫入槽位資訊，最後更新 head；臨時緩衝區上的區塊回傳 False）"""
+        buffer = block._buffer
+        if buffer is None or buffer is not self._pending:
+            self.counters[DROPPED_BLOCKS] += 1
+            self.counters[DROPPED_SAMPLES] += len(block.data)
+            return False
+        slot = self._head % self.slots
+        meta = self.meta[slot]
+        meta['start_index'] = block.start_index
+        meta['count'] = len(block.data)
+        meta['event_id'] = block.event_id
+        meta['read_time'] = block.read_time
+        meta['seq'] = self._head + 1
+        self._head += 1
+        self._pending = None
+        # 槽位交給讀取端，寫入端的區塊物件不再歸還
+        block._pool = None
+        block._buffer = None
+        self.counters[HEAD] = self._head
+        return True
+
+    def get_stats(self) -> Dict[str, object]:
+        """取得寫入端統計（與 BufferPool.get_stats 相同的鍵）"""
+        acquired = self.acquired
+        return {
+            'ring': self.name,
+            'pool_size': self.slots,
+            'block_capacity': self.capacity,
+            'in_use': self._head - int(self.counters[TAIL]),
+            'high_water': self.high_water,
+            'acquired': acquired,
+            'exhausted': self.exhausted,
+            'reuse_rate': (max(0, acquired - self.slots) / acquired) if acquired else 0.0,
+        }
+
+
+class RingQueue:
+    """
+    讀取行程中取代 data_queue 的發布介面（put() 滿載時不阻塞，丟棄數計入統計）
+
+    event 為跨行程的 multiprocessing.Event：發布區塊後設定，主行程據此喚醒合併管線（已設定時不重複設定）。
+    """
+
+    def __init__(self, writer: RingWriter, event=None):
+        self.writer = writer
+        self.event = event
+
+    def put(self, block: SampleBlock) -> bool:
+        published = self.writer.publish(block)
+        if published and self.event is not None and not self.event.is_set():
+            self.event.set()
+        return published
+
+    @property
+    def dropped_items(self) -> int:
+        return int(self.writer.counters[DROPPED_BLOCKS])
+
+    @property
+    def dropped_samples(self) -> int:
+        return int(self.writer.counters[DROPPED_SAMPLES])
+
+    def clear(self) -> None:
+        """已發布的區塊由讀取端歸還，寫入端不需要清除"""
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            'policy': 'shm_ring',
+            'items': self.writer._head - int(self.writer.counters[TAIL]),
+            'dropped_items': self.dropped_items,
+            'dropped_samples': self.dropped_samples,
+        }
+
+
+class RingReader(ShmRing):
+    """
+    環形緩衝區讀取端（主行程使用）
+
+    get() 依序取出已發布的區塊（槽位上的唯讀檢視，不複製）；區塊所有消費者 release() 後，
+    連續歸還的槽位推進 tail，寫入端即可重複使用。get() 只能由單一執行緒呼叫，release() 可在任何執行緒呼叫。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, descriptor: Dict[str, object]):
+        super().__init__(shm, descriptor)
+        self.lock = threading.Lock()
+        self.device_id = str(descriptor.get('device_id', ''))
+        self.calibration: Optional[RawCalibration] = None
+        self._next = int(self.counters[TAIL])
+        self._tail = self._next
+        self._released = set()
+        self.received = 0
+        self.high_water = 0
+        self._final_stats: Dict[str, object] = {}
+
+    def qsize(self) -> int:
+        """已發布但尚未取出的區塊數"""
+        if self.counters is None:
+            return 0
+        return int(self.counters[HEAD]) - self._next
+
+    def get(self) -> Optional[SampleBlock]:
+        """取出下一個區塊（沒有新區塊時回傳 None）"""
+        if self.counters is None or self._next >= int(self.counters[HEAD]):
+            return None
+        seq = self._next
+        slot = seq % self.slots
+        meta = self.meta[slot]
+        if int(meta['seq']) != seq + 1:
+            # 槽位資訊尚未寫入完成（不應發生：head 在槽位資訊之後更新）
+            return None
+        count = int(meta['count'])
+        data = self.data[slot, :count]
+        if self.block_dtype != self.dtype:
+            data = data.view(self.block_dtype)
+        aux = self.aux[slot, :count // int(self.descriptor['channels'])] if self.aux is not None else None
+        block = SampleBlock(data, seq, self, self.calibration, device_id=self.device_id,
+                            start_index=int(meta['start_index']), aux=aux)
+        block.event_id = int(meta['event_id'])
+        block.read_time = float(meta['read_time'])
+        self._next += 1
+        self.received += 1
+        in_flight = self._next - self._tail
+        if in_flight > self.high_water:
+            self.high_water = in_flight
+        return block
+
+    def release(self, seq: int) -> None:
+        """歸還槽位（依序推進 tail；先完成的後續槽位等前面的槽位歸還後一起推進）"""
+        with self.lock:
+            if self.counters is None:
+                return
+            self._released.add(seq)
+            while self._tail in self._released:
+                self._released.remove(self._tail)
+                self._tail += 1
+            self.counters[TAIL] = self._tail
+
+    def close(self) -> bool:
+        """解除對應（保留最後一次的統計）"""
+        with self.lock:
+            if self.counters is not None:
+                self._final_stats = self.get_stats()
+            return super().close()
+
+    def get_stats(self) -> Dict[str, object]:
+        """取得讀取端統計（與 ByteQueue.get_stats 相近的鍵；解除對應後回傳最後一次的統計）"""
+        if self.counters is None:
+            return dict(self._final_stats)
+        head = int(self.counters[HEAD])
+        return {
+            'policy': 'shm_ring',
+            'ring': self.name,
+            'slots': self.slots,
+            'max_bytes': self.data.nbytes,
+            'items': head - self._next,
+            'in_flight': self._next - self._tail,
+            'high_water_items': self.high_water,
+            'bytes': (head - self._next) * self.capacity * self.dtype.itemsize,
+            'high_water_bytes': self.high_water * self.capacity * self.dtype.itemsize,
+            'put_items': head,
+            'dropped_items': int(self.counters[DROPPED_BLOCKS]),
+            'dropped_bytes': int(self.counters[DROPPED_SAMPLES]) * self.dtype.itemsize,
+            'dropped_samples': int(self.counters[DROPPED_SAMPLES]),
+            'spilled_bytes': 0,
+            'blocked_seconds': 0.0,
+        }
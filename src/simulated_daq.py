@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模擬 HSDAQ 設備模組
+
+此模組以 NumPy 模擬 libhsdaq.so 中 PET7H24M 使用的函數（呼叫方式與 ctypes 版本相同），支援：
+- HS_Device_Create / HS_Device_Release、HS_Set/GetAIScanParam、HS_Start/StopAIScan
+- HS_GetAIBufferStatus、HS_GetAIBuffer（float）、HS_GetAIBufferHex（原始整數）與校正函數
+- HS_SetEventCallback（依資料量觸發回呼）
+- 可設定的波形（sine、square、sawtooth、triangle、dc、ramp）、頻率、振幅與雜訊
+- 決定性輸出：樣本值只由樣本索引與 sim_seed 決定，與讀取時機、讀取大小無關
+- 故障注入：設備緩衝區溢位（容量不足或指定樣本數後）與斷線（指定樣本數後）
+- HS_ReadAIALL 單點讀取，以及資料記錄器（HS_StartLogger / HS_StopLogger）與記錄檔讀取函數
+  （模擬記錄檔使用自訂格式：固定長度標頭加上 float32 通道交錯資料，與 SDK 實際的記錄檔格式無關）
+- 同步輸入（HS_SetSyncInScanParam、HS_GetSyncInBufferLV 等）：AI 與 AI 緩衝區相同，
+  DI 為依 sim_di_hz 切換的方波，計數器依 sim_counter_rate 遞增，皆只由 frame 索引決定
+"""
+
+import os
+import struct
+import threading
+import time
+from ctypes import CFUNCTYPE, c_ulong
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 緩衝區狀態位元（與 HS_GetAIBufferStatus 相同）
+STATUS_OVERFLOW = 0x02
+STATUS_SCAN_STOPPED = 0x04
+
+# 模擬錯誤碼
+SIM_ERROR_NONE = 0x0
+SIM_ERROR_INVALID_HANDLE = 0x1001
+SIM_ERROR_NOT_SCANNING = 0x1002
+SIM_ERROR_DISCONNECTED = 0x1003
+
+# 原始整數格式：24-bit ADC 有號值（int32 右對齊），滿刻度 ±10 V
+FULL_SCALE_VOLTS = 10.0
+RAW_FULL_SCALE = float(1 << 23)
+
+# 雜訊表長度（以樣本索引取值，確保輸出與讀取大小無關）
+NOISE_TABLE_SIZE = 1 << 20
+
+WAVEFORMS = ("sine", "square", "sawtooth", "triangle", "dc", "ramp")
+
+_EVENT_CALLBACK = CFUNCTYPE(None)
+
+# 模擬記錄檔：標頭（識別字、filetype、通道數、增益、觸發模式、取樣率、起始時間 epoch 秒）後接 float32 資料
+SIM_LOG_EXT = ".simlog"
+SIM_LOG_MAGIC = b"SIMLOG01"
+SIM_LOG_HEADER = struct.Struct("<8siiiiid")
+
+# 同步輸入通道型別（hsdaql.h: enum SYNC_IN_TYPE）
+SYNC_IN_AI = 0
+SYNC_IN_DWORD_DI_CNT = 4
+SYNC_IN_DWORD_CNT = 5
+SYNC_IN_DI = 6
+
+# 模擬記錄器寫入檔案的間隔（秒）
+SIM_LOG_FLUSH_S = 0.05
+
+
+def _value(arg):
+    """取得 ctypes 參數的數值（c_short(...) 等物件或一般 Python 數值）"""
+    return arg.value if hasattr(arg, "value") else arg
+
+
+def _store(ref, value) -> None:
+    """寫入 byref() 輸出參數"""
+    getattr(ref, "_obj", ref).value = value
+
+
+def _split(value: str, count: int, cast) -> List:
+    """解析逗號分隔的每通道設定（數量不足時重複最後一個值）"""
+    items = [cast(v.strip()) for v in str(value).split(",") if v.strip()]
+    if not items:
+        raise ValueError("設定值不可為空")
+    return [items[min(i, len(items) - 1)] for i in range(count)]
+
+
+class _SimDevice:
+    """單一模擬設備連線的狀態"""
+
+    def __init__(self, ip: str):
+        self.ip = ip
+        self.channels = 1
+        self.gain = 0
+        self.trigger_mode = 0
+        self.sample_rate = 20000
+        self.target_count = 0
+        self.data_trans_method = 0
+        self.auto_run = 0
+        self.scanning = False
+        self.status = 0
+        self.disconnected = False
+        self.t0 = 0.0
+        self.wall_t0 = 0.0  # 掃描開始的 time.time()（模擬記錄檔的起始時間）
+        self.produced_fast = 0  # fast 模式下已產生的樣本數
+        self.read_pos = 0       # 已讀取的樣本數（通道交錯）
+        self.skipped = 0        # HS_ClearAIBuffer 丟棄的樣本數
+        self.readable_limit: Optional[int] = None  # 溢位後可讀取的上限（之後的樣本遺失，直到清除緩衝區）
+        self.overflow_injected = False
+        self.callback = None
+        self.callback_param = 0
+        self.callback_thread: Optional[threading.Thread] = None
+        self.logger: Optional[_SimLogger] = None
+        self.sync_in: List[tuple] = []  # HS_SetSyncInScanParam 的 (通道編號, 型別)
+
+
+class _SimLogger:
+    """模擬資料記錄器（掃描期間將已產生的樣本寫入記錄檔，interval > 0 時每 interval 秒分檔）"""
+
+    def __init__(self, folder: str, interval: int, filetype: int):
+        self.folder = folder
+        self.interval = interval
+        self.filetype = filetype
+        self.written = 0
+        self.active = False
+        self.thread: Optional[threading.Thread] = None
+
+
+class _SimLogFile:
+    """開啟中的模擬記錄檔"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            header = f.read(SIM_LOG_HEADER.size)
+        if len(header) < SIM_LOG_HEADER.size:
+            raise ValueError("記錄檔標頭不完整")
+        magic, self.filetype, self.channels, self.gain, self.trigger_mode, self.sample_rate, start = \
+            SIM_LOG_HEADER.unpack(header)
+        if magic != SIM_LOG_MAGIC:
+            raise ValueError("不是模擬記錄檔")
+        self.path = path
+        self.start_time = datetime.fromtimestamp(start)
+        self.data = np.memmap(path, dtype="<f4", mode="r", offset=SIM_LOG_HEADER.size)
+
+
+class SimulatedHSDAQ:
+    """
+    模擬 HSDAQ 函式庫
+
+    options 使用設定檔中 sim_ 開頭的鍵（皆可省略）：
+        sim_waveform   波形（逗號分隔可分別指定每個通道）
+        sim_frequency  頻率 Hz
+        sim_amplitude  振幅 V
+        sim_offset     直流偏移 V
+        sim_noise      高斯雜訊標準差 V
+        sim_seed       雜訊亂數種子
+        sim_pace       realtime = 依取樣率即時產生；fast = 每次查詢都有 sim_fast_ms 毫秒資料（壓力測試）
+        sim_fast_ms    fast 模式每次查詢可讀取的資料長度（毫秒）
+        sim_buffer_samples    設備緩衝區容量（樣本數，超過即溢位，之後的樣本遺失直到 HS_ClearAIBuffer）
+        sim_overflow_after    產生指定 frame 數後強制溢位（0 = 停用）
+        sim_disconnect_after  產生指定 frame 數後模擬斷線（0 = 停用；每次重新連線後重新計算）
+        sim_outage_ms         斷線後多久內無法重新建立連線（毫秒，HS_Device_Create 失敗）
+        sim_di_hz             同步輸入 DI 0 的方波頻率 Hz（DI n 為 DI 0 的 2^n 分頻）
+        sim_counter_rate      同步輸入計數器 0 每秒遞增的計數（計數器 n 為 n + 1 倍）
+    """
+
+    def __init__(self, options: Dict[str, str]):
+        """初始化模擬設備"""
+        self.options = dict(options)
+        self.pace = self.options.get("sim_pace", "realtime").strip().lower()
+        if self.pace not in ("realtime", "fast"):
+            raise ValueError(f"不支援的 sim_pace: {self.pace}（可用值: realtime, fast）")
+        self.fast_ms = int(self.options.get("sim_fast_ms", 100))
+        self.buffer_samples = int(self.options.get("sim_buffer_samples", 4 * 1024 * 1024))
+        self.overflow_after = int(self.options.get("sim_overflow_after", 0))
+        self.disconnect_after = int(self.options.get("sim_disconnect_after", 0))
+        self.outage_ms = int(self.options.get("sim_outage_ms", 0))
+        self._outage_until = 0.0
+        self.seed = int(self.options.get("sim_seed", 0))
+        self.di_hz = float(self.options.get("sim_di_hz", 10))
+        self.counter_rate = float(self.options.get("sim_counter_rate", 1000))
+        self._noise_table = np.random.default_rng(self.seed).standard_normal(NOISE_TABLE_SIZE).astype(np.float32)
+
+        self._devices: Dict[int, _SimDevice] = {}
+        self._log_files: Dict[int, _SimLogFile] = {}
+        self._log_list: List[str] = []
+        self._next_handle = 1
+        self._lock = threading.Lock()
+        self._last_error = SIM_ERROR_NONE
+        info(f"使用模擬 HSDAQ 設備（pace={self.pace}）")
+
+    # ==========================================
+    # 內部工具
+    # ==========================================
+
+    def _device(self, handle) -> Optional[_SimDevice]:
+        device = self._devices.get(_value(handle))
+        if device is None:
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+        return device
+
+    def _channel_params(self, channels: int) -> None:
+        """解析每通道的波形參數"""
+        self._waveforms = _split(self.options.get("sim_waveform", "sine"), channels, str)
+        for waveform in self._waveforms:
+            if waveform not in WAVEFORMS:
+                raise ValueError(f"不支援的 sim_waveform: {waveform}（可用值: {', '.join(WAVEFORMS)}）")
+        self._frequency = np.array(_split(self.options.get("sim_frequency", "50"), channels, float))
+        self._amplitude = np.array(_split(self.options.get("sim_amplitude", "1.0"), channels, float))
+        self._offset = np.array(_split(self.options.get("sim_offset", "0.0"), channels, float))
+        self._noise = np.array(_split(self.options.get("sim_noise", "0.0"), channels, float))
+
+    def _produced(self, device: _SimDevice) -> int:
+        """目前設備已產生的樣本數（通道交錯，已套用 N Sample 上限）"""
+        if device.scanning:
+            if self.pace == "fast":
+                fast_samples = max(1, device.sample_rate * self.fast_ms // 1000) * device.channels
+                device.produced_fast = max(device.produced_fast, device.read_pos + fast_samples)
+                produced = device.produced_fast
+            else:
+                frames = int((time.monotonic() - device.t0) * device.sample_rate)
+                produced = frames * device.channels
+        else:
+            produced = device.read_pos
+        if device.target_count > 0:
+            produced = min(produced, device.target_count)
+        return produced
+
+    def _check_faults(self, device: _SimDevice, produced: int) -> None:
+        """依已產生的樣本數注入溢位與斷線（溢位後的樣本遺失，直到 HS_ClearAIBuffer）"""
+        frames = produced // max(device.channels, 1)
+        if self.disconnect_after and frames >= self.disconnect_after and not device.disconnected:
+            device.disconnected = True
+            self._outage_until = time.monotonic() + self.outage_ms / 1000.0
+        if device.readable_limit is not None:
+            return
+        if self.overflow_after and frames >= self.overflow_after and not device.overflow_injected:
+            device.overflow_injected = True
+            device.status |= STATUS_OVERFLOW
+            device.readable_limit = produced
+        elif produced - device.read_pos > self.buffer_samples:
+            device.status |= STATUS_OVERFLOW
+            device.readable_limit = device.read_pos + self.buffer_samples
+
+    def _readable(self, device: _SimDevice, produced: int) -> int:
+        """目前可讀取的樣本數"""
+        limit = produced if device.readable_limit is None else min(produced, device.readable_limit)
+        return max(0, limit - device.read_pos)
+
+    def generate(self, start: int, count: int, channels: int, sample_rate: int) -> np.ndarray:
+        """產生樣本索引 [start, start + count) 的電壓值（通道交錯，float32）"""
+        first_frame = start // channels
+        last_frame = -(-(start + count) // channels)
+        frame_idx = np.arange(first_frame, last_frame, dtype=np.int64)
+        t = frame_idx / float(sample_rate)
+        frames = np.empty((len(frame_idx), channels), dtype=np.float32)
+
+        for ch in range(channels):
+            waveform = self._waveforms[ch]
+            phase = (t * self._frequency[ch] + ch / 4.0) % 1.0
+            if waveform == "sine":
+                wave = np.sin(2 * np.pi * phase)
+            elif waveform == "square":
+                wave = np.where(phase < 0.5, 1.0, -1.0)
+            elif waveform == "sawtooth":
+                wave = 2.0 * phase - 1.0
+            elif waveform == "triangle":
+                wave = 1.0 - 4.0 * np.abs(phase - 0.5)
+            elif waveform == "ramp":
+                # 每個 frame 加 1（乘上振幅），可用於檢查樣本是否連續
+                wave = (frame_idx % (1 << 24)).astype(np.float64)
+            else:
+                wave = np.zeros(len(frame_idx))
+            column = wave * self._amplitude[ch] + self._offset[ch]
+            if self._noise[ch]:
+                noise_idx = (frame_idx * channels + ch) % NOISE_TABLE_SIZE
+                column = column + self._noise_table[noise_idx] * self._noise[ch]
+            frames[:, ch] = column
+
+        offset = start - first_frame * channels
+        return frames.ravel()[offset:offset + count]
+
+    def _read(self, handle, count) -> Optional[np.ndarray]:
+        """讀取共用邏輯，回傳本次讀取的電壓值（失敗時回傳 None）"""
+        device = self._device(handle)
+        if device is None:
+            return None
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return None
+
+        produced = self._produced(device)
+        self._check_faults(device, produced)
+        count = min(int(_value(count)), self._readable(device, produced))
+        if count <= 0:
+            return np.empty(0, dtype=np.float32)
+
+        data = self.generate(device.read_pos, count, device.channels, device.sample_rate)
+        device.read_pos += count
+        return data
+
+    def _callback_loop(self, device: _SimDevice) -> None:
+        """事件回呼執行緒：每產生 callback_param 個樣本觸發一次"""
+        notified = device.read_pos
+        while device.scanning and device.callback is not None:
+            produced = self._produced(device)
+            if produced - notified >= device.callback_param or (produced > notified and self.pace == "fast"):
+                notified = produced
+                try:
+                    device.callback()
+                except Exception as e:
+                    warning(f"模擬事件回呼發生錯誤: {e}")
+            if self.pace == "fast":
+                time.sleep(0.0005)
+            else:
+                time.sleep(device.callback_param / float(device.sample_rate * device.channels) / 2)
+
+    # ==========================================
+    # HSDAQ 函數（呼叫方式與 libhsdaq.so 相同）
+    # ==========================================
+
+    def HS_Device_Create(self, ip) -> Optional[int]:
+        ip_value = _value(ip)
+        if isinstance(ip_value, bytes):
+            ip_value = ip_value.decode("utf-8")
+        if time.monotonic() < self._outage_until:
+            # 模擬連線中斷期間無法連線
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return None
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self._devices[handle] = _SimDevice(ip_value)
+        debug(f"模擬設備已建立: {ip_value} (handle={handle})")
+        return handle
+
+    def HS_Device_Release(self, handle) -> bool:
+        device = self._devices.pop(_value(handle), None)
+        if device is None:
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return False
+        device.scanning = False
+        device.callback = None
+        return True
+
+    def HS_SetAIScanParam(self, handle, channels, gain, trigger_mode, sample_rate,
+                          target_count, data_trans_method, auto_run) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        device.channels = max(1, int(_value(channels)))
+        device.gain = int(_value(gain))
+        device.trigger_mode = int(_value(trigger_mode))
+        device.sample_rate = max(1, int(_value(sample_rate)))
+        device.target_count = int(_value(target_count))
+        device.data_trans_method = int(_value(data_trans_method))
+        device.auto_run = int(_value(auto_run))
+        self._channel_params(device.channels)
+        return True
+
+    def HS_GetAIScanParam(self, handle, channels, gain, trigger_mode, sample_rate,
+                          target_count, data_trans_method, auto_run) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        _store(channels, device.channels)
+        _store(gain, device.gain)
+        _store(trigger_mode, device.trigger_mode)
+        _store(sample_rate, device.sample_rate)
+        _store(target_count, device.target_count)
+        _store(data_trans_method, device.data_trans_method)
+        _store(auto_run, device.auto_run)
+        return True
+
+    def HS_StartAIScan(self, handle) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return False
+        device.t0 = time.monotonic()
+        device.wall_t0 = time.time()
+        device.read_pos = 0
+        device.produced_fast = 0
+        device.skipped = 0
+        device.readable_limit = None
+        device.overflow_injected = False
+        device.status = 0
+        device.scanning = True
+        if device.callback is not None:
+            device.callback_thread = threading.Thread(target=self._callback_loop, args=(device,), daemon=True)
+            device.callback_thread.start()
+        if device.logger is not None:
+            device.logger.written = 0
+            device.logger.active = True
+            device.logger.thread = threading.Thread(target=self._logger_loop, args=(device,), daemon=True)
+            device.logger.thread.start()
+        return True
+
+    def HS_StopAIScan(self, handle) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        self._stop_logger_thread(device)
+        device.scanning = False
+        return True
+
+    def HS_GetAIBufferStatus(self, handle, status, count) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return False
+
+        produced = self._produced(device)
+        self._check_faults(device, produced)
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return False
+
+        state = device.status
+        if not device.scanning:
+            state |= STATUS_SCAN_STOPPED
+        _store(status, state)
+        _store(count, min(self._readable(device, produced), self.buffer_samples))
+        return True
+
+    def HS_GetTotalSamplingStatus(self, handle, total, status) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return False
+        # 設備已取樣的總樣本數（包含已讀取、緩衝區中與遺失的樣本）
+        _store(total, self._produced(device))
+        _store(status, device.status)
+        return True
+
+    def HS_ClearAIBuffer(self, handle) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        produced = self._produced(device)
+        device.skipped += produced - device.read_pos
+        device.read_pos = produced
+        device.readable_limit = None
+        device.status &= ~STATUS_OVERFLOW
+        return True
+
+    def HS_GetAIBuffer(self, handle, buffer, count) -> int:
+        data = self._read(handle, count)
+        if data is None or len(data) == 0:
+            return 0
+        np.ctypeslib.as_array(buffer, (len(data),))[:] = data
+        return len(data)
+
+    def HS_GetAIBufferHex(self, handle, buffer, count) -> int:
+        data = self._read(handle, count)
+        if data is None or len(data) == 0:
+            return 0
+        raw = np.clip(np.rint(data.astype(np.float64) / FULL_SCALE_VOLTS * RAW_FULL_SCALE),
+                      -RAW_FULL_SCALE, RAW_FULL_SCALE - 1)
+        np.ctypeslib.as_array(buffer, (len(data),))[:] = raw.astype(np.int32).view(np.uint32)
+        return len(data)
+
+    def HS_ReadGainOffset(self, handle, channel, gain, gain_value, offset_value) -> bool:
+        if self._device(handle) is None:
+            return False
+        _store(gain_value, 0x8000)
+        _store(offset_value, 0)
+        return True
+
+    def HS_Calibrate_Data_Float(self, handle, channel, gain, raw, value) -> bool:
+        if self._device(handle) is None:
+            return False
+        _store(value, int(_value(raw)) * FULL_SCALE_VOLTS / RAW_FULL_SCALE)
+        return True
+
+    def HS_SetEventCallback(self, handle, event, param, callback, context) -> int:
+        device = self._device(handle)
+        if device is None:
+            return 1
+        address = _value(callback)
+        device.callback = _EVENT_CALLBACK(address) if isinstance(address, int) else callback
+        device.callback_param = max(1, int(_value(param)))
+        return 0
+
+    def HS_RemoveEventCallback(self, handle, event) -> int:
+        device = self._device(handle)
+        if device is None:
+            return 1
+        device.callback = None
+        return 0
+
+    def HS_ReadAIALL(self, handle, gain, values, total_channels) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return False
+        # 單點讀取目前時間的樣本（與掃描無關，不影響 AI 緩衝區）
+        frame = int((time.monotonic() - device.t0) * device.sample_rate) if device.scanning else 0
+        count = min(int(_value(total_channels)), device.channels)
+        data = self.generate(frame * device.channels, device.channels, device.channels, device.sample_rate)
+        for ch in range(count):
+            values[ch] = float(data[ch])
+        return True
+
+    # ==========================================
+    # 同步輸入
+    # ==========================================
+
+    def HS_SetSyncInScanParam(self, handle, header, numbers, types, count, options, reserved) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        entries = [(int(numbers[i]), int(types[i])) for i in range(int(_value(count)))]
+        if sum(1 for _, kind in entries if kind == SYNC_IN_AI) != device.channels:
+            # AI 項目數需與 HS_SetAIScanParam 的通道數相同
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return False
+        device.sync_in = entries
+        return True
+
+    def HS_GetSyncInBufferStatus(self, handle, status, frames) -> bool:
+        device = self._device(handle)
+        count = c_ulong()
+        if device is None or not self.HS_GetAIBufferStatus(handle, status, count):
+            return False
+        _store(frames, count.value // device.channels)
+        return True
+
+    def HS_GetSyncInBufferLV(self, handle, header, ai, di, do, di_counters, counters, ud1, ud2, frames) -> int:
+        device = self._device(handle)
+        if device is None:
+            return 0
+        first_frame = device.read_pos // device.channels
+        data = self._read(handle, int(_value(frames)) * device.channels)
+        if data is None or len(data) == 0:
+            return 0
+        count = len(data) // device.channels
+
+        # AI 以 DWORD 傳回 float32 的位元組
+        np.ctypeslib.as_array(ai, (len(data),))[:] = data.view(np.uint32)
+
+        frame_idx = np.arange(first_frame, first_frame + count, dtype=np.int64)
+        level = frame_idx * int(2 * self.di_hz) // device.sample_rate
+        di_cnt = [ch for ch, kind in device.sync_in if kind == SYNC_IN_DWORD_DI_CNT]
+        cnt = [ch for ch, kind in device.sync_in if kind == SYNC_IN_DWORD_CNT]
+        if di and any(kind == SYNC_IN_DI for _, kind in device.sync_in):
+            np.ctypeslib.as_array(di, (count,))[:] = level & 0xFF
+        if di_counters and di_cnt:
+            # DI 計數器：對應 DI 位元的上升緣次數
+            out = np.ctypeslib.as_array(di_counters, (count, len(di_cnt)))
+            for i, ch in enumerate(di_cnt):
+                bit = ch % 8
+                out[:, i] = ((level + (1 << bit)) >> (bit + 1)) & 0xFFFFFFFF
+        if counters and cnt:
+            out = np.ctypeslib.as_array(counters, (count, len(cnt)))
+            for i, ch in enumerate(cnt):
+                out[:, i] = (frame_idx * int(self.counter_rate * (ch + 1)) // device.sample_rate) & 0xFFFFFFFF
+        return count
+
+    def HS_ClearSyncInBuffer(self, handle) -> bool:
+        return self.HS_ClearAIBuffer(handle)
+
+    def HS_GetSyncInTotalSamplingStatus(self, handle, total, status) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        if device.disconnected:
+            self._last_error = SIM_ERROR_DISCONNECTED
+            return False
+        _store(total, self._produced(device) // device.channels)
+        _store(status, device.status)
+        return True
+
+    # ==========================================
+    # 資料記錄器與記錄檔
+    # ==========================================
+
+    def _logger_loop(self, device: _SimDevice) -> None:
+        """模擬記錄器執行緒：掃描期間定期將已產生的樣本附加到目前的記錄檔"""
+        logger = device.logger
+        path = None
+        file_start = 0
+        while True:
+            active = logger.active
+            path = self._logger_write(device, logger, path, file_start)
+            if path is not None and logger.interval > 0 and \
+                    logger.written - file_start >= logger.interval * device.sample_rate * device.channels:
+                # 分檔：之後的樣本寫入新的記錄檔
+                file_start = logger.written
+                path = None
+                continue
+            if not active:
+                break
+            time.sleep(SIM_LOG_FLUSH_S)
+
+    def _logger_write(self, device: _SimDevice, logger: _SimLogger, path: Optional[str], file_start: int) -> Optional[str]:
+        """將尚未記錄的樣本附加到記錄檔（只寫入完整的 frame，第一次寫入時建立檔案），回傳目前的記錄檔"""
+        produced = self._produced(device)
+        if logger.interval > 0:
+            produced = min(produced, file_start + logger.interval * device.sample_rate * device.channels)
+        produced -= produced % device.channels
+        if produced <= logger.written:
+            return path
+
+        if path is None:
+            # 以檔案第一個 frame 的時間命名並寫入標頭
+            start = device.wall_t0 + file_start // device.channels / device.sample_rate
+            name = datetime.fromtimestamp(start).strftime("%Y%m%d_%H%M%S_%f") + SIM_LOG_EXT
+            path = os.path.join(logger.folder, name)
+            with open(path, "wb") as f:
+                f.write(SIM_LOG_HEADER.pack(SIM_LOG_MAGIC, logger.filetype, device.channels, device.gain,
+                                            device.trigger_mode, device.sample_rate, start))
+
+        data = self.generate(logger.written, produced - logger.written, device.channels, device.sample_rate)
+        with open(path, "ab") as f:
+            f.write(data.astype("<f4").tobytes())
+        logger.written = produced
+        return path
+
+    def _stop_logger_thread(self, device: _SimDevice) -> None:
+        """停止記錄器執行緒（掃描仍在進行時寫入最後的樣本）"""
+        logger = device.logger
+        if logger is None or logger.thread is None:
+            return
+        logger.active = False
+        logger.thread.join()
+        logger.thread = None
+
+    def HS_StartLogger(self, handle, path, interval, filetype) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        folder = _value(path)
+        if isinstance(folder, bytes):
+            folder = folder.decode("utf-8")
+        os.makedirs(folder, exist_ok=True)
+        device.logger = _SimLogger(folder, int(_value(interval)), int(_value(filetype)))
+        return True
+
+    def HS_StopLogger(self, handle) -> bool:
+        device = self._device(handle)
+        if device is None:
+            return False
+        self._stop_logger_thread(device)
+        device.logger = None
+        return True
+
+    def HS_GetAllLogFiles(self, folder, filetype) -> int:
+        folder = _value(folder)
+        if isinstance(folder, bytes):
+            folder = folder.decode("utf-8")
+        filetype = int(_value(filetype))
+        files = []
+        for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if not name.endswith(SIM_LOG_EXT):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                if _SimLogFile(path).filetype == filetype:
+                    files.append(path)
+            except (OSError, ValueError):
+                continue
+        self._log_list = files
+        return len(files)
+
+    def _open_log(self, path: str) -> Optional[int]:
+        try:
+            log_file = _SimLogFile(path)
+        except (OSError, ValueError):
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return None
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self._log_files[handle] = log_file
+        return handle
+
+    def HS_LogFile_Open_byIndex(self, index, filename) -> Optional[int]:
+        index = int(_value(index))
+        if not 0 <= index < len(self._log_list):
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return None
+        path = self._log_list[index]
+        filename.value = path.encode("utf-8")
+        return self._open_log(path)
+
+    def HS_LogFile_Open(self, filename) -> Optional[int]:
+        path = _value(filename)
+        if isinstance(path, bytes):
+            path = path.decode("utf-8")
+        return self._open_log(path)
+
+    def HS_LogFile_Close(self, handle) -> bool:
+        return self._log_files.pop(_value(handle), None) is not None
+
+    def HS_GetLogFile_AIScanConfigInfo(self, handle, channels, gain, trigger_mode, sample_rate,
+                                       data_trans_method, sync_mode) -> bool:
+        log_file = self._log_files.get(_value(handle))
+        if log_file is None:
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return False
+        _store(channels, log_file.channels)
+        _store(gain, log_file.gain)
+        _store(trigger_mode, log_file.trigger_mode)
+        _store(sample_rate, log_file.sample_rate)
+        _store(data_trans_method, 0)
+        _store(sync_mode, 0)
+        return True
+
+    def HS_GetLogFile_AIScanSampleInfo(self, handle, sample_count, start_date, start_time) -> bool:
+        log_file = self._log_files.get(_value(handle))
+        if log_file is None:
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return False
+        _store(sample_count, len(log_file.data))
+        start_date.value = log_file.start_time.strftime("%Y/%m/%d").encode("utf-8")
+        start_time.value = log_file.start_time.strftime("%H:%M:%S.%f").encode("utf-8")
+        return True
+
+    def HS_GetLogFile_AIData(self, handle, start, count, buffer) -> int:
+        log_file = self._log_files.get(_value(handle))
+        if log_file is None:
+            self._last_error = SIM_ERROR_INVALID_HANDLE
+            return 0
+        start = int(_value(start))
+        data = log_file.data[start:start + int(_value(count))]
+        if len(data) == 0:
+            return 0
+        np.ctypeslib.as_array(buffer, (len(data),))[:] = data
+        return len(data)
+
+    def HS_GetLastError(self) -> int:
+        return self._last_error
@@ -10,6 +10,8 @@ SQL 上傳器模組
 - 重試機制和資料保護（失敗時保留資料）
 - 執行緒安全
 - 支援動態通道數
+- 缺漏記錄（暫存檔案中的 "# GAP" 標記列寫入 <表名>_gaps 資料表）
+- 同步輸入欄位（DI 狀態與計數器，欄位名稱為小寫的 di_n、dicnt_n、cnt_n）
 """
 
 import time
@@ -19,6 +21,8 @@ from datetime import datetime
 from typing import List, Optional, Dict
 import threading
 
+from sample_block import GAP_MARKER
+
 try:
     import pymysql
     PYMySQL_AVAILABLE = True
@@ -48,9 +52,11 @@ if not PYMySQL_AVAILABLE and not MYSQL_CONNECTOR_AVAILABLE:
 class SQLUploader:
     """SQL 上傳器類別"""
 
-    def __init__(self, channels: int, label: str, sql_config: Dict[str, str]):
-        """初始化 SQL 上傳器"""
+    def __init__(self, channels: int, label: str, sql_config: Dict[str, str],
+                 aux_columns: Optional[List[str]] = None):
+        """初始化 SQL 上傳器（aux_columns 為同步輸入欄位名稱，接在通道欄位之後）"""
         self.channels = channels
+        self.aux_columns = [name.lower() for name in (aux_columns or [])]
         self.label = label
         self.sql_config = sql_config
         self.connection: Optional[object] = None
@@ -132,7 +138,8 @@ class SQLUploader:
                 self.cursor = self.connection.cursor()
             
             # 動態生成通道欄位
-            channel_columns = ', '.join([f'channel_{i+1} DOUBLE NOT NULL' for i in range(self.channels)])
+            channel_columns = ', '.join([f'channel_{i+1} DOUBLE NOT NULL' for i in range(self.channels)]
+                                        + [f'`{name}` BIGINT NOT NULL' for name in self.aux_columns])
             
             # 建立資料表的 SQL（使用通用語法）
             # 注意：表名使用清理後的名稱，但欄位中仍保留原始 label
@@ -148,6 +155,18 @@ class SQLUploader:
             """
 
             self.cursor.execute(create_table_sql)
+
+            # 缺漏資料表：記錄遺失資料的起始時間與 frame 數
+            create_gaps_table_sql = f"""
+            CREATE TABLE IF NOT EXISTS `{sanitized_table_name}_gaps` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                timestamp DATETIME(6) NOT NULL,
+                label VARCHAR(255) NOT NULL,
+                lost_frames BIGINT NOT NULL,
+                INDEX idx_timestamp (timestamp)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+            """
+            self.cursor.execute(create_gaps_table_sql)
             self.connection.commit()
             
             # 設定當前表名
@@ -285,8 +304,9 @@ class SQLUploader:
             bool: 上傳成功返回 True，失敗返回 False
         
         注意：
-            - CSV 檔案格式應為：Timestamp, Channel_1, Channel_2, ... (根據通道數)
+            - CSV 檔案格式應為：Timestamp, Channel_1, Channel_2, ... (根據通道數)，之後為同步輸入欄位
             - 第一行會被視為標題行並跳過
+            - 第一欄為 "# GAP" 的缺漏標記列寫入 <表名>_gaps 資料表
             - 使用批次插入提升效能
             - 如果表不存在，會自動建立
         """
@@ -311,12 +331,21 @@ class SQLUploader:
         # 讀取 CSV 檔案
         try:
             rows_to_insert = []
+            gaps_to_insert = []
             with open(csv_file_path, 'r', encoding='utf-8') as f:
                 reader = csv.reader(f)
                 next(reader)  # 跳過標題行
                 
                 for row in reader:
-                    if len(row) < 1 + self.channels:  # timestamp + channels
+                    if row and row[0] == GAP_MARKER:
+                        # 缺漏標記列：[GAP_MARKER, 時間戳記, 遺失的 frame 數]
+                        try:
+                            gaps_to_insert.append((datetime.fromisoformat(row[1]), self.label, int(row[2])))
+                        except (ValueError, IndexError) as e:
+                            warning(f"跳過無效的缺漏標記: {row}, 錯誤: {e}")
+                        continue
+
+                    if len(row) < 1 + self.channels + len(self.aux_columns):  # timestamp + channels + 同步輸入欄位
                         continue
                     
                     try:
@@ -334,13 +363,14 @@ class SQLUploader:
                         except:
                             timestamp = datetime.now()
                         
-                        row_data = [timestamp, self.label] + channel_values
+                        aux_values = [int(v) for v in row[1 + self.channels:1 + self.channels + len(self.aux_columns)]]
+                        row_data = [timestamp, self.label] + channel_values + aux_values
                         rows_to_insert.append(tuple(row_data))
                     except (ValueError, IndexError) as e:
                         warning(f"跳過無效的 CSV 行: {row}, 錯誤: {e}")
                         continue
             
-            if not rows_to_insert:
+            if not rows_to_insert and not gaps_to_insert:
                 warning(f"CSV 檔案中沒有有效資料: {csv_file_path}")
                 return True  # 檔案為空，視為成功
             
@@ -376,19 +406,28 @@ class SQLUploader:
                             self.cursor = self.connection.cursor()
                         
                         # 動態生成欄位名稱和佔位符
-                        channel_fields = ', '.join([f'channel_{i+1}' for i in range(self.channels)])
-                        placeholders = ', '.join(['%s'] * (2 + self.channels))
+                        channel_fields = ', '.join([f'channel_{i+1}' for i in range(self.channels)]
+                                                   + [f'`{name}`' for name in self.aux_columns])
+                        placeholders = ', '.join(['%s'] * (2 + self.channels + len(self.aux_columns)))
                         
                         insert_sql = f"""
                         INSERT INTO `{sanitized_table_name}` (timestamp, label, {channel_fields})
                         VALUES ({placeholders})
                         """
                         
-                        # 批次插入
-                        self.cursor.executemany(insert_sql, rows_to_insert)
+                        # 批次插入（資料與缺漏記錄在同一個交易中）
+                        if rows_to_insert:
+                            self.cursor.executemany(insert_sql, rows_to_insert)
+                        if gaps_to_insert:
+                            self.cursor.executemany(
+                                f"INSERT INTO `{sanitized_table_name}_gaps` (timestamp, label, lost_frames) VALUES (%s, %s, %s)",
+                                gaps_to_insert
+                            )
                         self.connection.commit()
                         
                         info(f"成功從 CSV 檔案上傳 {len(rows_to_insert)} 筆資料至 SQL 表: {sanitized_table_name}")
+                        if gaps_to_insert:
+                            warning(f"上傳 {len(gaps_to_insert)} 筆缺漏記錄至 SQL 表: {sanitized_table_name}_gaps")
                         return True
                         
                     except Exception as e:
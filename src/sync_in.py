@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同步輸入（SyncIn）模組
+
+此模組負責 sync_in = 1 時以 HS_SetSyncInScanParam / HS_GetSyncInBufferLV 讀取與 AI 時間對齊的
+DI 狀態與計數器值，支援：
+- SyncInSettings：同步輸入設定（DI 通道、計數器通道、DI 計數器通道）與 HS_SetSyncInScanParam 的陣列參數
+- 每個 frame 一筆 NumPy 結構化紀錄（欄位名稱即 CSV / SQL 欄位名稱：DI_n、DICNT_n、CNT_n）
+- SyncInReader：預先配置 HS_GetSyncInBufferLV 的 DI / 計數器暫存區，AI 直接寫入池化緩衝區，
+  DI 位元與計數器以整欄向量化複製到池化緩衝區的紀錄陣列（不逐列轉換）
+"""
+
+import configparser
+from ctypes import POINTER, byref, c_ubyte, c_uint32, c_ushort
+from typing import List, Optional
+
+import numpy as np
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# HS_SetSyncInScanParam 的通道型別（hsdaql.h: enum SYNC_IN_TYPE）
+SYNC_IN_AI = 0
+SYNC_IN_DWORD_DI_CNT = 4
+SYNC_IN_DWORD_CNT = 5
+SYNC_IN_DI = 6
+
+# DI 以一個 SYNC_IN_DI 項目讀取，每個 frame 一個位元組，位元 n 為 DI n
+DI_PORT_BITS = 8
+
+
+def _parse_channels(text: str, limit: Optional[int] = None) -> List[int]:
+    """解析逗號分隔的通道編號（去除重複並排序）"""
+    channels = sorted({int(item.strip()) for item in text.split(",") if item.strip()})
+    for ch in channels:
+        if ch < 0 or (limit is not None and ch >= limit):
+            raise ValueError(f"無效的同步輸入通道編號: {ch}")
+    return channels
+
+
+class SyncInSettings:
+    """同步輸入設定（PET-7H24M.ini 設備區段中 sync_in 開頭的鍵）"""
+
+    def __init__(self, ai_channels: List[int], di_channels: List[int], di_counters: List[int],
+                 counters: List[int], header: int = 0, options: int = 0):
+        """
+        初始化同步輸入設定
+
+        Args:
+            ai_channels: 啟用的 AI 通道（與 HS_SetAIScanParam 相同）
+            di_channels: 記錄狀態的 DI 通道（0-7）
+            di_counters: DI 計數器通道（SYNC_IN_DWORD_DI_CNT）
+            counters: 計數器 / 編碼器通道（SYNC_IN_DWORD_CNT）
+            header: HS_SetSyncInScanParam 的 SyncInheader
+            options: HS_SetSyncInScanParam 的 Options
+        """
+        if not (di_channels or di_counters or counters):
+            raise ValueError("sync_in = 1 時至少需要設定 sync_in_di、sync_in_di_counters 或 sync_in_counters")
+        self.ai_channels = ai_channels
+        self.di_channels = di_channels
+        self.di_counters = di_counters
+        self.counters = counters
+        self.header = header
+        self.options = options
+
+    @classmethod
+    def from_config(cls, cfg: configparser.ConfigParser, section: str,
+                    ai_channels: List[int]) -> Optional["SyncInSettings"]:
+        """從設定檔讀取同步輸入設定（sync_in = 0 時回傳 None）"""
+        if not cfg.getint(section, "sync_in", fallback=0):
+            return None
+        return cls(
+            ai_channels=list(ai_channels),
+            di_channels=_parse_channels(cfg.get(section, "sync_in_di", fallback=""), DI_PORT_BITS),
+            di_counters=_parse_channels(cfg.get(section, "sync_in_di_counters", fallback="")),
+            counters=_parse_channels(cfg.get(section, "sync_in_counters", fallback="")),
+            header=cfg.getint(section, "sync_in_header", fallback=0),
+            options=cfg.getint(section, "sync_in_options", fallback=0),
+        )
+
+    def entries(self) -> List[tuple]:
+        """HS_SetSyncInScanParam 的通道項目 (通道編號, SYNC_IN_TYPE)：AI、DI、DI 計數器、計數器"""
+        entries = [(ch, SYNC_IN_AI) for ch in self.ai_channels]
+        if self.di_channels:
+            entries.append((0, SYNC_IN_DI))
+        entries += [(ch, SYNC_IN_DWORD_DI_CNT) for ch in self.di_counters]
+        entries += [(ch, SYNC_IN_DWORD_CNT) for ch in self.counters]
+        return entries
+
+    def param_arrays(self):
+        """HS_SetSyncInScanParam 的 InChNumArray、InChTypeArray 與 Arraycount"""
+        entries = self.entries()
+        numbers = (c_ushort * len(entries))(*[num for num, _ in entries])
+        types = (c_ushort * len(entries))(*[kind for _, kind in entries])
+        return numbers, types, len(entries)
+
+    @property
+    def aux_dtype(self) -> np.dtype:
+        """每個 frame 的同步輸入紀錄型別（DI 為 0/1，計數器為 uint32）"""
+        fields = [(f"DI_{ch}", np.uint8) for ch in self.di_channels]
+        fields += [(f"DICNT_{ch}", "<u4") for ch in self.di_counters]
+        fields += [(f"CNT_{ch}", "<u4") for ch in self.counters]
+        return np.dtype(fields)
+
+    @property
+    def aux_columns(self) -> List[str]:
+        """同步輸入欄位名稱（CSV 標題、SQL 欄位與網頁圖例）"""
+        return list(self.aux_dtype.names)
+
+
+class SyncInReader:
+    """
+    HS_GetSyncInBufferLV 讀取器
+
+    AI 以 DWORD 形式直接寫入池化的 float32 緩衝區（同一份記憶體），DI 與計數器寫入預先配置的暫存區，
+    讀取後以整欄向量化複製到池化緩衝區的 aux 紀錄陣列。暫存區只由讀取執行緒使用。
+    """
+
+    def __init__(self, dll, settings: SyncInSettings, max_frames: int):
+        """初始化讀取器（max_frames 為單次讀取的最大 frame 數，即緩衝區池每個緩衝區的 frame 數）"""
+        self.dll = dll
+        self.settings = settings
+        self.max_frames = max_frames
+        self._header = c_uint32()
+        self._di = np.zeros(max_frames, dtype=np.uint8)
+        self._di_counters = np.zeros((max_frames, max(1, len(settings.di_counters))), dtype=np.uint32)
+        self._counters = np.zeros((max_frames, max(1, len(settings.counters))), dtype=np.uint32)
+        self._di_pointer = self._di.ctypes.data_as(POINTER(c_ubyte)) if settings.di_channels else None
+        self._di_counter_pointer = self._di_counters.ctypes.data_as(POINTER(c_uint32)) if settings.di_counters else None
+        self._counter_pointer = self._counters.ctypes.data_as(POINTER(c_uint32)) if settings.counters else None
+
+    def read(self, handle, buffer, frames: int) -> int:
+        """讀取最多 frames 個 frame 到池化緩衝區（buffer.array 為 AI，buffer.aux 為紀錄），回傳實際讀取的 frame 數"""
+        frames = min(frames, self.max_frames)
+        read_frames = self.dll.HS_GetSyncInBufferLV(
+            handle,
+            byref(self._header),
+            buffer.array.ctypes.data_as(POINTER(c_uint32)),
+            self._di_pointer,
+            None,
+            self._di_counter_pointer,
+            self._counter_pointer,
+            None,
+            None,
+            frames
+        )
+        if read_frames <= 0:
+            return 0
+
+        aux = buffer.aux
+        settings = self.settings
+        ports = self._di[:read_frames]
+        for ch in settings.di_channels:
+            np.bitwise_and(np.right_shift(ports, ch), 1, out=aux[f"DI_{ch}"][:read_frames])
+        for i, ch in enumerate(settings.di_counters):
+            aux[f"DICNT_{ch}"][:read_frames] = self._di_counters[:read_frames, i]
+        for i, ch in enumerate(settings.counters):
+            aux[f"CNT_{ch}"][:read_frames] = self._counters[:read_frames, i]
+        return read_frames
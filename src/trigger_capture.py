@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+觸發擷取模組
+
+此模組負責事件觸發擷取（capture_mode = hw_trigger / sw_trigger），支援：
+- 觸發參數解析（觸發通道、上下限電壓、觸發前後 frame 數）
+- 硬體類比觸發參數（HS_SetAIAnalogTriggerParam 的陣列參數）
+- 軟體觸發：預先配置的環形緩衝區保留最近 N 秒資料，向量化掃描門檻穿越，
+  只將事件視窗（觸發前 + 觸發後）交給 CSV / bin / SQL 輸出
+- 事件統計（事件數、截斷的事件、最近事件的觸發位置）
+"""
+
+import configparser
+from collections import deque
+from ctypes import c_char, c_float
+from typing import List, Optional
+
+import numpy as np
+
+from sample_block import RawCalibration, SampleBlock, as_frames
+
+# 導入統一日誌系統
+try:
+    from logger import info, debug, error, warning
+except ImportError:
+    # 如果無法導入，使用簡單的 fallback
+    def info(msg): print(f"[INFO] {msg}")
+    def debug(msg): print(f"[Debug] {msg}")
+    def error(msg): print(f"[Error] {msg}")
+    def warning(msg): print(f"[Warning] {msg}")
+
+# 可用的擷取模式
+CAPTURE_MODES = ("continuous", "hw_trigger", "sw_trigger")
+
+# 軟體觸發的穿越方向：rising = 向上穿越上限，falling = 向下穿越下限，both = 離開上下限之間的範圍
+TRIGGER_SLOPES = ("rising", "falling", "both")
+
+# PET-7H24M 的類比輸入通道總數（HS_SetAIAnalogTriggerParam 的陣列長度）
+AI_CHANNELS = 4
+
+# HS_SetAIScanParam 的類比輸入觸發模式（hsdaql.h: AI_TRIGGER_TYPE 的 AI_TRI_AI）
+AI_TRI_AI = 6
+
+# 保留最近多少個事件的觸發資訊
+RECENT_EVENTS = 100
+
+
+def _parse_list(text: str, cast) -> list:
+    """解析逗號分隔的設定值"""
+    return [cast(item.strip()) for item in text.split(",") if item.strip()]
+
+
+class TriggerSettings:
+    """觸發擷取設定（PET-7H24M.ini 設備區段的 trigger_* 參數）"""
+
+    def __init__(self, channels: List[int], high: List[float], low: List[float],
+                 pre_frames: int, post_frames: int, slope: str = "both",
+                 analog_mode: int = 1, ring_seconds: float = 10.0):
+        """
+        初始化觸發設定
+
+        Args:
+            channels: 觸發通道（AI 編號）
+            high: 各觸發通道的上限電壓
+            low: 各觸發通道的下限電壓
+            pre_frames: 觸發前保留的 frame 數
+            post_frames: 觸發後（含觸發點）擷取的 frame 數
+            slope: 軟體觸發的穿越方向（rising / falling / both）
+            analog_mode: 硬體類比觸發模式（HS_SetAIAnalogTriggerParam 的 analogmode，依 HSDAQ 手冊）
+            ring_seconds: 軟體觸發環形緩衝區保留的秒數
+        """
+        if not channels:
+            raise ValueError("觸發擷取至少需要一個觸發通道（trigger_channels）")
+        if slope not in TRIGGER_SLOPES:
+            raise ValueError(f"不支援的 trigger_slope: {slope}（可用值: {', '.join(TRIGGER_SLOPES)}）")
+        if post_frames <= 0:
+            raise ValueError("post_trigger_samples 必須大於 0")
+        self.channels = channels
+        self.high = np.array(high, dtype=np.float64)
+        self.low = np.array(low, dtype=np.float64)
+        self.pre_frames = max(0, pre_frames)
+        self.post_frames = post_frames
+        self.slope = slope
+        self.analog_mode = analog_mode
+        self.ring_seconds = ring_seconds
+
+    @classmethod
+    def from_config(cls, cfg: configparser.ConfigParser, section: str) -> "TriggerSettings":
+        """從設備區段讀取觸發設定（上下限可為單一值或每個觸發通道一個值）"""
+        channels = _parse_list(cfg.get(section, "trigger_channels", fallback="0"), int)
+        for channel in channels:
+            if not 0 <= channel < AI_CHANNELS:
+                raise ValueError(f"trigger_channels 超出範圍: AI{channel}")
+
+        def levels(key: str, default: str) -> List[float]:
+            values = _parse_list(cfg.get(section, key, fallback=default), float)
+            if len(values) == 1:
+                values = values * len(channels)
+            if len(values) != len(channels):
+                raise ValueError(f"{key} 的數量必須為 1 或與 trigger_channels 相同")
+            return values
+
+        return cls(
+            channels,
+            levels("trigger_high", "1.0"),
+            levels("trigger_low", "-1.0"),
+            cfg.getint(section, "pre_trigger_samples", fallback=2000),
+            cfg.getint(section, "post_trigger_samples", fallback=8000),
+            cfg.get(section, "trigger_slope", fallback="both").strip().lower(),
+            cfg.getint(section, "analog_trigger_mode", fallback=1),
+            cfg.getfloat(section, "trigger_ring_seconds", fallback=10.0),
+        )
+
+    @property
+    def window_frames(self) -> int:
+        """一個事件視窗的 frame 數"""
+        return self.pre_frames + self.post_frames
+
+    def analog_trigger_arrays(self):
+        """產生 HS_SetAIAnalogTriggerParam 的通道啟用、上限、下限陣列（長度 AI_CHANNELS）"""
+        enabled = (c_char * AI_CHANNELS)()
+        high = (c_float * AI_CHANNELS)()
+        low = (c_float * AI_CHANNELS)()
+        for i, channel in enumerate(self.channels):
+            enabled[channel] = b"\x01"
+            high[channel] = float(self.high[i])
+            low[channel] = float(self.low[i])
+        return enabled, high, low
+
+
+class SoftwareTrigger:
+    """
+    軟體觸發擷取
+
+    process() 由分發執行緒逐一傳入區塊（單一寫入者，環形緩衝區不需要鎖）。
+    每個區塊只掃描觸發通道一次（向量化比較前一個 frame 與目前 frame 的門檻狀態），
+    觸發後回傳的事件區塊包含環形緩衝區中的觸發前資料，之後的區塊補足觸發後資料。
+    事件區塊為獨立配置的陣列（不佔用讀取緩衝區池），event_id 標示所屬事件，
+    start_index 為事件資料在掃描中的實際序號，輸出端據此切換檔案並計算時間戳記。
+    前後兩個事件不重疊：觸發前資料最早只取到上一個事件結束之後。
+    """
+
+    def __init__(self, settings: TriggerSettings, channels: int, active_channels: List[int],
+                 sample_rate: int, calibration: Optional[RawCalibration] = None, device_id: str = ""):
+        """
+        初始化軟體觸發
+
+        Args:
+            settings: 觸發設定
+            channels: 區塊的通道數
+            active_channels: 啟用的 AI 通道（區塊中各欄對應的 AI 編號）
+            sample_rate: 取樣率（Hz）
+            calibration: 原始整數模式的校正係數（觸發通道轉換為電壓後比較）
+            device_id: 設備識別碼（日誌用）
+        """
+        missing = [ch for ch in settings.channels if ch not in active_channels]
+        if missing:
+            raise ValueError(f"觸發通道未啟用: {', '.join(f'AI{ch}' for ch in missing)}")
+
+        self.settings = settings
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.device_id = device_id
+        self.columns = [active_channels.index(ch) for ch in settings.channels]
+        self.scale = None
+        self.offset = None
+        if calibration is not None:
+            self.scale = calibration.scale[self.columns].astype(np.float64)
+            self.offset = calibration.offset[self.columns].astype(np.float64)
+
+        # 環形緩衝區（第一個區塊到達時依資料型別配置）
+        self.ring_frames = max(int(settings.ring_seconds * sample_rate), settings.pre_frames, 1)
+        self.ring: Optional[np.ndarray] = None
+        self.ring_fill = 0      # 環形緩衝區中連續的 frame 數（序號 i 的 frame 位於 i % ring_frames）
+
+        self.next_index: Optional[int] = None  # 預期的下一個區塊序號
+        self.armed_from = 0     # 觸發前資料可取用的最早序號（上一個事件結束或缺漏之後）
+        self.prev_state: Optional[np.ndarray] = None  # 上一個 frame 的門檻狀態
+        self.remaining_post = 0  # 目前事件尚未擷取的觸發後 frame 數
+        self.event_id = -1
+
+        # 統計資訊
+        self.scanned_frames = 0
+        self.events = 0
+        self.truncated = 0
+        self.recent = deque(maxlen=RECENT_EVENTS)
+
+    def process(self, block: SampleBlock) -> List[SampleBlock]:
+        """處理一個區塊，回傳需要寫入的事件區塊（可能為空）"""
+        frames = as_frames(block.data, self.channels)
+        count = len(frames)
+        start = block.start_index
+        if count == 0:
+            return []
+
+        if self.next_index is not None and start != self.next_index:
+            # 序號不連續：缺漏前的資料不能作為之後事件的觸發前資料
+            if self.remaining_post:
+                self.truncated += 1
+                self.remaining_post = 0
+                warning(f"[{self.device_id}] 觸發事件 #{self.event_id} 因資料缺漏提前結束")
+            self.ring_fill = 0
+            self.prev_state = None
+            self.armed_from = start
+        self.next_index = start + count
+
+        out = []
+        pos = 0
+        while pos < count:
+            if self.remaining_post:
+                take = min(self.remaining_post, count - pos)
+                out.append(self._event_block(frames[pos:pos + take], start + pos, block))
+                self.remaining_post -= take
+                pos += take
+                if not self.remaining_post:
+                    self.armed_from = start + pos
+                continue
+
+            hit = self._find_trigger(frames, pos)
+            self.scanned_frames += (count if hit < 0 else hit) - pos
+            if hit < 0:
+                break
+
+            trigger_index = start + hit
+            pre_start = max(trigger_index - self.settings.pre_frames, self.armed_from, start - self.ring_fill)
+            take = min(self.settings.post_frames, count - hit)
+            parts = []
+            if pre_start < start:
+                parts.extend(self._ring_slices(pre_start, start))
+            parts.append(frames[max(pre_start - start, 0):hit + take])
+            data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+            self.event_id += 1
+            self.events += 1
+            self.remaining_post = self.settings.post_frames - take
+            self.recent.append({
+                'event_id': self.event_id,
+                'trigger_index': trigger_index,
+                'trigger_time_s': round(trigger_index / self.sample_rate, 6),
+                'pre_frames': trigger_index - pre_start,
+            })
+            info(f"[{self.device_id}] 觸發事件 #{self.event_id}: 序號 {trigger_index}，"
+                 f"觸發前 {trigger_index - pre_start} frames")
+
+            out.append(self._event_block(data, pre_start, block))
+            pos = hit + take
+            if not self.remaining_post:
+                self.armed_from = start + pos
+
+        # 觸發通道最後一個 frame 的狀態（下一個區塊比對穿越用）
+        self.prev_state = self._state(frames[-1:])[0]
+        self._store(frames)
+        return out
+
+    def _state(self, frames: np.ndarray) -> np.ndarray:
+        """計算觸發通道的門檻狀態（True = 位於觸發區域內）"""
+        values = frames[:, self.columns]
+        if self.scale is not None:
+            values = values * self.scale + self.offset
+        if self.settings.slope == "rising":
+            return values > self.settings.high
+        if self.settings.slope == "falling":
+            return values < self.settings.low
+        return (values > self.settings.high) | (values < self.settings.low)
+
+    def _find_trigger(self, frames: np.ndarray, pos: int) -> int:
+        """從 pos 開始尋找第一個進入觸發區域的 frame（區塊內索引，找不到時回傳 -1）"""
+        state = self._state(frames[pos:])
+        if pos > 0:
+            before = self._state(frames[pos - 1:pos])[0]
+        elif self.prev_state is not None:
+            before = self.prev_state
+        else:
+            # 掃描剛開始時沒有前一個 frame，已位於觸發區域內不視為穿越
+            before = state[0]
+        previous = np.vstack((before[np.newaxis, :], state[:-1]))
+        hits = np.flatnonzero((state & ~previous).any(axis=1))
+        return pos + int(hits[0]) if len(hits) else -1
+
+    def _ring_slices(self, first: int, end: int) -> List[np.ndarray]:
+        """取出環形緩衝區中序號 [first, end) 的資料（最多兩段）"""
+        size = self.ring_frames
+        a = first % size
+        b = (end - 1) % size + 1
+        if a < b:
+            return [self.ring[a:b]]
+        return [self.ring[a:], self.ring[:b]]
+
+    def _store(self, frames: np.ndarray) -> None:
+        """將區塊寫入環形緩衝區（只保留最後 ring_frames 個 frame）"""
+        if self.ring is None:
+            self.ring = np.empty((self.ring_frames, self.channels), dtype=frames.dtype)
+        size = self.ring_frames
+        count = len(frames)
+        if count >= size:
+            frames = frames[-size:]
+            count = size
+        end = self.next_index
+        a = (end - count) % size
+        first = min(count, size - a)
+        self.ring[a:a + first] = frames[:first]
+        if first < count:
+            self.ring[:count - first] = frames[first:]
+        self.ring_fill = min(self.ring_fill + len(frames), size)
+
+    def _event_block(self, frames: np.ndarray, start_index: int, source: SampleBlock) -> SampleBlock:
+        """建立事件區塊（複製資料，來源區塊的緩衝區可立即歸還）"""
+        block = SampleBlock(np.ascontiguousarray(frames).ravel(), calibration=source.calibration,
+                            device_id=source.device_id, start_index=start_index)
+        block.read_time = source.read_time
+        block.event_id = self.event_id
+        return block
+
+    def get_stats(self) -> dict:
+        """取得觸發統計"""
+        return {
+            'mode': 'sw_trigger',
+            'events': self.events,
+            'truncated': self.truncated,
+            'capturing': self.remaining_post > 0,
+            'scanned_frames': self.scanned_frames,
+            'ring_frames': self.ring_frames,
+            'recent': list(self.recent)[-10:],
+        }
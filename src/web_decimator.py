@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+網頁顯示降頻模組
+
+此模組負責即時圖表的降頻（網頁游標取出區塊時呼叫），支援：
+- 最小 / 最大值包絡（每個區間輸出該區間的最小值與最大值，依出現順序排列，振動峰值不會被略過）
+- 降頻比例依取樣率與每秒顯示點數自動計算（[Web] 區段的 points_per_s）
+- 跨區塊的區間（區塊長度不是比例的整數倍時，剩餘的 frame 與下一個區塊合併；序號不連續時捨棄）
+- 整個區塊以 (區間, 比例, 欄位) 三維檢視一次計算，不逐點處理
+"""
+
+import configparser
+from typing import Optional
+
+import numpy as np
+
+# 每個通道每秒顯示的點數（[Web] 區段 points_per_s 的預設值；每個區間輸出 2 點）
+DEFAULT_POINTS_PER_S = 800
+
+
+def read_points_per_s(ini_path: str) -> int:
+    """讀取設定檔 [Web] 區段的每秒顯示點數"""
+    cfg = configparser.ConfigParser()
+    cfg.read(ini_path, encoding="utf-8")
+    points_per_s = cfg.getint("Web", "points_per_s", fallback=DEFAULT_POINTS_PER_S)
+    if points_per_s < 2:
+        raise ValueError(f"無效的 points_per_s: {points_per_s}（至少 2）")
+    return points_per_s
+
+
+def decimation_ratio(sample_rate: int, points_per_s: int) -> int:
+    """每個區間的 frame 數（每個區間輸出最小與最大值 2 點；取樣率不超過顯示點數時為 1 = 不降頻）"""
+    return max(1, -(-2 * sample_rate // points_per_s))
+
+
+class EnvelopeDecimator:
+    """最小 / 最大值包絡降頻器（每個輸出欄位各自計算，同一個執行緒依序呼叫 process()）"""
+
+    def __init__(self, ratio: int):
+        """
+        初始化降頻器
+
+        Args:
+            ratio: 每個區間的 frame 數（1 = 不降頻，原樣輸出）
+        """
+        if ratio < 1:
+            raise ValueError(f"無效的降頻比例: {ratio}")
+        self.ratio = ratio
+        self._carry: Optional[np.ndarray] = None  # 上一個區塊剩餘、不滿一個區間的 frame（複本）
+        self._next_index: Optional[int] = None
+        self.output_index: Optional[int] = None  # 最近一次輸出的第一個區間起點的 frame 序號
+
+    def reset(self) -> None:
+        """捨棄剩餘的 frame（資料不連續時由 process() 自動呼叫）"""
+        self._carry = None
+        self._next_index = None
+
+    def process(self, frames: np.ndarray, start_index: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        將 (frames, columns) 資料降頻為包絡（每個區間 2 列：依出現順序的最小值與最大值）
+
+        Args:
+            frames: 二維資料（可為唯讀檢視，不會被修改或保留）
+            start_index: 第一個 frame 的序號（與上一次呼叫不連續時捨棄剩餘的 frame；None = 視為連續）
+
+        Returns:
+            (2 × 區間數, columns) 的陣列，不足一個區間時為 None
+        """
+        if start_index is not None:
+            if self._next_index is not None and start_index != self._next_index:
+                self.reset()
+            self._next_index = start_index + len(frames)
+            # 有剩餘的 frame 時，第一個輸出的區間從剩餘的 frame 開始
+            self.output_index = start_index - (len(self._carry) if self._carry is not None else 0)
+
+        ratio = self.ratio
+        if ratio == 1:
+            # 複製：呼叫者處理完畢後即歸還區塊的緩衝區
+            return frames.copy() if len(frames) else None
+
+        parts = []
+        carry = self._carry
+        if carry is not None:
+            # 先補滿上一個區塊剩餘的區間（只複製不滿一個區間的資料）
+            need = ratio - len(carry)
+            if len(frames) < need:
+                self._carry = np.concatenate((carry, frames))
+                return None
+            parts.append(self._envelope(np.concatenate((carry, frames[:need]))[np.newaxis]))
+            frames = frames[need:]
+            self._carry = None
+
+        whole = len(frames) // ratio * ratio
+        if whole:
+            parts.append(self._envelope(frames[:whole].reshape(-1, ratio, frames.shape[1])))
+        if whole < len(frames):
+            self._carry = frames[whole:].copy()
+
+        if not parts:
+            return None
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    @staticmethod
+    def _envelope(buckets: np.ndarray) -> np.ndarray:
+        """(區間, 比例, 欄位) → (2 × 區間, 欄位)：各區間的最小與最大值，先出現的在前"""
+        lowest = buckets.argmin(axis=1)
+        highest = buckets.argmax(axis=1)
+        rows = np.arange(len(buckets))[:, np.newaxis]
+        columns = np.arange(buckets.shape[2])
+        envelope = np.empty((len(buckets), 2, buckets.shape[2]), dtype=buckets.dtype)
+        envelope[:, 0] = buckets[rows, np.minimum(lowest, highest), columns]
+        envelope[:, 1] = buckets[rows, np.maximum(lowest, highest), columns]
+        return envelope.reshape(-1, buckets.shape[2])
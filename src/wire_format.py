@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+即時資料二進位格式模組
+
+此模組負責 /stream 與 /data 的二進位資料框（?format=f32 / i16；未指定時為 JSON），支援：
+- 固定 32 位元組的標頭（小端序）：識別碼、版本、資料種類、欄位數、序號、降頻比例、第一個區間的 frame 序號、略過的 frame 數、值的個數
+- float32 資料：標頭之後直接是依 frame 交錯排列的值，前端以 Float32Array 直接檢視，不需解析
+- int16 資料：標頭之後為每個欄位一個 float32 比例，再接 int16 值（值 × 比例 = 電壓），資料量約為 float32 的一半
+- 連續的資料段合併為一個資料框（每次送出時標頭只佔一次）
+- JSON 資料框：設備資訊與狀態（meta / status）以同一種標頭傳送，值的個數為 UTF-8 位元組數
+"""
+
+import json
+import struct
+from typing import List, Optional
+
+import numpy as np
+
+# 標頭：識別碼、版本、資料種類、欄位數、序號、降頻比例、第一個區間的 frame 序號、略過的 frame 數、值的個數
+FRAME_HEADER = struct.Struct('<4sBBHIIQII')
+FRAME_MAGIC = b'PETW'
+FRAME_VERSION = 1
+
+# 資料種類
+KIND_JSON = 0
+KIND_FLOAT32 = 1
+KIND_INT16 = 2
+
+# ?format= 可用的二進位格式（json = 原有的 JSON 回應）
+WIRE_FORMATS = {'f32': KIND_FLOAT32, 'i16': KIND_INT16}
+MIMETYPE = 'application/octet-stream'
+
+INT16_MAX = 32767
+
+
+def parse_wire_format(name: Optional[str]) -> Optional[int]:
+    """解析 ?format= 參數（None / 空白 / json = JSON，回傳 None；不支援的格式拋出 ValueError）"""
+    if not name or name == 'json':
+        return None
+    if name not in WIRE_FORMATS:
+        raise ValueError(f"不支援的格式: {name}（json / {' / '.join(WIRE_FORMATS)}）")
+    return WIRE_FORMATS[name]
+
+
+def encode_values(kind: int, values: np.ndarray, columns: int, seq: int = 0, sample_index: int = 0,
+                  decimation: int = 1, skipped: int = 0) -> bytes:
+    """
+    將依 frame 交錯排列的值編碼為一個資料框
+
+    Args:
+        kind: KIND_FLOAT32 或 KIND_INT16
+        values: 一維陣列（長度為 columns 的整數倍）
+        columns: 每個 frame 的欄位數
+        seq: 資料段序號
+        sample_index: 第一個區間起點的原始 frame 序號
+        decimation: 降頻比例（每個區間的原始 frame 數）
+        skipped: 上一個資料框之後此用戶端略過的原始 frame 數
+    """
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, kind, columns, seq & 0xFFFFFFFF, decimation,
+                               max(0, sample_index), min(skipped, 0xFFFFFFFF), len(values))
+    if kind == KIND_FLOAT32:
+        return header + np.asarray(values, dtype='<f4').tobytes()
+    if kind == KIND_INT16:
+        # 每個欄位依這段資料的最大絕對值縮放（同步輸入的整數欄位以比例 1 原樣傳送）
+        frames = np.asarray(values, dtype=np.float32).reshape(-1, columns)
+        peak = np.abs(frames).max(axis=0) if len(frames) else np.zeros(columns, dtype=np.float32)
+        scale = (peak / INT16_MAX).astype('<f4')
+        scale[((peak <= INT16_MAX) & (np.rint(frames) == frames).all(axis=0)) | (peak == 0)] = 1.0
+        quantized = np.rint(frames / scale).astype('<i2')
+        return header + scale.tobytes() + quantized.tobytes()
+    raise ValueError(f"不支援的資料種類: {kind}")
+
+
+def encode_chunks(kind: int, chunks: list, columns: int, decimation: int, skipped: int = 0) -> List[bytes]:
+    """
+    將 LiveChunk 串列編碼為資料框（frame 序號連續的資料段合併為一個資料框，不連續時另起一個）
+
+    Args:
+        kind: KIND_FLOAT32 或 KIND_INT16
+        chunks: 依序號排列的資料段
+        columns: 每個 frame 的欄位數
+        decimation: 降頻比例（每個區間輸出最小與最大值 2 列；比例 1 時每個 frame 1 列）
+        skipped: 略過的原始 frame 數（記錄在第一個資料框）
+    """
+    rows_per_bucket = 2 if decimation > 1 else 1
+    frames = []
+    group = []
+    next_index = None
+    for chunk in chunks:
+        if group and chunk.start_index != next_index:
+            frames.append(_encode_group(kind, group, columns, decimation, skipped))
+            skipped = 0
+            group = []
+        group.append(chunk)
+        next_index = chunk.start_index + len(chunk.values) // columns // rows_per_bucket * decimation
+    if group:
+        frames.append(_encode_group(kind, group, columns, decimation, skipped))
+    return frames
+
+
+def _encode_group(kind: int, group: list, columns: int, decimation: int, skipped: int) -> bytes:
+    """將連續的資料段編碼為一個資料框（序號為最後一段的序號）"""
+    values = group[0].values if len(group) == 1 else np.concatenate([chunk.values for chunk in group])
+    return encode_values(kind, values, columns, group[-1].seq, group[0].start_index, decimation, skipped)
+
+
+def encode_json(payload: dict) -> bytes:
+    """將設備資訊或狀態編碼為 JSON 資料框"""
+    body = json.dumps(payload).encode('utf-8')
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, KIND_JSON, 0, 0, 0, 0, 0, len(body)) + body
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""pytest 設定：src 下的模組以頂層模組匯入（與 src 目錄中執行 main.py 相同）"""
+
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+以模擬設備（sim_waveform = ramp，每個 frame 加 1）端對端測試讀取管線
+
+- 區塊的 start_index 連續，且 ramp 值等於 frame 序號
+- sim_overflow_after 注入溢位後（overflow_action = continue），CSV 寫入 # GAP 列，之後的時間與數值跳過遺失的 frame
+- sim_disconnect_after 注入斷線後重新連線並繼續讀取，start_index 跳過斷線期間遺失的 frame
+"""
+
+import configparser
+import csv
+import glob
+import os
+import time
+
+import numpy as np
+import pytest
+
+from acquisition_session import AcquisitionSession, load_output_settings
+from device_manager import DEVICE_SECTION_PREFIX, DeviceManager
+from hsdaq_backend import BACKEND_ENV
+from sample_block import GAP_MARKER
+
+BASE_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "API", "PET-7H24M.ini")
+CHANNELS = 2
+
+
+@pytest.fixture(autouse=True)
+def _simulated_backend(monkeypatch):
+    """環境變數會覆寫設定檔中的 backend，測試一律使用模擬設備"""
+    monkeypatch.setenv(BACKEND_ENV, "simulated")
+
+
+def write_ini(tmp_path, sample_rate: int = 10000, **options) -> str:
+    """以基準設定檔為範本產生單一模擬設備的設定檔（ramp 波形、CHANNELS 個通道；options 覆寫其他鍵）"""
+    cfg = configparser.ConfigParser()
+    cfg.read(BASE_INI, encoding="utf-8")
+    for section in cfg.sections():
+        if section != DEVICE_SECTION_PREFIX:
+            cfg.remove_section(section)
+    section = cfg[DEVICE_SECTION_PREFIX]
+    section.update({
+        "backend": "simulated",
+        "sample_rate": str(sample_rate),
+        "target_count": "0",
+        "sim_waveform": "ramp",
+        "sim_pace": "realtime",
+        "reconnect_initial_ms": "50",
+    })
+    for ch in range(4):
+        section[f"enable_ai{ch}"] = "1" if ch < CHANNELS else "0"
+    section.update({key: str(value) for key, value in options.items()})
+
+    path = os.path.join(str(tmp_path), "PET-7H24M.ini")
+    with open(path, "w", encoding="utf-8") as f:
+        cfg.write(f)
+    return path
+
+
+def collect(manager: DeviceManager, done, timeout: float = 10.0) -> list:
+    """取出區塊直到 done(blocks) 為真，回傳 (start_index, (frames, CHANNELS) 陣列) 串列"""
+    blocks = []
+    deadline = time.monotonic() + timeout
+    while not done(blocks):
+        assert time.monotonic() < deadline, "等待模擬設備資料逾時"
+        block = manager.get_data()
+        if block is None:
+            manager.wait_for_data(0.05)
+            continue
+        blocks.append((block.start_index, np.array(block.data, dtype=np.float64).reshape(-1, CHANNELS)))
+        block.release()
+    return blocks
+
+
+def frames_read(blocks: list) -> int:
+    return sum(len(values) for _, values in blocks)
+
+
+def test_ramp_blocks_are_contiguous(tmp_path):
+    manager = DeviceManager()
+    manager.init_devices(write_ini(tmp_path))
+    try:
+        manager.start_reading()
+        blocks = collect(manager, lambda blocks: frames_read(blocks) >= 5000)
+    finally:
+        manager.release()
+
+    expected = 0
+    for start_index, values in blocks:
+        assert start_index == expected
+        for ch in range(CHANNELS):
+            np.testing.assert_array_equal(values[:, ch], np.arange(start_index, start_index + len(values)))
+        expected += len(values)
+
+
+def test_overflow_writes_gap_rows(tmp_path):
+    ini = write_ini(tmp_path, sim_overflow_after=2000, overflow_action="continue")
+    session = AcquisitionSession("test", load_output_settings(True, False, {}), str(tmp_path / "output"), ini)
+    session.start()
+    try:
+        device = session.manager.get_device(session.get_device_ids()[0])
+        deadline = time.monotonic() + 10.0
+        while device.get_reader_stats()["gaps"] < 1 or device.get_reader_stats()["samples"] < 8000 * CHANNELS:
+            assert time.monotonic() < deadline, "等待溢位缺漏逾時"
+            time.sleep(0.05)
+    finally:
+        session.drain()
+        session.manager.release()
+
+    paths = sorted(glob.glob(os.path.join(str(tmp_path / "output"), "**", "*.csv"), recursive=True))
+    assert paths
+    gaps = []
+    expected = 0
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))[1:]
+        for row in rows:
+            if row[0] == GAP_MARKER:
+                gaps.append(int(row[2]))
+                expected += int(row[2])
+                continue
+            # 缺漏之後的數值跳過遺失的 frame（ramp 值仍等於 frame 序號）
+            assert [float(value) for value in row[1:1 + CHANNELS]] == [expected] * CHANNELS
+            expected += 1
+
+    assert gaps and all(frames > 0 for frames in gaps)
+    assert expected > 2000 + sum(gaps)
+
+
+def split_connections(blocks: list) -> tuple:
+    """依 start_index 的跳躍切分各次連線的區塊，回傳 (各次連線的區塊串列, 跳過的 frame 數)"""
+    segments = [[]]
+    skipped = 0
+    for block in blocks:
+        if segments[-1]:
+            prev_index, prev_values = segments[-1][-1]
+            gap = block[0] - (prev_index + len(prev_values))
+            assert gap >= 0
+            if gap:
+                skipped += gap
+                segments.append([])
+        segments[-1].append(block)
+    return segments, skipped
+
+
+def test_disconnect_recovers(tmp_path):
+    manager = DeviceManager()
+    manager.init_devices(write_ini(tmp_path, sample_rate=2000, sim_disconnect_after=1000))
+    device = manager.get_device(manager.get_device_ids()[0])
+    try:
+        manager.start_reading()
+        # 重新連線後繼續讀取至少 200 個 frame（每次連線在 1000 個 frame 後再次斷線）
+        blocks = collect(manager, lambda blocks: len(split_connections(blocks)[0]) >= 2
+                         and frames_read(split_connections(blocks)[0][-1]) >= 200)
+        link = device.get_reader_stats()["link"]
+    finally:
+        manager.release()
+
+    assert link["link_losses"] >= 1 and link["reconnects"] >= 1
+
+    # start_index 只在重新連線時跳過斷線期間遺失的 frame；每次連線重新開始掃描，ramp 在同一次連線中連續
+    segments, skipped = split_connections(blocks)
+    assert 0 < skipped * CHANNELS <= link["outage_lost_samples"]
+    for segment in segments:
+        ramp = np.concatenate([values[:, 0] for _, values in segment])
+        np.testing.assert_array_equal(np.diff(ramp), 1.0)